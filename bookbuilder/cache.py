@@ -0,0 +1,1121 @@
+"""
+Build cache module - content hashes and the conversion manifest.
+
+Converted PDFs are validated against a cache key built from everything that
+affects the rendered output, not just file timestamps. Keys are stored in a
+sidecar manifest inside the output directory, next to the converted PDFs.
+The manifest also lists the local files each PDF was rendered from (images,
+stylesheets), so replacing a screenshot rebuilds only the documents that
+use it:
+
+    bookbuilder-output/
+    ├── .bookbuilder-cache/
+    │   ├── manifest.json      # pdf path -> cache key and dependencies
+    │   ├── page-counts.json   # pdf path -> page count (by size and mtime)
+    │   ├── dir-snapshot.json  # source directory -> listing (by directory mtime)
+    │   ├── book-plan.json     # order file -> resolved book plan (by directory mtimes)
+    │   ├── book-map.json      # page ranges of the last built book (incremental mode)
+    │   ├── build-manifest.json # book -> inputs and output of its last build
+    │   ├── html/              # markdown -> HTML stage, one file per key
+    │   ├── resources/         # remote images and stylesheets, one file per URL
+    │   ├── images/            # downsampled images, one file per key
+    │   └── chapters/          # merged chapter blocks, one PDF per key
+    ├── intro.pdf
+    └── ...
+"""
+
+import os
+import json
+import time
+import hashlib
+
+from .utils import ensure_dir
+
+# Directory (inside the output directory) holding all cache files
+CACHE_DIR_NAME = '.bookbuilder-cache'
+
+# Conversion manifest filename (inside the cache directory)
+MANIFEST_FILENAME = 'manifest.json'
+
+# Bump when the manifest layout changes; older manifests are discarded
+MANIFEST_VERSION = 2
+
+# Page count index filename (inside the cache directory)
+PAGE_INDEX_FILENAME = 'page-counts.json'
+
+# Directory snapshot filename (inside the cache directory)
+DIR_SNAPSHOT_FILENAME = 'dir-snapshot.json'
+
+# Listings of directories modified less than this many seconds before they
+# were read are not kept: an entry added within the same mtime tick would
+# not change the mtime
+DIR_SNAPSHOT_SETTLE_SECONDS = 2
+
+# Resolved book plan filename (inside the cache directory)
+BOOK_PLAN_FILENAME = 'book-plan.json'
+
+# Subdirectory (inside the cache directory) for the markdown -> HTML stage
+HTML_CACHE_DIR_NAME = 'html'
+
+# Book page-range map filename (inside the cache directory)
+BOOK_MAP_FILENAME = 'book-map.json'
+
+# Build manifest filename (inside the cache directory)
+BUILD_MANIFEST_FILENAME = 'build-manifest.json'
+
+# Subdirectory (inside the cache directory) for merged chapter blocks
+CHAPTER_CACHE_DIR_NAME = 'chapters'
+
+# Subdirectory (inside the cache directory) for fetched remote resources
+RESOURCE_CACHE_DIR_NAME = 'resources'
+
+# Subdirectory (inside the cache directory) for downsampled images
+IMAGE_CACHE_DIR_NAME = 'images'
+
+# HTML, resource and image entries not used for this many seconds are
+# deleted by prune()
+UNUSED_ENTRY_MAX_AGE = 30 * 24 * 3600
+
+
+def get_cache_dir(output_dir: str) -> str:
+    """
+    Get the cache directory for an output directory.
+    
+    Args:
+        output_dir: Output directory holding converted PDFs
+    
+    Returns:
+        Path to the cache directory (not created)
+    """
+    return os.path.join(output_dir, CACHE_DIR_NAME)
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the SHA-256 hex digest of a file's contents.
+    
+    Args:
+        path: File to hash
+        chunk_size: Read size in bytes
+    
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_files(paths, include_missing: bool = False) -> dict:
+    """
+    Record the current state of files, for checking later whether they changed.
+    
+    Args:
+        paths: File paths
+        include_missing: Record files that do not exist as None, so their
+            appearance counts as a change
+    
+    Returns:
+        Dictionary of {path: {'size', 'mtime', 'hash'}} for the files that
+        exist (and {path: None} for the others with include_missing)
+    """
+    snapshot = {}
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+            snapshot[path] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': hash_file(path)}
+        except OSError:
+            if include_missing and not os.path.exists(path):
+                snapshot[path] = None
+    return snapshot
+
+
+def is_file_unchanged(path: str, recorded: dict) -> bool:
+    """
+    Check whether a file is unchanged since snapshot_files recorded it.
+    
+    Files are compared by size and mtime first, and hashed only when the
+    mtime differs. A touched file with the same content is unchanged; its
+    new mtime is then stored in recorded, to skip hashing next time. A file
+    recorded as missing is unchanged while it is still missing.
+    
+    Args:
+        path: File path
+        recorded: Entry of the file from snapshot_files (None if it was missing)
+    
+    Returns:
+        True if the file exists with the recorded content, or is still missing
+    """
+    if recorded is None:
+        return not os.path.exists(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    if stat.st_size != recorded.get('size'):
+        return False
+    if stat.st_mtime_ns == recorded.get('mtime'):
+        return True
+    if hash_file(path) != recorded.get('hash'):
+        return False
+    recorded['mtime'] = stat.st_mtime_ns
+    return True
+
+
+def hash_data(data) -> str:
+    """
+    Compute a stable SHA-256 hex digest of JSON-serializable data.
+    
+    Dictionary keys are sorted so equal settings always hash the same.
+    
+    Args:
+        data: JSON-serializable value (dicts, lists, strings, numbers)
+    
+    Returns:
+        Hex digest string
+    """
+    payload = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_json_file(path: str, default=None):
+    """
+    Load a JSON cache file, returning a default if it is missing or corrupt.
+    
+    Args:
+        path: JSON file path
+        default: Value returned when the file cannot be read
+    
+    Returns:
+        Parsed JSON data or default
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json_file(path: str, data) -> None:
+    """
+    Atomically write a JSON cache file.
+    
+    Writes to a temporary file first and renames it into place so an
+    interrupted build never leaves a half-written cache file behind.
+    
+    Args:
+        path: JSON file path
+        data: JSON-serializable data
+    """
+    ensure_dir(os.path.dirname(path))
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def mark_used(path: str) -> None:
+    """
+    Record that a cache entry was used, by setting its mtime to now.
+    
+    Args:
+        path: Entry file path
+    """
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def prune_unused_entries(directory: str, max_age: float) -> int:
+    """
+    Delete the cache entries of a directory that were not used recently.
+    
+    All files whose names start with the same key (an entry and its .json
+    sidecar, or a leftover temporary file) form one entry, last used at the
+    newest mtime among them; the whole entry is deleted once that is more
+    than max_age seconds ago.
+    
+    Args:
+        directory: Cache directory
+        max_age: Maximum time in seconds since the last use
+    
+    Returns:
+        Number of entries deleted
+    """
+    if not os.path.isdir(directory):
+        return 0
+    entries = {}
+    for filename in os.listdir(directory):
+        path = os.path.join(directory, filename)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            continue
+        entry = entries.setdefault(filename.split('.', 1)[0], {'mtime': 0, 'paths': []})
+        entry['mtime'] = max(entry['mtime'], mtime)
+        entry['paths'].append(path)
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in entries.values():
+        if entry['mtime'] >= cutoff:
+            continue
+        for path in entry['paths']:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        removed += 1
+    return removed
+
+
+def prune_stage_caches(output_dir: str, max_age: float = UNUSED_ENTRY_MAX_AGE) -> int:
+    """
+    Delete the HTML, resource and image stage entries that were not used recently.
+    
+    Args:
+        output_dir: Output directory holding converted PDFs
+        max_age: Maximum time in seconds since the last use
+    
+    Returns:
+        Number of entries deleted
+    """
+    return sum(cache.prune(max_age) for cache in (
+        HtmlStageCache(output_dir), ResourceCache(output_dir), ImageStageCache(output_dir)))
+
+
+class ConversionManifest:
+    """
+    Sidecar manifest mapping converted PDFs to the cache key they were built with.
+    
+    Entries are keyed by the PDF path relative to the output directory, so the
+    output directory can be moved without invalidating the cache.
+    """
+    
+    def __init__(self, output_dir: str):
+        """
+        Load the manifest for an output directory (empty if none exists yet).
+        
+        Args:
+            output_dir: Output directory holding converted PDFs
+        """
+        self.output_dir = os.path.abspath(output_dir)
+        self.path = os.path.join(get_cache_dir(self.output_dir), MANIFEST_FILENAME)
+        data = load_json_file(self.path, {})
+        if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION:
+            data = {}
+        self.entries = data.get('entries', {})
+        self._dirty = False
+    
+    def _entry_name(self, pdf_path: str) -> str:
+        """Get the manifest key for a PDF path."""
+        return os.path.relpath(os.path.abspath(pdf_path), self.output_dir)
+    
+    def get(self, pdf_path: str) -> dict:
+        """
+        Get the manifest entry for a PDF.
+        
+        Args:
+            pdf_path: Converted PDF path
+        
+        Returns:
+            Entry dictionary, or None if the PDF is not recorded
+        """
+        return self.entries.get(self._entry_name(pdf_path))
+    
+    def is_current(self, pdf_path: str, cache_key: str) -> bool:
+        """
+        Check whether a PDF was built with the given cache key.
+        
+        The files the PDF was rendered from must also be unchanged. They are
+        compared by size and mtime first, and hashed only when those differ,
+        so a touched but unchanged file does not trigger a rebuild.
+        
+        Args:
+            pdf_path: Converted PDF path
+            cache_key: Cache key for the current rendering inputs
+        
+        Returns:
+            True if the recorded key matches and no dependency changed
+        """
+        entry = self.get(pdf_path)
+        if entry is None or entry.get('key') != cache_key:
+            return False
+        return not self.changed_dependencies(pdf_path)
+    
+    def changed_dependencies(self, pdf_path: str) -> list[str]:
+        """
+        Get the recorded dependencies of a PDF that changed or disappeared.
+        
+        Args:
+            pdf_path: Converted PDF path
+        
+        Returns:
+            List of changed file paths (empty if none, or the PDF is not recorded)
+        """
+        entry = self.get(pdf_path) or {}
+        changed = []
+        for path, recorded in entry.get('dependencies', {}).items():
+            mtime = recorded and recorded.get('mtime')
+            if not is_file_unchanged(path, recorded):
+                changed.append(path)
+            elif recorded and recorded.get('mtime') != mtime:
+                # Same content with a new mtime: remember it to skip hashing next time
+                self._dirty = True
+        return changed
+    
+    def record(self, pdf_path: str, cache_key: str, dependencies: dict = None) -> None:
+        """
+        Record the cache key a PDF was just built with.
+        
+        Args:
+            pdf_path: Converted PDF path
+            cache_key: Cache key used for the conversion
+            dependencies: Files the PDF was rendered from, as returned by
+                snapshot_files (optional)
+        """
+        self.entries[self._entry_name(pdf_path)] = {'key': cache_key, 'dependencies': dependencies or {}}
+        self._dirty = True
+    
+    def discard(self, pdf_path: str) -> None:
+        """
+        Remove the entry of a PDF, so it is converted again next time.
+        
+        Args:
+            pdf_path: Converted PDF path
+        """
+        if self.entries.pop(self._entry_name(pdf_path), None) is not None:
+            self._dirty = True
+    
+    def save(self) -> None:
+        """Write the manifest to disk if it changed since it was loaded."""
+        if not self._dirty:
+            return
+        save_json_file(self.path, {'version': MANIFEST_VERSION, 'entries': self.entries})
+        self._dirty = False
+
+
+class PageCountIndex:
+    """
+    Persistent index of PDF page counts, validated by file size and mtime.
+    
+    Page counts are recorded when a PDF is rendered (WeasyPrint already
+    knows them) or the first time an existing PDF is opened, so later
+    builds can lay out the book without parsing any PDF just to count pages.
+    """
+    
+    def __init__(self, output_dir: str):
+        """
+        Load the page count index for an output directory (empty if none exists yet).
+        
+        Args:
+            output_dir: Output directory holding converted PDFs
+        """
+        self.output_dir = os.path.abspath(output_dir)
+        self.path = os.path.join(get_cache_dir(self.output_dir), PAGE_INDEX_FILENAME)
+        data = load_json_file(self.path, {})
+        if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION:
+            data = {}
+        self.entries = data.get('entries', {})
+        self._dirty = False
+    
+    def _entry_name(self, pdf_path: str) -> str:
+        """Get the index key for a PDF path."""
+        return os.path.relpath(os.path.abspath(pdf_path), self.output_dir)
+    
+    def get(self, pdf_path: str) -> int:
+        """
+        Get the recorded page count of a PDF if the file is unchanged.
+        
+        Args:
+            pdf_path: PDF file path
+        
+        Returns:
+            Page count, or None if unknown or the file changed since recording
+        """
+        entry = self.entries.get(self._entry_name(pdf_path))
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(pdf_path)
+        except OSError:
+            return None
+        if entry.get('size') != stat.st_size or entry.get('mtime') != stat.st_mtime_ns:
+            return None
+        return entry.get('pages')
+    
+    def record(self, pdf_path: str, pages: int) -> None:
+        """
+        Record the page count of a PDF as it is on disk now.
+        
+        Args:
+            pdf_path: PDF file path
+            pages: Number of pages in the PDF
+        """
+        stat = os.stat(pdf_path)
+        self.entries[self._entry_name(pdf_path)] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'pages': pages,
+        }
+        self._dirty = True
+    
+    def save(self) -> None:
+        """Write the index to disk if it changed since it was loaded."""
+        if not self._dirty:
+            return
+        save_json_file(self.path, {'version': MANIFEST_VERSION, 'entries': self.entries})
+        self._dirty = False
+
+
+class DirectorySnapshot:
+    """
+    Persistent listings of source directories, validated by directory mtime.
+    
+    Adding, removing or renaming an entry changes the mtime of its
+    directory, so a directory with the same mtime as last time has the same
+    listing: finding the files of an unchanged tree costs one stat per
+    directory instead of reading every directory.
+    """
+    
+    def __init__(self, output_dir: str):
+        """
+        Load the directory snapshot for an output directory (empty if none exists yet).
+        
+        Args:
+            output_dir: Output directory of the build
+        """
+        self.output_dir = os.path.abspath(output_dir)
+        self.path = os.path.join(get_cache_dir(self.output_dir), DIR_SNAPSHOT_FILENAME)
+        data = load_json_file(self.path, {})
+        if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION:
+            data = {}
+        self.entries = data.get('entries', {})
+        # Every directory looked up by this build, with its current mtime
+        self.mtimes = {}
+        self._used = set()
+        self._dirty = False
+    
+    def get(self, dir_path: str, mtime: int) -> tuple[list[str], list[str]]:
+        """
+        Get the recorded listing of a directory if it is unchanged.
+        
+        The directory and its mtime are added to mtimes either way.
+        
+        Args:
+            dir_path: Directory path
+            mtime: Current mtime of the directory (st_mtime_ns)
+        
+        Returns:
+            Tuple of (dirnames, filenames), or None if unknown or changed
+        """
+        dir_path = os.path.abspath(dir_path)
+        self.mtimes[dir_path] = mtime
+        entry = self.entries.get(dir_path)
+        if entry is None or entry.get('mtime') != mtime:
+            return None
+        self._used.add(dir_path)
+        return list(entry['dirs']), list(entry['files'])
+    
+    def record(self, dir_path: str, mtime: int, dirnames: list[str], filenames: list[str]) -> None:
+        """
+        Record the listing of a directory, read when it had the given mtime.
+        
+        Args:
+            dir_path: Directory path
+            mtime: mtime of the directory before it was read (st_mtime_ns)
+            dirnames: Subdirectories
+            filenames: Other entries
+        """
+        dir_path = os.path.abspath(dir_path)
+        if time.time_ns() - mtime < DIR_SNAPSHOT_SETTLE_SECONDS * 10**9:
+            self.entries.pop(dir_path, None)
+            return
+        self.entries[dir_path] = {'mtime': mtime, 'dirs': list(dirnames), 'files': list(filenames)}
+        self._used.add(dir_path)
+        self._dirty = True
+    
+    def save(self) -> None:
+        """
+        Write the snapshot to disk if it changed since it was loaded.
+        
+        Only directories used by this build are kept, so directories that
+        were removed or left the book do not accumulate.
+        """
+        if not self._dirty and len(self._used) == len(self.entries):
+            return
+        self.entries = {path: self.entries[path] for path in self._used if path in self.entries}
+        save_json_file(self.path, {'version': MANIFEST_VERSION, 'entries': self.entries})
+        self._dirty = False
+
+
+class BookPlanCache:
+    """
+    Persistent resolved book plans, one per order file.
+    
+    A plan is stored with the hash of the order file's content and the
+    mtimes of the paths it was resolved from (the directories that were
+    checked or listed, and the .gitignore files that were read). It is
+    reused while none of them changed: adding, removing or renaming a file
+    changes the mtime of its directory.
+    """
+    
+    def __init__(self, output_dir: str):
+        """
+        Load the book plans for an output directory (empty if none exists yet).
+        
+        Args:
+            output_dir: Output directory of the build
+        """
+        self.path = os.path.join(get_cache_dir(os.path.abspath(output_dir)), BOOK_PLAN_FILENAME)
+        data = load_json_file(self.path, {})
+        if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION:
+            data = {}
+        self.entries = data.get('entries', {})
+        self._dirty = False
+    
+    def get(self, order_path: str, order_key: str) -> dict:
+        """
+        Get the recorded plan of an order file if nothing it was resolved from changed.
+        
+        Args:
+            order_path: Order JSON path
+            order_key: Hash of the order file's content (and project root)
+        
+        Returns:
+            Plan data (see plan.BookPlan.to_dict), or None
+        """
+        entry = self.entries.get(os.path.abspath(order_path))
+        if entry is None or entry.get('key') != order_key:
+            return None
+        for path, mtime in entry['stamps'].items():
+            try:
+                current = os.stat(path).st_mtime_ns
+            except OSError:
+                current = None
+            if current != mtime:
+                return None
+        return entry['plan']
+    
+    def record(self, order_path: str, order_key: str, plan: dict, stamps: dict) -> None:
+        """
+        Record the plan of an order file.
+        
+        Plans resolved from paths modified within DIR_SNAPSHOT_SETTLE_SECONDS
+        are not kept, since a later change in the same mtime tick would go
+        unnoticed.
+        
+        Args:
+            order_path: Order JSON path
+            order_key: Hash of the order file's content (and project root)
+            plan: Plan data (see plan.BookPlan.to_dict)
+            stamps: Path -> mtime (st_mtime_ns, None for missing paths) of
+                every path the plan was resolved from
+        """
+        order_path = os.path.abspath(order_path)
+        settled = time.time_ns() - DIR_SNAPSHOT_SETTLE_SECONDS * 10**9
+        if any(mtime is not None and mtime > settled for mtime in stamps.values()):
+            if self.entries.pop(order_path, None) is not None:
+                self._dirty = True
+            return
+        self.entries[order_path] = {'key': order_key, 'stamps': stamps, 'plan': plan}
+        self._dirty = True
+    
+    def save(self) -> None:
+        """Write the plans to disk if they changed since they were loaded."""
+        if not self._dirty:
+            return
+        save_json_file(self.path, {'version': MANIFEST_VERSION, 'entries': self.entries})
+        self._dirty = False
+
+
+class HtmlStageCache:
+    """
+    On-disk cache of the markdown -> HTML stage, one JSON file per cache key.
+    
+    Each entry holds the preprocessed HTML and the extracted title, so a
+    style-only change re-runs layout without re-parsing the markdown.
+    Entries are written atomically, so worker processes can share the cache.
+    Entries that no build used for a while are removed by prune().
+    """
+    
+    def __init__(self, output_dir: str):
+        """
+        Open the HTML stage cache for an output directory.
+        
+        Args:
+            output_dir: Output directory holding converted PDFs
+        """
+        self.directory = os.path.join(get_cache_dir(os.path.abspath(output_dir)), HTML_CACHE_DIR_NAME)
+    
+    def _entry_path(self, cache_key: str) -> str:
+        """Get the file path for a cache key."""
+        return os.path.join(self.directory, f"{cache_key}.json")
+    
+    def get(self, cache_key: str) -> tuple[str, str]:
+        """
+        Look up the HTML stage output for a cache key.
+        
+        Args:
+            cache_key: Key from compute_html_cache_key
+        
+        Returns:
+            Tuple of (html_content, title), or None on a cache miss
+        """
+        path = self._entry_path(cache_key)
+        data = load_json_file(path)
+        if not isinstance(data, dict) or 'html' not in data:
+            return None
+        mark_used(path)
+        return data['html'], data.get('title')
+    
+    def put(self, cache_key: str, html_content: str, title: str) -> None:
+        """
+        Store the HTML stage output for a cache key.
+        
+        Args:
+            cache_key: Key from compute_html_cache_key
+            html_content: Preprocessed HTML
+            title: Extracted title (or None)
+        """
+        save_json_file(self._entry_path(cache_key), {'html': html_content, 'title': title})
+    
+    def prune(self, max_age: float = UNUSED_ENTRY_MAX_AGE) -> int:
+        """
+        Delete the entries no build used within max_age seconds.
+        
+        Args:
+            max_age: Maximum time in seconds since the last use
+        
+        Returns:
+            Number of entries deleted
+        """
+        return prune_unused_entries(self.directory, max_age)
+
+
+class ChapterBlockCache:
+    """
+    On-disk cache of merged chapter blocks, one PDF per cache key.
+    
+    A chapter block is the merge of a chapter's PDFs in order; its key is
+    built from the content hashes of those PDFs and the merge settings, so
+    when one file changes only its chapter is merged again. Blocks that a
+    build did not use are removed by prune().
+    """
+    
+    def __init__(self, output_dir: str):
+        """
+        Open the chapter block cache for an output directory.
+        
+        Args:
+            output_dir: Output directory holding converted PDFs
+        """
+        self.directory = os.path.join(get_cache_dir(os.path.abspath(output_dir)), CHAPTER_CACHE_DIR_NAME)
+        self._used = set()
+    
+    def compute_key(self, pdf_paths: list[str], merge_settings: dict = None) -> str:
+        """
+        Compute the cache key of a chapter block.
+        
+        Args:
+            pdf_paths: Chapter PDFs in merge order
+            merge_settings: Settings that change the merged output (engine, deduplication)
+        
+        Returns:
+            Hex digest string
+        """
+        return hash_data({
+            'inputs': [hash_file(path) for path in pdf_paths],
+            'merge': merge_settings or {},
+        })
+    
+    def path(self, cache_key: str) -> str:
+        """
+        Get the block path for a cache key and mark it as used by this build.
+        
+        Args:
+            cache_key: Key from compute_key
+        
+        Returns:
+            Path of the block PDF (it may not exist yet)
+        """
+        self._used.add(cache_key)
+        return os.path.join(self.directory, f"{cache_key}.pdf")
+    
+    def get(self, cache_key: str) -> str:
+        """
+        Look up a chapter block.
+        
+        Args:
+            cache_key: Key from compute_key
+        
+        Returns:
+            Path of the cached block PDF, or None on a cache miss
+        """
+        block_path = self.path(cache_key)
+        return block_path if os.path.isfile(block_path) else None
+    
+    def prune(self) -> int:
+        """
+        Delete the blocks this build did not use.
+        
+        Returns:
+            Number of blocks deleted
+        """
+        if not os.path.isdir(self.directory):
+            return 0
+        removed = 0
+        for filename in os.listdir(self.directory):
+            name, ext = os.path.splitext(filename)
+            if ext == '.pdf' and name not in self._used:
+                os.remove(os.path.join(self.directory, filename))
+                removed += 1
+        return removed
+
+
+class ResourceCache:
+    """
+    On-disk cache of fetched remote resources, one file per URL.
+    
+    Each entry is the resource body plus a JSON sidecar with its URL, MIME
+    type and fetch time. Entries are written atomically, so worker
+    processes can share the cache. Entries that no build used for a while
+    are removed by prune().
+    """
+    
+    def __init__(self, output_dir: str):
+        """
+        Open the resource cache for an output directory.
+        
+        Args:
+            output_dir: Output directory holding converted PDFs
+        """
+        self.directory = os.path.join(get_cache_dir(os.path.abspath(output_dir)), RESOURCE_CACHE_DIR_NAME)
+    
+    def _entry_path(self, url: str) -> str:
+        """Get the body file path for a URL (the sidecar adds .json)."""
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest())
+    
+    def get(self, url: str, max_age: float = None) -> tuple[bytes, str]:
+        """
+        Look up a cached resource.
+        
+        Args:
+            url: Resource URL
+            max_age: Maximum age in seconds (None accepts any age)
+        
+        Returns:
+            Tuple of (body, mime_type), or None on a miss or expired entry
+        """
+        path = self._entry_path(url)
+        meta = load_json_file(path + '.json')
+        if not isinstance(meta, dict) or meta.get('url') != url:
+            return None
+        if max_age is not None and time.time() - meta.get('fetched', 0) > max_age:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None
+        mark_used(path)
+        return body, meta.get('mime_type')
+    
+    def put(self, url: str, body: bytes, mime_type: str) -> None:
+        """
+        Store a fetched resource.
+        
+        Args:
+            url: Resource URL
+            body: Resource content
+            mime_type: Content type reported by the server
+        """
+        path = self._entry_path(url)
+        ensure_dir(self.directory)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(body)
+        os.replace(temp_path, path)
+        save_json_file(path + '.json', {'url': url, 'mime_type': mime_type, 'fetched': time.time()})
+    
+    def prune(self, max_age: float = UNUSED_ENTRY_MAX_AGE) -> int:
+        """
+        Delete the entries no build used within max_age seconds.
+        
+        Args:
+            max_age: Maximum time in seconds since the last use
+        
+        Returns:
+            Number of entries deleted
+        """
+        return prune_unused_entries(self.directory, max_age)
+
+
+class ImageStageCache:
+    """
+    On-disk cache of the image stage, one file per cache key.
+    
+    An entry holds the downsampled and recompressed image, or is empty when
+    the original was already small enough to be used as it is. Entries are
+    written atomically, so worker processes can share the cache. Entries
+    that no build used for a while are removed by prune().
+    """
+    
+    def __init__(self, output_dir: str):
+        """
+        Open the image stage cache for an output directory.
+        
+        Args:
+            output_dir: Output directory holding converted PDFs
+        """
+        self.directory = os.path.join(get_cache_dir(os.path.abspath(output_dir)), IMAGE_CACHE_DIR_NAME)
+    
+    def path(self, cache_key: str, extension: str = '') -> str:
+        """
+        Get the entry path for a cache key.
+        
+        Args:
+            cache_key: Key from ImageProcessor
+            extension: File extension of the image (e.g. '.png')
+        
+        Returns:
+            Path of the entry (it may not exist yet)
+        """
+        return os.path.join(self.directory, f"{cache_key}{extension}")
+    
+    def get(self, cache_key: str, extension: str = '') -> bytes:
+        """
+        Look up the image stage output for a cache key.
+        
+        Returns:
+            Image data (empty if the original is used as it is), or None on a cache miss
+        """
+        path = self.path(cache_key, extension)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        mark_used(path)
+        return data
+    
+    def put(self, cache_key: str, data: bytes, extension: str = '') -> str:
+        """
+        Store the image stage output for a cache key.
+        
+        Args:
+            cache_key: Key from ImageProcessor
+            data: Processed image (empty if the original is used as it is)
+            extension: File extension of the image (e.g. '.png')
+        
+        Returns:
+            Path of the entry
+        """
+        path = self.path(cache_key, extension)
+        ensure_dir(self.directory)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        return path
+    
+    def prune(self, max_age: float = UNUSED_ENTRY_MAX_AGE) -> int:
+        """
+        Delete the entries no build used within max_age seconds.
+        
+        Args:
+            max_age: Maximum time in seconds since the last use
+        
+        Returns:
+            Number of entries deleted
+        """
+        return prune_unused_entries(self.directory, max_age)
+
+
+class BookMap:
+    """
+    Page-range map of the last built book: which source produced which pages.
+    
+    Each source entry records the PDF path, its content hash, its page count
+    and its outline and named destinations (with page numbers relative to
+    the source), so the next build can update only the pages of changed
+    sources. The map is only valid while the book is unchanged on disk
+    (validated by size and mtime).
+    """
+    
+    def __init__(self, output_dir: str):
+        """
+        Load the book map for an output directory (empty if none exists yet).
+        
+        Args:
+            output_dir: Output directory holding converted PDFs
+        """
+        self.path = os.path.join(get_cache_dir(os.path.abspath(output_dir)), BOOK_MAP_FILENAME)
+        data = load_json_file(self.path, {})
+        if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION:
+            data = {}
+        self.data = data
+    
+    def get_sources(self, book_pdf: str) -> list[dict]:
+        """
+        Get the source entries of a book if it is unchanged since it was recorded.
+        
+        Args:
+            book_pdf: Built book path
+        
+        Returns:
+            List of source entries in page order, or None
+        """
+        if self.data.get('book') != os.path.abspath(book_pdf):
+            return None
+        try:
+            stat = os.stat(book_pdf)
+        except OSError:
+            return None
+        if self.data.get('size') != stat.st_size or self.data.get('mtime') != stat.st_mtime_ns:
+            return None
+        return self.data.get('sources')
+    
+    @property
+    def full_size(self) -> int:
+        """Size of the book after its last full (non-incremental) build."""
+        return self.data.get('full_size', 0)
+    
+    @property
+    def stamp(self) -> str:
+        """Signature of the header and footers stamped on the book (None if not stamped)."""
+        return self.data.get('stamp')
+    
+    def record(self, book_pdf: str, sources: list[dict], full_build: bool, stamp: str = None) -> None:
+        """
+        Record the sources of a book as it is on disk now.
+        
+        Args:
+            book_pdf: Built book path
+            sources: Source entries in page order
+            full_build: True if the book was written from scratch
+            stamp: Signature of the stamped header and footers (optional)
+        """
+        stat = os.stat(book_pdf)
+        self.data = {
+            'version': MANIFEST_VERSION,
+            'book': os.path.abspath(book_pdf),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'full_size': stat.st_size if full_build else self.full_size,
+            'stamp': stamp,
+            'sources': sources,
+        }
+    
+    def save(self) -> None:
+        """Write the map to disk."""
+        save_json_file(self.path, self.data)
+
+
+class BuildManifest:
+    """
+    Inputs and output of the last finished build of each book.
+    
+    A book is up to date when it was built with the same build key (order
+    file, configuration, options and file list), every input file (sources,
+    fonts, and the images and stylesheets they were rendered with) is
+    unchanged, and the book itself is unchanged on disk. Files are compared
+    like ConversionManifest dependencies: by size and mtime, hashing only
+    files whose mtime changed.
+    """
+    
+    def __init__(self, output_dir: str):
+        """
+        Load the build manifest for an output directory (empty if none exists yet).
+        
+        Args:
+            output_dir: Output directory of the build
+        """
+        self.path = os.path.join(get_cache_dir(os.path.abspath(output_dir)), BUILD_MANIFEST_FILENAME)
+        data = load_json_file(self.path, {})
+        if not isinstance(data, dict) or data.get('version') != MANIFEST_VERSION:
+            data = {}
+        self.entries = data.get('entries', {})
+        self._dirty = False
+    
+    def is_current(self, book_path: str, build_key: str) -> bool:
+        """
+        Check whether a book is up to date.
+        
+        Args:
+            book_path: Built book path
+            build_key: Build key for the current order file, configuration and options
+        
+        Returns:
+            True if the book was built with this key from unchanged inputs
+            and is unchanged itself
+        """
+        entry = self.entries.get(os.path.abspath(book_path))
+        if entry is None or entry.get('key') != build_key:
+            return False
+        checked = [(book_path, entry['book'])] + list(entry['inputs'].items())
+        for path, recorded in checked:
+            # Inputs that were missing must still be missing
+            mtime = recorded and recorded.get('mtime')
+            if not is_file_unchanged(path, recorded):
+                return False
+            if recorded and recorded.get('mtime') != mtime:
+                self._dirty = True
+        return True
+    
+    def record(self, book_path: str, build_key: str, inputs, started: int) -> None:
+        """
+        Record a finished build of a book.
+        
+        Files are hashed again only if their size or mtime changed since the
+        last recorded build. The build is not recorded if an input changed
+        after it started (or within DIR_SNAPSHOT_SETTLE_SECONDS before): the
+        book may have been built from the older content.
+        
+        Args:
+            book_path: Built book path
+            build_key: Build key the book was built with
+            inputs: Paths of the files the book was built from
+            started: Time the build started (time.time_ns())
+        """
+        book_path = os.path.abspath(book_path)
+        previous = self.entries.pop(book_path, None) or {'inputs': {}}
+        self._dirty = True
+        known = previous['inputs']
+        recorded_inputs = {}
+        for path in sorted(set(inputs)):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                recorded_inputs[path] = None
+                continue
+            if stat.st_mtime_ns > started - DIR_SNAPSHOT_SETTLE_SECONDS * 10**9:
+                return
+            recorded = known.get(path)
+            if recorded is None or (recorded['size'], recorded['mtime']) != (stat.st_size, stat.st_mtime_ns):
+                recorded = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': hash_file(path)}
+            recorded_inputs[path] = recorded
+        self.entries[book_path] = {
+            'key': build_key,
+            'book': snapshot_files([book_path])[book_path],
+            'inputs': recorded_inputs,
+        }
+    
+    def discard(self, book_path: str) -> None:
+        """
+        Remove the entry of a book, so it is built again next time.
+        
+        Args:
+            book_path: Built book path
+        """
+        if self.entries.pop(os.path.abspath(book_path), None) is not None:
+            self._dirty = True
+    
+    def save(self) -> None:
+        """Write the manifest to disk if it changed since it was loaded."""
+        if not self._dirty:
+            return
+        save_json_file(self.path, {'version': MANIFEST_VERSION, 'entries': self.entries})
+        self._dirty = False
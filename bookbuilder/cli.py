@@ -19,6 +19,17 @@ from .utils import get_default_output_dir
 from .formats import OutputFormat, check_pandoc_installed, get_supported_formats
 
 
+def non_negative_int(value: str) -> int:
+    """Parse a --jobs value: a whole number, 0 or more."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}")
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more, got {number}")
+    return number
+
+
 def resolve_paths(args):
     """Resolve and validate paths from arguments.
     
@@ -141,7 +152,12 @@ def cmd_build(args):
         force=args.force if hasattr(args, 'force') else False,
         verbose=not args.quiet,
         config_path=config_path,
-        output_format=output_format
+        output_format=output_format,
+        jobs=args.jobs if hasattr(args, 'jobs') else 1,
+        render_mode=args.render_mode if hasattr(args, 'render_mode') else 'per-file',
+        optimize=True if getattr(args, 'optimize', False) else None,
+        incremental=True if getattr(args, 'incremental', False) else None,
+        offline=True if getattr(args, 'offline', False) else None
     )
     
     # Cleanup output directory if requested
@@ -191,6 +207,12 @@ Examples:
   # Force reconversion of all MD files
   bookbuilder build --order ./order.json --force
   
+  # Convert MD files with 8 worker processes (0 = one per CPU core)
+  bookbuilder build --order ./order.json --jobs 8
+  
+  # Render all markdown chapters as one document (single WeasyPrint pass)
+  bookbuilder build --order ./order.json --render-mode single-pass
+  
   # Build with custom config file
   bookbuilder build --order ./order.json --config ./my-config.json
   
@@ -287,7 +309,35 @@ Order JSON Format:
     build_parser.add_argument(
         '--force', '-f',
         action='store_true',
-        help='Force reconversion of all MD files (ignore cache)'
+        help='Force reconversion of all MD files and rebuild the book (ignore cache)'
+    )
+    build_parser.add_argument(
+        '--jobs', '-j',
+        type=non_negative_int,
+        default=1,
+        help='Number of worker processes for MD conversion (default: 1, 0 = one per CPU core)'
+    )
+    build_parser.add_argument(
+        '--render-mode',
+        type=str,
+        choices=['per-file', 'single-pass'],
+        default='per-file',
+        help='PDF render mode: per-file (default) or single-pass (whole book as one document)'
+    )
+    build_parser.add_argument(
+        '--optimize',
+        action='store_true',
+        help='Optimize the final PDF: recompress streams, object streams, optional linearization (see outputSettings)'
+    )
+    build_parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Update the previous book in place, appending only the pages that changed (see mergeSettings)'
+    )
+    build_parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='Do not download remote images or stylesheets; use cached copies only (see fetchSettings)'
     )
     build_parser.add_argument(
         '--config', '-C',
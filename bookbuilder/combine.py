@@ -11,25 +11,56 @@ Features:
 import os
 import gc
 import json
+import time
 import datetime
-from pypdf import PdfWriter, PdfReader
+from pypdf import PdfWriter
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 from reportlab.lib.colors import HexColor
 
+from . import __version__
 from .utils import (
-    get_gitignore_patterns,
-    is_ignored,
     get_default_output_dir,
     ensure_dir,
     load_config,
     deep_merge,
     build_anchor_map
 )
+from .cache import (
+    BookMap,
+    BookPlanCache,
+    BuildManifest,
+    ChapterBlockCache,
+    ConversionManifest,
+    DirectorySnapshot,
+    HtmlStageCache,
+    PageCountIndex,
+    hash_data,
+    prune_stage_caches
+)
+from .fetch import configure_fetcher, get_fetcher, is_retryable_failure, recording_dependencies
+from .ignore import get_ignore_matcher
+from .images import ImageProcessor
+from .merge import DEFAULT_MERGE_ENGINE, MERGE_ENGINES, count_pages, create_merger
+from .incremental import describe_sources, record_book, update_book
+from .optimize import is_pikepdf_available, optimize_pdf
+from .plan import (
+    BACK_COVER_SECTION,
+    FRONT_COVER_SECTION,
+    BookPlan,
+    ChapterEntry,
+    PlanSection,
+    order_reference_stamps
+)
+from .probe import probe_page_count
+from .stamp import PageStamper, resolve_stamp_fonts
 from .convert import (
     convert_file,
     convert_files_parallel,
+    convert_book_to_pdf,
+    extract_title_from_markdown,
+    find_font_files,
     get_output_pdf_path
 )
 from .formats import (
@@ -40,24 +71,33 @@ from .formats import (
     get_format_extension
 )
 
+# Render modes for PDF output
+# - per-file: each MD file is its own WeasyPrint document, merged with pypdf
+# - single-pass: all chapters are rendered as one WeasyPrint document
+RENDER_MODES = ('per-file', 'single-pass')
 
-def safe_get_page_count(pdf_path: str) -> int:
+
+def safe_get_page_count(pdf_path: str, merge_engine: str = None) -> int:
     """
     Safely get page count from a PDF file.
     
-    Returns 0 if the file cannot be read to allow skipping.
-    Includes garbage collection to prevent macOS memory issues.
+    The count is read with the fast probe (the /Count of the root page tree
+    node, without parsing the document); damaged or unusual files fall
+    back to a full parse, followed by garbage collection to prevent macOS
+    memory issues. Returns 0 if the file cannot be read to allow skipping.
     
     Args:
         pdf_path: Path to PDF file
+        merge_engine: Merge engine whose PDF library reads the file (default: pypdf)
         
     Returns:
         Number of pages, or 0 if error
     """
+    count = probe_page_count(pdf_path)
+    if count is not None:
+        return count
     try:
-        reader = PdfReader(pdf_path)
-        count = len(reader.pages)
-        del reader
+        count = count_pages(pdf_path, merge_engine)
         gc.collect()
         return count
     except Exception as e:
@@ -65,6 +105,31 @@ def safe_get_page_count(pdf_path: str) -> int:
         return 0
 
 
+def get_page_count(pdf_path: str, page_index: PageCountIndex = None, merge_engine: str = None) -> int:
+    """
+    Get the page count of a PDF, using the page count index when possible.
+    
+    The PDF is only parsed if the index has no entry for it or the file
+    changed since it was recorded; the parsed count is then recorded.
+    
+    Args:
+        pdf_path: Path to PDF file
+        page_index: Page count index (optional)
+        merge_engine: Merge engine whose PDF library reads the file (default: pypdf)
+    
+    Returns:
+        Number of pages, or 0 if the file cannot be read
+    """
+    if page_index is not None:
+        count = page_index.get(pdf_path)
+        if count is not None:
+            return count
+    count = safe_get_page_count(pdf_path, merge_engine)
+    if page_index is not None and count:
+        page_index.record(pdf_path, count)
+    return count
+
+
 def resolve_file_path(file_ref: str, root_dir: str) -> str:
     """
     Resolve a file reference to an absolute path.
@@ -103,35 +168,29 @@ def resolve_file_path(file_ref: str, root_dir: str) -> str:
     return abs_path  # Return the path even if not found (will error later)
 
 
-def find_files_in_directory(dir_path: str, root_dir: str) -> list[str]:
+def find_files_in_directory(dir_path: str, root_dir: str, snapshot: DirectorySnapshot = None) -> list[str]:
     """
     Find all MD and PDF files in a directory recursively.
     
     Args:
         dir_path: Directory to search
         root_dir: Project root for ignore patterns
+        snapshot: Directory snapshot of the last build; unchanged
+            directories are not read again (optional)
         
     Returns:
         Sorted list of file paths (MD and PDF)
     """
-    ignore_patterns = get_gitignore_patterns(root_dir)
     files = []
     
     if not os.path.isdir(dir_path):
         return files
     
-    for dirpath, dirnames, filenames in os.walk(dir_path):
-        # Filter ignored directories
-        dirnames[:] = [d for d in dirnames if not is_ignored(
-            os.path.relpath(os.path.join(dirpath, d), root_dir),
-            ignore_patterns
-        )]
-        
+    # Ignored directories are pruned by the matcher
+    for dirpath, dirnames, filenames in get_ignore_matcher(root_dir).walk(dir_path, snapshot):
         for filename in sorted(filenames):
             if filename.endswith('.md') or filename.endswith('.pdf'):
-                rel_path = os.path.relpath(os.path.join(dirpath, filename), root_dir)
-                if not is_ignored(rel_path, ignore_patterns):
-                    files.append(os.path.join(dirpath, filename))
+                files.append(os.path.join(dirpath, filename))
     
     return sorted(files)
 
@@ -146,7 +205,10 @@ def get_pdf_for_file(
     style_settings: dict = None,
     anchor_map: dict = None,
     content_settings: dict = None,
-    full_bleed: bool = False
+    full_bleed: bool = False,
+    manifest: ConversionManifest = None,
+    page_index: PageCountIndex = None,
+    image_settings: dict = None
 ) -> tuple[str, bool, str]:
     """
     Get or create a PDF for a file (MD or PDF).
@@ -162,6 +224,9 @@ def get_pdf_for_file(
         anchor_map: Dictionary mapping filenames to anchor IDs for internal linking
         content_settings: Content processing settings (e.g., details tag handling)
         full_bleed: If True, use full-bleed mode for PDF conversion
+        manifest: Conversion manifest for content-hash caching (optional)
+        page_index: Page count index; rendered page counts are recorded in it (optional)
+        image_settings: Image stage configuration, for the cache key (see images.py)
         
     Returns:
         Tuple of (pdf_path, was_converted, error_message)
@@ -174,21 +239,29 @@ def get_pdf_for_file(
     
     if file_path.lower().endswith('.md'):
         # Convert MD to PDF
-        return convert_file(
+        render_info = {}
+        pdf_path, was_converted, error = convert_file(
             file_path, root_dir, output_dir, force, verbose,
             page_settings=page_settings,
             style_settings=style_settings,
             anchor_map=anchor_map,
             content_settings=content_settings,
-            full_bleed=full_bleed
+            full_bleed=full_bleed,
+            manifest=manifest,
+            render_info=render_info,
+            image_settings=image_settings
         )
+        if page_index is not None and 'pages' in render_info:
+            page_index.record(pdf_path, render_info['pages'])
+        return pdf_path, was_converted, error
     
     return None, False, f"Unsupported file type: {file_path}"
 
 
 def collect_files_for_chapter(
     chapter: dict,
-    root_dir: str
+    root_dir: str,
+    snapshot: DirectorySnapshot = None
 ) -> list[str]:
     """
     Collect all file paths for a chapter from the order JSON.
@@ -196,6 +269,7 @@ def collect_files_for_chapter(
     Args:
         chapter: Chapter configuration from order JSON
         root_dir: Project root directory
+        snapshot: Directory snapshot for folder searches (optional)
         
     Returns:
         List of absolute file paths (MD or PDF)
@@ -212,14 +286,81 @@ def collect_files_for_chapter(
     if 'folders' in chapter:
         for folder_ref in chapter['folders']:
             folder_path = resolve_file_path(folder_ref.rstrip('/'), root_dir)
-            folder_files = find_files_in_directory(folder_path, root_dir)
+            folder_files = find_files_in_directory(folder_path, root_dir, snapshot)
             files.extend(folder_files)
     
     return files
 
 
+def resolve_book_plan(chapters: list[dict], root_dir: str, snapshot: DirectorySnapshot = None) -> BookPlan:
+    """
+    Resolve the chapters of an order JSON into a book plan.
+    
+    Args:
+        chapters: Chapter configurations from the order JSON
+        root_dir: Project root directory
+        snapshot: Directory snapshot for folder searches (optional)
+    
+    Returns:
+        Book plan with the files of every section, the cover candidates and
+        the anchor map
+    """
+    sections = []
+    front_cover_files = []
+    back_cover_files = []
+    for chapter in chapters:
+        section_name = chapter.get('section', 'Untitled Section')
+        files = collect_files_for_chapter(chapter, root_dir, snapshot)
+        if section_name == FRONT_COVER_SECTION:
+            front_cover_files = files
+        elif section_name == BACK_COVER_SECTION:
+            back_cover_files = files
+        else:
+            sections.append(PlanSection(section_name, files))
+    plan = BookPlan(sections, front_cover_files, back_cover_files)
+    # Anchor map for internal linking across all book files
+    plan.anchor_map = build_anchor_map(plan.book_files, root_dir)
+    return plan
+
+
+def load_book_plan(order_json_path: str, chapters: list[dict], root_dir: str, temp_dir: str) -> tuple[BookPlan, bool]:
+    """
+    Get the plan of a book, reusing the last build's plan if nothing it was resolved from changed.
+    
+    The cached plan is checked with one stat per directory it was resolved
+    from (and per .gitignore read), instead of resolving every file
+    reference and walking every folder again.
+    
+    Args:
+        order_json_path: Path to the order JSON file
+        chapters: Chapter configurations from the order JSON
+        root_dir: Project root directory
+        temp_dir: Directory for intermediate files (holds the plan cache)
+    
+    Returns:
+        Tuple of (plan, reused)
+    """
+    plan_cache = BookPlanCache(temp_dir)
+    order_key = hash_data({'root': root_dir, 'chapters': chapters})
+    data = plan_cache.get(order_json_path, order_key)
+    if data is not None:
+        return BookPlan.from_dict(data), True
+    
+    # Folders unchanged since the last build are not read again
+    dir_snapshot = DirectorySnapshot(temp_dir)
+    plan = resolve_book_plan(chapters, root_dir, dir_snapshot)
+    dir_snapshot.save()
+    
+    stamps = order_reference_stamps(chapters, root_dir)
+    stamps.update(dir_snapshot.mtimes)
+    stamps.update(get_ignore_matcher(root_dir).ignore_files())
+    plan_cache.record(order_json_path, order_key, plan.to_dict(), stamps)
+    plan_cache.save()
+    return plan, False
+
+
 def create_toc_page(
-    chapter_info: list[dict], 
+    chapter_info: list[ChapterEntry], 
     book_title: str, 
     output_path: str,
     toc_settings: dict = None,
@@ -229,7 +370,7 @@ def create_toc_page(
     Create a clickable Table of Contents page using ReportLab.
     
     Args:
-        chapter_info: List of chapter information dictionaries
+        chapter_info: Chapters of the book (section, first page)
         book_title: Title for the TOC page
         output_path: Output PDF file path
         toc_settings: TOC styling configuration
@@ -273,8 +414,8 @@ def create_toc_page(
     c.setFont("Helvetica", entry_font_size)
     
     for i, chapter in enumerate(chapter_info):
-        section_name = chapter['section']
-        page_num = chapter['page']
+        section_name = chapter.section
+        page_num = chapter.page
         
         c.setFillColor(HexColor(entry_color))
         c.drawString(1.5 * inch, y_position, section_name)
@@ -297,17 +438,82 @@ def create_toc_page(
     c.save()
 
 
+def build_chapter_block(
+    pdf_paths: list[str],
+    chapter_cache: ChapterBlockCache,
+    merge_engine: str = None,
+    deduplicate: bool = True
+) -> tuple[str, bool]:
+    """
+    Get the merged block of a chapter's PDFs, merging them only on a cache miss.
+    
+    Args:
+        pdf_paths: Chapter PDFs in order
+        chapter_cache: Chapter block cache
+        merge_engine: Merge engine, one of MERGE_ENGINES (default: pypdf)
+        deduplicate: Collapse identical objects within the chapter
+    
+    Returns:
+        Tuple of (block_path, reused), or (None, False) if the block cannot be
+        built (the chapter's PDFs are then merged one by one)
+    """
+    try:
+        cache_key = chapter_cache.compute_key(pdf_paths, {
+            'engine': merge_engine or DEFAULT_MERGE_ENGINE,
+            'deduplicate': deduplicate,
+        })
+    except OSError:
+        return None, False
+    block_pdf = chapter_cache.get(cache_key)
+    if block_pdf is not None:
+        return block_pdf, True
+    
+    block_pdf = chapter_cache.path(cache_key)
+    ensure_dir(os.path.dirname(block_pdf))
+    temp_pdf = f"{block_pdf}.{os.getpid()}.tmp"
+    try:
+        merger = create_merger(temp_pdf, merge_engine, deduplicate)
+        try:
+            for pdf in pdf_paths:
+                merger.append(pdf)
+        finally:
+            merger.close()
+        os.replace(temp_pdf, block_pdf)
+    except Exception:
+        if os.path.exists(temp_pdf):
+            os.remove(temp_pdf)
+        return None, False
+    return block_pdf, False
+
+
 def combine_pdfs_with_bookmarks(
     pdf_list: list[str], 
-    chapter_info: list[dict], 
+    chapter_info: list[ChapterEntry], 
     output_pdf: str, 
     toc_pdf: str, 
     front_cover: str = None, 
-    back_cover: str = None
+    back_cover: str = None,
+    merge_engine: str = None,
+    deduplicate: bool = True,
+    chapter_cache: ChapterBlockCache = None,
+    stamper: PageStamper = None,
+    page_index: PageCountIndex = None
 ) -> None:
     """
     Combine PDFs with bookmarks and clickable TOC.
     
+    Each input PDF is parsed exactly once, by the reader that appends it.
+    Each chapter bookmark points at the first page of the chapter.
+    
+    With a chapter cache, the PDFs of each multi-file chapter are merged
+    into a cached chapter block first, and the book is assembled from the
+    blocks: an edit re-merges only the chapter it is in. The outlines of all
+    of the chapter's files are then nested under its bookmark.
+    
+    With a stamper, the running header and footers (with book-wide page
+    numbers) are stamped onto the pages of its rendered chapters after the
+    merge, in one overlay pass.
+    
     Args:
         pdf_list: List of PDF file paths to combine
         chapter_info: Chapter information for bookmarks
@@ -315,26 +521,33 @@ def combine_pdfs_with_bookmarks(
         toc_pdf: Path to TOC PDF
         front_cover: Path to front cover PDF (optional)
         back_cover: Path to back cover PDF (optional)
+        merge_engine: Merge engine, one of MERGE_ENGINES (default: pypdf)
+        deduplicate: Collapse identical fonts, images and other objects across inputs
+        chapter_cache: Cache of merged chapter blocks (optional)
+        stamper: Page stamper for the running header and footers (optional)
+        page_index: Page count index, for the files of a chapter block (optional)
     """
-    writer = PdfWriter()
-    current_page = 0
+    merger = create_merger(output_pdf, merge_engine, deduplicate)
+    block_count = 0
+    reused_blocks = 0
+    # (pdf_path, first_page, page_count) of every merged PDF, for stamping
+    page_ranges = []
+    page_count = 0
     
     try:
         # Add front cover first
         if front_cover and os.path.isfile(front_cover):
             try:
-                writer.append(front_cover)
-                front_cover_pages = safe_get_page_count(front_cover)
-                current_page += front_cover_pages
+                front_cover_pages = merger.append(front_cover)
+                page_count += front_cover_pages or 0
                 print(f"Added front cover ({front_cover_pages} pages)")
             except Exception as e:
                 print(f"  Warning: Could not add front cover: {e}")
         
         # Add TOC
         try:
-            writer.append(toc_pdf)
-            toc_pages = safe_get_page_count(toc_pdf)
-            current_page += toc_pages
+            toc_pages = merger.append(toc_pdf)
+            page_count += toc_pages or 0
             print(f"Added TOC ({toc_pages} pages)")
         except Exception as e:
             print(f"  Warning: Could not add TOC: {e}")
@@ -343,18 +556,37 @@ def combine_pdfs_with_bookmarks(
         pdf_index = 0
         
         for chapter in chapter_info:
-            writer.add_outline_item(chapter['section'], current_page)
+            chapter_pdfs = pdf_list[pdf_index:pdf_index + chapter.files]
+            pdf_index += chapter.files
             
-            for _ in range(chapter['files']):
-                if pdf_index < len(pdf_list):
-                    pdf = pdf_list[pdf_index]
-                    try:
-                        page_count = safe_get_page_count(pdf)
-                        writer.append(pdf)
-                        current_page += page_count
-                    except Exception as e:
-                        print(f"  Warning: Could not add {os.path.basename(pdf)}: {e}")
-                    pdf_index += 1
+            block_files = None
+            if chapter_cache is not None and len(chapter_pdfs) > 1:
+                block_pdf, reused = build_chapter_block(chapter_pdfs, chapter_cache, merge_engine, deduplicate)
+                if block_pdf is not None:
+                    block_files = chapter_pdfs
+                    chapter_pdfs = [block_pdf]
+                    block_count += 1
+                    reused_blocks += reused
+            
+            # The bookmark goes on the first page the chapter contributes
+            outline_title = chapter.section
+            
+            for pdf in chapter_pdfs:
+                try:
+                    pages = merger.append(pdf, outline_title)
+                    if pages:
+                        outline_title = None
+                except Exception as e:
+                    print(f"  Warning: Could not add {os.path.basename(pdf)}: {e}")
+                    continue
+                if stamper is not None:
+                    # A chapter block holds its files' pages in order
+                    for source in block_files or [pdf]:
+                        source_pages = pages if block_files is None else get_page_count(source, page_index, merge_engine)
+                        page_ranges.append((source, page_count, source_pages))
+                        page_count += source_pages
+                else:
+                    page_count += pages or 0
             
             # Garbage collection after each chapter to prevent memory buildup
             gc.collect()
@@ -362,16 +594,134 @@ def combine_pdfs_with_bookmarks(
         # Add back cover last
         if back_cover and os.path.isfile(back_cover):
             try:
-                writer.append(back_cover)
-                back_cover_pages = safe_get_page_count(back_cover)
+                back_cover_pages = merger.append(back_cover)
                 print(f"Added back cover ({back_cover_pages} pages)")
             except Exception as e:
                 print(f"  Warning: Could not add back cover: {e}")
-        
-        writer.write(output_pdf)
     finally:
-        writer.close()
+        merger.close()
         gc.collect()
+    
+    if stamper is not None:
+        stamped = stamper.stamp_file(output_pdf, stamper.page_labels(page_ranges))
+        print(f"Stamped header and footers on {stamped} pages")
+    
+    if block_count:
+        print(f"Reused {reused_blocks} of {block_count} cached chapter blocks")
+    if merger.stats['deduplicated_objects']:
+        saved_mb = merger.stats['bytes_saved'] / (1024 * 1024)
+        print(f"Deduplicated {merger.stats['deduplicated_objects']} objects ({saved_mb:.2f} MB saved)")
+
+
+def build_book_single_pass(
+    sections: list[PlanSection],
+    front_cover_files: list[str],
+    back_cover_files: list[str],
+    output_file: str,
+    temp_dir: str,
+    book_title: str,
+    page_settings: dict = None,
+    style_settings: dict = None,
+    toc_settings: dict = None,
+    anchor_map: dict = None,
+    content_settings: dict = None,
+    verbose: bool = True
+) -> str:
+    """
+    Build a PDF book by rendering all chapters as one WeasyPrint document.
+    
+    Markdown covers are rendered inline (full-bleed). PDF covers are spliced
+    in afterwards in place of blank pages reserved for them, so page numbers
+    in the footers and the TOC still count the cover pages.
+    
+    Args:
+        sections: Chapters of the book plan, with markdown files only
+        front_cover_files: Candidate files for the front cover
+        back_cover_files: Candidate files for the back cover
+        output_file: Final book path
+        temp_dir: Directory for intermediate files
+        book_title: Book title
+        page_settings: Header/footer configuration
+        style_settings: Styling configuration
+        toc_settings: TOC styling configuration
+        anchor_map: Dictionary mapping filenames to anchor IDs for internal linking
+        content_settings: Content processing settings
+        verbose: Print progress messages
+    
+    Returns:
+        Path to generated book file
+    """
+    def pick_cover(files):
+        for f in files:
+            if f.lower().endswith(('.md', '.pdf')) and os.path.exists(f):
+                return f
+        return None
+    
+    front_cover = pick_cover(front_cover_files)
+    back_cover = pick_cover(back_cover_files)
+    front_pdf = front_cover if front_cover and front_cover.lower().endswith('.pdf') else None
+    back_pdf = back_cover if back_cover and back_cover.lower().endswith('.pdf') else None
+    front_pages = safe_get_page_count(front_pdf) if front_pdf else 0
+    back_pages = safe_get_page_count(back_pdf) if back_pdf else 0
+    
+    rendered_sections = []
+    for section in sections:
+        md_files = []
+        for f in section.files:
+            if os.path.exists(f):
+                md_files.append(f)
+            elif verbose:
+                print(f"  Warning: MD file not found: {f}")
+        if md_files:
+            rendered_sections.append((section.name, md_files))
+    
+    # PDF covers are spliced in after rendering, so render to a temp file first
+    splice = bool(front_pdf or back_pdf)
+    rendered_pdf = os.path.join(temp_dir, '_single-pass-body.pdf') if splice else output_file
+    
+    if verbose:
+        file_count = sum(len(md_files) for _, md_files in rendered_sections)
+        print(f"\nRendering {file_count} MD files as a single document...")
+    
+    total_pages = convert_book_to_pdf(
+        rendered_sections,
+        rendered_pdf,
+        book_title,
+        page_settings=page_settings,
+        style_settings=style_settings,
+        toc_settings=toc_settings,
+        anchor_map=anchor_map,
+        content_settings=content_settings,
+        front_cover=None if front_pdf else front_cover,
+        back_cover=None if back_pdf else back_cover,
+        front_placeholder_pages=front_pages,
+        back_placeholder_pages=back_pages,
+        html_cache=HtmlStageCache(temp_dir)
+    )
+    
+    if splice:
+        writer = PdfWriter()
+        try:
+            if front_pdf:
+                writer.append(front_pdf)
+            writer.append(rendered_pdf, pages=(front_pages, total_pages - back_pages))
+            if back_pdf:
+                writer.append(back_pdf)
+            writer.write(output_file)
+        finally:
+            writer.close()
+    
+    if verbose:
+        print(f"\n{'='*60}")
+        print(f"✓ Book created: {output_file}")
+        print(f"✓ Render mode: single-pass")
+        print(f"✓ Front cover: {'Included' if front_cover else 'Not found'}")
+        print(f"✓ Back cover: {'Included' if back_cover else 'Not found'}")
+        print(f"✓ Total chapters: {len(rendered_sections)}")
+        print(f"✓ Total pages: {total_pages}")
+        print(f"{'='*60}")
+    
+    return output_file
 
 
 def build_book(
@@ -383,13 +733,20 @@ def build_book(
     force: bool = False,
     verbose: bool = True,
     config_path: str = None,
-    output_format: OutputFormat = None
+    output_format: OutputFormat = None,
+    jobs: int = 1,
+    render_mode: str = 'per-file',
+    optimize: bool = None,
+    incremental: bool = None,
+    offline: bool = None
 ) -> str:
     """
     Build a complete book from source files in the specified format.
     
     Supports MD files, PDF files, and directories in the order JSON.
     MD files are converted on-demand (lazy conversion) with caching.
+    A PDF book whose inputs did not change since its last build is not
+    built again (see cache.BuildManifest).
     
     Args:
         order_json_path: Path to order JSON file (required)
@@ -397,14 +754,26 @@ def build_book(
         root_dir: Project root directory (defaults to current directory)
         output_dir: Output directory for final book (defaults to <root>/bookbuilder-output)
         temp_dir: Directory for intermediate files (converted PDFs). If None, uses output_dir
-        force: Force reconversion of all MD files
+        force: Force reconversion of all MD files and rebuild the book
+            (normally unnecessary: the cache keys cover the sources and all
+            rendering settings)
         verbose: Print progress messages
         config_path: Path to custom config file (optional)
         output_format: Output format (PDF, EPUB, DOCX, HTML). Defaults to PDF.
+        jobs: Worker processes for MD conversion (1 = sequential, 0 = one per CPU core)
+        render_mode: 'per-file' (default) or 'single-pass' (PDF only, chapters
+            must be markdown; falls back to per-file otherwise)
+        optimize: Optimize the final PDF (overrides outputSettings.optimize;
+            None uses the config)
+        incremental: Update the previous book in place when only page content
+            changed (overrides mergeSettings.incremental; None uses the config)
+        offline: Use only cached copies of remote resources (overrides
+            fetchSettings.offline; None uses the config)
         
     Returns:
         Path to generated book file
     """
+    build_started = time.time_ns()
     # Default to PDF format
     if output_format is None:
         output_format = OutputFormat.PDF
@@ -454,8 +823,24 @@ def build_book(
     page_settings['bookTitle'] = book_title
     
     # Get style and TOC settings from config
-    style_settings = config.get('styleSettings', {})
+    style_settings = dict(config.get('styleSettings', {}))
+    # Bundled font directory is relative to the project root
+    font_dir = style_settings.get('fontDirectory')
+    if font_dir and not os.path.isabs(font_dir):
+        style_settings['fontDirectory'] = os.path.normpath(os.path.join(root_dir, font_dir))
     toc_settings = config.get('tocSettings', {})
+    merge_settings = dict(config.get('mergeSettings', {}))
+    if incremental is not None:
+        merge_settings['incremental'] = incremental
+    output_settings = dict(config.get('outputSettings', {}))
+    if optimize is not None:
+        output_settings['optimize'] = optimize
+    fetch_settings = dict(config.get('fetchSettings', {}))
+    if offline is not None:
+        fetch_settings['offline'] = offline
+    image_settings = config.get('imageSettings', {})
+    # Images and stylesheets are cached in memory and (remote ones) in temp_dir
+    configure_fetcher(temp_dir, fetch_settings, image_settings, style_settings)
     # Get content processing settings: merge config defaults with order JSON overrides
     content_settings = deep_merge(
         config.get('contentProcessing', {}),
@@ -474,45 +859,22 @@ def build_book(
     if verbose:
         print(f"\nCollecting files for {len(chapters)} chapters...")
     
-    # Process chapters and collect files
-    chapter_data = []  # List of (section_name, file_list)
-    front_cover_files = []
-    back_cover_files = []
-    all_files_to_convert = []  # MD files to convert
-    
-    for chapter in chapters:
-        section_name = chapter.get('section', 'Untitled Section')
-        files = collect_files_for_chapter(chapter, root_dir)
-        
-        if section_name == "Front Cover":
-            front_cover_files = files
-        elif section_name == "Back Cover":
-            back_cover_files = files
-        else:
-            chapter_data.append((section_name, files))
-        
-        # Collect MD files for batch conversion (exclude covers as they need special processing)
-        if section_name not in ["Front Cover", "Back Cover"]:
-            for f in files:
-                if f.lower().endswith('.md'):
-                    all_files_to_convert.append(f)
+    # Resolve the files of every chapter (reused from the last build when unchanged)
+    plan, plan_reused = load_book_plan(order_json_path, chapters, root_dir, temp_dir)
+    front_cover_files = plan.front_cover_files
+    back_cover_files = plan.back_cover_files
+    # MD files for batch conversion (covers need special processing)
+    all_files_to_convert = plan.markdown_files
+    anchor_map = plan.anchor_map
     
     if verbose:
-        total_files = sum(len(files) for _, files in chapter_data)
+        if plan_reused:
+            print("  Reusing the resolved book plan (order file and folders unchanged)")
+        total_files = sum(len(section.files) for section in plan.sections)
         total_files += len(front_cover_files) + len(back_cover_files)
         md_count = len(all_files_to_convert)
         print(f"  Total files: {total_files}")
         print(f"  MD files to convert: {md_count}")
-    
-    # Build anchor map for internal linking across all book files
-    all_book_files = []
-    for _, files in chapter_data:
-        all_book_files.extend(files)
-    all_book_files.extend(front_cover_files)
-    all_book_files.extend(back_cover_files)
-    anchor_map = build_anchor_map(all_book_files, root_dir)
-    
-    if verbose:
         print(f"  Built anchor map with {len(anchor_map)} entries for internal linking")
     
     # Get author from order JSON or config
@@ -532,12 +894,44 @@ def build_book(
     ensure_dir(output_dir)
     output_file = os.path.join(output_dir, output_filename)
     
+    # PDF books record their inputs, so a build that would change nothing exits here
+    if output_format == OutputFormat.PDF:
+        build_manifest = BuildManifest(temp_dir)
+        font_files = find_font_files(style_settings.get('fontDirectory'))
+        build_key = hash_data({
+            'version': __version__,
+            'root': root_dir,
+            'tempDir': temp_dir,
+            'order': order_json,
+            'config': config,
+            'options': {'renderMode': render_mode, 'optimize': optimize,
+                        'incremental': incremental, 'offline': offline},
+            'files': plan.book_files,
+            'fonts': font_files,
+            # The TOC and stamped footers show the build date
+            'date': datetime.date.today().strftime(page_settings.get('dateFormat', '%B %d, %Y')),
+        })
+        if not force and build_manifest.is_current(output_file, build_key):
+            build_manifest.save()
+            if verbose:
+                print(f"\n✓ Book is up to date: {output_file} (nothing changed since the last build)")
+            return output_file
+    
+    def record_build(dependencies, complete: bool) -> None:
+        """Record the finished build, or forget the last one if something was left out."""
+        if complete:
+            inputs = plan.book_files + font_files + list(dependencies)
+            build_manifest.record(output_file, build_key, inputs, build_started)
+        else:
+            build_manifest.discard(output_file)
+        build_manifest.save()
+    
     # Handle non-PDF formats using Pandoc
     if output_format != OutputFormat.PDF:
         # Collect all MD files in order for Pandoc
         all_md_files = []
-        for _, files in chapter_data:
-            for f in files:
+        for section in plan.sections:
+            for f in section.files:
                 if f.lower().endswith('.md') and os.path.exists(f):
                     all_md_files.append(f)
         
@@ -557,7 +951,9 @@ def build_book(
                 author=author,
                 cover_image=cover_image,
                 toc=True,
-                verbose=verbose
+                verbose=verbose,
+                image_processor=(ImageProcessor(temp_dir, image_settings, style_settings)
+                                 if image_settings.get('downsample') else None)
             )
         elif output_format == OutputFormat.DOCX:
             result_path, success, error = build_book_docx(
@@ -592,7 +988,62 @@ def build_book(
         
         return output_file
     
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"Unsupported render mode: {render_mode}. Supported: {list(RENDER_MODES)}")
+    
+    merge_engine = merge_settings.get('engine', DEFAULT_MERGE_ENGINE)
+    if merge_engine not in MERGE_ENGINES:
+        raise ValueError(f"Unsupported merge engine: {merge_engine}. Supported: {list(MERGE_ENGINES)}")
+    if merge_engine == 'pikepdf' and not is_pikepdf_available():
+        print(f"  Warning: pikepdf is not installed, using the {DEFAULT_MERGE_ENGINE} merge engine")
+        merge_engine = DEFAULT_MERGE_ENGINE
+    
+    if render_mode == 'single-pass':
+        other_files = [f for section in plan.sections for f in section.files if not f.lower().endswith('.md')]
+        if not other_files:
+            fetcher = get_fetcher()
+            failed_fetches = len(fetcher.failures)
+            with recording_dependencies() as used_files:
+                build_book_single_pass(
+                    plan.sections, front_cover_files, back_cover_files,
+                    output_file, temp_dir, book_title,
+                    page_settings=page_settings,
+                    style_settings=style_settings,
+                    toc_settings=toc_settings,
+                    anchor_map=anchor_map,
+                    content_settings=content_settings,
+                    verbose=verbose
+                )
+            if output_settings.get('optimize'):
+                if verbose:
+                    print(f"\nOptimizing {os.path.basename(output_file)}...")
+                optimize_pdf(output_file, output_settings, verbose)
+            # A resource that could not be fetched is fetched again next time;
+            # missing local files are recorded as inputs that must stay missing
+            record_build(used_files, not any(map(is_retryable_failure, fetcher.failures[failed_fetches:])))
+            prune_stage_caches(temp_dir)
+            return output_file
+        if verbose:
+            print(f"\nSingle-pass mode needs markdown-only chapters "
+                  f"({len(other_files)} other files found), using per-file mode")
+    
     # PDF format: use existing WeasyPrint + pypdf workflow
+    # Conversion cache keys live in a manifest next to the converted PDFs
+    manifest = ConversionManifest(temp_dir)
+    # Page counts recorded at conversion time, so offsets need no PDF parsing
+    page_index = PageCountIndex(temp_dir)
+    # Merged chapters are reused until one of their PDFs changes
+    chapter_cache = ChapterBlockCache(temp_dir) if merge_settings.get('chapterCache', True) else None
+    # Header and footers stamped after the merge, with book-wide page numbers
+    stamper = None
+    if page_settings.get('stampAtMerge') and resolve_stamp_fonts(style_settings) is None:
+        if verbose:
+            print(f"  Note: {style_settings.get('fontFamily')} cannot be embedded in stamps, "
+                  f"rendering the header and footers into each file instead")
+        page_settings = {**page_settings, 'stampAtMerge': False}
+    elif page_settings.get('stampAtMerge'):
+        stamper = PageStamper(page_settings, style_settings)
+    
     # Convert all MD files in parallel (lazy - only if needed)
     if all_files_to_convert:
         if verbose:
@@ -604,10 +1055,15 @@ def build_book(
             temp_dir,
             force,
             verbose,
+            max_workers=jobs,
             page_settings=page_settings,
             style_settings=style_settings,
             anchor_map=anchor_map,
-            content_settings=content_settings
+            content_settings=content_settings,
+            manifest=manifest,
+            page_index=page_index,
+            fetch_settings=fetch_settings,
+            image_settings=image_settings
         )
         
         if verbose:
@@ -622,74 +1078,94 @@ def build_book(
     chapter_info = []
     front_cover = None
     back_cover = None
+    rendered = []  # (markdown file, PDF or None), for the build manifest
     
     # Process front cover
     for f in front_cover_files:
-        # Always force re-conversion for covers ensuring full-bleed settings are applied
+        # Covers are cached separately: full_bleed is part of the cache key
         pdf_path, _, _ = get_pdf_for_file(
-            f, root_dir, temp_dir, True, False,
+            f, root_dir, temp_dir, force, False,
             page_settings=page_settings,
             style_settings=style_settings,
             anchor_map=anchor_map,
             content_settings=content_settings,
-            full_bleed=True
+            full_bleed=True,
+            manifest=manifest,
+            page_index=page_index,
+            image_settings=image_settings
         )
+        if f.lower().endswith('.md'):
+            rendered.append((f, pdf_path if pdf_path and os.path.exists(pdf_path) else None))
         if pdf_path and os.path.exists(pdf_path):
             front_cover = pdf_path
             if verbose:
                 print(f"  Front cover: {os.path.basename(pdf_path)}")
             break
     
-    # Process chapters
-    for section_name, files in chapter_data:
-        page_start = sum(safe_get_page_count(pdf) for pdf in ordered_pdfs)
+    # Process chapters (chapter offsets come from a running page total)
+    total_pages = 0
+    for section in plan.sections:
+        page_start = total_pages
         chapter_pdfs = []
         
-        for f in files:
+        for f in section.files:
             pdf_path, _, error = get_pdf_for_file(
                 f, root_dir, temp_dir, force, False,
                 page_settings=page_settings,
                 style_settings=style_settings,
                 anchor_map=anchor_map,
-                content_settings=content_settings
+                content_settings=content_settings,
+                manifest=manifest,
+                page_index=page_index,
+                image_settings=image_settings
             )
+            if f.lower().endswith('.md'):
+                rendered.append((f, pdf_path if pdf_path and os.path.exists(pdf_path) else None))
             if pdf_path and os.path.exists(pdf_path):
                 chapter_pdfs.append(pdf_path)
+                total_pages += get_page_count(pdf_path, page_index, merge_engine)
+                if stamper is not None and f.lower().endswith('.md'):
+                    with open(f, 'r', encoding='utf-8') as md_file:
+                        title = extract_title_from_markdown(md_file.read())
+                    stamper.add_document(pdf_path, title, os.path.basename(f))
             elif verbose and error:
                 print(f"  Warning: {error}")
         
         if chapter_pdfs:
             ordered_pdfs.extend(chapter_pdfs)
-            chapter_info.append({
-                'section': section_name,
-                'page': page_start + 1,
-                'files': len(chapter_pdfs)
-            })
+            chapter_info.append(ChapterEntry(section.name, page_start + 1, len(chapter_pdfs)))
     
     # Process back cover
     for f in back_cover_files:
-        # Always force re-conversion for covers ensuring full-bleed settings are applied
+        # Covers are cached separately: full_bleed is part of the cache key
         pdf_path, _, _ = get_pdf_for_file(
-            f, root_dir, temp_dir, True, False,
+            f, root_dir, temp_dir, force, False,
             page_settings=page_settings,
             style_settings=style_settings,
             anchor_map=anchor_map,
             content_settings=content_settings,
-            full_bleed=True
+            full_bleed=True,
+            manifest=manifest,
+            page_index=page_index,
+            image_settings=image_settings
         )
+        if f.lower().endswith('.md'):
+            rendered.append((f, pdf_path if pdf_path and os.path.exists(pdf_path) else None))
         if pdf_path and os.path.exists(pdf_path):
             back_cover = pdf_path
             if verbose:
                 print(f"  Back cover: {os.path.basename(pdf_path)}")
             break
     
+    manifest.save()
+    
     # Adjust page numbers for front cover and TOC
-    front_cover_pages = safe_get_page_count(front_cover) if front_cover else 0
+    front_cover_pages = get_page_count(front_cover, page_index, merge_engine) if front_cover else 0
     toc_pages = 1
     offset = front_cover_pages + toc_pages
     
     for chapter in chapter_info:
-        chapter['page'] += offset
+        chapter.page += offset
     
     # Create TOC page
     toc_filename = defaults.get('tocFilename', '_toc.pdf')
@@ -699,12 +1175,59 @@ def build_book(
     if verbose:
         print(f"\nCreated TOC page")
     
-    if verbose:
-        print(f"\nCombining {len(ordered_pdfs)} PDFs...")
+    # Incremental mode: replace only the pages of changed sources in the previous book
+    book_map = None
+    sources = None
+    if merge_settings.get('incremental') and output_settings.get('optimize'):
+        if verbose:
+            print("  Note: incremental updates are disabled while outputSettings.optimize is on")
+    elif merge_settings.get('incremental'):
+        book_map = BookMap(temp_dir)
+        page_counts = {
+            os.path.abspath(pdf): get_page_count(pdf, page_index, merge_engine)
+            for pdf in [front_cover, toc_pdf, back_cover] + ordered_pdfs if pdf
+        }
+        sources = describe_sources(
+            front_cover, toc_pdf, chapter_info, ordered_pdfs, back_cover, page_counts,
+            chapter_blocks=chapter_cache is not None
+        )
     
-    combine_pdfs_with_bookmarks(
-        ordered_pdfs, chapter_info, output_file, toc_pdf, front_cover, back_cover
+    if sources is not None and update_book(output_file, sources, book_map, verbose, stamper):
+        record_book(output_file, sources, book_map, full_build=False, stamper=stamper)
+    else:
+        if verbose:
+            print(f"\nCombining {len(ordered_pdfs)} PDFs...")
+        combine_pdfs_with_bookmarks(
+            ordered_pdfs, chapter_info, output_file, toc_pdf, front_cover, back_cover,
+            merge_engine=merge_engine,
+            deduplicate=merge_settings.get('deduplicate', True),
+            chapter_cache=chapter_cache,
+            stamper=stamper,
+            page_index=page_index
+        )
+        if sources is not None:
+            # Only record a map that matches the pages actually merged
+            expected_pages = sum(source['pages'] for source in sources)
+            if safe_get_page_count(output_file, merge_engine) == expected_pages:
+                record_book(output_file, sources, book_map, full_build=True, stamper=stamper)
+    page_index.save()
+    if chapter_cache is not None:
+        chapter_cache.prune()
+    
+    if output_settings.get('optimize'):
+        if verbose:
+            print(f"\nOptimizing {os.path.basename(output_file)}...")
+        optimize_pdf(output_file, output_settings, verbose)
+    
+    # Complete only if every markdown file has a manifest entry (failed
+    # conversions and PDFs missing resources that may be fetched next time
+    # have none); missing local files are dependencies that must stay missing
+    entries = [manifest.get(pdf) if pdf else None for f, pdf in rendered if os.path.exists(f)]
+    record_build(
+        [path for entry in entries if entry is not None for path in entry.get('dependencies', {})],
+        None not in entries
     )
+    prune_stage_caches(temp_dir)
     
     if verbose:
         print(f"\n{'='*60}")
@@ -3,27 +3,56 @@ Markdown to PDF conversion module with optimized workflow.
 
 Features:
 - Converts MD files to centralized output directory
-- Timestamp-based caching (skips if PDF is newer than MD)
-- Parallel conversion for speed
+- Content-hash caching keyed on the source and every rendering setting
+- Separately cached markdown -> HTML stage, so style changes only re-run layout
+- Parallel conversion in worker processes for speed
 - Lazy conversion (only converts files needed for the book)
 - Dynamic headers/footers with placeholder support
+- Single-pass mode rendering a whole book as one document
+- Shared stylesheet compiled once per process and reused for every document
+- One font configuration per process, with optional bundled font directory
+- Images and stylesheets fetched through in-memory and on-disk caches
 """
 
 import os
 import re
 import gc
+import html
 import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 import markdown
-from weasyprint import HTML
+from weasyprint import HTML, CSS
+from weasyprint.text.fonts import FontConfiguration
 
+from . import __version__
+from .cache import (
+    ConversionManifest,
+    DirectorySnapshot,
+    HtmlStageCache,
+    PageCountIndex,
+    hash_data,
+    hash_file,
+    snapshot_files
+)
+from .fetch import (
+    configure_fetcher,
+    get_fetcher,
+    get_image_cache,
+    is_retryable_failure,
+    recording_dependencies,
+    recording_rasterized_svgs
+)
+from .ignore import IgnoreMatcher, get_ignore_matcher
+from .images import is_image_stage_enabled
 from .utils import (
-    get_gitignore_patterns, 
-    is_ignored, 
     get_default_output_dir,
     ensure_dir,
     filename_to_anchor,
     rewrite_markdown_links,
     inject_document_anchor,
+    absolutize_resource_urls,
     process_details_tags
 )
 
@@ -37,6 +66,55 @@ DEFAULT_PAGE_SETTINGS = {
     'dateFormat': '%B %d, %Y'
 }
 
+# Extra page CSS for full-bleed documents (covers)
+FULL_BLEED_CSS = """
+            body, p { margin: 0; padding: 0; }
+            img { width: 100vw; height: 100vh; object-fit: cover; display: block; }
+"""
+
+# Compiled shared stylesheets keyed by a hash of the style settings.
+# Each process (including conversion workers) compiles a given style once.
+_STYLESHEET_CACHE = {}
+
+# Font configuration shared by every document rendered in this process
+_FONT_CONFIG = None
+
+# Markdown extensions used by the HTML stage
+MARKDOWN_EXTENSIONS = ['extra', 'toc', 'tables']
+
+# Markdown parser reused (after reset()) for every file in this process
+_MARKDOWN_PARSER = None
+
+# Default styleSettings.fontFamily
+DEFAULT_FONT_FAMILY = 'Helvetica Neue, Helvetica, Arial, sans-serif'
+
+# Generic CSS font families (never quoted in a font-family list)
+GENERIC_FONT_FAMILIES = {
+    'serif', 'sans-serif', 'monospace', 'cursive', 'fantasy',
+    'system-ui', 'ui-serif', 'ui-sans-serif', 'ui-monospace',
+}
+
+# Font file extensions loaded from styleSettings.fontDirectory
+FONT_FORMATS = {
+    '.ttf': 'truetype',
+    '.otf': 'opentype',
+    '.woff': 'woff',
+    '.woff2': 'woff2',
+}
+
+# Style suffixes in bundled font filenames (e.g. "Inter-SemiBoldItalic.ttf")
+FONT_WEIGHTS = {
+    'thin': 100,
+    'extralight': 200,
+    'light': 300,
+    'regular': 400,
+    'medium': 500,
+    'semibold': 600,
+    'bold': 700,
+    'extrabold': 800,
+    'black': 900,
+}
+
 
 def extract_title_from_markdown(md_content: str) -> str:
     """
@@ -141,32 +219,161 @@ def build_css_content(text: str) -> str:
     return ' '.join(parts)
 
 
-def find_markdown_files(root_dir: str, ignore_patterns: list[str] = None) -> list[str]:
+def css_string(text: str) -> str:
+    """
+    Quote text as a CSS string literal, escaping quotes and backslashes.
+    
+    Args:
+        text: Plain text
+    
+    Returns:
+        Single-quoted CSS string
+    """
+    escaped = (text or '').replace('\\', '\\\\').replace("'", "\\'").replace('\n', ' ')
+    return f"'{escaped}'"
+
+
+def css_font_stack(stack: str) -> str:
+    """
+    Format a comma-separated font stack as a CSS font-family value.
+    
+    Each family name is quoted separately so fontconfig resolves the stack
+    name by name; generic families (sans-serif, monospace, ...) stay bare.
+    
+    Args:
+        stack: Font stack, e.g. "Helvetica Neue, Arial, sans-serif"
+    
+    Returns:
+        CSS font-family value, e.g. '"Helvetica Neue", "Arial", sans-serif'
+    """
+    families = []
+    for name in stack.split(','):
+        name = name.strip().strip('"\'')
+        if not name:
+            continue
+        if name.lower() in GENERIC_FONT_FAMILIES:
+            families.append(name.lower())
+        else:
+            families.append('"' + name.replace('"', '\\"') + '"')
+    return ', '.join(families)
+
+
+def get_font_config() -> FontConfiguration:
+    """
+    Get the font configuration shared by all documents in this process.
+    
+    WeasyPrint caches fontconfig lookups and @font-face downloads on the
+    FontConfiguration, so reusing one avoids repeating the fallback search
+    for every document.
+    
+    Returns:
+        WeasyPrint FontConfiguration for this process
+    """
+    global _FONT_CONFIG
+    if _FONT_CONFIG is None:
+        _FONT_CONFIG = FontConfiguration()
+    return _FONT_CONFIG
+
+
+def find_font_files(font_dir: str) -> list[str]:
+    """
+    Find the font files in a bundled font directory.
+    
+    Args:
+        font_dir: Directory holding .ttf, .otf, .woff or .woff2 files
+    
+    Returns:
+        Sorted list of font file paths (empty if the directory is missing)
+    """
+    if not font_dir or not os.path.isdir(font_dir):
+        return []
+    return sorted(
+        os.path.join(font_dir, name)
+        for name in os.listdir(font_dir)
+        if os.path.splitext(name)[1].lower() in FONT_FORMATS
+    )
+
+
+def parse_font_filename(font_path: str) -> tuple[str, int, str]:
+    """
+    Read the family, weight and style of a bundled font from its filename.
+    
+    The family name is the filename up to the first hyphen, and the rest
+    selects weight and style, e.g. "Inter-BoldItalic.ttf" is the "Inter"
+    family at weight 700, italic.
+    
+    Args:
+        font_path: Font file path
+    
+    Returns:
+        Tuple of (family, weight, style) - style is 'normal' or 'italic'
+    """
+    stem = os.path.splitext(os.path.basename(font_path))[0]
+    family, _, variant = stem.partition('-')
+    variant = variant.lower()
+    style = 'italic' if 'italic' in variant or 'oblique' in variant else 'normal'
+    variant = variant.replace('italic', '').replace('oblique', '')
+    weight = FONT_WEIGHTS.get(variant.replace('-', '').replace('_', ''), 400)
+    return family, weight, style
+
+
+def build_font_face_css(font_dir: str) -> str:
+    """
+    Build @font-face rules for every font file in a bundled font directory.
+    
+    Family, weight and style come from the filename (see parse_font_filename).
+    
+    Args:
+        font_dir: Directory holding font files
+    
+    Returns:
+        CSS text with one @font-face rule per font file
+    """
+    rules = []
+    for font_path in find_font_files(font_dir):
+        family, weight, style = parse_font_filename(font_path)
+        ext = os.path.splitext(font_path)[1]
+        url = Path(os.path.abspath(font_path)).as_uri()
+        rules.append(f'''
+            @font-face {{
+                font-family: {css_string(family)};
+                src: url("{url}") format("{FONT_FORMATS[ext.lower()]}");
+                font-weight: {weight};
+                font-style: {style};
+            }}''')
+    return ''.join(rules)
+
+
+def find_markdown_files(
+    root_dir: str,
+    ignore_patterns: list[str] = None,
+    snapshot: DirectorySnapshot = None
+) -> list[str]:
     """
     Find all markdown files in a directory tree, excluding ignored paths.
     
     Args:
         root_dir: Root directory to search
-        ignore_patterns: List of gitignore-style patterns to exclude
+        ignore_patterns: List of gitignore-style patterns to exclude (default:
+            the root .gitignore, through the build's shared matcher);
+            .gitignore files in subdirectories apply too
+        snapshot: Directory snapshot of the last build; unchanged
+            directories are not read again (optional)
         
     Returns:
         List of absolute paths to markdown files
     """
     if ignore_patterns is None:
-        ignore_patterns = get_gitignore_patterns(root_dir)
+        matcher = get_ignore_matcher(root_dir)
+    else:
+        matcher = IgnoreMatcher(root_dir, ignore_patterns)
     
     md_files = []
-    for dirpath, dirnames, filenames in os.walk(root_dir):
-        # Remove ignored directories in-place
-        dirnames[:] = [d for d in dirnames if not is_ignored(
-            os.path.relpath(os.path.join(dirpath, d), root_dir), 
-            ignore_patterns
-        )]
+    # Ignored directories are pruned by the matcher
+    for dirpath, dirnames, filenames in matcher.walk(root_dir, snapshot):
         for filename in filenames:
             if filename.endswith('.md'):
-                rel_path = os.path.relpath(os.path.join(dirpath, filename), root_dir)
-                if not is_ignored(rel_path, ignore_patterns):
-                    md_files.append(os.path.join(dirpath, filename))
+                md_files.append(os.path.join(dirpath, filename))
     return md_files
 
 
@@ -195,14 +402,80 @@ def get_output_pdf_path(md_path: str, root_dir: str = None, output_dir: str = No
     return os.path.join(output_dir, rel_pdf_path)
 
 
-def is_conversion_needed(md_path: str, pdf_path: str, force: bool = False) -> bool:
+def compute_cache_key(
+    md_path: str,
+    page_settings: dict = None,
+    style_settings: dict = None,
+    anchor_map: dict = None,
+    content_settings: dict = None,
+    full_bleed: bool = False,
+    image_settings: dict = None
+) -> str:
+    """
+    Build the conversion cache key for a markdown file.
+    
+    The key covers every input that affects the rendered PDF: the source
+    bytes, the effective page settings (merged with defaults), style and
+    content processing settings, the bundled font files, the anchor map,
+    the full-bleed flag and the bookbuilder version. With stampAtMerge,
+    the header and footer settings are left out: they are stamped onto the
+    book after the merge, not rendered into the file. Image settings count
+    only when the image stage is on.
+    
+    Args:
+        md_path: Path to source markdown file
+        page_settings: Header/footer configuration
+        style_settings: Styling configuration
+        anchor_map: Dictionary mapping filenames to anchor IDs
+        content_settings: Content processing settings
+        full_bleed: Whether the file is rendered in full-bleed mode
+        image_settings: Image stage configuration (see images.py)
+    
+    Returns:
+        Hex digest identifying this rendering of the file
+    """
+    page_settings = {**DEFAULT_PAGE_SETTINGS, **(page_settings or {})}
+    if page_settings.get('stampAtMerge') and not full_bleed:
+        page_settings = {'stampAtMerge': True}
+    key_data = {
+        'version': __version__,
+        'source': hash_file(md_path),
+        'pageSettings': page_settings,
+        'styleSettings': style_settings or {},
+        'fonts': [
+            (os.path.basename(path), os.path.getsize(path), os.path.getmtime(path))
+            for path in find_font_files((style_settings or {}).get('fontDirectory'))
+        ],
+        'contentSettings': content_settings or {},
+        'anchorMap': anchor_map or {},
+        'fullBleed': full_bleed,
+    }
+    if is_image_stage_enabled(image_settings):
+        key_data['imageSettings'] = image_settings
+    return hash_data(key_data)
+
+
+def is_conversion_needed(
+    md_path: str,
+    pdf_path: str,
+    force: bool = False,
+    cache_key: str = None,
+    manifest: ConversionManifest = None
+) -> bool:
     """
-    Check if conversion is needed based on file timestamps.
+    Check if conversion is needed.
+    
+    With a manifest and cache key, the cached PDF is valid only if it was
+    built with exactly the same key and none of the files it was rendered
+    from (images, stylesheets) changed since. Without them, falls back to
+    comparing file timestamps.
     
     Args:
         md_path: Path to source markdown file
         pdf_path: Path to target PDF file
         force: If True, always return True (force reconversion)
+        cache_key: Cache key from compute_cache_key (optional)
+        manifest: Conversion manifest for the output directory (optional)
         
     Returns:
         True if conversion is needed, False if cached PDF is still valid
@@ -213,6 +486,9 @@ def is_conversion_needed(md_path: str, pdf_path: str, force: bool = False) -> bo
     if not os.path.exists(pdf_path):
         return True
     
+    if manifest is not None and cache_key is not None:
+        return not manifest.is_current(pdf_path, cache_key)
+    
     # Check if MD file is newer than PDF
     md_mtime = os.path.getmtime(md_path)
     pdf_mtime = os.path.getmtime(pdf_path)
@@ -220,53 +496,81 @@ def is_conversion_needed(md_path: str, pdf_path: str, force: bool = False) -> bo
     return md_mtime > pdf_mtime
 
 
-def convert_markdown_to_pdf(
-    md_path: str, 
-    pdf_path: str = None,
-    page_settings: dict = None,
-    style_settings: dict = None,
-    force: bool = False,
+def get_markdown_parser() -> markdown.Markdown:
+    """
+    Get the markdown parser shared by all files in this process.
+    
+    Building a parser loads every extension, so one instance is kept and
+    reset() between files instead.
+    
+    Returns:
+        Reset markdown.Markdown instance
+    """
+    global _MARKDOWN_PARSER
+    if _MARKDOWN_PARSER is None:
+        _MARKDOWN_PARSER = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    return _MARKDOWN_PARSER.reset()
+
+
+def compute_html_cache_key(
+    md_path: str,
+    anchor_map: dict = None,
+    content_settings: dict = None
+) -> str:
+    """
+    Build the cache key for the markdown -> HTML stage of a file.
+    
+    Only the inputs of the markdown stage participate: the source bytes,
+    the file name (used for the document anchor), the anchor map, content
+    processing settings and the bookbuilder version. Page and style
+    settings do not, so changing them reuses the cached HTML.
+    
+    Args:
+        md_path: Path to source markdown file
+        anchor_map: Dictionary mapping filenames to anchor IDs
+        content_settings: Content processing settings
+    
+    Returns:
+        Hex digest identifying the HTML stage output for the file
+    """
+    return hash_data({
+        'version': __version__,
+        'source': hash_file(md_path),
+        'filename': os.path.basename(md_path),
+        'anchorMap': anchor_map or {},
+        'contentSettings': content_settings or {},
+    })
+
+
+def render_markdown_html(
+    md_path: str,
     anchor_map: dict = None,
     content_settings: dict = None,
-    full_bleed: bool = False
-) -> tuple[str, bool]:
+    html_cache: HtmlStageCache = None
+) -> tuple[str, str]:
     """
-    Convert a markdown file to PDF with dynamic header and footer.
+    Run the markdown stage for a file: preprocess it and convert it to HTML.
+    
+    Rewrites internal .md links to anchors, flattens <details> blocks for
+    PDF output, converts the markdown to HTML and injects the document anchor.
+    The result does not depend on page or style settings, so it can be
+    reused by any layout or output format.
     
     Args:
         md_path: Path to markdown file
-        pdf_path: Output PDF path (defaults to output directory with same structure)
-        page_settings: Dictionary with header/footer configuration
-            - header: Header text with placeholders
-            - headerFallback: Fallback if title not found
-            - footerLeft: Left footer with placeholders
-            - footerCenter: Center footer with placeholders
-            - footerRight: Right footer with placeholders
-            - dateFormat: Date format string (default: %B %d, %Y)
-            - bookTitle: Book title for {bookTitle} placeholder
-        style_settings: Dictionary with styling configuration
-            - pageSize, margins, fonts, colors, sizes, etc.
-        force: Force reconversion even if cached
         anchor_map: Dictionary mapping filenames to anchor IDs for internal linking
         content_settings: Content processing settings
-        full_bleed: If True, set margins to 0 and disable headers/footers
+        html_cache: HTML stage cache; results are looked up and stored there (optional)
         
     Returns:
-        Tuple of (pdf_path, was_converted) - was_converted is False if cached
+        Tuple of (html_content, title) - title is None if no H1 was found
     """
-    if pdf_path is None:
-        pdf_path = get_output_pdf_path(md_path)
-    
-    # Check if conversion is needed (caching)
-    if not is_conversion_needed(md_path, pdf_path, force):
-        return pdf_path, False
-    
-    # Merge with defaults
-    settings = {**DEFAULT_PAGE_SETTINGS, **(page_settings or {})}
-    styles = style_settings or {}
-    
-    # Ensure output directory exists
-    ensure_dir(os.path.dirname(pdf_path))
+    cache_key = None
+    if html_cache is not None:
+        cache_key = compute_html_cache_key(md_path, anchor_map, content_settings)
+        cached = html_cache.get(cache_key)
+        if cached is not None:
+            return cached
     
     with open(md_path, 'r', encoding='utf-8') as f:
         md_content = f.read()
@@ -282,106 +586,111 @@ def convert_markdown_to_pdf(
     
     # Extract title from markdown
     title = extract_title_from_markdown(md_content)
-    if not title:
-        title = settings.get('headerFallback', 'Document')
     
-    # Build context for placeholder replacement
-    context = {
-        'title': title,
-        'filename': os.path.basename(md_path),
-        'date': datetime.date.today().strftime(settings.get('dateFormat', '%B %d, %Y')),
-        'bookTitle': settings.get('bookTitle', ''),
-    }
+    html_content = get_markdown_parser().convert(md_content)
     
-    # Process placeholders for header and footers
-    header_text = process_placeholder(settings.get('header', '{title}'), context)
-    footer_left = process_placeholder(settings.get('footerLeft', ''), context)
-    footer_center = process_placeholder(settings.get('footerCenter', ''), context)
-    footer_right = process_placeholder(settings.get('footerRight', ''), context)
+    # Inject document anchor for internal linking
+    doc_anchor = filename_to_anchor(os.path.basename(md_path))
+    html_content = inject_document_anchor(html_content, doc_anchor)
     
-    # Build CSS content values (handles {page} and {pages} counters)
-    header_css = build_css_content(header_text)
-    footer_left_css = build_css_content(footer_left)
-    footer_center_css = build_css_content(footer_center)
-    footer_right_css = build_css_content(footer_right)
+    if html_cache is not None:
+        html_cache.put(cache_key, html_content, title)
+    return html_content, title
+
+
+def build_page_css(
+    style_settings: dict = None,
+    header_css: str = 'none',
+    footer_left_css: str = 'none',
+    footer_center_css: str = 'none',
+    footer_right_css: str = 'none',
+    margins: str = None,
+    page_name: str = None
+) -> str:
+    """
+    Build the @page rule with header and footer margin boxes.
+    
+    Args:
+        style_settings: Styling configuration (pageSize, margins, fonts, sizes)
+        header_css: CSS content value for the header
+        footer_left_css: CSS content value for the left footer
+        footer_center_css: CSS content value for the center footer
+        footer_right_css: CSS content value for the right footer
+        margins: Page margins (defaults to the margins style setting)
+        page_name: Named page selector (e.g. 'bb-cover'), or None for all pages
     
-    # Get style values with defaults (moved up for full_bleed logic)
+    Returns:
+        CSS text for the @page rule
+    """
+    styles = style_settings or {}
     page_size = styles.get('pageSize', 'A4')
-    margins = styles.get('margins', '1in 0.8in 1in 0.8in')
-    font_family = styles.get('fontFamily', 'Helvetica Neue, Helvetica, Arial, sans-serif')
-    mono_font = styles.get('monoFontFamily', 'SF Mono, Monaco, Menlo, Consolas, Liberation Mono, monospace')
-    body_font_size = styles.get('bodyFontSize', '11pt')
-    body_line_height = styles.get('bodyLineHeight', '1.6')
-    body_color = styles.get('bodyColor', '#333333')
-    heading_color = styles.get('headingColor', '#222222')
-    h1_size = styles.get('h1FontSize', '18pt')
-    h2_size = styles.get('h2FontSize', '16pt')
-    h3_size = styles.get('h3FontSize', '14pt')
-    h4_size = styles.get('h4FontSize', '12pt')
-    code_font_size = styles.get('codeFontSize', '10pt')
-    table_font_size = styles.get('tableFontSize', '10pt')
-    code_bg = styles.get('codeBackground', '#f5f5f5')
-    link_color = styles.get('linkColor', '#0066cc')
+    if margins is None:
+        margins = styles.get('margins', '1in 0.8in 1in 0.8in')
+    font_family = css_font_stack(styles.get('fontFamily', DEFAULT_FONT_FAMILY))
     header_font_size = styles.get('headerFontSize', '14px')
     footer_font_size = styles.get('footerFontSize', '10px')
-
-    # Handle full bleed (no margins, no headers/footers)
-    full_bleed_css = ""
-    actual_margins = '0' if full_bleed else margins
-    if full_bleed:
-        header_css = 'none'
-        footer_left_css = 'none'
-        footer_center_css = 'none'
-        footer_right_css = 'none'
-        full_bleed_css = """
-            body, p { margin: 0; padding: 0; }
-            img { width: 100vw; height: 100vh; object-fit: cover; display: block; }
-        """
+    selector = f'@page {page_name}' if page_name else '@page'
     
-    html_content = markdown.markdown(
-        md_content, 
-        extensions=['extra', 'toc', 'tables']
-    )
-    
-    # Inject document anchor for internal linking
-    doc_anchor = filename_to_anchor(os.path.basename(md_path))
-    html_content = inject_document_anchor(html_content, doc_anchor)
-    
-    html_template = f'''
-    <html>
-    <head>
-        <style>
-            @page {{
+    return f'''
+            {selector} {{
                 size: {page_size};
-                margin: {actual_margins};
+                margin: {margins};
                 @top-center {{
                     content: {header_css};
                     font-size: {header_font_size};
                     font-weight: bold;
-                    font-family: "{font_family}";
+                    font-family: {font_family};
                 }}
                 @bottom-left {{
                     content: {footer_left_css};
                     font-size: {footer_font_size};
-                    font-family: "{font_family}";
+                    font-family: {font_family};
                 }}
                 @bottom-center {{
                     content: {footer_center_css};
                     font-size: {footer_font_size};
-                    font-family: "{font_family}";
+                    font-family: {font_family};
                 }}
                 @bottom-right {{
                     content: {footer_right_css};
                     font-size: {footer_font_size};
-                    font-family: "{font_family}";
+                    font-family: {font_family};
                 }}
             }}
-            
-            {full_bleed_css}
-            
+    '''
+
+
+def build_body_css(style_settings: dict = None) -> str:
+    """
+    Build the document body stylesheet (fonts, headings, code, tables, ...).
+    
+    Args:
+        style_settings: Styling configuration (fonts, colors, sizes)
+    
+    Returns:
+        CSS text shared by every converted document
+    """
+    styles = style_settings or {}
+    font_family = css_font_stack(styles.get('fontFamily', DEFAULT_FONT_FAMILY))
+    mono_font = css_font_stack(styles.get('monoFontFamily', 'SF Mono, Monaco, Menlo, Consolas, Liberation Mono, monospace'))
+    body_font_size = styles.get('bodyFontSize', '11pt')
+    body_line_height = styles.get('bodyLineHeight', '1.6')
+    body_color = styles.get('bodyColor', '#333333')
+    heading_color = styles.get('headingColor', '#222222')
+    h1_size = styles.get('h1FontSize', '18pt')
+    h2_size = styles.get('h2FontSize', '16pt')
+    h3_size = styles.get('h3FontSize', '14pt')
+    h4_size = styles.get('h4FontSize', '12pt')
+    code_font_size = styles.get('codeFontSize', '10pt')
+    table_font_size = styles.get('tableFontSize', '10pt')
+    code_bg = styles.get('codeBackground', '#f5f5f5')
+    link_color = styles.get('linkColor', '#0066cc')
+    font_faces = build_font_face_css(styles.get('fontDirectory'))
+    
+    return font_faces + f'''
             /* Base font for all text */
             body {{
-                font-family: "{font_family}";
+                font-family: {font_family};
                 font-size: {body_font_size};
                 line-height: {body_line_height};
                 color: {body_color};
@@ -389,7 +698,7 @@ def convert_markdown_to_pdf(
             
             /* Headings */
             h1, h2, h3, h4, h5, h6 {{
-                font-family: "{font_family}";
+                font-family: {font_family};
                 font-weight: 600;
                 margin-top: 1.5em;
                 margin-bottom: 0.5em;
@@ -407,7 +716,7 @@ def convert_markdown_to_pdf(
             
             /* Code - inline and blocks */
             code, pre, kbd, samp {{
-                font-family: "{mono_font}";
+                font-family: {mono_font};
                 font-size: {code_font_size};
             }}
             
@@ -434,7 +743,7 @@ def convert_markdown_to_pdf(
             
             /* Tables */
             table {{
-                font-family: "{font_family}";
+                font-family: {font_family};
                 border-collapse: collapse;
                 width: 100%;
                 margin: 1em 0;
@@ -468,7 +777,7 @@ def convert_markdown_to_pdf(
             
             /* Blockquotes */
             blockquote {{
-                font-family: "{font_family}";
+                font-family: {font_family};
                 font-style: italic;
                 margin: 1em 0;
                 padding: 0.5em 1em;
@@ -487,18 +796,414 @@ def convert_markdown_to_pdf(
                 max-width: 100%;
                 height: auto;
             }}
-        </style>
-    </head>
+    '''
+
+
+def get_shared_stylesheet(style_settings: dict = None) -> CSS:
+    """
+    Get the compiled body stylesheet for a set of style settings.
+    
+    The stylesheet is parsed by WeasyPrint once and reused for every
+    document rendered with the same styleSettings in this process.
+    
+    Args:
+        style_settings: Styling configuration (fonts, colors, sizes)
+    
+    Returns:
+        Compiled WeasyPrint CSS object
+    """
+    key = hash_data(style_settings or {})
+    stylesheet = _STYLESHEET_CACHE.get(key)
+    if stylesheet is None:
+        stylesheet = CSS(string=build_body_css(style_settings), font_config=get_font_config())
+        _STYLESHEET_CACHE[key] = stylesheet
+    return stylesheet
+
+
+def convert_markdown_to_pdf(
+    md_path: str, 
+    pdf_path: str = None,
+    page_settings: dict = None,
+    style_settings: dict = None,
+    force: bool = False,
+    anchor_map: dict = None,
+    content_settings: dict = None,
+    full_bleed: bool = False,
+    manifest: ConversionManifest = None,
+    render_info: dict = None,
+    image_settings: dict = None,
+    html_cache: HtmlStageCache = None
+) -> tuple[str, bool]:
+    """
+    Convert a markdown file to PDF with dynamic header and footer.
+    
+    Args:
+        md_path: Path to markdown file
+        pdf_path: Output PDF path (defaults to output directory with same structure)
+        page_settings: Dictionary with header/footer configuration
+            - header: Header text with placeholders
+            - headerFallback: Fallback if title not found
+            - footerLeft: Left footer with placeholders
+            - footerCenter: Center footer with placeholders
+            - footerRight: Right footer with placeholders
+            - dateFormat: Date format string (default: %B %d, %Y)
+            - bookTitle: Book title for {bookTitle} placeholder
+            - stampAtMerge: Leave the header and footers out; they are
+              stamped onto the merged book instead
+        style_settings: Dictionary with styling configuration
+            - pageSize, margins, fonts, colors, sizes, etc.
+        force: Force reconversion even if cached
+        anchor_map: Dictionary mapping filenames to anchor IDs for internal linking
+        content_settings: Content processing settings
+        full_bleed: If True, set margins to 0 and disable headers/footers
+        manifest: Conversion manifest; enables content-hash caching and
+            records the cache key after a successful conversion
+        render_info: Dictionary filled with {'pages': page_count} when the
+            file is rendered, plus 'missing_resources' (URLs that could not
+            be fetched), 'rasterized_svgs' and 'svg_seconds_saved' (see
+            images.py) and 'dependencies' (the local files used, see
+            snapshot_files; missing files are None) when there were any
+            (optional)
+        image_settings: Image stage configuration, for the cache key (the
+            stage itself runs in the process fetcher, see configure_fetcher)
+        html_cache: HTML stage cache (defaults to the one in the manifest's
+            output directory when a manifest is given)
+    
+    Returns:
+        Tuple of (pdf_path, was_converted) - was_converted is False if cached
+    """
+    if pdf_path is None:
+        pdf_path = get_output_pdf_path(md_path)
+    
+    # Check if conversion is needed (caching)
+    cache_key = None
+    if manifest is not None:
+        cache_key = compute_cache_key(
+            md_path, page_settings, style_settings,
+            anchor_map, content_settings, full_bleed, image_settings
+        )
+    if not is_conversion_needed(md_path, pdf_path, force, cache_key, manifest):
+        return pdf_path, False
+    
+    # Merge with defaults
+    settings = {**DEFAULT_PAGE_SETTINGS, **(page_settings or {})}
+    styles = style_settings or {}
+    
+    # Ensure output directory exists
+    ensure_dir(os.path.dirname(pdf_path))
+    
+    if html_cache is None and manifest is not None:
+        html_cache = HtmlStageCache(manifest.output_dir)
+    html_content, title = render_markdown_html(md_path, anchor_map, content_settings, html_cache)
+    if not title:
+        title = settings.get('headerFallback', 'Document')
+    
+    # Build context for placeholder replacement
+    context = {
+        'title': title,
+        'filename': os.path.basename(md_path),
+        'date': datetime.date.today().strftime(settings.get('dateFormat', '%B %d, %Y')),
+        'bookTitle': settings.get('bookTitle', ''),
+    }
+    
+    # Per-document stylesheet: only the @page margin boxes vary per file
+    if full_bleed:
+        # Full bleed: no margins, no headers/footers
+        document_css = build_page_css(styles, margins='0') + FULL_BLEED_CSS
+    elif settings.get('stampAtMerge'):
+        # Header and footers are stamped onto the merged book (see stamp.py)
+        document_css = build_page_css(styles)
+    else:
+        # Build CSS content values (handles {page} and {pages} counters)
+        document_css = build_page_css(
+            styles,
+            header_css=build_css_content(process_placeholder(settings.get('header', '{title}'), context)),
+            footer_left_css=build_css_content(process_placeholder(settings.get('footerLeft', ''), context)),
+            footer_center_css=build_css_content(process_placeholder(settings.get('footerCenter', ''), context)),
+            footer_right_css=build_css_content(process_placeholder(settings.get('footerRight', ''), context))
+        )
+    
+    html_template = f'''
+    <html>
     <body>
         {html_content}
     </body>
     </html>
     '''
     
-    HTML(string=html_template, base_url=os.path.dirname(md_path)).write_pdf(pdf_path)
+    font_config = get_font_config()
+    fetcher = get_fetcher()
+    failed_fetches = len(fetcher.failures)
+    stylesheets = [get_shared_stylesheet(styles), CSS(string=document_css, font_config=font_config)]
+    with recording_dependencies() as used_files, recording_rasterized_svgs() as rasterized_svgs:
+        document = HTML(
+            string=html_template, base_url=os.path.dirname(md_path), url_fetcher=fetcher.url_fetcher
+        ).render(stylesheets=stylesheets, font_config=font_config, cache=get_image_cache())
+    document.write_pdf(pdf_path)
+    missing_resources = fetcher.failures[failed_fetches:]
+    dependencies = snapshot_files(used_files, include_missing=True)
+    if render_info is not None:
+        render_info['pages'] = len(document.pages)
+        if dependencies:
+            render_info['dependencies'] = dependencies
+        if missing_resources:
+            render_info['missing_resources'] = missing_resources
+        if rasterized_svgs:
+            render_info['rasterized_svgs'] = len(rasterized_svgs)
+            render_info['svg_seconds_saved'] = sum(rasterized_svgs.values())
+    
+    # A PDF rendered without some of its resources is converted again next
+    # time, unless they are local files that do not exist (see dependencies)
+    if manifest is not None:
+        if any(map(is_retryable_failure, missing_resources)):
+            manifest.discard(pdf_path)
+        else:
+            manifest.record(pdf_path, cache_key, dependencies)
     return pdf_path, True
 
 
+# Margin boxes used for the running header and footers
+RUNNING_SLOTS = (
+    ('header', 'top-center'),
+    ('footerLeft', 'bottom-left'),
+    ('footerCenter', 'bottom-center'),
+    ('footerRight', 'bottom-right'),
+)
+
+# Placeholders whose value differs between documents of the same book
+DOCUMENT_PLACEHOLDERS = ('{title}', '{filename}')
+
+
+def build_running_content(slot: str, template: str, context: dict) -> tuple[str, list]:
+    """
+    Build a book-wide CSS content value for one header/footer slot.
+    
+    {page} and {pages} become CSS counters. Literal parts that depend on the
+    current document ({title}, {filename}) become named strings that each
+    document sets with string-set; all other parts are resolved once.
+    
+    Args:
+        slot: Page setting name (e.g. 'header', 'footerCenter')
+        template: Slot text with placeholders
+        context: Book-level placeholder values
+    
+    Returns:
+        Tuple of (css_content, named_parts) - named_parts lists
+        (string_name, template_part) pairs each document must set
+    """
+    if not template:
+        return "''", []
+    
+    content = []
+    named_parts = []
+    for i, part in enumerate(re.split(r'(\{pages?\})', template)):
+        if part == '{page}':
+            content.append('counter(page)')
+        elif part == '{pages}':
+            content.append('counter(pages)')
+        elif any(p in part for p in DOCUMENT_PLACEHOLDERS):
+            name = f'bb-{slot}-{i}'
+            content.append(f'string({name})')
+            named_parts.append((name, part))
+        elif part:
+            content.append(css_string(process_placeholder(part, context)))
+    
+    return ' '.join(content) or "''", named_parts
+
+
+def build_toc_css(toc_settings: dict = None) -> str:
+    """
+    Build the stylesheet for the HTML table of contents (single-pass mode).
+    
+    Args:
+        toc_settings: TOC styling configuration
+    
+    Returns:
+        CSS text for the table of contents
+    """
+    toc = toc_settings or {}
+    return f'''
+            .bb-toc {{ break-before: page; }}
+            .bb-toc-title {{
+                font-size: {toc.get('titleFontSize', 24)}pt;
+                font-weight: bold;
+                text-align: center;
+                margin-top: 0.5in;
+            }}
+            .bb-toc-subtitle {{
+                font-size: {toc.get('subtitleFontSize', 14)}pt;
+                text-align: center;
+                padding-bottom: 0.2in;
+                border-bottom: 2px solid {toc.get('lineColor', '#0066CC')};
+            }}
+            .bb-toc ol {{
+                list-style: none;
+                padding-left: 0;
+                font-size: {toc.get('entryFontSize', 11)}pt;
+            }}
+            .bb-toc a {{ color: {toc.get('entryColor', '#0066CC')}; }}
+            .bb-toc a::after {{
+                content: leader(' ') 'Page ' target-counter(attr(href), page);
+                color: #000000;
+            }}
+    '''
+
+
+def convert_book_to_pdf(
+    sections: list[tuple[str, list[str]]],
+    pdf_path: str,
+    book_title: str,
+    page_settings: dict = None,
+    style_settings: dict = None,
+    toc_settings: dict = None,
+    anchor_map: dict = None,
+    content_settings: dict = None,
+    front_cover: str = None,
+    back_cover: str = None,
+    front_placeholder_pages: int = 0,
+    back_placeholder_pages: int = 0,
+    html_cache: HtmlStageCache = None
+) -> int:
+    """
+    Render a whole book as a single WeasyPrint document (single-pass mode).
+    
+    The preprocessed HTML of every chapter file is concatenated into one
+    document with CSS page breaks, so WeasyPrint lays out and subsets fonts
+    once, page counters run across the whole book and internal links
+    between files are real links. The table of contents is generated in
+    HTML with target-counter() page numbers and sections become bookmarks.
+    
+    Args:
+        sections: List of (section_name, markdown_paths) in book order
+        pdf_path: Output PDF path
+        book_title: Book title for the TOC and {bookTitle} placeholder
+        page_settings: Header/footer configuration
+        style_settings: Styling configuration
+        toc_settings: TOC styling configuration
+        anchor_map: Dictionary mapping filenames to anchor IDs for internal linking
+        content_settings: Content processing settings
+        front_cover: Markdown front cover rendered full-bleed (optional)
+        back_cover: Markdown back cover rendered full-bleed (optional)
+        front_placeholder_pages: Blank cover pages reserved at the start, to
+            be replaced by a PDF front cover after rendering
+        back_placeholder_pages: Blank cover pages reserved at the end, to
+            be replaced by a PDF back cover after rendering
+        html_cache: HTML stage cache for the markdown files (optional)
+    
+    Returns:
+        Number of pages in the rendered PDF
+    """
+    settings = {**DEFAULT_PAGE_SETTINGS, **(page_settings or {})}
+    styles = style_settings or {}
+    book_context = {
+        'date': datetime.date.today().strftime(settings.get('dateFormat', '%B %d, %Y')),
+        'bookTitle': settings.get('bookTitle', book_title),
+    }
+    
+    # Running header/footers: book-wide counters, per-document named strings
+    slot_css = {}
+    named_parts = []
+    for slot, _ in RUNNING_SLOTS:
+        slot_css[slot], parts = build_running_content(slot, settings.get(slot, ''), book_context)
+        named_parts.extend(parts)
+    
+    def cover_html(md_path, placeholder_pages, css_class):
+        if md_path:
+            html_content, _ = render_markdown_html(md_path, anchor_map, content_settings, html_cache)
+            html_content = absolutize_resource_urls(html_content, os.path.dirname(md_path))
+            return f'<section class="bb-cover {css_class}">{html_content}</section>'
+        return ''.join(
+            f'<section class="bb-cover {css_class}"></section>' for _ in range(placeholder_pages)
+        )
+    
+    body = [cover_html(front_cover, front_placeholder_pages, 'bb-front-cover')]
+    
+    toc_entries = []
+    section_html = []
+    for n, (section_name, md_files) in enumerate(sections, start=1):
+        section_id = f'bb-section-{n}'
+        toc_entries.append(f'<li><a href="#{section_id}">{html.escape(section_name)}</a></li>')
+        
+        documents = []
+        for md_path in md_files:
+            html_content, title = render_markdown_html(md_path, anchor_map, content_settings, html_cache)
+            html_content = absolutize_resource_urls(html_content, os.path.dirname(md_path))
+            context = {
+                **book_context,
+                'title': title or settings.get('headerFallback', 'Document'),
+                'filename': os.path.basename(md_path),
+            }
+            string_set = ', '.join(
+                f'{name} {css_string(process_placeholder(part, context))}'
+                for name, part in named_parts
+            )
+            style = f' style="string-set: {html.escape(string_set)}"' if string_set else ''
+            documents.append(f'<article class="bb-document"{style}>{html_content}</article>')
+        
+        bookmark = html.escape(f'bookmark-level: 1; bookmark-label: {css_string(section_name)}')
+        section_html.append(
+            f'<section class="bb-section" id="{section_id}">'
+            f'<div class="bb-section-mark" style="{bookmark}"></div>'
+            f'{"".join(documents)}</section>'
+        )
+    
+    toc = toc_settings or {}
+    body.append(
+        '<nav class="bb-toc">'
+        f'<div class="bb-toc-title">{html.escape(book_title)}</div>'
+        f'<div class="bb-toc-subtitle">{html.escape(toc.get("subtitleText", "Table of Contents"))}</div>'
+        f'<ol>{"".join(toc_entries)}</ol></nav>'
+    )
+    body.extend(section_html)
+    body.append(cover_html(back_cover, back_placeholder_pages, 'bb-back-cover'))
+    
+    page_css = build_page_css(
+        styles,
+        header_css=slot_css['header'],
+        footer_left_css=slot_css['footerLeft'],
+        footer_center_css=slot_css['footerCenter'],
+        footer_right_css=slot_css['footerRight']
+    )
+    cover_page_css = build_page_css(styles, margins='0', page_name='bb-cover')
+    book_css = f'''
+            {page_css}
+            {cover_page_css}
+            
+            {build_toc_css(toc_settings)}
+            
+            /* Book structure */
+            .bb-cover {{ page: bb-cover; }}
+            .bb-cover + .bb-cover, .bb-back-cover {{ break-before: page; }}
+            .bb-cover p {{ margin: 0; padding: 0; }}
+            .bb-cover img {{ width: 100vw; height: 100vh; object-fit: cover; display: block; }}
+            .bb-section {{ break-before: page; }}
+            .bb-document + .bb-document {{ break-before: page; }}
+            .bb-document h1 {{ bookmark-level: 2; }}
+            .bb-document h2 {{ bookmark-level: 3; }}
+            .bb-document h3 {{ bookmark-level: 4; }}
+            .bb-document h4 {{ bookmark-level: 5; }}
+            .bb-document h5 {{ bookmark-level: 6; }}
+            .bb-document h6 {{ bookmark-level: 7; }}
+    '''
+    
+    html_template = f'''
+    <html>
+    <body>
+        {"".join(body)}
+    </body>
+    </html>
+    '''
+    
+    ensure_dir(os.path.dirname(pdf_path))
+    font_config = get_font_config()
+    stylesheets = [get_shared_stylesheet(styles), CSS(string=book_css, font_config=font_config)]
+    document = HTML(
+        string=html_template, base_url=os.path.dirname(pdf_path), url_fetcher=get_fetcher().url_fetcher
+    ).render(stylesheets=stylesheets, font_config=font_config, cache=get_image_cache())
+    document.write_pdf(pdf_path)
+    return len(document.pages)
+
+
 def convert_file(
     file_path: str,
     root_dir: str = None,
@@ -509,7 +1214,12 @@ def convert_file(
     style_settings: dict = None,
     anchor_map: dict = None,
     content_settings: dict = None,
-    full_bleed: bool = False
+    full_bleed: bool = False,
+    manifest: ConversionManifest = None,
+    render_info: dict = None,
+    fetch_settings: dict = None,
+    image_settings: dict = None,
+    html_cache: HtmlStageCache = None
 ) -> tuple[str, bool, str]:
     """
     Convert a single file (MD or PDF) and return the PDF path.
@@ -526,6 +1236,13 @@ def convert_file(
         anchor_map: Dictionary mapping filenames to anchor IDs for internal linking
         content_settings: Content processing settings
         full_bleed: If True, use full-bleed mode for PDF conversion
+        manifest: Conversion manifest for content-hash caching (optional)
+        render_info: Dictionary filled with {'pages': page_count} when an
+            MD file is rendered (optional)
+        fetch_settings: Resource fetching configuration (see fetch.py); when
+            given, sets up the process fetcher with its disk cache in output_dir
+        image_settings: Image stage configuration (see images.py)
+        html_cache: HTML stage cache shared by every conversion (optional)
         
     Returns:
         Tuple of (pdf_path, was_converted, error_message)
@@ -550,11 +1267,15 @@ def convert_file(
                 return None, False, f"MD file not found: {file_path}"
             
             pdf_path = get_output_pdf_path(file_path, root_dir, output_dir)
+            if fetch_settings is not None:
+                configure_fetcher(output_dir, fetch_settings, image_settings, style_settings)
             pdf_path, was_converted = convert_markdown_to_pdf(
                 file_path, pdf_path, page_settings=page_settings, 
                 style_settings=style_settings, force=force,
                 anchor_map=anchor_map, content_settings=content_settings,
-                full_bleed=full_bleed
+                full_bleed=full_bleed, manifest=manifest,
+                render_info=render_info, image_settings=image_settings,
+                html_cache=html_cache
             )
             
             if verbose and was_converted:
@@ -570,22 +1291,72 @@ def convert_file(
         return None, False, str(e)
 
 
+def _convert_worker(task: tuple) -> tuple[str, bool, str, dict]:
+    """
+    Convert a single markdown file inside a worker process.
+    
+    Each worker process imports its own copy of WeasyPrint, so documents
+    rendered in different processes never share WeasyPrint state. Within a
+    worker, the font configuration and shared stylesheet are reused across
+    every document it converts.
+    
+    Args:
+        task: Tuple of (file_path, convert_file keyword arguments)
+    
+    Returns:
+        Tuple of (pdf_path, was_converted, error_message) from convert_file,
+        plus its render_info (page count, missing resources, rasterized SVGs,
+        dependencies)
+    """
+    file_path, kwargs = task
+    render_info = {}
+    pdf_path, was_converted, error = convert_file(file_path, render_info=render_info, **kwargs)
+    return pdf_path, was_converted, error, render_info
+
+
+def resolve_worker_count(max_workers: int, task_count: int) -> int:
+    """
+    Resolve the number of worker processes to use for a conversion batch.
+    
+    Args:
+        max_workers: Requested worker count (0 or None means one per CPU core)
+        task_count: Number of files that need converting
+    
+    Returns:
+        Number of workers, never more than task_count and never less than 1
+    
+    Raises:
+        ValueError: If max_workers is negative
+    """
+    if max_workers is not None and max_workers < 0:
+        raise ValueError(f"Worker count must be 0 or more, got {max_workers}")
+    if not max_workers:
+        max_workers = os.cpu_count() or 1
+    return max(1, min(max_workers, task_count))
+
+
 def convert_files_parallel(
     file_paths: list[str],
     root_dir: str = None,
     output_dir: str = None,
     force: bool = False,
     verbose: bool = True,
-    max_workers: int = 1,  # WeasyPrint is not thread-safe
+    max_workers: int = 1,
     page_settings: dict = None,
     style_settings: dict = None,
     anchor_map: dict = None,
-    content_settings: dict = None
+    content_settings: dict = None,
+    manifest: ConversionManifest = None,
+    page_index: PageCountIndex = None,
+    fetch_settings: dict = None,
+    image_settings: dict = None
 ) -> tuple[list[str], int, int]:
     """
-    Convert multiple files sequentially.
+    Convert multiple files, using a pool of worker processes when requested.
     
-    Note: WeasyPrint is not thread-safe, so parallel conversion is disabled.
+    WeasyPrint is not thread-safe, so parallelism uses separate processes
+    (started with the 'spawn' method) rather than threads. With max_workers=1
+    files are converted sequentially in the current process.
     
     Args:
         file_paths: List of file paths to convert
@@ -593,69 +1364,157 @@ def convert_files_parallel(
         output_dir: Output directory for PDFs
         force: Force reconversion
         verbose: Print progress
-        max_workers: Ignored (kept for API compatibility)
+        max_workers: Number of worker processes (0 uses one per CPU core)
         page_settings: Header/footer configuration for PDF conversion
         style_settings: Styling configuration for PDF conversion
         anchor_map: Dictionary mapping filenames to anchor IDs for internal linking
         content_settings: Content processing settings (e.g., details tag handling)
+        manifest: Conversion manifest (loaded from output_dir if not provided)
+        page_index: Page count index; rendered page counts are recorded in it (optional)
+        fetch_settings: Resource fetching configuration (see fetch.py)
+        image_settings: Image stage configuration (see images.py)
         
     Returns:
         Tuple of (pdf_paths, converted_count, failed_count)
+        pdf_paths follows the order of file_paths (failed files are omitted)
     """
     if root_dir is None:
         root_dir = os.getcwd()
     if output_dir is None:
         output_dir = get_default_output_dir(root_dir)
     
-    pdf_paths = []
     converted_count = 0
     failed_count = 0
     
-    # Filter to only MD files that need conversion
-    md_files = [f for f in file_paths if f.lower().endswith('.md')]
-    pdf_files = [f for f in file_paths if f.lower().endswith('.pdf')]
+    # One result slot per input so the original order is preserved
+    results = [None] * len(file_paths)
+    md_indexes = []
     
-    # Add existing PDFs directly
-    for pdf_file in pdf_files:
-        if os.path.exists(pdf_file):
-            pdf_paths.append(pdf_file)
-        else:
+    for i, file_path in enumerate(file_paths):
+        if file_path.lower().endswith('.md'):
+            md_indexes.append(i)
+        elif file_path.lower().endswith('.pdf'):
+            # Add existing PDFs directly
+            if os.path.exists(file_path):
+                results[i] = file_path
+            else:
+                if verbose:
+                    print(f"  Warning: PDF not found: {file_path}")
+                failed_count += 1
+    
+    if manifest is None:
+        manifest = ConversionManifest(output_dir)
+    
+    def report(i, pdf_path, was_converted, error, note=''):
+        nonlocal converted_count, failed_count
+        md_file = file_paths[i]
+        if error:
             if verbose:
-                print(f"  Warning: PDF not found: {pdf_file}")
+                print(f"  Failed: {os.path.relpath(md_file, root_dir)} - {error}")
             failed_count += 1
+            return
+        results[i] = pdf_path
+        if was_converted:
+            converted_count += 1
+            if verbose:
+                print(f"  Converted: {os.path.relpath(md_file, root_dir)}{note}")
+        elif verbose:
+            print(f"  Cached: {os.path.relpath(md_file, root_dir)}")
     
-    if not md_files:
-        return pdf_paths, converted_count, failed_count
-    
-    # Convert MD files sequentially (WeasyPrint is not thread-safe)
-    for i, md_file in enumerate(md_files):
-        try:
-            pdf_path, was_converted, error = convert_file(
-                md_file, root_dir, output_dir, force, False, page_settings, style_settings, anchor_map, content_settings
+    # Check the cache up front so only stale files are sent to workers
+    pending = []  # List of (index, cache_key)
+    for i in md_indexes:
+        md_file = file_paths[i]
+        cache_key = None
+        if os.path.exists(md_file):
+            pdf_path = get_output_pdf_path(md_file, root_dir, output_dir)
+            cache_key = compute_cache_key(
+                md_file, page_settings, style_settings,
+                anchor_map, content_settings, image_settings=image_settings
             )
-            if error:
-                if verbose:
-                    print(f"  Failed: {os.path.relpath(md_file, root_dir)} - {error}")
-                failed_count += 1
-            else:
-                pdf_paths.append(pdf_path)
-                if was_converted:
-                    converted_count += 1
+            if not is_conversion_needed(md_file, pdf_path, force, cache_key, manifest):
+                report(i, pdf_path, False, None)
+                continue
+        pending.append((i, cache_key))
+    
+    # Workers always convert: the cache decision was made above. They get no
+    # manifest, so the HTML stage cache is passed to them explicitly.
+    convert_kwargs = {
+        'root_dir': root_dir,
+        'output_dir': output_dir,
+        'force': True,
+        'verbose': False,
+        'page_settings': page_settings,
+        'style_settings': style_settings,
+        'anchor_map': anchor_map,
+        'content_settings': content_settings,
+        'fetch_settings': fetch_settings,
+        'image_settings': image_settings,
+        'html_cache': HtmlStageCache(output_dir)
+    }
+    
+    def record(i, cache_key, pdf_path, was_converted, error, render_info=None):
+        render_info = render_info or {}
+        pages = render_info.get('pages')
+        missing_resources = render_info.get('missing_resources')
+        if missing_resources and verbose:
+            print(f"  Warning: {os.path.relpath(file_paths[i], root_dir)} is missing "
+                  f"{len(missing_resources)} resources: {', '.join(missing_resources)}")
+        # Without the manifest entry, a file missing resources is converted
+        # again next time (missing local files are recorded as dependencies)
+        retry = any(map(is_retryable_failure, missing_resources or []))
+        if not error and cache_key is not None and not retry:
+            manifest.record(pdf_path, cache_key, render_info.get('dependencies'))
+        elif retry:
+            manifest.discard(pdf_path)
+        if not error and pages is not None and page_index is not None:
+            page_index.record(pdf_path, pages)
+        note = ''
+        if render_info.get('rasterized_svgs'):
+            note = (f" ({render_info['rasterized_svgs']} SVGs rasterized, "
+                    f"~{render_info['svg_seconds_saved']:.1f}s render time saved)")
+        report(i, pdf_path, was_converted, error, note)
+    
+    workers = resolve_worker_count(max_workers, len(pending))
+    
+    if len(pending) > 1 and workers > 1:
+        # Each worker process owns its own WeasyPrint state
+        mp_context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+            futures = [
+                executor.submit(_convert_worker, (file_paths[i], convert_kwargs))
+                for i, _ in pending
+            ]
+            for (i, cache_key), future in zip(pending, futures):
+                try:
+                    record(i, cache_key, *future.result())
+                except Exception as e:
                     if verbose:
-                        print(f"  Converted: {os.path.relpath(md_file, root_dir)}")
-                elif verbose:
-                    print(f"  Cached: {os.path.relpath(md_file, root_dir)}")
-            
-            # Force garbage collection every 10 files to prevent memory buildup
-            # This helps avoid macOS Objective-C runtime crashes with WeasyPrint
-            if was_converted and (i + 1) % 10 == 0:
-                gc.collect()
+                        print(f"  Error: {os.path.relpath(file_paths[i], root_dir)} - {e}")
+                    failed_count += 1
+    else:
+        # Convert MD files sequentially in this process
+        for n, (i, cache_key) in enumerate(pending):
+            try:
+                render_info = {}
+                pdf_path, was_converted, error = convert_file(
+                    file_paths[i], render_info=render_info, **convert_kwargs
+                )
+                record(i, cache_key, pdf_path, was_converted, error, render_info)
                 
-        except Exception as e:
-            if verbose:
-                print(f"  Error: {os.path.relpath(md_file, root_dir)} - {e}")
-            failed_count += 1
+                # Force garbage collection every 10 files to prevent memory buildup
+                # This helps avoid macOS Objective-C runtime crashes with WeasyPrint
+                if was_converted and (n + 1) % 10 == 0:
+                    gc.collect()
+            
+            except Exception as e:
+                if verbose:
+                    print(f"  Error: {os.path.relpath(file_paths[i], root_dir)} - {e}")
+                failed_count += 1
+    
+    manifest.save()
     
+    pdf_paths = [pdf_path for pdf_path in results if pdf_path]
     return pdf_paths, converted_count, failed_count
 
 
@@ -664,7 +1523,8 @@ def convert_all(
     output_dir: str = None,
     force: bool = False,
     verbose: bool = True,
-    parallel: bool = True
+    parallel: bool = True,
+    max_workers: int = 1
 ) -> tuple[int, int, int]:
     """
     Convert all markdown files in a directory tree to PDF.
@@ -675,6 +1535,7 @@ def convert_all(
         force: Force reconversion of all files
         verbose: Print progress messages
         parallel: Use parallel conversion
+        max_workers: Worker processes for parallel conversion (1 = sequential, 0 = one per CPU core)
         
     Returns:
         Tuple of (total_count, converted_count, failed_count)
@@ -684,15 +1545,18 @@ def convert_all(
     if output_dir is None:
         output_dir = get_default_output_dir(root_dir)
     
-    ignore_patterns = get_gitignore_patterns(root_dir)
-    md_files = find_markdown_files(root_dir, ignore_patterns)
+    dir_snapshot = DirectorySnapshot(output_dir)
+    md_files = find_markdown_files(root_dir, snapshot=dir_snapshot)
+    dir_snapshot.save()
+    manifest = ConversionManifest(output_dir)
     
     if verbose:
         print(f"Found {len(md_files)} markdown files.")
     
     if parallel:
         pdf_paths, converted_count, failed_count = convert_files_parallel(
-            md_files, root_dir, output_dir, force, verbose
+            md_files, root_dir, output_dir, force, verbose,
+            max_workers=max_workers, manifest=manifest
         )
         cached_count = len(pdf_paths) - converted_count
     else:
@@ -702,7 +1566,8 @@ def convert_all(
         
         for md_file in md_files:
             pdf_path, was_converted, error = convert_file(
-                md_file, root_dir, output_dir, force, verbose
+                md_file, root_dir, output_dir, force, verbose,
+                manifest=manifest
             )
             if error:
                 failed_count += 1
@@ -710,6 +1575,8 @@ def convert_all(
                 converted_count += 1
             else:
                 cached_count += 1
+        
+        manifest.save()
     
     if verbose:
         print(f"\nConversion complete:")
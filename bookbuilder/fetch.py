@@ -0,0 +1,454 @@
+"""
+Resource fetching for WeasyPrint with in-memory and on-disk caches.
+
+By default WeasyPrint reads every image and stylesheet again for each
+document, and fetches remote resources on every build. The fetcher here
+sits in front of it:
+
+- Local files are kept in an in-memory LRU (keyed by path, size and
+  mtime), so a logo shared by dozens of chapters is read once per process.
+- Remote http(s) resources also go to an on-disk cache in the output
+  directory (.bookbuilder-cache/resources/), reused across builds until
+  they are older than maxAgeHours.
+- Remote fetches use a configurable timeout. In offline mode they are not
+  attempted at all: only cached copies (of any age) are used.
+
+While a document renders, the local files it uses are collected (see
+recording_dependencies), so the conversion manifest can rebuild it when one
+of them changes, or when a missing one appears. The rasterized SVG
+diagrams it uses are collected too (see recording_rasterized_svgs), to
+report the render time they save.
+
+Decoded images are also shared across documents through one WeasyPrint
+image cache per process (get_image_cache). With imageSettings.downsample
+or rasterizeSvg, images go through the image stage (see images.py) before
+they are cached in memory.
+
+Settings come from the fetchSettings config section:
+
+    "fetchSettings": {
+        "timeout": 10,
+        "offline": false,
+        "memoryCacheMB": 64,
+        "maxAgeHours": 168
+    }
+"""
+
+import os
+import mimetypes
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+
+from .cache import ResourceCache, hash_data
+from .images import ImageProcessor, is_image_stage_enabled
+
+try:  # WeasyPrint >= 66: fetchers are URLFetcher subclasses returning responses
+    from weasyprint.urls import URLFetcher, URLFetcherResponse
+    default_url_fetcher = None
+except ImportError:  # Older releases take a function returning a dict
+    from weasyprint import default_url_fetcher
+    URLFetcher = URLFetcherResponse = None
+
+# Default fetch settings (see the fetchSettings config section)
+DEFAULT_FETCH_SETTINGS = {
+    'timeout': 10,
+    'offline': False,
+    'memoryCacheMB': 64,
+    'maxAgeHours': 168,
+}
+
+# Decoded images kept in the per-process WeasyPrint image cache
+IMAGE_CACHE_ENTRIES = 256
+
+# Fetcher shared by every document rendered in this process (see configure_fetcher)
+_FETCHER = None
+_FETCHER_CONFIG = None
+
+# WeasyPrint image cache shared by every document rendered in this process
+_IMAGE_CACHE = None
+
+
+class OfflineError(IOError):
+    """A remote resource is needed in offline mode but is not cached."""
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by the total size of its values."""
+    
+    def __init__(self, max_bytes: int):
+        """
+        Create an empty cache.
+        
+        Args:
+            max_bytes: Total size of the cached values before old ones are evicted
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key):
+        """Get a value (None on a miss), marking it as recently used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+    
+    def put(self, key, value, size: int) -> None:
+        """
+        Store a value, evicting the least recently used ones past max_bytes.
+        
+        Values larger than the whole cache are not stored.
+        """
+        if key in self._entries:
+            self.size -= self._entries.pop(key)[1]
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+
+
+class ImageCache(OrderedDict):
+    """
+    WeasyPrint image cache holding at most max_entries decoded images.
+    
+    WeasyPrint looks images up by URL with `in` and item access, and stores
+    them with item assignment; the oldest entries are dropped first. Local
+    files looked up are added to dependencies, and URLs looked up to urls,
+    while they are sets.
+    """
+    
+    def __init__(self, max_entries: int = IMAGE_CACHE_ENTRIES):
+        super().__init__()
+        self.max_entries = max_entries
+        self.dependencies = None
+        self.urls = None
+    
+    def __contains__(self, key):
+        if self.urls is not None and isinstance(key, str):
+            self.urls.add(key)
+        if self.dependencies is not None and isinstance(key, str):
+            path = _file_url_path(key)
+            if path is not None:
+                self.dependencies.add(path)
+        return super().__contains__(key)
+    
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        while len(self) > self.max_entries:
+            self.popitem(last=False)
+
+
+class ResourceFetcher:
+    """
+    Fetches resources for WeasyPrint through an LRU and an on-disk cache.
+    
+    Use url_fetcher as the url_fetcher argument of weasyprint.HTML.
+    Resources that could not be fetched are listed in failures, local
+    files are added to dependencies and URLs to urls while they are sets.
+    Images the image stage rasterized from SVGs are kept in rasterized, as
+    URL -> seconds the rasterization took.
+    """
+    
+    def __init__(
+        self,
+        output_dir: str = None,
+        fetch_settings: dict = None,
+        image_processor: ImageProcessor = None
+    ):
+        """
+        Create a fetcher.
+        
+        Args:
+            output_dir: Output directory for the on-disk cache (None keeps
+                remote resources in memory only)
+            fetch_settings: timeout, offline, memoryCacheMB, maxAgeHours
+            image_processor: Image stage applied to fetched images (optional)
+        """
+        settings = {**DEFAULT_FETCH_SETTINGS, **(fetch_settings or {})}
+        self.timeout = settings['timeout']
+        self.offline = bool(settings['offline'])
+        max_age_hours = settings['maxAgeHours']
+        self.max_age = None if max_age_hours is None else max_age_hours * 3600
+        self.memory = LRUCache(int(settings['memoryCacheMB'] * 1024 * 1024))
+        self.disk = ResourceCache(output_dir) if output_dir else None
+        self.image_processor = image_processor
+        self.failures = []
+        self.dependencies = None
+        self.urls = None
+        self.rasterized = {}
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'reads': 0, 'downloads': 0}
+        if URLFetcher is not None:
+            self.url_fetcher = _CachingURLFetcher(self)
+        else:
+            self.url_fetcher = self._fetch_dict
+    
+    def fetch(self, url: str) -> tuple[bytes, str, str]:
+        """
+        Fetch a resource.
+        
+        Args:
+            url: Absolute URL (file, http, https, data, ...)
+        
+        Returns:
+            Tuple of (body, mime_type, final_url)
+        
+        Raises:
+            OfflineError: A remote resource is not cached in offline mode
+            Exception: Whatever the underlying fetch raised (the URL is
+                added to failures first)
+        """
+        if self.urls is not None:
+            self.urls.add(url)
+        try:
+            scheme = urlsplit(url).scheme.lower()
+            if scheme == 'file':
+                return self._fetch_file(url)
+            if scheme in ('http', 'https'):
+                return self._fetch_remote(url)
+            return self._download(url)
+        except Exception:
+            self.failures.append(url)
+            raise
+    
+    def _fetch_file(self, url: str) -> tuple[bytes, str, str]:
+        """Read a local file, through the LRU."""
+        path = _file_url_path(url)
+        if self.dependencies is not None:
+            self.dependencies.add(path)
+        stat = os.stat(path)
+        key = ('file', path, stat.st_size, stat.st_mtime_ns)
+        cached = self.memory.get(key)
+        if cached is not None:
+            self.stats['memory_hits'] += 1
+            return cached
+        with open(path, 'rb') as f:
+            body = f.read()
+        self.stats['reads'] += 1
+        resource = self._process_image(url, body, mimetypes.guess_type(path)[0] or 'application/octet-stream', url)
+        self.memory.put(key, resource, len(resource[0]))
+        return resource
+    
+    def _fetch_remote(self, url: str) -> tuple[bytes, str, str]:
+        """Fetch an http(s) resource, through the LRU and the disk cache."""
+        key = ('url', url)
+        cached = self.memory.get(key)
+        if cached is not None:
+            self.stats['memory_hits'] += 1
+            return cached
+        
+        entry = None
+        if self.disk is not None:
+            # Offline builds use cached copies of any age
+            entry = self.disk.get(url, None if self.offline else self.max_age)
+        if entry is not None:
+            self.stats['disk_hits'] += 1
+            resource = (entry[0], entry[1], url)
+        elif self.offline:
+            raise OfflineError(f"Not cached (offline mode): {url}")
+        else:
+            resource = self._download(url)
+            if self.disk is not None:
+                self.disk.put(url, resource[0], resource[1])
+        resource = self._process_image(url, *resource)
+        self.memory.put(key, resource, len(resource[0]))
+        return resource
+    
+    def _process_image(self, url: str, body: bytes, mime_type: str, final_url: str) -> tuple[bytes, str, str]:
+        """Run a fetched resource through the image stage, if there is one, remembering rasterized SVGs."""
+        if self.image_processor is not None:
+            body, seconds = self.image_processor.process_timed(body, mime_type)
+            if seconds is None:
+                self.rasterized.pop(url, None)
+            else:
+                self.rasterized[url] = seconds
+        return body, mime_type, final_url
+    
+    def _download(self, url: str) -> tuple[bytes, str, str]:
+        """Fetch a resource with WeasyPrint's own fetcher."""
+        self.stats['downloads'] += 1
+        if URLFetcher is not None:
+            response = URLFetcher(timeout=self.timeout).fetch(url)
+            try:
+                body = response.read()
+            finally:
+                response.close()
+            return body, response.headers.get('Content-Type', response.content_type), response.url
+        result = default_url_fetcher(url, timeout=self.timeout)
+        if 'string' in result:
+            body = result['string']
+        else:
+            with result['file_obj'] as f:
+                body = f.read()
+        if isinstance(body, str):
+            body = body.encode(result.get('encoding') or 'utf-8')
+        return body, result.get('mime_type'), result.get('redirected_url', url)
+    
+    def _fetch_dict(self, url: str, timeout: float = None, ssl_context=None, **kwargs) -> dict:
+        """Fetch a resource in the url_fetcher format of WeasyPrint < 66."""
+        body, mime_type, final_url = self.fetch(url)
+        return {'string': body, 'mime_type': mime_type, 'redirected_url': final_url}
+
+
+def _file_url_path(url: str) -> str:
+    """Get the local path of a file: URL (None for other URLs)."""
+    parts = urlsplit(url)
+    if parts.scheme.lower() != 'file':
+        return None
+    return os.path.abspath(url2pathname(parts.path))
+
+
+def is_retryable_failure(url: str) -> bool:
+    """
+    Check whether a resource that could not be fetched may be fetched next time.
+    
+    A local file that does not exist gives the same result on every build
+    until it is created, which the recorded dependencies notice. Anything
+    else (network errors, unreadable files) is tried again.
+    
+    Args:
+        url: URL from ResourceFetcher.failures
+    
+    Returns:
+        False for local files that do not exist, True otherwise
+    """
+    path = _file_url_path(url)
+    return path is None or os.path.exists(path)
+
+
+if URLFetcher is not None:
+    class _CachingURLFetcher(URLFetcher):
+        """WeasyPrint URLFetcher that answers from a ResourceFetcher."""
+        
+        def __init__(self, resources: ResourceFetcher):
+            super().__init__(timeout=resources.timeout)
+            self.resources = resources
+        
+        def fetch(self, url, headers=None):
+            body, mime_type, final_url = self.resources.fetch(url)
+            return URLFetcherResponse(final_url, body, {'Content-Type': mime_type or 'application/octet-stream'})
+
+
+def configure_fetcher(
+    output_dir: str = None,
+    fetch_settings: dict = None,
+    image_settings: dict = None,
+    style_settings: dict = None
+) -> ResourceFetcher:
+    """
+    Set up the fetcher shared by every document rendered in this process.
+    
+    Calling it again with the same arguments keeps the current fetcher (and
+    its caches).
+    
+    Args:
+        output_dir: Output directory for the on-disk caches
+        fetch_settings: fetchSettings configuration
+        image_settings: imageSettings configuration (images are processed
+            when downsample or rasterizeSvg is on)
+        style_settings: Styling configuration (page size and margins for
+            the image stage)
+    
+    Returns:
+        The process fetcher
+    """
+    global _FETCHER, _FETCHER_CONFIG
+    image_stage = is_image_stage_enabled(image_settings)
+    config = hash_data({
+        'output_dir': output_dir and os.path.abspath(output_dir),
+        'settings': fetch_settings or {},
+        'images': [image_settings, style_settings] if image_stage else None,
+    })
+    if _FETCHER is None or config != _FETCHER_CONFIG:
+        image_processor = ImageProcessor(output_dir, image_settings, style_settings) if image_stage else None
+        _FETCHER = ResourceFetcher(output_dir, fetch_settings, image_processor)
+        _FETCHER_CONFIG = config
+    return _FETCHER
+
+
+def get_fetcher() -> ResourceFetcher:
+    """
+    Get the fetcher shared by every document rendered in this process.
+    
+    Returns:
+        The fetcher from configure_fetcher, or a default one (memory cache only)
+    """
+    if _FETCHER is None:
+        return configure_fetcher()
+    return _FETCHER
+
+
+@contextmanager
+def recording_dependencies():
+    """
+    Collect the local files used while rendering a document.
+    
+    Files are collected from the process fetcher and from image cache
+    lookups (an image decoded for an earlier document is not fetched again,
+    but is still a dependency).
+    
+    Yields:
+        Set of absolute file paths, filled while the context is active
+    """
+    fetcher = get_fetcher()
+    image_cache = get_image_cache()
+    dependencies = set()
+    fetcher.dependencies = image_cache.dependencies = dependencies
+    try:
+        yield dependencies
+    finally:
+        fetcher.dependencies = image_cache.dependencies = None
+
+
+@contextmanager
+def recording_rasterized_svgs():
+    """
+    Collect the rasterized SVG diagrams used while rendering a document.
+    
+    A diagram counts for every document that uses it, also when it comes
+    from the fetcher's memory cache or is reused decoded from the image
+    cache of an earlier document.
+    
+    Yields:
+        Dictionary of {url: seconds the rasterization took}, an estimate
+        of the render time each diagram saves; filled when the context exits
+    """
+    fetcher = get_fetcher()
+    image_cache = get_image_cache()
+    urls = set()
+    fetcher.urls = image_cache.urls = urls
+    rasterized = {}
+    try:
+        yield rasterized
+    finally:
+        fetcher.urls = image_cache.urls = None
+        rasterized.update((url, fetcher.rasterized[url]) for url in urls if url in fetcher.rasterized)
+
+
+def get_image_cache() -> ImageCache:
+    """
+    Get the WeasyPrint image cache shared by every document rendered in this process.
+    
+    Passed as the cache option when rendering, so an image used by many
+    documents is decoded once.
+    
+    Returns:
+        Image cache
+    """
+    global _IMAGE_CACHE
+    if _IMAGE_CACHE is None:
+        _IMAGE_CACHE = ImageCache()
+    return _IMAGE_CACHE
@@ -19,6 +19,7 @@ import shutil
 from enum import Enum
 from typing import Optional
 
+from .images import ImageProcessor, prepare_markdown_images
 from .utils import ensure_dir, process_details_tags
 
 
@@ -231,7 +232,8 @@ def build_book_epub(
     cover_image: str = None,
     css_file: str = None,
     toc: bool = True,
-    verbose: bool = True
+    verbose: bool = True,
+    image_processor: ImageProcessor = None
 ) -> tuple[str, bool, Optional[str]]:
     """
     Build an EPUB book from markdown files.
@@ -245,6 +247,8 @@ def build_book_epub(
         css_file: Path to CSS file for styling
         toc: Include table of contents
         verbose: Print progress messages
+        image_processor: Downsample images before they are packed (optional;
+            keeps the EPUB within store file-size limits)
         
     Returns:
         Tuple of (output_path, success, error_message)
@@ -261,6 +265,14 @@ def build_book_epub(
     # Get all directories containing source files for image resolution
     resource_paths = get_resource_paths(md_files)
     
+    if image_processor is not None:
+        # Files with downsampled images are replaced by copies pointing at them
+        md_files = prepare_markdown_images(md_files, image_processor, os.path.dirname(os.path.abspath(output_path)))
+        if verbose:
+            stats = image_processor.stats
+            print(f"  Images: {stats['processed']} downsampled, {stats['cached']} cached, "
+                  f"{stats['saved'] / 1024:.1f} KB saved")
+    
     result = convert_with_pandoc(
         md_files,
         output_path,
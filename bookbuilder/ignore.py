@@ -0,0 +1,415 @@
+"""
+Gitignore matching for file discovery.
+
+The patterns of each .gitignore file are compiled once into a single
+regular expression, instead of matching every pattern with fnmatch for
+every path. Matching follows git's rules:
+
+- `*`, `?` and `[...]` do not match `/`; `**` matches across directories
+- Patterns with a slash at the start or in the middle are anchored to the
+  directory of their .gitignore; other patterns match at any depth
+- Patterns ending in `/` match directories only
+- `!pattern` re-includes a path an earlier pattern excluded: the last
+  matching pattern wins, and a .gitignore in a subdirectory takes
+  precedence over the ones above it
+- Nothing inside an excluded directory can be re-included, so walks prune
+  excluded directories without reading them (or their .gitignore files)
+
+One matcher per root directory is shared by every search of a build (see
+get_ignore_matcher). It is built again only when a .gitignore file it
+read changes.
+
+Walks list directories with os.scandir, whose entries know their type
+without a stat call. With a directory snapshot (cache.DirectorySnapshot),
+a directory whose mtime did not change since the last build is not read
+at all.
+"""
+
+import os
+import re
+
+# Ignore file read in the root directory and in every subdirectory
+GITIGNORE_FILENAME = '.gitignore'
+
+# Matchers shared by every search in this process, by root directory
+_MATCHERS = {}
+
+
+def read_ignore_file(path: str) -> list[str]:
+    """
+    Read the patterns of an ignore file.
+    
+    Args:
+        path: Path to a .gitignore file
+    
+    Returns:
+        List of patterns (empty if the file does not exist)
+    """
+    patterns = []
+    if os.path.isfile(path):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    patterns.append(line)
+    return patterns
+
+
+def translate_pattern(pattern: str) -> tuple[str, bool, bool]:
+    """
+    Translate a gitignore pattern into a regular expression.
+    
+    Args:
+        pattern: Pattern as written in a .gitignore file
+    
+    Returns:
+        Tuple of (regex, negated, directory_only), where regex matches
+        paths relative to the .gitignore's directory (with / separators);
+        None for patterns that match nothing
+    """
+    negated = pattern.startswith('!')
+    if negated:
+        pattern = pattern[1:]
+    directory_only = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+    if not pattern:
+        return None
+    
+    # A slash at the start or in the middle anchors the pattern
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    
+    parts = [] if anchored else ['(?:.*/)?']
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**', i) and (i == 0 or pattern[i - 1] == '/'):
+            if pattern.startswith('**/', i):
+                parts.append('(?:.*/)?')
+                i += 3
+                continue
+            if i + 2 == len(pattern):
+                parts.append('.*')
+                i += 2
+                continue
+        if char == '*':
+            parts.append('[^/]*')
+        elif char == '?':
+            parts.append('[^/]')
+        elif char == '\\' and i + 1 < len(pattern):
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        elif char == '[':
+            # A ] right after [ (or [!) is part of the set, not its end
+            start = i + 1
+            negated_set = start < len(pattern) and pattern[start] in '!^'
+            if negated_set:
+                start += 1
+            end = pattern.find(']', start + 1 if pattern.startswith(']', start) else start)
+            if end == -1:
+                parts.append(re.escape(char))
+            else:
+                body = pattern[start:end].replace('[', '\\[').replace(']', '\\]')
+                if not negated_set and body.startswith('^'):
+                    body = '\\' + body
+                parts.append('[' + ('^/' if negated_set else '') + body + ']')
+                i = end
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return ''.join(parts), negated, directory_only
+
+
+def list_directory(dir_path: str, snapshot=None) -> tuple[list[str], list[str]]:
+    """
+    List a directory with os.scandir, or from a snapshot if it is unchanged.
+    
+    Symbolic links to directories are left out (walks do not follow them).
+    
+    Args:
+        dir_path: Directory to list
+        snapshot: DirectorySnapshot of earlier listings (optional)
+    
+    Returns:
+        Tuple of (dirnames, filenames)
+    
+    Raises:
+        OSError: The directory cannot be read
+    """
+    if snapshot is not None:
+        # Read before listing: a change during the listing makes the entry stale
+        mtime = os.stat(dir_path).st_mtime_ns
+        listing = snapshot.get(dir_path, mtime)
+        if listing is not None:
+            return listing
+    dirnames, filenames = [], []
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+                is_link = is_dir and entry.is_symlink()
+            except OSError:
+                continue
+            if is_link:
+                continue
+            (dirnames if is_dir else filenames).append(entry.name)
+    if snapshot is not None:
+        snapshot.record(dir_path, mtime, dirnames, filenames)
+    return dirnames, filenames
+
+
+def _file_mtime(path: str) -> int:
+    """Get a file's mtime in nanoseconds (None if it does not exist)."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _is_outside(rel_path: str) -> bool:
+    """Check whether a path relative to the root points outside it."""
+    return rel_path == '..' or rel_path.startswith('../')
+
+
+class IgnoreRules:
+    """
+    The compiled patterns of one .gitignore file.
+    
+    All patterns are joined into one regular expression, with the last
+    pattern first: the first alternative that matches is then the last
+    matching pattern, which decides (it may be a negation).
+    """
+    
+    def __init__(self, patterns: list[str], base: str = ''):
+        """
+        Compile a list of patterns.
+        
+        Args:
+            patterns: gitignore-style patterns, in file order
+            base: Directory of the .gitignore, relative to the tree root
+                (with / separators; '' for the root)
+        """
+        self.patterns = list(patterns)
+        self.base = base
+        translated = [t for t in map(translate_pattern, self.patterns) if t is not None]
+        self._file_regex, self._file_negated = self._compile([t for t in translated if not t[2]])
+        self._dir_regex, self._dir_negated = self._compile(translated)
+    
+    @staticmethod
+    def _compile(translated: list) -> tuple:
+        """Join translated patterns into one regex, last pattern first."""
+        if not translated:
+            return None, ()
+        ordered = translated[::-1]
+        regex = re.compile('|'.join(f'({t[0]})' for t in ordered), re.DOTALL)
+        return regex, tuple(t[1] for t in ordered)
+    
+    def match(self, rel_path: str, is_dir: bool) -> bool:
+        """
+        Match a path against the patterns.
+        
+        Args:
+            rel_path: Path relative to the .gitignore's directory (with /
+                separators)
+            is_dir: Whether the path is a directory
+        
+        Returns:
+            True if excluded, False if re-included by a negation, None if no
+            pattern matches
+        """
+        regex, negated = (self._dir_regex, self._dir_negated) if is_dir else (self._file_regex, self._file_negated)
+        if regex is None:
+            return None
+        match = regex.fullmatch(rel_path)
+        if match is None:
+            return None
+        return not negated[match.lastindex - 1]
+
+
+class IgnoreMatcher:
+    """
+    Decides which paths of a directory tree are ignored.
+    
+    Uses the root .gitignore (or the given patterns) and the .gitignore
+    files of subdirectories, each read the first time a path below it is
+    checked. The files read are remembered with their mtime (see is_current).
+    """
+    
+    def __init__(self, root_dir: str, patterns: list[str] = None):
+        """
+        Create a matcher for a directory tree.
+        
+        Args:
+            root_dir: Root directory of the tree
+            patterns: Patterns for the root directory (None reads its .gitignore)
+        """
+        self.root_dir = os.path.abspath(root_dir)
+        self._sources = {}
+        if patterns is None:
+            patterns = self._read(os.path.join(self.root_dir, GITIGNORE_FILENAME), track_missing=True)
+        self._rules = {'': IgnoreRules(patterns) if patterns else None}
+        self._chains = {}
+        self._excluded_dirs = {}
+    
+    def _read(self, path: str, track_missing: bool = False) -> list[str]:
+        """Read an ignore file, remembering its mtime (None when missing)."""
+        mtime = _file_mtime(path)
+        if mtime is not None or track_missing:
+            self._sources[path] = mtime
+        return read_ignore_file(path) if mtime is not None else []
+    
+    def is_current(self) -> bool:
+        """
+        Check whether the .gitignore files read so far are unchanged.
+        
+        Only files that existed are checked, plus the root .gitignore: a
+        .gitignore added to a subdirectory is picked up by the next build.
+        
+        Returns:
+            True if no file was changed, removed or (at the root) added
+        """
+        return all(_file_mtime(path) == mtime for path, mtime in self._sources.items())
+    
+    def ignore_files(self) -> dict:
+        """
+        Get the .gitignore files read so far.
+        
+        Returns:
+            Path -> mtime (st_mtime_ns; None for a missing root .gitignore)
+        """
+        return dict(self._sources)
+    
+    def relative(self, path: str) -> str:
+        """
+        Get a path relative to the root, with / separators.
+        
+        Args:
+            path: Absolute path, or path relative to the current directory
+        
+        Returns:
+            Relative path ('' for the root itself; starts with '../' outside it)
+        """
+        rel_path = os.path.relpath(os.path.abspath(path), self.root_dir)
+        if rel_path == '.':
+            return ''
+        return rel_path.replace(os.sep, '/')
+    
+    def _chain(self, rel_dir: str) -> tuple:
+        """Get the rules that apply inside a directory, nearest .gitignore first."""
+        chain = self._chains.get(rel_dir)
+        if chain is None:
+            if rel_dir == '':
+                parent_chain = ()
+            else:
+                parent_chain = self._chain(rel_dir.rpartition('/')[0])
+            if rel_dir not in self._rules:
+                patterns = self._read(os.path.join(self.root_dir, rel_dir, GITIGNORE_FILENAME))
+                self._rules[rel_dir] = IgnoreRules(patterns, rel_dir) if patterns else None
+            rules = self._rules[rel_dir]
+            chain = ((rules,) if rules is not None else ()) + parent_chain
+            self._chains[rel_dir] = chain
+        return chain
+    
+    def excludes(self, rel_path: str, is_dir: bool) -> bool:
+        """
+        Check whether the patterns exclude an entry, whose parent directory is
+        known not to be ignored (as when walking the tree top-down).
+        
+        Args:
+            rel_path: Path relative to the root (with / separators)
+            is_dir: Whether the entry is a directory
+        
+        Returns:
+            True if the entry is excluded
+        """
+        if _is_outside(rel_path):
+            return False
+        rel_dir = rel_path.rpartition('/')[0]
+        for rules in self._chain(rel_dir):
+            result = rules.match(rel_path[len(rules.base) + 1:] if rules.base else rel_path, is_dir)
+            if result is not None:
+                return result
+        return False
+    
+    def is_ignored(self, path: str, is_dir: bool = None) -> bool:
+        """
+        Check whether a path is ignored, itself or through a parent directory.
+        
+        Args:
+            path: Absolute path, or path relative to the current directory
+            is_dir: Whether the path is a directory (None checks the filesystem)
+        
+        Returns:
+            True if the path is ignored; paths outside the root never are
+        """
+        rel_path = self.relative(path)
+        if not rel_path or _is_outside(rel_path):
+            return False
+        parts = rel_path.split('/')
+        for n in range(1, len(parts)):
+            if self._is_dir_excluded('/'.join(parts[:n])):
+                return True
+        if is_dir is None:
+            is_dir = os.path.isdir(os.path.join(self.root_dir, rel_path))
+        return self.excludes(rel_path, is_dir)
+    
+    def _is_dir_excluded(self, rel_dir: str) -> bool:
+        """Check whether the patterns exclude a directory, remembering the answer."""
+        excluded = self._excluded_dirs.get(rel_dir)
+        if excluded is None:
+            excluded = self._excluded_dirs[rel_dir] = self.excludes(rel_dir, True)
+        return excluded
+    
+    def walk(self, top: str, snapshot=None):
+        """
+        Walk a directory top-down like os.walk, without ignored files and directories.
+        
+        Excluded directories are pruned: nothing below them is listed, and
+        nothing is yielded when top itself is ignored or lies inside an
+        ignored directory. Unreadable directories are skipped.
+        
+        Args:
+            top: Directory to walk (inside the root)
+            snapshot: DirectorySnapshot, to skip reading directories that
+                did not change since the last build (optional)
+        
+        Yields:
+            Tuples of (dirpath, dirnames, filenames); dirnames may be
+            modified in place to skip directories, as with os.walk
+        """
+        if self.is_ignored(top, True):
+            return
+        pending = [top]
+        while pending:
+            dirpath = pending.pop()
+            try:
+                dirnames, filenames = list_directory(dirpath, snapshot)
+            except OSError:
+                continue
+            rel_dir = self.relative(dirpath)
+            prefix = rel_dir + '/' if rel_dir else ''
+            dirnames = [d for d in dirnames if not self._is_dir_excluded(prefix + d)]
+            filenames = [f for f in filenames if not self.excludes(prefix + f, False)]
+            yield dirpath, dirnames, filenames
+            pending.extend(os.path.join(dirpath, d) for d in reversed(dirnames))
+
+
+def get_ignore_matcher(root_dir: str) -> IgnoreMatcher:
+    """
+    Get the matcher for a root directory, shared by every search of the build.
+    
+    The matcher keeps its compiled rules and the directories it already
+    decided on, so searching many folders of one project parses each
+    .gitignore once. It is built again when one of its files changed.
+    
+    Args:
+        root_dir: Root directory of the tree
+    
+    Returns:
+        Matcher reading the .gitignore files of the tree
+    """
+    root_dir = os.path.abspath(root_dir)
+    matcher = _MATCHERS.get(root_dir)
+    if matcher is None or not matcher.is_current():
+        matcher = _MATCHERS[root_dir] = IgnoreMatcher(root_dir)
+    return matcher
@@ -0,0 +1,435 @@
+"""
+Image stage: downsample and recompress images before they are rendered.
+
+Screenshots are often embedded at full resolution (4K and more), and
+WeasyPrint decodes and embeds them at that size even though a page can
+only show them at a fraction of it. With imageSettings.downsample on,
+every JPEG and PNG image is resized to fit the page's content box at the
+target DPI (the content box is pageSize minus margins), and recompressed:
+
+- JPEG images at the configured quality (progressive, optimized)
+- PNG images losslessly (optimized)
+
+An image that already fits is only replaced when recompressing makes it
+smaller. Results are cached by the image's content hash in
+.bookbuilder-cache/images/, so later builds reuse them. PDF output gets
+the processed images through the resource fetcher (see fetch.py); EPUB
+output through markdown copies that point at them.
+
+With imageSettings.rasterizeSvg on, heavy SVG diagrams (at least
+svgMinElements elements or svgMinKB in size) are rasterized to PNG at the
+target DPI, so WeasyPrint does not draw them element by element on every
+render. The PNG is wrapped in a one-element SVG with the original's
+width, height and aspect ratio, so the diagram keeps its size on the
+page. Small SVGs such as icons stay vector. Rasterized diagrams are
+cached by content hash and pixel size, together with the time the
+rasterization took. That time is an estimate of what drawing the vector
+costs on every render: each document using the diagram reports it as
+render time saved (see fetch.recording_rasterized_svgs).
+
+Settings come from the imageSettings config section:
+
+    "imageSettings": {
+        "downsample": false,
+        "dpi": 150,
+        "quality": 85,
+        "rasterizeSvg": false,
+        "svgMinElements": 1000,
+        "svgMinKB": 256
+    }
+
+Downsampling needs Pillow, which WeasyPrint already depends on; SVG
+rasterization needs CairoSVG (pip install "bookbuilder[svg]"). Without
+them images are used as they are.
+"""
+
+import io
+import os
+import re
+import time
+import base64
+import hashlib
+import mimetypes
+from pathlib import Path
+from urllib.parse import unquote
+
+from .cache import ImageStageCache, hash_data, load_json_file, save_json_file
+from .utils import css_length_to_points, css_margins_to_points, css_page_size_to_points, ensure_dir
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow comes with WeasyPrint, but the stage is optional
+    Image = ImageOps = None
+
+try:
+    import cairosvg
+except (ImportError, OSError):  # Optional dependency (also needs the cairo library)
+    cairosvg = None
+
+# Default image settings (see the imageSettings config section)
+DEFAULT_IMAGE_SETTINGS = {
+    'downsample': False,
+    'dpi': 150,
+    'quality': 85,
+    'rasterizeSvg': False,
+    'svgMinElements': 1000,
+    'svgMinKB': 256,
+}
+
+# Image types the stage processes, with their Pillow format and file extension
+PROCESSED_TYPES = {
+    'image/jpeg': ('JPEG', '.jpg'),
+    'image/png': ('PNG', '.png'),
+}
+
+# Bump when the processing changes, so cached images are made again
+IMAGE_STAGE_VERSION = 1
+
+# Subdirectory (inside the output directory) for EPUB markdown copies
+EPUB_SOURCES_DIR_NAME = '_epub-sources'
+
+# CSS pixels per inch (SVG user units are CSS pixels), and points per CSS pixel
+CSS_PX_PER_INCH = 96
+POINTS_PER_PX = 0.75
+
+# Rasterized SVG: the PNG drawn over the original's viewport
+RASTER_SVG_TEMPLATE = (
+    '<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink"{size}'
+    ' viewBox="0 0 {width:g} {height:g}" preserveAspectRatio="none">'
+    '<image x="0" y="0" width="{width:g}" height="{height:g}" preserveAspectRatio="none"'
+    ' xlink:href="data:image/png;base64,{png}"/></svg>'
+)
+
+
+def is_pillow_available() -> bool:
+    """Check if Pillow is installed."""
+    return Image is not None
+
+
+def is_cairosvg_available() -> bool:
+    """Check if CairoSVG is installed."""
+    return cairosvg is not None
+
+
+def is_image_stage_enabled(image_settings: dict = None) -> bool:
+    """Check if image settings turn on downsampling or SVG rasterization."""
+    settings = image_settings or {}
+    return bool(settings.get('downsample') or settings.get('rasterizeSvg'))
+
+
+def svg_viewport(body: bytes) -> tuple[float, float, str]:
+    """
+    Get the size an SVG image is drawn at.
+    
+    Args:
+        body: SVG document
+    
+    Returns:
+        Tuple of (width, height, size_attributes): the viewport in CSS
+        pixels (from width/height, completed from the viewBox ratio), and
+        the root element's width/height attributes to copy; None when the
+        size cannot be determined (e.g. percentages without a viewBox)
+    """
+    match = re.search(rb'<svg\b([^>]*)>', body)
+    if not match:
+        return None
+    attributes = {
+        name.decode('ascii', 'replace'): value.decode('utf-8', 'replace')
+        for name, _, value in re.findall(rb'([\w:.-]+)\s*=\s*(["\'])(.*?)\2', match.group(1), re.DOTALL)
+    }
+    
+    def length(name):
+        value = attributes.get(name, '').strip()
+        points = css_length_to_points(value, None) if value and not value.endswith('%') else None
+        return points / POINTS_PER_PX if points is not None and points > 0 else None
+    
+    width, height = length('width'), length('height')
+    view_box = [float(v) for v in re.findall(r'-?[\d.]+(?:e-?\d+)?', attributes.get('viewBox', ''))]
+    if len(view_box) == 4 and view_box[2] > 0 and view_box[3] > 0:
+        ratio = view_box[2] / view_box[3]
+        if width is None and height is None:
+            width, height = view_box[2], view_box[3]
+        elif width is None:
+            width = height * ratio
+        elif height is None:
+            height = width / ratio
+    if width is None or height is None:
+        return None
+    size = ''.join(f' {name}="{attributes[name]}"' for name in ('width', 'height') if name in attributes)
+    return width, height, size
+
+
+def image_pixel_limits(style_settings: dict = None, dpi: float = 150) -> tuple[int, int]:
+    """
+    Get the largest image size, in pixels, the page can show at a DPI.
+    
+    Args:
+        style_settings: Styling configuration (pageSize, margins)
+        dpi: Target resolution
+    
+    Returns:
+        Tuple of (width, height) of the page's content box in pixels
+    """
+    styles = style_settings or {}
+    width, height = css_page_size_to_points(styles.get('pageSize', 'A4'))
+    top, right, bottom, left = css_margins_to_points(styles.get('margins', '1in 0.8in 1in 0.8in'))
+    return (
+        max(1, round((width - left - right) / 72 * dpi)),
+        max(1, round((height - top - bottom) / 72 * dpi)),
+    )
+
+
+class ImageProcessor:
+    """
+    Downsamples and recompresses images and rasterizes heavy SVGs, with an
+    on-disk cache.
+    
+    Processed images are counted in stats (processed, cached, bytes saved),
+    rasterized SVGs in svg_stats (rasterized, and the time rasterizing them
+    took in seconds, an estimate of the render time each use saves).
+    """
+    
+    def __init__(self, output_dir: str = None, image_settings: dict = None, style_settings: dict = None):
+        """
+        Create an image processor.
+        
+        Args:
+            output_dir: Output directory for the image cache (None disables it)
+            image_settings: Image stage configuration (see DEFAULT_IMAGE_SETTINGS)
+            style_settings: Styling configuration the pixel limits come from
+        """
+        # A processor downsamples unless told not to (the config default
+        # only decides whether the build makes one)
+        settings = {**DEFAULT_IMAGE_SETTINGS, 'downsample': True, **(image_settings or {})}
+        self.downsample = bool(settings['downsample'])
+        self.rasterize_svg = bool(settings['rasterizeSvg'])
+        self.dpi = settings['dpi']
+        self.quality = int(settings['quality'])
+        self.svg_min_elements = settings['svgMinElements']
+        self.svg_min_bytes = settings['svgMinKB'] * 1024
+        self.max_size = image_pixel_limits(style_settings, self.dpi)
+        self.cache = ImageStageCache(output_dir) if output_dir else None
+        self.stats = {'processed': 0, 'cached': 0, 'saved': 0}
+        self.svg_stats = {'rasterized': 0, 'seconds_saved': 0.0}
+        # Rasterization time of the SVGs rasterized or found in the cache, by cache key
+        self._svg_seconds = {}
+    
+    @property
+    def signature(self) -> str:
+        """Hash of everything that affects the processed images."""
+        return hash_data({
+            'max_size': self.max_size,
+            'dpi': self.dpi,
+            'quality': self.quality,
+            'version': IMAGE_STAGE_VERSION,
+        })
+    
+    def process(self, body: bytes, mime_type: str) -> bytes:
+        """
+        Downsample and recompress an image, or rasterize a heavy SVG.
+        
+        Args:
+            body: Image data
+            mime_type: Content type of the image
+        
+        Returns:
+            Processed image data, or body itself when it is used as it is
+        """
+        return self._process(body, mime_type)[1]
+    
+    def process_timed(self, body: bytes, mime_type: str) -> tuple[bytes, float]:
+        """
+        Process an image like process, also getting the render time it saves.
+        
+        Args:
+            body: Image data
+            mime_type: Content type of the image
+        
+        Returns:
+            Tuple of (data, seconds): seconds is the time rasterizing the SVG
+            took, or None when the image is not a rasterized SVG
+        """
+        cache_key, data = self._process(body, mime_type)
+        return data, self._svg_seconds.get(cache_key) if data is not body else None
+    
+    def process_file(self, image_path: str) -> str:
+        """
+        Downsample and recompress an image file.
+        
+        Args:
+            image_path: Image file path
+        
+        Returns:
+            Path of the processed image in the cache, or image_path when the
+            original is used as it is
+        """
+        if self.cache is None:
+            raise ValueError("Processing image files needs an output directory for the image cache")
+        mime_type = mimetypes.guess_type(image_path)[0]
+        with open(image_path, 'rb') as f:
+            body = f.read()
+        cache_key, data = self._process(body, mime_type)
+        if data is body:
+            return image_path
+        return self.cache.path(cache_key, PROCESSED_TYPES[mime_type][1])
+    
+    def _process(self, body: bytes, mime_type: str) -> tuple[str, bytes]:
+        """Process an image, through the cache; returns (cache_key, data)."""
+        mime_type = (mime_type or '').split(';')[0].strip().lower()
+        if mime_type == 'image/svg+xml':
+            return self._process_svg(body)
+        image_type = PROCESSED_TYPES.get(mime_type)
+        if Image is None or image_type is None or not self.downsample:
+            return None, body
+        cache_key = hash_data({'image': hashlib.sha256(body).hexdigest(), 'stage': self.signature})
+        extension = image_type[1]
+        cached = self.cache.get(cache_key, extension) if self.cache is not None else None
+        if cached is not None:
+            self.stats['cached'] += 1
+            return cache_key, cached or body
+        
+        try:
+            data = self._resample(body, image_type[0])
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # Images Pillow cannot read are left for WeasyPrint to deal with
+            data = None
+        if data is not None:
+            self.stats['processed'] += 1
+            self.stats['saved'] += len(body) - len(data)
+        if self.cache is not None:
+            self.cache.put(cache_key, data or b'', extension)
+        return cache_key, data or body
+    
+    def _process_svg(self, body: bytes) -> tuple[str, bytes]:
+        """Rasterize a heavy SVG image, through the cache; returns (cache_key, data)."""
+        if not self.rasterize_svg or cairosvg is None:
+            return None, body
+        if len(body) < self.svg_min_bytes and len(re.findall(rb'<[a-zA-Z]', body)) < self.svg_min_elements:
+            return None, body  # Small SVGs (icons) stay vector
+        viewport = svg_viewport(body)
+        if viewport is None:
+            return None, body
+        width, height, size = viewport
+        
+        # Pixels at the target DPI, no larger than the page's content box
+        scale = min(self.dpi / CSS_PX_PER_INCH, self.max_size[0] / width, self.max_size[1] / height)
+        pixels = (max(1, round(width * scale)), max(1, round(height * scale)))
+        cache_key = hash_data({'image': hashlib.sha256(body).hexdigest(), 'stage': self.signature, 'pixels': pixels})
+        if self.cache is not None:
+            cached = self.cache.get(cache_key, '.svg')
+            if cached is not None:
+                self.stats['cached'] += 1
+                if cached:
+                    meta = load_json_file(self.cache.path(cache_key, '.json'), {})
+                    self._svg_seconds[cache_key] = meta.get('seconds', 0.0)
+                    self.svg_stats['rasterized'] += 1
+                    self.svg_stats['seconds_saved'] += self._svg_seconds[cache_key]
+                return cache_key, cached or body
+        
+        start = time.perf_counter()
+        try:
+            png = cairosvg.svg2png(bytestring=body, output_width=pixels[0], output_height=pixels[1])
+        except Exception:
+            # SVGs CairoSVG cannot draw are left for WeasyPrint to deal with
+            png = None
+        seconds = time.perf_counter() - start
+        data = None
+        if png is not None:
+            data = RASTER_SVG_TEMPLATE.format(
+                size=size, width=width, height=height, png=base64.b64encode(png).decode('ascii')
+            ).encode('utf-8')
+            self._svg_seconds[cache_key] = seconds
+            self.svg_stats['rasterized'] += 1
+            self.svg_stats['seconds_saved'] += seconds
+        if self.cache is not None:
+            self.cache.put(cache_key, data or b'', '.svg')
+            if data is not None:
+                save_json_file(self.cache.path(cache_key, '.json'), {'seconds': seconds, 'pixels': pixels})
+        return cache_key, data or body
+    
+    def _resample(self, body: bytes, image_format: str) -> bytes:
+        """
+        Resize an image to fit max_size and recompress it.
+        
+        Returns:
+            New image data, or None if the original should be used
+        """
+        with Image.open(io.BytesIO(body)) as original:
+            # The new file has no EXIF data: apply its orientation to the pixels
+            image = ImageOps.exif_transpose(original)
+            max_width, max_height = self.max_size
+            scale = min(max_width / image.width, max_height / image.height)
+            if scale < 1:
+                if image.mode in ('P', '1'):
+                    image = image.convert('RGBA' if image.mode == 'P' else 'L')
+                size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+                image = image.resize(size, Image.LANCZOS)
+            
+            output = io.BytesIO()
+            if image_format == 'JPEG':
+                if image.mode not in ('RGB', 'L', 'CMYK'):
+                    image = image.convert('RGB')
+                image.save(output, 'JPEG', quality=self.quality, optimize=True, progressive=True)
+            else:
+                image.save(output, 'PNG', optimize=True)
+        data = output.getvalue()
+        if scale >= 1 and len(data) >= len(body):
+            return None
+        return data
+
+
+def prepare_markdown_images(md_files: list[str], processor: ImageProcessor, output_dir: str) -> list[str]:
+    """
+    Point the images of markdown files at their processed versions.
+    
+    Used for Pandoc output, which reads the markdown files directly: each
+    file with processed images is copied to output_dir/_epub-sources with
+    its image references (markdown and <img>) replaced by absolute paths.
+    
+    Args:
+        md_files: Markdown file paths in book order
+        processor: Image processor
+        output_dir: Output directory for the markdown copies
+    
+    Returns:
+        Markdown file paths to use, in the same order
+    """
+    md_image_pattern = re.compile(r'(!\[[^\]]*\]\(\s*)(<[^>]*>|[^)\s]+)')
+    img_pattern = re.compile(r'(<img\b[^>]*?\ssrc=)(["\'])(.*?)\2', re.IGNORECASE)
+    sources_dir = os.path.join(output_dir, EPUB_SOURCES_DIR_NAME)
+    prepared = []
+    
+    for n, md_file in enumerate(md_files):
+        base_dir = os.path.dirname(os.path.abspath(md_file))
+        
+        def processed_path(url):
+            # Keep URLs with a scheme (http:, data:, ...), anchors and missing files
+            if not url or url.startswith('#') or re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*:', url):
+                return None
+            path = os.path.join(base_dir, unquote(url))
+            if not os.path.isfile(path) or mimetypes.guess_type(path)[0] not in PROCESSED_TYPES:
+                return None
+            new_path = processor.process_file(path)
+            return None if new_path == path else Path(new_path).as_posix()
+        
+        def replace_md_image(match):
+            url = match.group(2)
+            new_path = processed_path(url[1:-1] if url.startswith('<') else url)
+            return match.group(0) if new_path is None else f"{match.group(1)}<{new_path}>"
+        
+        def replace_img(match):
+            new_path = processed_path(match.group(3))
+            return match.group(0) if new_path is None else f"{match.group(1)}{match.group(2)}{new_path}{match.group(2)}"
+        
+        with open(md_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        rewritten = img_pattern.sub(replace_img, md_image_pattern.sub(replace_md_image, content))
+        if rewritten == content:
+            prepared.append(md_file)
+            continue
+        ensure_dir(sources_dir)
+        copy_path = os.path.join(sources_dir, f"{n:03d}-{os.path.basename(md_file)}")
+        with open(copy_path, 'w', encoding='utf-8') as f:
+            f.write(rewritten)
+        prepared.append(copy_path)
+    return prepared
@@ -0,0 +1,430 @@
+"""
+Incremental update of the previously built book.
+
+After each build in incremental mode, the book's page-range map (see
+cache.BookMap) records which source PDF produced which pages. On the next
+build, if every source still produces the same number of pages, the pages
+of the changed sources are replaced in place and written to the end of the
+existing book as a PDF incremental-update section, instead of merging and
+writing the whole book again. The outline and named destinations are
+rewritten too when a changed source's headings moved.
+
+The book is rebuilt from scratch instead when its layout changed (sources
+added, removed, reordered or with a different page count), when it was
+modified since it was recorded, or when the incremental sections have
+grown it by more than MAX_GROWTH of its last full build.
+"""
+
+import os
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import (
+    ArrayObject,
+    DictionaryObject,
+    Fit,
+    FloatObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    NumberObject,
+    TextStringObject,
+)
+
+from .cache import BookMap, hash_file
+from .merge import IncrementalUpdateError, append_increment, open_incremental_writer
+from .plan import ChapterEntry
+from .stamp import PageStamper
+
+# Rebuild from scratch once incremental sections add this fraction of the full build size
+MAX_GROWTH = 0.5
+
+
+def _view_to_json(values) -> list:
+    """Convert the view part of a destination array to JSON values."""
+    view = []
+    for value in values:
+        value = value.get_object() if isinstance(value, IndirectObject) else value
+        if isinstance(value, NameObject):
+            view.append(str(value))
+        elif isinstance(value, (int, float)):
+            view.append(value)
+        else:
+            view.append(None)
+    return view
+
+
+def _view_from_json(view: list) -> list:
+    """Convert JSON view values back to PDF objects."""
+    values = []
+    for value in view:
+        if isinstance(value, str):
+            values.append(NameObject(value))
+        elif isinstance(value, int):
+            values.append(NumberObject(value))
+        elif isinstance(value, float):
+            values.append(FloatObject(value))
+        else:
+            values.append(NullObject())
+    return values
+
+
+def read_structure(pdf_path: str) -> tuple[list, dict]:
+    """
+    Read the outline and named destinations of a PDF.
+    
+    Args:
+        pdf_path: PDF file path
+    
+    Returns:
+        Tuple of (outline, named_dests). Outline nodes are
+        [title, page, view, children] lists and named destinations map
+        names to [page, view]; pages are relative to the PDF (None when an
+        item points outside it).
+    """
+    reader = PdfReader(pdf_path)
+    page_numbers = {page.indirect_reference.idnum: n for n, page in enumerate(reader.pages)}
+    
+    def read_destination(dest):
+        page = dest.page
+        if not isinstance(page, IndirectObject) or page.idnum not in page_numbers:
+            return None
+        return [page_numbers[page.idnum], _view_to_json(list(dest.dest_array)[1:])]
+    
+    def read_outline(items):
+        nodes = []
+        for item in items:
+            if isinstance(item, list):
+                if nodes:
+                    nodes[-1][3].extend(read_outline(item))
+                continue
+            page, view = read_destination(item) or (None, None)
+            nodes.append([str(item.title), page, view, []])
+        return nodes
+    
+    outline = read_outline(reader.outline)
+    named_dests = {}
+    for name, dest in reader.named_destinations.items():
+        target = read_destination(dest)
+        if target is not None:
+            named_dests[str(name)] = target
+    del reader
+    return outline, named_dests
+
+
+def describe_sources(
+    front_cover: str,
+    toc_pdf: str,
+    chapter_info: list[ChapterEntry],
+    pdf_list: list[str],
+    back_cover: str,
+    page_counts: dict,
+    chapter_blocks: bool = False
+) -> list[dict]:
+    """
+    List the sources of a book in page order.
+    
+    Args:
+        front_cover: Front cover PDF (or None)
+        toc_pdf: TOC PDF
+        chapter_info: Chapter information (section, files)
+        pdf_list: Chapter PDFs in order
+        back_cover: Back cover PDF (or None)
+        page_counts: PDF path -> page count
+        chapter_blocks: True if multi-file chapters are merged as chapter
+            blocks (their bookmark then nests the outline of every file)
+    
+    Returns:
+        Source entries: path, role, chapter, section, nested, key, pages
+    """
+    entries = []
+    if front_cover:
+        entries.append({'path': front_cover, 'role': 'front'})
+    entries.append({'path': toc_pdf, 'role': 'toc'})
+    pdf_index = 0
+    for n, chapter in enumerate(chapter_info):
+        files = pdf_list[pdf_index:pdf_index + chapter.files]
+        pdf_index += chapter.files
+        for pdf in files:
+            entries.append({
+                'path': pdf,
+                'role': 'chapter',
+                'chapter': n,
+                'section': chapter.section,
+                'nested': chapter_blocks and len(files) > 1,
+            })
+    if back_cover:
+        entries.append({'path': back_cover, 'role': 'back'})
+    
+    for entry in entries:
+        entry['path'] = os.path.abspath(entry['path'])
+        entry['key'] = hash_file(entry['path'])
+        entry['pages'] = page_counts.get(entry['path'], 0)
+    return entries
+
+
+def add_structure(sources: list[dict], previous: list[dict] = None) -> None:
+    """
+    Add outline and named destinations to source entries.
+    
+    Sources whose content is unchanged since the previous map reuse the
+    recorded structure; only new or changed PDFs are read.
+    
+    Args:
+        sources: Source entries from describe_sources (updated in place)
+        previous: Source entries of the previous map (optional)
+    """
+    known = {(entry['path'], entry['key']): entry for entry in previous or []}
+    for source in sources:
+        entry = known.get((source['path'], source['key']))
+        if entry is not None and 'outline' in entry:
+            source['outline'], source['dests'] = entry['outline'], entry['dests']
+        else:
+            source['outline'], source['dests'] = read_structure(source['path'])
+
+
+def _layout(source: dict) -> tuple:
+    """Get the parts of a source entry that fix the book's page layout."""
+    return (source['path'], source['role'], source.get('chapter'),
+            source.get('section'), source.get('nested'), source['pages'])
+
+
+def _shift_outline(nodes: list, offset: int) -> list:
+    """Offset the pages of source outline nodes to book pages."""
+    return [
+        [title, None if page is None else page + offset, view, _shift_outline(children, offset)]
+        for title, page, view, children in nodes
+    ]
+
+
+def build_outline(sources: list[dict]) -> tuple[list, dict]:
+    """
+    Build the book outline and named destinations from source entries.
+    
+    Follows the merge: the chapter bookmark goes on the chapter's first page
+    and nests the outline of the file that starts it (of every file in the
+    chapter when it was merged as a chapter block); other outlines follow at
+    the top level.
+    
+    Returns:
+        Tuple of (outline nodes, named destinations) with book page numbers
+    """
+    nodes = []
+    named_dests = {}
+    chapter_node = None
+    current_chapter = None
+    start = 0
+    for source in sources:
+        outline = _shift_outline(source['outline'], start)
+        if source['role'] == 'chapter' and source['chapter'] != current_chapter:
+            current_chapter = source['chapter']
+            chapter_node = None
+        if source['role'] == 'chapter' and source['pages'] and chapter_node is None:
+            chapter_node = [source['section'], start, None, outline]
+            nodes.append(chapter_node)
+        elif source['role'] == 'chapter' and source['nested'] and chapter_node is not None:
+            chapter_node[3].extend(outline)
+        else:
+            nodes.extend(outline)
+        for name, (page, view) in source['dests'].items():
+            named_dests.setdefault(name, [page + start, view])
+        start += source['pages']
+    return nodes, named_dests
+
+
+def _point_at_book_pages(page, page_refs: dict) -> None:
+    """
+    Point a source page's references to other source pages at book pages.
+    
+    The source objects are changed in place (they are only read to be
+    cloned), so cloning them copies links, not the pages they target.
+    
+    Args:
+        page: Source page
+        page_refs: Source page object numbers -> book page references
+    """
+    seen = set()
+    pending = [page]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, DictionaryObject):
+            items = [(key, value) for key, value in obj.items() if key != '/Parent']
+        elif isinstance(obj, ArrayObject):
+            items = list(enumerate(obj))
+        else:
+            continue
+        for key, value in items:
+            if isinstance(value, IndirectObject):
+                if value.idnum in page_refs:
+                    obj[key] = page_refs[value.idnum]
+                    continue
+                value = value.get_object()
+            pending.append(value)
+
+
+def _replace_pages(writer: PdfWriter, start: int, pdf_path: str) -> None:
+    """
+    Replace book pages in place with the pages of a source PDF.
+    
+    The book's page objects keep their object numbers, so the page tree,
+    outline items, named destinations and links from other pages that
+    point at them stay valid. References to the source's own pages (links
+    within the source) are mapped to the book pages that replace them.
+    """
+    reader = PdfReader(pdf_path)
+    page_refs = {
+        page.indirect_reference.idnum: writer.pages[start + n].indirect_reference
+        for n, page in enumerate(reader.pages)
+    }
+    for n, page in enumerate(reader.pages):
+        _point_at_book_pages(page, page_refs)
+        target = writer.pages[start + n]
+        for key in list(target.keys()):
+            if key != '/Parent' and key not in page:
+                del target[key]
+        for key, value in page.items():
+            if key != '/Parent':
+                target[NameObject(key)] = value.clone(writer)
+    del reader
+
+
+def _write_outline(writer: PdfWriter, nodes: list, parent=None) -> None:
+    """Add outline nodes to a writer."""
+    for title, page, view, children in nodes:
+        fit = Fit(view[0], _view_from_json(view[1:])) if view else Fit.fit()
+        item = writer.add_outline_item(title, page, parent=parent, fit=fit)
+        _write_outline(writer, children, item)
+
+
+def _write_named_destinations(writer: PdfWriter, named_dests: dict) -> None:
+    """Replace the named destination tree of a writer."""
+    names = ArrayObject()
+    for name in sorted(named_dests):
+        page, view = named_dests[name]
+        if page < len(writer.pages):
+            view = _view_from_json(view) or [NameObject('/Fit')]
+            names.extend([
+                TextStringObject(name),
+                ArrayObject([writer.pages[page].indirect_reference] + view),
+            ])
+    root = writer.root_object
+    names_dict = root.get('/Names')
+    names_dict = DictionaryObject() if names_dict is None else DictionaryObject(names_dict.get_object())
+    if names:
+        names_dict[NameObject('/Dests')] = DictionaryObject({NameObject('/Names'): names})
+    elif '/Dests' in names_dict:
+        del names_dict['/Dests']
+    root[NameObject('/Names')] = names_dict
+
+
+def update_book(
+    book_pdf: str,
+    sources: list[dict],
+    book_map: BookMap,
+    verbose: bool = True,
+    stamper: PageStamper = None
+) -> bool:
+    """
+    Update the previously built book in place with an incremental-update section.
+    
+    Replaced pages are stamped again; when the stamped text changed (e.g.
+    the date), the stamps of every page are replaced.
+    
+    Args:
+        book_pdf: Book path (the previous build's output)
+        sources: Source entries for this build (structure is added to them)
+        book_map: Page-range map of the previous build
+        verbose: Print what was updated
+        stamper: Page stamper for the running header and footers (optional)
+    
+    Returns:
+        True if the book was updated (or already current), False if it
+        has to be built from scratch
+    """
+    previous = book_map.get_sources(book_pdf)
+    if not previous or [_layout(s) for s in previous] != [_layout(s) for s in sources]:
+        return False
+    if book_map.full_size and os.path.getsize(book_pdf) > book_map.full_size * (1 + MAX_GROWTH):
+        return False
+    stamp = stamper.signature if stamper is not None else None
+    if (book_map.stamp is None) != (stamp is None):
+        return False
+    restamp = stamp is not None and stamp != book_map.stamp
+    
+    add_structure(sources, previous)
+    changed = []
+    start = 0
+    for old, new in zip(previous, sources):
+        if old['key'] != new['key']:
+            changed.append((start, new))
+        start += new['pages']
+    if not changed and not restamp:
+        return True
+    structure_changed = any(
+        (old['outline'], old['dests']) != (new['outline'], new['dests'])
+        for old, new in zip(previous, sources)
+    )
+    
+    try:
+        writer = open_incremental_writer(book_pdf)
+    except IncrementalUpdateError:
+        return False
+    try:
+        for start, source in changed:
+            _replace_pages(writer, start, source['path'])
+        if stamper is not None:
+            ranges = []
+            start = 0
+            for source in sources:
+                ranges.append((source['path'], start, source['pages']))
+                start += source['pages']
+            if not restamp:
+                changed_paths = {source['path'] for _, source in changed}
+                ranges = [r for r in ranges if r[0] in changed_paths]
+            stamper.stamp_writer(writer, stamper.page_labels(ranges))
+        if structure_changed:
+            nodes, named_dests = build_outline(sources)
+            if '/Outlines' in writer.root_object:
+                del writer.root_object['/Outlines']
+            _write_outline(writer, nodes)
+            _write_named_destinations(writer, named_dests)
+        written = append_increment(writer, book_pdf)
+    except IncrementalUpdateError:
+        # The stamps cannot be added to the update (raised before any change is written)
+        return False
+    finally:
+        writer.close()
+    
+    if verbose:
+        pages = sum(source['pages'] for _, source in changed)
+        written_kb = written / 1024
+        print(f"Updated {len(changed)} sources ({pages} pages) in place: {written_kb:.1f} KB appended"
+              f"{', outline rewritten' if structure_changed else ''}"
+              f"{', stamps replaced' if restamp else ''}")
+    return True
+
+
+def record_book(
+    book_pdf: str,
+    sources: list[dict],
+    book_map: BookMap,
+    full_build: bool,
+    stamper: PageStamper = None
+) -> None:
+    """
+    Record the page-range map of a book that was just built or updated.
+    
+    Args:
+        book_pdf: Book path
+        sources: Source entries for this build
+        book_map: Book map to update and save
+        full_build: True if the book was written from scratch
+        stamper: Page stamper the book was stamped with (optional)
+    """
+    if 'outline' not in sources[0]:
+        add_structure(sources, book_map.data.get('sources'))
+    stamp = stamper.signature if stamper is not None else None
+    book_map.record(book_pdf, sources, full_build, stamp)
+    book_map.save()
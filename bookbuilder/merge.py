@@ -0,0 +1,801 @@
+"""
+PDF merge engines for the per-file render mode.
+
+Engines:
+- pypdf: collects every page in one pypdf PdfWriter and writes the book at
+  the end (peak memory grows with the size of the book)
+- streaming: copies each input's objects straight to the output file as
+  soon as the input is read, so peak memory is bounded by the largest
+  single input rather than by the whole book
+- pikepdf: merges with pikepdf (qpdf, native code); much faster on books
+  made of many existing PDFs. Optional: pip install "bookbuilder[optimize]"
+
+Every engine is a class with the same interface:
+- Engine(output_pdf, deduplicate): start a merged book
+- append(pdf_path, outline_title) -> pages appended
+- close(): write the book, including its outline and named destinations
+- stats: {'deduplicated_objects', 'bytes_saved'}
+- Engine.count_pages(pdf_path): page count of a PDF
+
+All engines take the inputs in book order, create one outline item per
+chapter (nesting the outline of the chapter's first file under it), import
+the outlines and named destinations of the inputs and keep internal links.
+
+With deduplication enabled (the default), objects that are byte-for-byte
+identical after merging - font files, images such as logos and footer
+artwork, and everything that only references them - are written once and
+shared by every chapter that uses them.
+"""
+
+import io
+import os
+import hashlib
+import warnings
+
+from pypdf import PdfWriter, PdfReader
+from pypdf.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    NumberObject,
+    StreamObject,
+    TextStringObject,
+)
+
+try:
+    import pikepdf
+except ImportError:  # Optional dependency
+    pikepdf = None
+
+# Merge engines selectable with mergeSettings.engine (see MERGE_BACKENDS)
+MERGE_ENGINES = ('pypdf', 'streaming', 'pikepdf')
+
+# Default merge engine
+DEFAULT_MERGE_ENGINE = 'pypdf'
+
+
+class IncrementalUpdateError(RuntimeError):
+    """Raised when the installed pypdf cannot write an incremental update or add its objects."""
+
+
+def serialized_size(obj) -> int:
+    """
+    Get the number of bytes a PDF object takes when written.
+    
+    Args:
+        obj: pypdf object
+    
+    Returns:
+        Serialized size in bytes
+    """
+    buffer = io.BytesIO()
+    obj.write_to_stream(buffer)
+    return buffer.tell()
+
+
+def reachable_objects(writer: PdfWriter) -> dict:
+    """
+    Get the indirect objects reachable from a writer's catalog.
+    
+    Args:
+        writer: pypdf writer
+    
+    Returns:
+        Dictionary mapping object numbers to objects
+    """
+    found = {}
+    pending = [writer.root_object.indirect_reference]
+    while pending:
+        obj = pending.pop()
+        if isinstance(obj, IndirectObject):
+            if obj.idnum in found:
+                continue
+            target = writer.get_object(obj.idnum)
+            if target is None:
+                continue
+            found[obj.idnum] = obj = target
+        if isinstance(obj, DictionaryObject):
+            pending.extend(obj.values())
+        elif isinstance(obj, ArrayObject):
+            pending.extend(obj)
+    return found
+
+
+def append_pdf(writer: PdfWriter, pdf_path: str, outline_title: str = None) -> int:
+    """
+    Append a PDF to a writer, parsing it only once.
+    
+    A single reader supplies both the pages and the page count, and is
+    released as soon as its pages have been copied into the writer.
+    
+    Args:
+        writer: Destination PDF writer
+        pdf_path: PDF file to append
+        outline_title: Outline item created for the first appended page (optional)
+    
+    Returns:
+        Number of pages appended
+    """
+    reader = PdfReader(pdf_path)
+    page_count = len(reader.pages)
+    writer.append(reader, outline_item=outline_title if page_count else None)
+    del reader
+    return page_count
+
+
+def open_incremental_writer(pdf_path: str) -> PdfWriter:
+    """
+    Open a PDF for an incremental update.
+    
+    Args:
+        pdf_path: PDF file to update
+    
+    Returns:
+        pypdf writer in incremental mode
+    
+    Raises:
+        IncrementalUpdateError: If the installed pypdf does not keep its
+            object table where the numbering fix below expects it (callers
+            write the whole file instead)
+    """
+    writer = PdfWriter(pdf_path, incremental=True)
+    # pypdf numbers new objects after the highest object it found in the
+    # cross-reference data, which misses the cross-reference stream of an
+    # earlier incremental update: number them after the trailer /Size instead.
+    # pypdf has no public API for this, so its object table is checked first.
+    objects = getattr(writer, '_objects', None)
+    if not isinstance(objects, list):
+        writer.close()
+        raise IncrementalUpdateError("pypdf object table not found")
+    size = int(PdfReader(pdf_path).trailer.get('/Size', 0))
+    if len(objects) < size - 1:
+        objects.extend([None] * (size - 1 - len(objects)))
+    return writer
+
+
+def add_indirect_object(writer: PdfWriter, obj) -> IndirectObject:
+    """
+    Add an object to a writer as a new indirect object.
+    
+    Args:
+        writer: pypdf writer
+        obj: pypdf object (streams must be indirect)
+    
+    Returns:
+        Reference to the added object
+    
+    Raises:
+        IncrementalUpdateError: If the installed pypdf does not have the
+            method this relies on (pypdf has no public API for it; callers
+            fall back to merging pages with the public API)
+    """
+    add_object = getattr(writer, '_add_object', None)
+    if add_object is None:
+        raise IncrementalUpdateError("pypdf cannot add indirect objects")
+    return add_object(obj)
+
+
+def append_increment(writer: PdfWriter, pdf_path: str) -> int:
+    """
+    Write the update of an incremental writer to the end of its PDF.
+    
+    Args:
+        writer: Writer from open_incremental_writer
+        pdf_path: PDF file the writer was opened on
+    
+    Returns:
+        Number of bytes appended
+    """
+    original_size = os.path.getsize(pdf_path)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    # The incremental writer repeats the original file first; append only the update
+    data = buffer.getbuffer()[original_size:]
+    if data:
+        with open(pdf_path, 'ab') as f:
+            f.write(data)
+    return len(data)
+
+
+class PypdfMerger:
+    """Merge engine that builds the whole book in one pypdf PdfWriter."""
+    
+    def __init__(self, output_pdf: str, deduplicate: bool = True):
+        """
+        Start a merged book.
+        
+        Args:
+            output_pdf: Output file path (written by close())
+            deduplicate: Collapse identical objects before writing
+        """
+        self.output_pdf = output_pdf
+        self.deduplicate = deduplicate
+        self.writer = PdfWriter()
+        self.stats = {'deduplicated_objects': 0, 'bytes_saved': 0}
+    
+    @staticmethod
+    def count_pages(pdf_path: str) -> int:
+        """Get the page count of a PDF with pypdf."""
+        reader = PdfReader(pdf_path)
+        count = len(reader.pages)
+        del reader
+        return count
+    
+    def append(self, pdf_path: str, outline_title: str = None) -> int:
+        """
+        Append every page of a PDF.
+        
+        Args:
+            pdf_path: PDF file to append
+            outline_title: Outline item pointing at the first appended page (optional)
+        
+        Returns:
+            Number of pages appended
+        """
+        return append_pdf(self.writer, pdf_path, outline_title)
+    
+    def _deduplicate(self) -> None:
+        """
+        Collapse identical objects in the writer.
+        
+        pypdf compares objects including the references they hold, so a
+        pass only merges objects whose children are already shared; passes
+        repeat until nothing changes (fonts: file, then descriptor, then font).
+        pypdf also drops objects nothing references; only the objects that
+        leave the book's reachable set are counted in the stats.
+        """
+        live = reachable_objects(self.writer)
+        while True:
+            self.writer.compress_identical_objects()
+            remaining = reachable_objects(self.writer)
+            removed = [obj for n, obj in live.items() if n not in remaining]
+            # A kept copy may have been unreferenced before the pass
+            added = [obj for n, obj in remaining.items() if n not in live]
+            if len(removed) <= len(added):
+                break
+            self.stats['deduplicated_objects'] += len(removed) - len(added)
+            self.stats['bytes_saved'] += (
+                sum(serialized_size(obj) for obj in removed) - sum(serialized_size(obj) for obj in added)
+            )
+            live = remaining
+    
+    def close(self) -> None:
+        """Write the merged book and release the writer."""
+        try:
+            if self.deduplicate:
+                self._deduplicate()
+            self.writer.write(self.output_pdf)
+        finally:
+            self.writer.close()
+
+
+class StreamingMerger:
+    """
+    Merge engine that streams each input's objects to the output file.
+    
+    Every input is read with its own PdfReader. Its pages and all objects
+    they reference are renumbered and written out immediately, then the
+    reader is dropped. Only the object offsets, the page references and the
+    (small) outline and named destination entries stay in memory until
+    close() writes the page tree, outline, catalog and cross-reference table.
+    
+    Objects are written children first, so an object's serialized form is
+    final when it is written; with deduplication, an object whose bytes
+    match one already written reuses that object instead (a digest per
+    written object is kept for this).
+    """
+    
+    def __init__(self, output_pdf: str, deduplicate: bool = True):
+        """
+        Start a merged book.
+        
+        Args:
+            output_pdf: Output file path (written incrementally)
+            deduplicate: Write identical objects only once
+        """
+        self.output_pdf = output_pdf
+        self.deduplicate = deduplicate
+        self.stats = {'deduplicated_objects': 0, 'bytes_saved': 0}
+        self._digests = {}  # sha256 of serialized object -> output reference
+        self._stream = open(output_pdf, 'wb')
+        self._stream.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+        self._offsets = [None]  # object number -> byte offset (0 is the free entry)
+        self._page_refs = []
+        self._outline = []  # [title, page_index, view, children] nodes
+        self._named_dests = {}  # name -> (page_index, view)
+        self._pages_ref = self._reserve()
+    
+    @staticmethod
+    def count_pages(pdf_path: str) -> int:
+        """Get the page count of a PDF with pypdf."""
+        return PypdfMerger.count_pages(pdf_path)
+    
+    def _reserve(self) -> IndirectObject:
+        """Allocate the next object number in the output file."""
+        self._offsets.append(None)
+        return IndirectObject(len(self._offsets) - 1, 0, None)
+    
+    def _write_object(self, ref: IndirectObject, obj) -> None:
+        """Write an indirect object at the current end of the output file."""
+        self._offsets[ref.idnum] = self._stream.tell()
+        self._stream.write(f"{ref.idnum} 0 obj\n".encode())
+        obj.write_to_stream(self._stream)
+        self._stream.write(b"\nendobj\n")
+    
+    def _write_shared(self, obj, ref: IndirectObject = None) -> IndirectObject:
+        """
+        Write an object unless an identical one was already written.
+        
+        Args:
+            obj: Object whose references are already output references
+            ref: Number the object must be written at (already referenced), or None
+        
+        Returns:
+            Reference of the written (or reused) object
+        """
+        buffer = io.BytesIO()
+        obj.write_to_stream(buffer)
+        data = buffer.getvalue()
+        digest = None
+        if self.deduplicate:
+            digest = hashlib.sha256(data).digest()
+            existing = self._digests.get(digest)
+            if existing is not None and ref is None:
+                self.stats['deduplicated_objects'] += 1
+                self.stats['bytes_saved'] += len(data)
+                return existing
+        if ref is None:
+            ref = self._reserve()
+        self._offsets[ref.idnum] = self._stream.tell()
+        self._stream.write(f"{ref.idnum} 0 obj\n".encode())
+        self._stream.write(data)
+        self._stream.write(b"\nendobj\n")
+        if digest is not None:
+            self._digests.setdefault(digest, ref)
+        return ref
+    
+    def append(self, pdf_path: str, outline_title: str = None) -> int:
+        """
+        Append every page of a PDF, writing its objects out immediately.
+        
+        Args:
+            pdf_path: PDF file to append
+            outline_title: Outline item pointing at the first appended page (optional)
+        
+        Returns:
+            Number of pages appended
+        """
+        reader = PdfReader(pdf_path)
+        pages = list(reader.pages)
+        page_offset = len(self._page_refs)
+        # Read outline and named destinations before anything is written
+        page_numbers = {
+            page.indirect_reference.idnum: page_offset + n
+            for n, page in enumerate(pages)
+        }
+        outline = self._read_outline(reader.outline, page_numbers)
+        named_dests = {}
+        for name, dest in reader.named_destinations.items():
+            target = self._read_destination(dest, page_numbers)
+            if target is not None:
+                named_dests[str(name)] = target
+        
+        # (idnum, generation) in the input -> reference in the output;
+        # None while the object's children are still being copied
+        mapping = {}
+        
+        def output_ref(ref):
+            key = (ref.idnum, ref.generation)
+            if key in mapping:
+                if mapping[key] is None:
+                    # Reference cycle: the object needs a fixed number now
+                    mapping[key] = self._reserve()
+                return mapping[key]
+            mapping[key] = None
+            obj = ref.get_object()
+            obj = NullObject() if obj is None else remap(obj)
+            mapping[key] = self._write_shared(obj, mapping[key])
+            return mapping[key]
+        
+        def remap(obj):
+            if isinstance(obj, IndirectObject):
+                return output_ref(obj) if obj.pdf is reader else obj
+            if isinstance(obj, DictionaryObject):
+                for key, value in list(obj.items()):
+                    # Stream lengths are rewritten as direct numbers on write
+                    if key == '/Length' and isinstance(obj, StreamObject):
+                        continue
+                    obj[key] = remap(value)
+            elif isinstance(obj, ArrayObject):
+                for i, value in enumerate(list(obj)):
+                    obj[i] = remap(value)
+            return obj
+        
+        # Page objects are written from reader.pages, which carries inherited
+        # attributes (resources, media box) copied down from the page tree
+        page_refs = []
+        for page in pages:
+            key = (page.indirect_reference.idnum, page.indirect_reference.generation)
+            mapping[key] = self._reserve()
+            page_refs.append(mapping[key])
+        
+        for page, page_ref in zip(pages, page_refs):
+            page[NameObject('/Parent')] = self._pages_ref
+            self._write_shared(remap(page), page_ref)
+            self._page_refs.append(page_ref)
+        
+        if pages and outline_title is not None:
+            self._outline.append([outline_title, page_offset, None, outline])
+        else:
+            self._outline.extend(outline)
+        for name, dest in named_dests.items():
+            self._named_dests.setdefault(name, dest)
+        
+        del reader, pages, mapping
+        return len(page_refs)
+    
+    def _read_destination(self, dest, page_numbers: dict):
+        """Convert an input destination to (page_index, view) in the output."""
+        page = dest.page
+        if not isinstance(page, IndirectObject) or page.idnum not in page_numbers:
+            return None
+        return page_numbers[page.idnum], ArrayObject(list(dest.dest_array)[1:])
+    
+    def _read_outline(self, items: list, page_numbers: dict) -> list:
+        """Convert an input outline (pypdf nested list form) to outline nodes."""
+        nodes = []
+        for item in items:
+            if isinstance(item, list):
+                if nodes:
+                    nodes[-1][3].extend(self._read_outline(item, page_numbers))
+                continue
+            dest = self._read_destination(item, page_numbers)
+            page_index, view = dest if dest else (None, None)
+            nodes.append([str(item.title), page_index, view, []])
+        return nodes
+    
+    def _destination_array(self, page_index: int, view) -> ArrayObject:
+        """Build an explicit destination for a page of the merged book."""
+        if view is None or not len(view):
+            view = [NameObject('/Fit')]
+        return ArrayObject([self._page_refs[page_index]] + list(view))
+    
+    def _write_outline(self, nodes: list, parent_ref: IndirectObject) -> tuple:
+        """
+        Write a level of outline items.
+        
+        Returns:
+            Tuple of (first_ref, last_ref, visible_item_count)
+        """
+        refs = [self._reserve() for _ in nodes]
+        count = len(nodes)
+        for n, ((title, page_index, view, children), ref) in enumerate(zip(nodes, refs)):
+            item = DictionaryObject({
+                NameObject('/Title'): TextStringObject(title),
+                NameObject('/Parent'): parent_ref,
+            })
+            if page_index is not None and page_index < len(self._page_refs):
+                item[NameObject('/Dest')] = self._destination_array(page_index, view)
+            if n > 0:
+                item[NameObject('/Prev')] = refs[n - 1]
+            if n < len(refs) - 1:
+                item[NameObject('/Next')] = refs[n + 1]
+            if children:
+                first, last, child_count = self._write_outline(children, ref)
+                item[NameObject('/First')] = first
+                item[NameObject('/Last')] = last
+                item[NameObject('/Count')] = NumberObject(child_count)
+                count += child_count
+            self._write_object(ref, item)
+        return refs[0], refs[-1], count
+    
+    def close(self) -> None:
+        """Write the page tree, outline, catalog and cross-reference table."""
+        try:
+            self._write_object(self._pages_ref, DictionaryObject({
+                NameObject('/Type'): NameObject('/Pages'),
+                NameObject('/Kids'): ArrayObject(self._page_refs),
+                NameObject('/Count'): NumberObject(len(self._page_refs)),
+            }))
+            catalog = DictionaryObject({
+                NameObject('/Type'): NameObject('/Catalog'),
+                NameObject('/Pages'): self._pages_ref,
+            })
+            
+            if self._outline:
+                outline_ref = self._reserve()
+                first, last, count = self._write_outline(self._outline, outline_ref)
+                self._write_object(outline_ref, DictionaryObject({
+                    NameObject('/Type'): NameObject('/Outlines'),
+                    NameObject('/First'): first,
+                    NameObject('/Last'): last,
+                    NameObject('/Count'): NumberObject(count),
+                }))
+                catalog[NameObject('/Outlines')] = outline_ref
+            
+            names = []
+            for name in sorted(self._named_dests):
+                page_index, view = self._named_dests[name]
+                if page_index < len(self._page_refs):
+                    names.extend([TextStringObject(name), self._destination_array(page_index, view)])
+            if names:
+                dests_ref = self._reserve()
+                self._write_object(dests_ref, DictionaryObject({
+                    NameObject('/Names'): ArrayObject(names),
+                }))
+                catalog[NameObject('/Names')] = DictionaryObject({NameObject('/Dests'): dests_ref})
+            
+            root_ref = self._reserve()
+            self._write_object(root_ref, catalog)
+            
+            # Objects referenced but never written (unreadable inputs) become null
+            for idnum, offset in enumerate(self._offsets):
+                if idnum and offset is None:
+                    self._write_object(IndirectObject(idnum, 0, None), NullObject())
+            
+            xref_offset = self._stream.tell()
+            self._stream.write(f"xref\n0 {len(self._offsets)}\n".encode())
+            self._stream.write(b"0000000000 65535 f \n")
+            for offset in self._offsets[1:]:
+                self._stream.write(f"{offset:010d} 00000 n \n".encode())
+            trailer = DictionaryObject({
+                NameObject('/Size'): NumberObject(len(self._offsets)),
+                NameObject('/Root'): root_ref,
+            })
+            self._stream.write(b"trailer\n")
+            trailer.write_to_stream(self._stream)
+            self._stream.write(f"\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+        finally:
+            self._stream.close()
+
+
+class PikepdfMerger:
+    """
+    Merge engine that builds the book with pikepdf (qpdf).
+    
+    Pages are copied by qpdf in native code; input files stay open until
+    close() because qpdf copies stream data lazily when the book is written.
+    Outlines and named destinations are read into the same node form as the
+    streaming engine and rebuilt against the merged pages on close().
+    """
+    
+    def __init__(self, output_pdf: str, deduplicate: bool = True):
+        """
+        Start a merged book.
+        
+        Args:
+            output_pdf: Output file path (written by close())
+            deduplicate: Collapse identical objects before writing
+        
+        Raises:
+            ImportError: If pikepdf is not installed
+        """
+        if pikepdf is None:
+            raise ImportError('The pikepdf merge engine needs pikepdf: pip install "bookbuilder[optimize]"')
+        self.output_pdf = output_pdf
+        self.deduplicate = deduplicate
+        self.stats = {'deduplicated_objects': 0, 'bytes_saved': 0}
+        self.pdf = pikepdf.Pdf.new()
+        self._sources = []
+        self._outline = []  # [title, page_index, view, children] nodes
+        self._named_dests = {}  # name -> (page_index, view)
+    
+    @staticmethod
+    def count_pages(pdf_path: str) -> int:
+        """Get the page count of a PDF with pikepdf."""
+        with pikepdf.open(pdf_path) as pdf:
+            return len(pdf.pages)
+    
+    def append(self, pdf_path: str, outline_title: str = None) -> int:
+        """
+        Append every page of a PDF.
+        
+        Args:
+            pdf_path: PDF file to append
+            outline_title: Outline item pointing at the first appended page (optional)
+        
+        Returns:
+            Number of pages appended
+        """
+        source = pikepdf.open(pdf_path)
+        page_offset = len(self.pdf.pages)
+        page_numbers = {page.objgen: page_offset + n for n, page in enumerate(source.pages)}
+        
+        named = {}
+        if '/Dests' in source.Root:
+            named.update((str(k), v) for k, v in source.Root.Dests.items())
+        if '/Names' in source.Root and '/Dests' in source.Root.Names:
+            named.update((str(k), v) for k, v in pikepdf.NameTree(source.Root.Names.Dests).items())
+        
+        def read_destination(dest):
+            if isinstance(dest, (str, pikepdf.String, pikepdf.Name)):
+                dest = named.get(str(dest).lstrip('/'))
+            if isinstance(dest, pikepdf.Dictionary):
+                dest = dest.get('/D')
+            if not isinstance(dest, pikepdf.Array) or not len(dest) or not dest[0].is_indirect:
+                return None
+            page_index = page_numbers.get(dest[0].objgen)
+            if page_index is None:
+                return None
+            return page_index, list(dest[1:])
+        
+        def read_outline(items):
+            nodes = []
+            for item in items:
+                dest = read_destination(item.destination if item.destination is not None else item.action)
+                page_index, view = dest if dest else (None, None)
+                nodes.append([str(item.title), page_index, view, read_outline(item.children)])
+            return nodes
+        
+        with source.open_outline() as outline:
+            nodes = read_outline(outline.root)
+        for name, dest in named.items():
+            target = read_destination(dest)
+            if target is not None:
+                self._named_dests.setdefault(name, target)
+        
+        with warnings.catch_warnings():
+            # Named destinations and outlines are carried over by this engine
+            warnings.filterwarnings('ignore', message='Copying pages from another Pdf')
+            self.pdf.pages.extend(source.pages)
+        self._sources.append(source)
+        page_count = len(source.pages)
+        
+        if page_count and outline_title is not None:
+            self._outline.append([outline_title, page_offset, None, nodes])
+        else:
+            self._outline.extend(nodes)
+        return page_count
+    
+    def _destination_array(self, page_index: int, view) -> "pikepdf.Array":
+        """Build an explicit destination for a page of the merged book."""
+        if not view:
+            view = [pikepdf.Name.Fit]
+        return pikepdf.Array([self.pdf.pages[page_index].obj] + list(view))
+    
+    def _outline_items(self, nodes: list) -> list:
+        """Convert outline nodes to pikepdf outline items."""
+        items = []
+        for title, page_index, view, children in nodes:
+            dest = None
+            if page_index is not None and page_index < len(self.pdf.pages):
+                dest = self._destination_array(page_index, view)
+            item = pikepdf.OutlineItem(title, dest)
+            item.children.extend(self._outline_items(children))
+            items.append(item)
+        return items
+    
+    def _deduplicate(self) -> None:
+        """
+        Collapse identical objects (fonts, images) in the merged book.
+        
+        Like the pypdf engine, objects are compared including the references
+        they hold, so passes repeat until nothing changes. Pages and the page
+        tree are never merged; duplicates are dropped on write once nothing
+        references them.
+        """
+        removed = set()
+        while True:
+            canonical = {}
+            replacements = {}
+            for obj in self.pdf.objects:
+                if obj.objgen in removed or not isinstance(obj, (pikepdf.Dictionary, pikepdf.Array, pikepdf.Stream)):
+                    continue
+                if obj.get('/Type') in (pikepdf.Name.Page, pikepdf.Name.Pages, pikepdf.Name.Catalog):
+                    continue
+                if isinstance(obj, pikepdf.Stream):
+                    data = obj.stream_dict.unparse(resolved=True) + obj.read_raw_bytes()
+                else:
+                    data = obj.unparse(resolved=True)
+                key = hashlib.sha256(data).digest()
+                if key in canonical:
+                    replacements[obj.objgen] = canonical[key]
+                    self.stats['bytes_saved'] += len(data)
+                else:
+                    canonical[key] = obj
+            if not replacements:
+                break
+            self.stats['deduplicated_objects'] += len(replacements)
+            removed.update(replacements)
+            for obj in self.pdf.objects:
+                if obj.objgen not in removed and isinstance(obj, (pikepdf.Dictionary, pikepdf.Array, pikepdf.Stream)):
+                    self._replace_references(obj, replacements)
+    
+    def _replace_references(self, obj, replacements: dict) -> None:
+        """Point references to duplicate objects at their canonical copy."""
+        if isinstance(obj, pikepdf.Array):
+            keys = range(len(obj))
+        else:
+            keys = list(obj.keys())
+        for key in keys:
+            value = obj[key]
+            if not isinstance(value, pikepdf.Object):
+                continue
+            if value.is_indirect:
+                if value.objgen in replacements:
+                    obj[key] = replacements[value.objgen]
+            elif isinstance(value, (pikepdf.Dictionary, pikepdf.Array)):
+                self._replace_references(value, replacements)
+    
+    def close(self) -> None:
+        """Write the merged book and release the input files."""
+        try:
+            if self.deduplicate:
+                self._deduplicate()
+            if self._outline:
+                with self.pdf.open_outline() as outline:
+                    outline.root.extend(self._outline_items(self._outline))
+            if self._named_dests:
+                names = pikepdf.NameTree.new(self.pdf)
+                for name in sorted(self._named_dests):
+                    page_index, view = self._named_dests[name]
+                    if page_index < len(self.pdf.pages):
+                        names[name] = self._destination_array(page_index, view)
+                self.pdf.Root.Names = pikepdf.Dictionary(Dests=names.obj)
+            # Keep stream data as it is in the inputs, like the other engines
+            # (recompression is an output optimization, see optimize.py)
+            self.pdf.save(
+                self.output_pdf,
+                compress_streams=False,
+                stream_decode_level=pikepdf.StreamDecodeLevel.none
+            )
+        finally:
+            self.pdf.close()
+            for source in self._sources:
+                source.close()
+            self._sources = []
+
+
+# Merge engine name -> engine class
+MERGE_BACKENDS = {
+    'pypdf': PypdfMerger,
+    'streaming': StreamingMerger,
+    'pikepdf': PikepdfMerger,
+}
+
+
+def count_pages(pdf_path: str, engine: str = None) -> int:
+    """
+    Get the page count of a PDF with a merge engine's PDF library.
+    
+    Args:
+        pdf_path: PDF file path
+        engine: One of MERGE_ENGINES (defaults to DEFAULT_MERGE_ENGINE)
+    
+    Returns:
+        Number of pages
+    
+    Raises:
+        ValueError: If the engine name is unknown
+    """
+    return _get_backend(engine).count_pages(pdf_path)
+
+
+def _get_backend(engine: str = None):
+    """Look up the engine class for an engine name."""
+    engine = engine or DEFAULT_MERGE_ENGINE
+    if engine not in MERGE_BACKENDS:
+        raise ValueError(f"Unsupported merge engine: {engine}. Supported: {list(MERGE_ENGINES)}")
+    return MERGE_BACKENDS[engine]
+
+
+def create_merger(output_pdf: str, engine: str = None, deduplicate: bool = True):
+    """
+    Create a merge engine writing to an output file.
+    
+    Args:
+        output_pdf: Output file path
+        engine: One of MERGE_ENGINES (defaults to DEFAULT_MERGE_ENGINE)
+        deduplicate: Collapse identical objects (fonts, images) across inputs
+    
+    Returns:
+        Merger with append(pdf_path, outline_title) and close() methods and
+        a stats dictionary (deduplicated_objects, bytes_saved)
+    
+    Raises:
+        ValueError: If the engine name is unknown
+        ImportError: If the engine's optional library is not installed
+    """
+    return _get_backend(engine)(output_pdf, deduplicate)
@@ -0,0 +1,159 @@
+"""
+Output PDF optimization for the final book.
+
+Optimizations (enabled with --optimize or outputSettings.optimize):
+- compressStreams: recompress content streams at the maximum zlib level
+- objectStreams: pack objects into compressed object streams
+- linearize: write a linearized ("fast web view") file, so viewers can show
+  page 1 before the whole file has downloaded
+
+Each optimization rewrites the book once and reports the time it took and
+the bytes it saved. Object streams and linearization need pikepdf
+(pip install "bookbuilder[optimize]"); stream recompression falls back to
+pypdf when pikepdf is not installed.
+"""
+
+import os
+import time
+
+from pypdf import PdfWriter
+
+try:
+    import pikepdf
+except ImportError:  # Optional dependency
+    pikepdf = None
+
+# Optimizations in the order they are applied
+OPTIMIZATIONS = ('compressStreams', 'objectStreams', 'linearize')
+
+# Default output settings (optimization is off unless requested)
+DEFAULT_OUTPUT_SETTINGS = {
+    'optimize': False,
+    'compressStreams': True,
+    'objectStreams': True,
+    'linearize': False,
+}
+
+# zlib level used when recompressing streams
+COMPRESSION_LEVEL = 9
+
+
+def is_pikepdf_available() -> bool:
+    """Check if pikepdf is installed."""
+    return pikepdf is not None
+
+
+def format_size(size: int) -> str:
+    """Format a byte count as KB or MB."""
+    if abs(size) >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.2f} MB"
+    return f"{size / 1024:.1f} KB"
+
+
+def _save_with_pikepdf(pdf_path: str, temp_path: str, **save_options) -> None:
+    """Open a PDF with pikepdf and save it with the given options."""
+    with pikepdf.open(pdf_path) as pdf:
+        pdf.save(temp_path, **save_options)
+
+
+def _compress_streams(pdf_path: str, temp_path: str) -> None:
+    """Recompress every stream (pikepdf) or page content stream (pypdf)."""
+    if pikepdf is not None:
+        pikepdf.settings.set_flate_compression_level(COMPRESSION_LEVEL)
+        _save_with_pikepdf(
+            pdf_path, temp_path,
+            compress_streams=True,
+            recompress_flate=True,
+            object_stream_mode=pikepdf.ObjectStreamMode.preserve
+        )
+        return
+    writer = PdfWriter(clone_from=pdf_path)
+    try:
+        for page in writer.pages:
+            page.compress_content_streams(level=COMPRESSION_LEVEL)
+        writer.write(temp_path)
+    finally:
+        writer.close()
+
+
+def _generate_object_streams(pdf_path: str, temp_path: str) -> None:
+    """Pack objects into compressed object streams."""
+    _save_with_pikepdf(
+        pdf_path, temp_path,
+        object_stream_mode=pikepdf.ObjectStreamMode.generate
+    )
+
+
+def _linearize(pdf_path: str, temp_path: str) -> None:
+    """Write a linearized file, keeping existing object streams."""
+    _save_with_pikepdf(
+        pdf_path, temp_path,
+        linearize=True,
+        object_stream_mode=pikepdf.ObjectStreamMode.preserve
+    )
+
+
+# Optimization name -> (function, needs pikepdf)
+_STEPS = {
+    'compressStreams': (_compress_streams, False),
+    'objectStreams': (_generate_object_streams, True),
+    'linearize': (_linearize, True),
+}
+
+
+def optimize_pdf(pdf_path: str, output_settings: dict = None, verbose: bool = True) -> list[dict]:
+    """
+    Apply the enabled optimizations to a PDF in place.
+    
+    Each step writes a temporary file next to the PDF and replaces it only
+    when the step succeeds, so a failed step leaves the previous result.
+    
+    Args:
+        pdf_path: PDF to optimize
+        output_settings: Output settings (see DEFAULT_OUTPUT_SETTINGS)
+        verbose: Print a line per optimization with its time and size change
+    
+    Returns:
+        List of step reports: {'name', 'seconds', 'size_before', 'size_after'}
+        (skipped steps have 'skipped' set to the reason instead)
+    """
+    settings = {**DEFAULT_OUTPUT_SETTINGS, **(output_settings or {})}
+    reports = []
+    
+    for name in OPTIMIZATIONS:
+        if not settings.get(name):
+            continue
+        step, needs_pikepdf = _STEPS[name]
+        if needs_pikepdf and pikepdf is None:
+            reports.append({'name': name, 'skipped': 'pikepdf is not installed'})
+            if verbose:
+                print(f"  {name}: skipped (pikepdf is not installed)")
+            continue
+        
+        temp_path = f"{pdf_path}.{name}.tmp"
+        size_before = os.path.getsize(pdf_path)
+        start = time.perf_counter()
+        try:
+            step(pdf_path, temp_path)
+            os.replace(temp_path, pdf_path)
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            reports.append({'name': name, 'skipped': str(e)})
+            if verbose:
+                print(f"  {name}: failed ({e})")
+            continue
+        report = {
+            'name': name,
+            'seconds': time.perf_counter() - start,
+            'size_before': size_before,
+            'size_after': os.path.getsize(pdf_path),
+        }
+        reports.append(report)
+        
+        if verbose:
+            saved = report['size_before'] - report['size_after']
+            print(f"  {name}: {report['seconds']:.2f}s, {format_size(saved)} saved "
+                  f"({format_size(report['size_before'])} -> {format_size(report['size_after'])})")
+    
+    return reports
@@ -0,0 +1,170 @@
+"""
+Book plan model - the resolved contents of an order file.
+
+Resolving an order file checks which of `ref`, `ref.md` and `ref.pdf`
+exists for every file entry and walks every folder entry. The result is a
+BookPlan: the ordered absolute files of each section, the cover candidates
+and the anchor map for internal links. Plans are cached per order file
+(see cache.BookPlanCache), so an unchanged project is not resolved again.
+
+The classes use __slots__: a plan for a book with thousands of files stays
+compact in memory.
+"""
+
+import os
+
+# Sections of the order file holding the covers instead of a chapter
+FRONT_COVER_SECTION = "Front Cover"
+BACK_COVER_SECTION = "Back Cover"
+
+
+class PlanSection:
+    """One chapter of a book plan: a section name and its files in order."""
+    
+    __slots__ = ('name', 'files')
+    
+    def __init__(self, name: str, files):
+        """
+        Create a section.
+        
+        Args:
+            name: Section name (shown in the TOC and bookmarks)
+            files: Absolute paths of the section's files (MD or PDF), in order
+        """
+        self.name = name
+        self.files = tuple(files)
+    
+    def __eq__(self, other):
+        if not isinstance(other, PlanSection):
+            return NotImplemented
+        return self.name == other.name and self.files == other.files
+    
+    def __repr__(self):
+        return f"PlanSection({self.name!r}, {len(self.files)} files)"
+
+
+class ChapterEntry:
+    """A chapter of the built book: its section name, first page and number of PDFs."""
+    
+    __slots__ = ('section', 'page', 'files')
+    
+    def __init__(self, section: str, page: int, files: int):
+        """
+        Create a chapter entry.
+        
+        Args:
+            section: Section name
+            page: First page of the chapter in the book (1-based)
+            files: Number of PDFs the chapter is made of
+        """
+        self.section = section
+        self.page = page
+        self.files = files
+    
+    def __eq__(self, other):
+        if not isinstance(other, ChapterEntry):
+            return NotImplemented
+        return (self.section, self.page, self.files) == (other.section, other.page, other.files)
+    
+    def __repr__(self):
+        return f"ChapterEntry({self.section!r}, page={self.page}, files={self.files})"
+
+
+class BookPlan:
+    """The resolved files of a book, in order."""
+    
+    __slots__ = ('sections', 'front_cover_files', 'back_cover_files', 'anchor_map')
+    
+    def __init__(
+        self,
+        sections: list[PlanSection],
+        front_cover_files=(),
+        back_cover_files=(),
+        anchor_map: dict = None
+    ):
+        """
+        Create a plan.
+        
+        Args:
+            sections: Chapters, in order
+            front_cover_files: Candidate files for the front cover
+            back_cover_files: Candidate files for the back cover
+            anchor_map: Dictionary mapping filenames to anchor IDs for internal linking
+        """
+        self.sections = list(sections)
+        self.front_cover_files = tuple(front_cover_files)
+        self.back_cover_files = tuple(back_cover_files)
+        self.anchor_map = anchor_map if anchor_map is not None else {}
+    
+    @property
+    def book_files(self) -> list[str]:
+        """Every file of the book: chapter files in order, then the covers."""
+        files = [f for section in self.sections for f in section.files]
+        return files + list(self.front_cover_files) + list(self.back_cover_files)
+    
+    @property
+    def markdown_files(self) -> list[str]:
+        """Markdown files of the chapters, in order (covers are converted separately)."""
+        return [f for section in self.sections for f in section.files if f.lower().endswith('.md')]
+    
+    def to_dict(self) -> dict:
+        """
+        Get the plan as JSON-serializable data.
+        
+        Returns:
+            Dictionary accepted by from_dict
+        """
+        return {
+            'sections': [[section.name, list(section.files)] for section in self.sections],
+            'front_cover': list(self.front_cover_files),
+            'back_cover': list(self.back_cover_files),
+            'anchor_map': self.anchor_map,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> 'BookPlan':
+        """
+        Create a plan from the data of to_dict.
+        
+        Args:
+            data: Plan data
+        
+        Returns:
+            Book plan
+        """
+        return cls(
+            [PlanSection(name, files) for name, files in data['sections']],
+            data['front_cover'],
+            data['back_cover'],
+            data['anchor_map']
+        )
+
+
+def order_reference_stamps(chapters: list[dict], root_dir: str) -> dict:
+    """
+    Get the mtimes of the directories checked when resolving an order file's references.
+    
+    A relative reference `ref` resolves to `ref`, `ref.md` or `ref.pdf`,
+    all in the directory of `root_dir/ref`; which one exists only changes
+    when that directory's entries change.
+    
+    Args:
+        chapters: Chapter configurations from the order JSON
+        root_dir: Project root directory
+    
+    Returns:
+        Directory path -> mtime (st_mtime_ns, None if it does not exist)
+    """
+    stamps = {}
+    for chapter in chapters:
+        for ref in chapter.get('files', []) + chapter.get('folders', []):
+            ref = ref.rstrip('/')
+            if not ref or os.path.isabs(ref):
+                continue
+            dir_path = os.path.dirname(os.path.abspath(os.path.join(root_dir, ref)))
+            if dir_path not in stamps:
+                try:
+                    stamps[dir_path] = os.stat(dir_path).st_mtime_ns
+                except OSError:
+                    stamps[dir_path] = None
+    return stamps
@@ -0,0 +1,468 @@
+"""
+Fast PDF page-count probe.
+
+Reads the page count straight from the /Count entry of the root page tree
+node without building a PdfReader: the file is memory-mapped, the
+cross-reference data is located through startxref (classic tables and
+cross-reference streams, following /Prev for incremental updates), and only
+the catalog and the root Pages object are parsed (from an object stream if
+that is where they live).
+
+Anything unexpected - damaged or encrypted files, unsupported filters or
+predictors - makes the probe return None, and callers fall back to a full
+parse with pypdf.
+"""
+
+import re
+import mmap
+import zlib
+
+# How far from the end of the file to look for startxref
+STARTXREF_SEARCH_SIZE = 2048
+
+# Bytes that end a PDF token
+_DELIMITERS = b'()<>[]{}/%'
+_WHITESPACE = b' \t\r\n\x0c\x00'
+
+_NUMBER = re.compile(rb'[+-]?(\d+\.?\d*|\.\d+)')
+_OBJECT_HEADER = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj\b')
+_XREF_SUBSECTION = re.compile(rb'\s*(\d+)\s+(\d+)\s*[\r\n]+')
+_XREF_ENTRY = re.compile(rb'(\d{10})\s(\d{5})\s([nf])')
+_REFERENCE = re.compile(rb'\s*(\d+)\s+(\d+)\s+R\b')
+_STRUCTURE = re.compile(rb'<<|>>|[\[\]()<]')
+_STRING_SPECIAL = re.compile(rb'[\\()]')
+_INTEGER = re.compile(rb'\d+')
+
+
+class ProbeError(ValueError):
+    """Raised when the probe cannot read a file; callers fall back to pypdf."""
+
+
+class Reference(tuple):
+    """Indirect object reference (object number, generation)."""
+
+
+def probe_page_count(pdf_path: str) -> int:
+    """
+    Read the page count of a PDF from its root page tree node.
+    
+    Args:
+        pdf_path: PDF file path
+    
+    Returns:
+        Number of pages, or None if the file cannot be probed
+    """
+    try:
+        with open(pdf_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return PdfProbe(data).page_count()
+    except (OSError, ValueError, IndexError, KeyError, TypeError, zlib.error):
+        return None
+
+
+class PdfProbe:
+    """Minimal PDF object reader for the catalog and root Pages object."""
+    
+    def __init__(self, data):
+        """
+        Start a probe over the contents of a PDF.
+        
+        Args:
+            data: File contents (bytes or a memory map)
+        """
+        self.data = data
+        # Cross-reference subsections, newest first; entries are looked up on demand
+        self.sections = []
+        self.trailer = {}
+        self._object_streams = {}
+    
+    def page_count(self) -> int:
+        """
+        Get the /Count of the root page tree node.
+        
+        Raises:
+            ProbeError: If the file cannot be probed
+        """
+        self._read_xref_chain()
+        if '/Encrypt' in self.trailer:
+            raise ProbeError("encrypted file")
+        root = self.get_object(self.trailer.get('/Root'), ('/Pages',))
+        pages = self.get_object(root.get('/Pages'), ('/Type', '/Count'))
+        count = pages.get('/Count')
+        if pages.get('/Type') not in (None, '/Pages') or not isinstance(count, int) or count < 0:
+            raise ProbeError("invalid page tree root")
+        return count
+    
+    # Cross-reference data
+    
+    def _read_xref_chain(self) -> None:
+        """Read every cross-reference section, newest first."""
+        data = self.data
+        tail_start = max(0, len(data) - STARTXREF_SEARCH_SIZE)
+        pos = data.rfind(b'startxref', tail_start)
+        if pos < 0:
+            raise ProbeError("startxref not found")
+        value, _ = self.parse(pos + len(b'startxref'))
+        offset = value
+        seen = set()
+        while isinstance(offset, int) and offset not in seen:
+            seen.add(offset)
+            trailer = self._read_xref_section(offset)
+            for key, value in trailer.items():
+                self.trailer.setdefault(key, value)
+            # Hybrid files keep compressed objects in an extra xref stream
+            if isinstance(trailer.get('/XRefStm'), int):
+                self._read_xref_section(trailer['/XRefStm'])
+            offset = trailer.get('/Prev')
+        if not self.sections:
+            raise ProbeError("empty cross-reference data")
+    
+    def _read_xref_section(self, offset: int) -> dict:
+        """Read one cross-reference table or stream and return its trailer."""
+        pos = self._skip_whitespace(offset)
+        if self.data[pos:pos + 4] == b'xref':
+            return self._read_xref_table(pos + 4)
+        return self._read_xref_stream(offset)
+    
+    def _read_xref_table(self, pos: int) -> dict:
+        """Index the subsections of a classic cross-reference table and read its trailer."""
+        data = self.data
+        while True:
+            match = _XREF_SUBSECTION.match(data, pos)
+            if not match:
+                break
+            start, count = int(match.group(1)), int(match.group(2))
+            pos = match.end()
+            if count:
+                # Entries are 20 bytes by the spec; measure in case of a nonstandard end of line
+                first = _XREF_ENTRY.match(data, pos)
+                if not first:
+                    raise ProbeError("malformed xref entry")
+                entry_size = self._skip_whitespace(first.end()) - pos
+                self.sections.append(('table', start, count, pos, entry_size))
+                pos += count * entry_size
+        pos = self._skip_whitespace(pos)
+        if data[pos:pos + 7] != b'trailer':
+            raise ProbeError("trailer not found")
+        trailer, _ = self.parse(pos + 7)
+        return trailer
+    
+    def _read_xref_stream(self, offset: int) -> dict:
+        """Read a cross-reference stream; its dictionary is the trailer."""
+        header = _OBJECT_HEADER.match(self.data, offset)
+        if not header:
+            raise ProbeError("xref stream not found")
+        stream_dict, content = self._read_stream(header.end())
+        if stream_dict.get('/Type') != '/XRef':
+            raise ProbeError("not an xref stream")
+        widths = stream_dict['/W']
+        index = stream_dict.get('/Index', [0, stream_dict['/Size']])
+        row = 0
+        for start, count in zip(index[::2], index[1::2]):
+            self.sections.append(('stream', start, count, row, content, widths))
+            row += count
+        return stream_dict
+    
+    def _lookup(self, number: int) -> tuple:
+        """
+        Find an object in the cross-reference data.
+        
+        Returns:
+            ('offset', position), ('stream', objstm_number, index), or None if
+            the object is free or missing
+        """
+        for section in self.sections:
+            kind, start, count = section[:3]
+            if not start <= number < start + count:
+                continue
+            if kind == 'table':
+                pos = section[3] + (number - start) * section[4]
+                entry = _XREF_ENTRY.match(self.data, pos)
+                if not entry:
+                    raise ProbeError("malformed xref entry")
+                return ('offset', int(entry.group(1))) if entry.group(3) == b'n' else None
+            content, widths = section[4], section[5]
+            row_size = sum(widths)
+            pos = (section[3] + number - start) * row_size
+            row = content[pos:pos + row_size]
+            if len(row) < row_size:
+                raise ProbeError("truncated xref stream")
+            fields = []
+            for width in widths:
+                fields.append(int.from_bytes(row[:width], 'big'))
+                row = row[width:]
+            # A zero-width type field defaults to type 1
+            entry_type = fields[0] if widths[0] else 1
+            if entry_type == 1:
+                return 'offset', fields[1]
+            if entry_type == 2:
+                return 'stream', fields[1], fields[2]
+            return None
+        return None
+    
+    # Objects
+    
+    def get_object(self, ref, keys: tuple = None):
+        """
+        Resolve an indirect reference to its object.
+        
+        Args:
+            ref: Reference to resolve
+            keys: For dictionaries, the only keys to parse (others are skipped)
+        
+        Raises:
+            ProbeError: If the reference cannot be resolved
+        """
+        if not isinstance(ref, Reference):
+            raise ProbeError("expected an indirect reference")
+        entry = self._lookup(ref[0])
+        if entry is None:
+            raise ProbeError(f"object {ref[0]} not in xref")
+        if entry[0] == 'offset':
+            header = _OBJECT_HEADER.match(self.data, entry[1])
+            if not header or int(header.group(1)) != ref[0]:
+                raise ProbeError(f"object {ref[0]} not at its xref offset")
+            value, _ = self.parse(header.end(), keys)
+            return value
+        return self._get_compressed_object(entry[1], entry[2], keys)
+    
+    def _get_compressed_object(self, stream_number: int, index: int, keys: tuple = None):
+        """Read an object stored in an object stream."""
+        if stream_number not in self._object_streams:
+            stream_dict, content = self._read_stream_object(stream_number)
+            if stream_dict.get('/Type') != '/ObjStm':
+                raise ProbeError("not an object stream")
+            first = stream_dict['/First']
+            # The header is /N pairs of "object_number offset"
+            numbers = _INTEGER.findall(content, 0, first)
+            offsets = [int(offset) for offset in numbers[1:2 * stream_dict['/N']:2]]
+            self._object_streams[stream_number] = (PdfProbe(content), first, offsets)
+        probe, first, offsets = self._object_streams[stream_number]
+        value, _ = probe.parse(first + offsets[index], keys)
+        return value
+    
+    def _read_stream_object(self, number: int) -> tuple[dict, bytes]:
+        """Read an uncompressed indirect stream object by number."""
+        entry = self._lookup(number)
+        if entry is None or entry[0] != 'offset':
+            raise ProbeError(f"stream object {number} not found")
+        header = _OBJECT_HEADER.match(self.data, entry[1])
+        if not header:
+            raise ProbeError(f"stream object {number} not at its xref offset")
+        return self._read_stream(header.end())
+    
+    def _read_stream(self, pos: int) -> tuple[dict, bytes]:
+        """Read a stream dictionary and its decoded content."""
+        stream_dict, pos = self.parse(pos)
+        pos = self._skip_whitespace(pos)
+        if not isinstance(stream_dict, dict) or self.data[pos:pos + 6] != b'stream':
+            raise ProbeError("stream expected")
+        pos += 6
+        if self.data[pos:pos + 2] == b'\r\n':
+            pos += 2
+        elif self.data[pos:pos + 1] in (b'\n', b'\r'):
+            pos += 1
+        length = stream_dict.get('/Length')
+        if isinstance(length, Reference):
+            length = self.get_object(length)
+        if not isinstance(length, int):
+            raise ProbeError("invalid stream length")
+        return stream_dict, decode_stream(stream_dict, bytes(self.data[pos:pos + length]))
+    
+    # Tokens
+    
+    def _skip_whitespace(self, pos: int) -> int:
+        """Skip whitespace and comments."""
+        data = self.data
+        size = len(data)
+        while pos < size:
+            char = data[pos:pos + 1]
+            if char in _WHITESPACE:
+                pos += 1
+            elif char == b'%':
+                while pos < size and data[pos:pos + 1] not in (b'\r', b'\n'):
+                    pos += 1
+            else:
+                break
+        return pos
+    
+    def _read_token(self, pos: int) -> tuple[bytes, int]:
+        """Read a regular token (keyword or number) up to the next delimiter."""
+        data = self.data
+        end = pos
+        while end < len(data):
+            char = data[end:end + 1]
+            if char in _WHITESPACE or char in _DELIMITERS:
+                break
+            end += 1
+        return bytes(data[pos:end]), end
+    
+    def parse(self, pos: int, keys: tuple = None):
+        """
+        Parse one PDF object starting at a position.
+        
+        Args:
+            pos: Start position
+            keys: For a dictionary, the only keys to parse; the values of other
+                keys (such as a page tree's /Kids array) are skipped unparsed
+        
+        Returns:
+            Tuple of (value, end_position). Dictionaries become dicts with
+            '/Name' keys, names become '/Name' strings, references become
+            Reference tuples; strings are returned raw (bytes).
+        """
+        data = self.data
+        pos = self._skip_whitespace(pos)
+        char = data[pos:pos + 1]
+        
+        if char == b'<' and data[pos + 1:pos + 2] == b'<':
+            result = {}
+            pos += 2
+            while True:
+                pos = self._skip_whitespace(pos)
+                if data[pos:pos + 2] == b'>>':
+                    return result, pos + 2
+                key, pos = self.parse(pos)
+                if not isinstance(key, str):
+                    raise ProbeError("dictionary key is not a name")
+                if keys is None or key in keys:
+                    result[key], pos = self.parse(pos)
+                else:
+                    pos = self._skip_value(pos)
+        if char == b'[':
+            result = []
+            pos += 1
+            while True:
+                pos = self._skip_whitespace(pos)
+                if data[pos:pos + 1] == b']':
+                    return result, pos + 1
+                if pos >= len(data):
+                    raise ProbeError("unterminated array")
+                value, pos = self.parse(pos)
+                result.append(value)
+        if char == b'/':
+            token, end = self._read_token(pos + 1)
+            return '/' + token.decode('latin-1'), end
+        if char == b'(':
+            return self._parse_literal_string(pos)
+        if char == b'<':
+            end = data.find(b'>', pos)
+            if end < 0:
+                raise ProbeError("unterminated hex string")
+            return bytes(data[pos + 1:end]), end + 1
+        
+        match = _NUMBER.match(data, pos)
+        if match:
+            reference = _REFERENCE.match(data, pos)
+            if reference and '.' not in match.group(0).decode('latin-1'):
+                return Reference((int(reference.group(1)), int(reference.group(2)))), reference.end()
+            text = match.group(0).decode('latin-1')
+            return (float(text) if '.' in text else int(text)), match.end()
+        
+        token, end = self._read_token(pos)
+        if token == b'true':
+            return True, end
+        if token == b'false':
+            return False, end
+        if token == b'null':
+            return None, end
+        raise ProbeError(f"unexpected token at {pos}")
+    
+    def _skip_value(self, pos: int) -> int:
+        """Skip one object without building it; returns the end position."""
+        data = self.data
+        pos = self._skip_whitespace(pos)
+        char = data[pos:pos + 1]
+        if char not in (b'[', b'<') or char == b'<' and data[pos + 1:pos + 2] != b'<':
+            _, pos = self.parse(pos)
+            return pos
+        depth = 0
+        while True:
+            match = _STRUCTURE.search(data, pos)
+            if not match:
+                raise ProbeError("unterminated object")
+            token = match.group(0)
+            if token == b'(':
+                _, pos = self._parse_literal_string(match.start())
+                continue
+            if token == b'<':
+                end = data.find(b'>', match.end())
+                if end < 0:
+                    raise ProbeError("unterminated hex string")
+                pos = end + 1
+                continue
+            pos = match.end()
+            depth += 1 if token in (b'[', b'<<') else -1
+            if depth == 0:
+                return pos
+    
+    def _parse_literal_string(self, pos: int) -> tuple[bytes, int]:
+        """Skip a literal string (balanced parentheses, backslash escapes)."""
+        data = self.data
+        depth = 0
+        start = pos
+        while True:
+            match = _STRING_SPECIAL.search(data, pos)
+            if not match:
+                raise ProbeError("unterminated string")
+            char = match.group(0)
+            pos = match.end()
+            if char == b'\\':
+                pos += 1
+            elif char == b'(':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return bytes(data[start + 1:pos - 1]), pos
+
+
+def decode_stream(stream_dict: dict, content: bytes) -> bytes:
+    """
+    Decode stream content (FlateDecode with optional PNG predictors only).
+    
+    Raises:
+        ProbeError: If the stream uses another filter or predictor
+    """
+    filters = stream_dict.get('/Filter', [])
+    params = stream_dict.get('/DecodeParms') or {}
+    if isinstance(filters, str):
+        filters, params = [filters], [params]
+    if isinstance(params, dict):
+        params = [params]
+    for n, name in enumerate(filters):
+        if name not in ('/FlateDecode', '/Fl'):
+            raise ProbeError(f"unsupported filter {name}")
+        content = zlib.decompress(content)
+        param = params[n] if n < len(params) and isinstance(params[n], dict) else {}
+        predictor = param.get('/Predictor', 1)
+        if predictor >= 10:
+            content = _undo_png_predictor(content, param.get('/Columns', 1))
+        elif predictor != 1:
+            raise ProbeError(f"unsupported predictor {predictor}")
+    return content
+
+
+def _undo_png_predictor(content: bytes, columns: int) -> bytes:
+    """Reverse PNG row predictors None, Sub and Up (one byte per pixel)."""
+    row_size = columns + 1
+    previous = bytearray(columns)
+    low_bits = int.from_bytes(b'\x7f' * columns, 'big')
+    high_bits = int.from_bytes(b'\x80' * columns, 'big')
+    output = bytearray()
+    for start in range(0, len(content) - row_size + 1, row_size):
+        kind = content[start]
+        row = bytearray(content[start + 1:start + row_size])
+        if kind == 1:
+            for i in range(1, columns):
+                row[i] = (row[i] + row[i - 1]) & 0xFF
+        elif kind == 2:
+            # Bytewise addition modulo 256 on the whole row at once
+            a = int.from_bytes(row, 'big')
+            b = int.from_bytes(previous, 'big')
+            total = ((a & low_bits) + (b & low_bits)) ^ ((a ^ b) & high_bits)
+            row = bytearray(total.to_bytes(columns, 'big'))
+        elif kind != 0:
+            raise ProbeError(f"unsupported PNG predictor {kind}")
+        output.extend(row)
+        previous = row
+    return bytes(output)
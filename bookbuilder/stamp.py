@@ -0,0 +1,393 @@
+"""
+Running header and footer stamped onto the merged book.
+
+With pageSettings.stampAtMerge, markdown chapters are rendered without
+running furniture, so a converted PDF depends only on its source and
+styling: it can be reused across books, chapter orderings and days. The
+header, footers, book-wide page numbers and the date are then drawn onto
+the book in one overlay pass after the merge:
+
+- One ReportLab overlay page is drawn for every stamped book page, sized
+  to match it, with the placeholders filled in ({page} is the page number
+  in the book, {pages} the book's page count).
+- Each overlay page becomes a form XObject that is painted over the page
+  content. Only the page dictionaries and the new streams are written, as
+  an incremental update appended to the book.
+- When the installed pypdf cannot do that, the overlay pages are merged
+  into the page content with pypdf's public page merging instead, and the
+  whole book is rewritten.
+
+The stamps use the first family of styleSettings.fontFamily, like the CSS
+furniture they replace: a family bundled in styleSettings.fontDirectory as
+TrueType files is embedded, and Helvetica, Arial, Times, Courier and the
+generic families map to the matching standard PDF fonts. Any other family
+cannot be embedded (see resolve_stamp_fonts); the build then renders the
+furniture with CSS instead.
+
+Only pages of rendered markdown chapters are stamped; covers, the TOC and
+chapters included as existing PDFs are left as they are.
+"""
+
+import io
+import os
+import datetime
+
+from pypdf import PageObject, PdfReader, PdfWriter, Transformation
+from pypdf.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    FloatObject,
+    NameObject,
+)
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from .cache import hash_data
+from .convert import (
+    DEFAULT_FONT_FAMILY,
+    DEFAULT_PAGE_SETTINGS,
+    find_font_files,
+    parse_font_filename,
+    process_placeholder
+)
+from .merge import IncrementalUpdateError, add_indirect_object, append_increment, open_incremental_writer
+from .utils import css_length_to_points, css_margins_to_points
+
+# Page settings that only affect the stamped furniture (left out of the conversion cache key)
+FURNITURE_SETTINGS = ('header', 'headerFallback', 'footerLeft', 'footerCenter', 'footerRight',
+                      'dateFormat', 'bookTitle')
+
+# Resource name of the stamp form XObject on each page
+STAMP_NAME = '/BBStamp'
+
+# Standard PDF fonts (regular, bold) standing in for CSS font families
+STANDARD_FONTS = {
+    'helvetica neue': ('Helvetica', 'Helvetica-Bold'),
+    'helvetica': ('Helvetica', 'Helvetica-Bold'),
+    'arial': ('Helvetica', 'Helvetica-Bold'),
+    'sans-serif': ('Helvetica', 'Helvetica-Bold'),
+    'times new roman': ('Times-Roman', 'Times-Bold'),
+    'times': ('Times-Roman', 'Times-Bold'),
+    'serif': ('Times-Roman', 'Times-Bold'),
+    'courier new': ('Courier', 'Courier-Bold'),
+    'courier': ('Courier', 'Courier-Bold'),
+    'monospace': ('Courier', 'Courier-Bold'),
+}
+
+# Bundled font files ReportLab can embed
+EMBEDDABLE_FONT_FORMATS = ('.ttf', '.otf')
+
+# ReportLab font names of the bundled font files registered in this process
+_REGISTERED_FONTS = {}
+
+
+def _register_font(font_path: str) -> str:
+    """Register a bundled font file with ReportLab (once per process) and return its font name."""
+    if font_path not in _REGISTERED_FONTS:
+        name = 'BB-' + os.path.splitext(os.path.basename(font_path))[0]
+        pdfmetrics.registerFont(TTFont(name, font_path))
+        _REGISTERED_FONTS[font_path] = name
+    return _REGISTERED_FONTS[font_path]
+
+
+def resolve_stamp_fonts(style_settings: dict = None) -> tuple[str, str]:
+    """
+    Map styleSettings.fontFamily to the fonts the stamps are drawn in.
+    
+    Only the first family of the stack is used, as it is the one the CSS
+    furniture asks for first.
+    
+    Args:
+        style_settings: Styling configuration (fontFamily, fontDirectory)
+    
+    Returns:
+        Tuple of (regular, bold) ReportLab font names, or None when the
+        family cannot be embedded (render the furniture with CSS then)
+    """
+    styles = style_settings or {}
+    names = [name.strip().strip('"\'') for name in styles.get('fontFamily', DEFAULT_FONT_FAMILY).split(',')]
+    family = next((name for name in names if name), '')
+    
+    bundled = {}  # weight -> font file
+    found = False
+    for font_path in find_font_files(styles.get('fontDirectory')):
+        name, weight, style = parse_font_filename(font_path)
+        if name.lower() != family.lower():
+            continue
+        found = True
+        if style == 'normal' and os.path.splitext(font_path)[1].lower() in EMBEDDABLE_FONT_FORMATS:
+            bundled.setdefault(weight, font_path)
+    if not found:
+        return STANDARD_FONTS.get(family.lower())
+    if not bundled:
+        return None
+    regular = bundled[min(bundled, key=lambda weight: abs(weight - 400))]
+    bold = bundled[min(bundled, key=lambda weight: abs(weight - 700))]
+    try:
+        return _register_font(regular), _register_font(bold)
+    except Exception:
+        # e.g. OpenType files with CFF outlines, which ReportLab cannot embed
+        return None
+
+
+class PageStamper:
+    """
+    Draws the running header and footers onto the pages of a merged book.
+    
+    Rendered chapter PDFs are registered with add_document; their pages
+    are stamped with the document's title and filename.
+    """
+    
+    def __init__(self, page_settings: dict = None, style_settings: dict = None, date: datetime.date = None):
+        """
+        Initialize the stamper.
+        
+        Args:
+            page_settings: Header/footer configuration (placeholders as in convert)
+            style_settings: Styling configuration (margins, headerFontSize,
+                footerFontSize, fontFamily, fontDirectory)
+            date: Date for the {date} placeholder (default: today)
+        
+        Raises:
+            ValueError: If the font family cannot be embedded (see resolve_stamp_fonts)
+        """
+        self.settings = {**DEFAULT_PAGE_SETTINGS, **(page_settings or {})}
+        styles = style_settings or {}
+        self.fonts = resolve_stamp_fonts(styles)
+        if self.fonts is None:
+            raise ValueError(f"Cannot embed the font family for stamping: {styles.get('fontFamily')}")
+        self.margins = css_margins_to_points(styles.get('margins', '1in 0.8in 1in 0.8in'))
+        self.header_size = css_length_to_points(styles.get('headerFontSize', '14px'), 10.5)
+        self.footer_size = css_length_to_points(styles.get('footerFontSize', '10px'), 7.5)
+        self.date = (date or datetime.date.today()).strftime(self.settings.get('dateFormat', '%B %d, %Y'))
+        self.documents = {}
+    
+    def add_document(self, pdf_path: str, title: str = None, filename: str = None) -> None:
+        """
+        Register a rendered chapter PDF whose pages are stamped.
+        
+        Args:
+            pdf_path: Converted PDF path
+            title: Document title for {title} (default: headerFallback)
+            filename: Source filename for {filename}
+        """
+        self.documents[os.path.abspath(pdf_path)] = {
+            'title': title or self.settings.get('headerFallback', 'Document'),
+            'filename': filename or '',
+        }
+    
+    @property
+    def signature(self) -> str:
+        """Hash of everything that affects the stamps apart from page numbers."""
+        return hash_data({
+            'settings': {key: self.settings.get(key) for key in FURNITURE_SETTINGS},
+            'margins': self.margins,
+            'sizes': (self.header_size, self.footer_size),
+            'fonts': self.fonts,
+            'date': self.date,
+            'documents': self.documents,
+        })
+    
+    def page_labels(self, ranges: list[tuple[str, int, int]]) -> dict:
+        """
+        Map book pages to the documents they come from.
+        
+        Args:
+            ranges: (pdf_path, first_page, page_count) for each merged PDF,
+                with 0-based book page numbers
+        
+        Returns:
+            Dictionary mapping 0-based book page numbers to document contexts
+        """
+        labels = {}
+        for pdf_path, first_page, page_count in ranges:
+            document = self.documents.get(os.path.abspath(pdf_path))
+            if document is not None:
+                labels.update((first_page + n, document) for n in range(page_count))
+        return labels
+    
+    def _text(self, slot: str, document: dict, page: int, pages: int) -> str:
+        """Fill in the placeholders of one header/footer slot."""
+        context = {**document, 'date': self.date, 'bookTitle': self.settings.get('bookTitle', '')}
+        text = process_placeholder(self.settings.get(slot, ''), context)
+        return text.replace('{pages}', str(pages)).replace('{page}', str(page))
+    
+    def _draw_overlay(self, pages: list[tuple[int, dict, float, float]], total_pages: int) -> PdfReader:
+        """
+        Draw one overlay page per stamped page.
+        
+        Args:
+            pages: (book_page, document, width, height) tuples
+            total_pages: Page count of the book
+        
+        Returns:
+            Reader over the overlay PDF
+        """
+        top, right, bottom, left = self.margins
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer)
+        for book_page, document, width, height in pages:
+            c.setPageSize((width, height))
+            # Margin boxes center their text vertically in the margin
+            c.setFont(self.fonts[1], self.header_size)
+            header_y = height - top / 2 - self.header_size * 0.35
+            c.drawCentredString(width / 2, header_y, self._text('header', document, book_page + 1, total_pages))
+            c.setFont(self.fonts[0], self.footer_size)
+            footer_y = bottom / 2 - self.footer_size * 0.35
+            c.drawString(left, footer_y, self._text('footerLeft', document, book_page + 1, total_pages))
+            c.drawCentredString(width / 2, footer_y, self._text('footerCenter', document, book_page + 1, total_pages))
+            c.drawRightString(width - right, footer_y,
+                              self._text('footerRight', document, book_page + 1, total_pages))
+            c.showPage()
+        c.save()
+        buffer.seek(0)
+        return PdfReader(buffer)
+    
+    def _draw_stamps(self, writer: PdfWriter, labels: dict) -> list[tuple[PageObject, PageObject]]:
+        """
+        Draw the overlay of every labelled page of a writer.
+        
+        Args:
+            writer: Writer holding the book
+            labels: 0-based book page numbers -> document contexts (see page_labels)
+        
+        Returns:
+            (book page, overlay page) pairs
+        """
+        pages = []
+        for book_page in sorted(labels):
+            box = writer.pages[book_page].mediabox
+            pages.append((book_page, labels[book_page], float(box.width), float(box.height)))
+        overlay = self._draw_overlay(pages, len(writer.pages))
+        return [(writer.pages[book_page], overlay_page) for (book_page, _, _, _), overlay_page in zip(pages, overlay.pages)]
+    
+    @staticmethod
+    def _form_fields(writer: PdfWriter, page: PageObject, overlay_page: PageObject) -> dict:
+        """Get the dictionary entries that turn an overlay page's content into the page's stamp form."""
+        box = page.mediabox
+        return {
+            NameObject('/Type'): NameObject('/XObject'),
+            NameObject('/Subtype'): NameObject('/Form'),
+            NameObject('/BBox'): ArrayObject([FloatObject(0), FloatObject(0),
+                                              FloatObject(box.width), FloatObject(box.height)]),
+            NameObject('/Matrix'): ArrayObject([FloatObject(v) for v in (1, 0, 0, 1, box.left, box.bottom)]),
+            NameObject('/Resources'): overlay_page['/Resources'].clone(writer),
+        }
+    
+    def stamp_writer(self, writer: PdfWriter, labels: dict) -> int:
+        """
+        Stamp pages of a writer in place.
+        
+        A page that was stamped before gets its stamp replaced; other pages
+        get their content wrapped in q/Q and the stamp painted after it.
+        
+        Args:
+            writer: Writer holding the book
+            labels: 0-based book page numbers -> document contexts (see page_labels)
+        
+        Returns:
+            Number of pages stamped
+        
+        Raises:
+            IncrementalUpdateError: If this pypdf cannot add the stamp
+                objects (raised before any page is changed)
+        """
+        if not labels:
+            return 0
+        stamps = self._draw_stamps(writer, labels)
+        save_state = add_indirect_object(writer, self._stream(b"q\n"))
+        paint_stamp = add_indirect_object(writer, self._stream(f"Q\nq {STAMP_NAME} Do Q\n".encode()))
+        for page, overlay_page in stamps:
+            form = self._stream(overlay_page.get_contents().get_data())
+            form.update(self._form_fields(writer, page, overlay_page))
+            
+            # Page resources may be shared (inherited or deduplicated): give the page its own copy
+            resources = DictionaryObject(page.get('/Resources', DictionaryObject()).get_object())
+            xobjects = DictionaryObject(resources.get('/XObject', DictionaryObject()).get_object())
+            stamped = STAMP_NAME in xobjects
+            xobjects[NameObject(STAMP_NAME)] = add_indirect_object(writer, form)
+            resources[NameObject('/XObject')] = xobjects
+            page[NameObject('/Resources')] = resources
+            
+            if not stamped:
+                contents = page.get('/Contents')
+                if contents is None:
+                    streams = []
+                elif isinstance(contents.get_object(), ArrayObject):
+                    streams = list(contents.get_object())
+                else:
+                    streams = [contents]
+                page[NameObject('/Contents')] = ArrayObject([save_state] + streams + [paint_stamp])
+        return len(stamps)
+    
+    def merge_stamps(self, writer: PdfWriter, labels: dict) -> int:
+        """
+        Stamp pages of a writer in place with pypdf's public page merging.
+        
+        Used when stamp_writer cannot add its objects. A page that was
+        stamped before gets its stamp form rewritten; other pages get the
+        overlay merged into their content.
+        
+        Args:
+            writer: Writer holding the book
+            labels: 0-based book page numbers -> document contexts (see page_labels)
+        
+        Returns:
+            Number of pages stamped
+        """
+        if not labels:
+            return 0
+        stamps = self._draw_stamps(writer, labels)
+        for page, overlay_page in stamps:
+            resources = page.get('/Resources')
+            xobjects = resources.get_object().get('/XObject') if resources is not None else None
+            form = xobjects.get_object().get(STAMP_NAME) if xobjects is not None else None
+            if form is not None:
+                form = form.get_object()
+                form.set_data(overlay_page.get_contents().get_data())
+                form.update(self._form_fields(writer, page, overlay_page))
+            else:
+                box = page.mediabox
+                page.merge_transformed_page(overlay_page, Transformation().translate(box.left, box.bottom), over=True)
+        return len(stamps)
+    
+    def stamp_file(self, pdf_path: str, labels: dict) -> int:
+        """
+        Stamp pages of a PDF, appending the change as an incremental update.
+        
+        Args:
+            pdf_path: Book path
+            labels: 0-based book page numbers -> document contexts (see page_labels)
+        
+        Returns:
+            Number of pages stamped
+        """
+        if not labels:
+            return 0
+        try:
+            writer = open_incremental_writer(pdf_path)
+            try:
+                count = self.stamp_writer(writer, labels)
+                append_increment(writer, pdf_path)
+            finally:
+                writer.close()
+            return count
+        except IncrementalUpdateError:
+            # This pypdf cannot write the incremental update: merge the
+            # stamps with its public API and rewrite the file
+            writer = PdfWriter(clone_from=pdf_path)
+            try:
+                count = self.merge_stamps(writer, labels)
+                writer.write(pdf_path)
+            finally:
+                writer.close()
+            return count
+    
+    @staticmethod
+    def _stream(data: bytes) -> DecodedStreamObject:
+        """Create a Flate-compressed stream."""
+        stream = DecodedStreamObject()
+        stream.set_data(data)
+        return stream.flate_encode()
@@ -8,10 +8,13 @@ All paths are provided by the user - no hardcoded project structure assumptions.
 import os
 import re
 import json
-import fnmatch
+from functools import lru_cache
 from importlib import resources
+from pathlib import Path
 from urllib.parse import unquote
 
+from .ignore import GITIGNORE_FILENAME, IgnoreRules, read_ignore_file
+
 
 def get_default_config_path() -> str:
     """Get the path to the default config file bundled with the package."""
@@ -74,21 +77,24 @@ def get_gitignore_patterns(root_dir: str) -> list[str]:
     Returns:
         List of gitignore patterns
     """
-    gitignore_path = os.path.join(root_dir, '.gitignore')
-    patterns = []
-    if os.path.exists(gitignore_path):
-        with open(gitignore_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    patterns.append(line)
-    return patterns
+    return read_ignore_file(os.path.join(root_dir, GITIGNORE_FILENAME))
+
+
+@lru_cache(maxsize=32)
+def _compile_ignore_patterns(patterns: tuple) -> IgnoreRules:
+    """Compile a list of ignore patterns once (see ignore.IgnoreRules)."""
+    return IgnoreRules(patterns)
 
 
 def is_ignored(path: str, patterns: list[str]) -> bool:
     """
     Check if a path matches any of the ignore patterns.
     
+    The path is ignored when it or one of its parent directories matches.
+    Its type is not known, so patterns ending in / match it as well. Walks
+    over a directory tree should use ignore.IgnoreMatcher, which also reads
+    nested .gitignore files and prunes ignored directories.
+    
     Args:
         path: Relative path to check
         patterns: List of gitignore-style patterns
@@ -96,15 +102,11 @@ def is_ignored(path: str, patterns: list[str]) -> bool:
     Returns:
         True if path should be ignored
     """
-    for pattern in patterns:
-        # Handle folder ignore (pattern ends with /)
-        if pattern.endswith('/'):
-            if os.path.commonpath([os.path.abspath(path), os.path.abspath(pattern.rstrip('/'))]) == os.path.abspath(pattern.rstrip('/')):
-                return True
-        # Handle file/folder pattern
-        if fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(os.path.basename(path), pattern):
-            return True
-    return False
+    if not patterns:
+        return False
+    rules = _compile_ignore_patterns(tuple(patterns))
+    parts = [part for part in path.replace(os.sep, '/').split('/') if part and part != '.']
+    return any(rules.match('/'.join(parts[:n]), True) for n in range(1, len(parts) + 1))
 
 
 def get_default_output_dir(root_dir: str) -> str:
@@ -275,6 +277,36 @@ def inject_document_anchor(html_content: str, anchor_id: str) -> str:
     return anchor_tag + html_content
 
 
+def absolutize_resource_urls(html_content: str, base_dir: str) -> str:
+    """
+    Rewrite relative image/media src attributes to absolute file URIs.
+    
+    Needed when HTML from several markdown files is rendered as one
+    document, where a single base URL cannot resolve every file's
+    relative paths.
+    
+    Args:
+        html_content: HTML content from markdown conversion
+        base_dir: Directory the relative paths are relative to
+    
+    Returns:
+        HTML content with relative src URLs made absolute
+    """
+    src_pattern = re.compile(r'(\ssrc=)(["\'])(.*?)\2', re.IGNORECASE)
+    
+    def replace_src(match):
+        url = match.group(3)
+        
+        # Keep URLs with a scheme (http:, data:, file:, ...), anchors and absolute paths
+        if re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*:', url) or url.startswith(('#', '/')) or not url:
+            return match.group(0)
+        
+        path = os.path.abspath(os.path.join(base_dir, unquote(url)))
+        return f'{match.group(1)}{match.group(2)}{Path(path).as_uri()}{match.group(2)}'
+    
+    return src_pattern.sub(replace_src, html_content)
+
+
 def process_details_tags(
     md_content: str,
     output_format: str,
@@ -363,3 +395,92 @@ def process_details_tags(
     
     return details_pattern.sub(replace_details, md_content)
 
+
+# Points per CSS length unit
+CSS_UNITS = {
+    'pt': 1.0,
+    'px': 0.75,
+    'in': 72.0,
+    'cm': 72.0 / 2.54,
+    'mm': 72.0 / 25.4,
+    'pc': 12.0,
+}
+
+
+def css_length_to_points(value: str, default: float = 0.0) -> float:
+    """
+    Convert a CSS length (e.g. '1in', '14px', '10pt') to points.
+    
+    Args:
+        value: CSS length
+        default: Value for lengths that cannot be parsed
+    
+    Returns:
+        Length in points
+    """
+    match = re.fullmatch(r'\s*(-?[\d.]+)\s*([a-z]*)\s*', str(value))
+    if not match:
+        return default
+    unit = match.group(2) or 'px'
+    if unit not in CSS_UNITS:
+        return default
+    return float(match.group(1)) * CSS_UNITS[unit]
+
+
+def css_margins_to_points(margins: str) -> tuple[float, float, float, float]:
+    """
+    Convert a CSS margin shorthand (1 to 4 values) to points.
+    
+    Returns:
+        Tuple of (top, right, bottom, left)
+    """
+    values = [css_length_to_points(v) for v in str(margins).split()] or [0.0]
+    if len(values) == 1:
+        values *= 4
+    elif len(values) == 2:
+        values = values * 2
+    elif len(values) == 3:
+        values = values + [values[1]]
+    return tuple(values[:4])
+
+
+# Page sizes in points for the CSS size keywords (portrait)
+PAGE_SIZES = {
+    'a3': (841.89, 1190.55),
+    'a4': (595.28, 841.89),
+    'a5': (419.53, 595.28),
+    'b4': (708.66, 1000.63),
+    'b5': (498.9, 708.66),
+    'letter': (612.0, 792.0),
+    'legal': (612.0, 1008.0),
+    'ledger': (792.0, 1224.0),
+}
+
+
+def css_page_size_to_points(page_size: str) -> tuple[float, float]:
+    """
+    Convert a CSS page size (e.g. 'A4', 'letter landscape', '6in 9in') to points.
+    
+    Args:
+        page_size: Value of the CSS size property
+    
+    Returns:
+        Tuple of (width, height); A4 for sizes that cannot be parsed
+    """
+    tokens = str(page_size).lower().split()
+    size = None
+    lengths = []
+    for token in tokens:
+        if token in PAGE_SIZES:
+            size = PAGE_SIZES[token]
+        elif token not in ('portrait', 'landscape'):
+            lengths.append(css_length_to_points(token, None))
+    if lengths and None not in lengths and len(lengths) <= 2:
+        size = (lengths[0], lengths[-1])
+    if size is None:
+        size = PAGE_SIZES['a4']
+    if 'landscape' in tokens:
+        return max(size), min(size)
+    if 'portrait' in tokens:
+        return min(size), max(size)
+    return size
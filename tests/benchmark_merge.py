@@ -0,0 +1,124 @@
+"""
+Benchmark the merge engines on the PDFs of an order file.
+
+Collects the PDFs an order file refers to (existing PDFs, plus markdown
+files already converted in the output directory by an earlier build), then
+merges them with every available engine, timing the page counting and the
+merge separately.
+
+Usage:
+    python tests/benchmark_merge.py --root finished-book-example --order order.json
+    python tests/benchmark_merge.py --root . --order order.json --engines pypdf pikepdf --repeat 5
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bookbuilder import merge
+from bookbuilder.combine import collect_files_for_chapter
+from bookbuilder.convert import get_output_pdf_path
+from bookbuilder.merge import MERGE_ENGINES, count_pages, create_merger
+from bookbuilder.utils import get_default_output_dir
+
+
+def collect_pdfs(order_path: str, root_dir: str, output_dir: str) -> list[tuple[str, list[str]]]:
+    """
+    Collect the PDFs of every chapter in an order file.
+    
+    Args:
+        order_path: Order JSON file
+        root_dir: Project root directory
+        output_dir: Output directory holding converted PDFs
+    
+    Returns:
+        List of (section_name, pdf_paths) tuples (chapters without PDFs are left out)
+    """
+    with open(order_path, 'r') as f:
+        order_json = json.load(f)
+    
+    chapters = []
+    for chapter in order_json.get('chapters', []):
+        pdfs = []
+        for file_path in collect_files_for_chapter(chapter, root_dir):
+            if file_path.lower().endswith('.md'):
+                file_path = get_output_pdf_path(file_path, root_dir, output_dir)
+            if file_path.lower().endswith('.pdf') and os.path.isfile(file_path):
+                pdfs.append(file_path)
+        if pdfs:
+            chapters.append((chapter.get('section', 'Untitled'), pdfs))
+    return chapters
+
+
+def run_engine(engine: str, chapters: list, output_pdf: str) -> dict:
+    """
+    Count pages and merge every PDF with one engine.
+    
+    Returns:
+        Dictionary with count_seconds, merge_seconds, pages and size
+    """
+    start = time.perf_counter()
+    pages = sum(count_pages(pdf, engine) for _, pdfs in chapters for pdf in pdfs)
+    count_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    merger = create_merger(output_pdf, engine)
+    try:
+        for section, pdfs in chapters:
+            outline_title = section
+            for pdf in pdfs:
+                if merger.append(pdf, outline_title):
+                    outline_title = None
+    finally:
+        merger.close()
+    merge_seconds = time.perf_counter() - start
+    
+    return {
+        'count_seconds': count_seconds,
+        'merge_seconds': merge_seconds,
+        'pages': pages,
+        'size': os.path.getsize(output_pdf),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the PDF merge engines on an order file')
+    parser.add_argument('--order', '-o', required=True, help='Path to order JSON file')
+    parser.add_argument('--root', '-r', default='.', help='Project root directory (default: current directory)')
+    parser.add_argument('--output-dir', '-d', help='Output directory with converted PDFs (default: <root>/bookbuilder-output)')
+    parser.add_argument('--engines', nargs='+', choices=MERGE_ENGINES, help='Engines to compare (default: all available)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per engine; the best run is reported (default: 3)')
+    args = parser.parse_args()
+    
+    root_dir = os.path.abspath(args.root)
+    order_path = args.order if os.path.exists(args.order) else os.path.join(root_dir, args.order)
+    output_dir = os.path.abspath(args.output_dir) if args.output_dir else get_default_output_dir(root_dir)
+    
+    chapters = collect_pdfs(order_path, root_dir, output_dir)
+    file_count = sum(len(pdfs) for _, pdfs in chapters)
+    if not file_count:
+        print("No PDFs found (build the book once so markdown files are converted)")
+        return 1
+    print(f"{file_count} PDFs in {len(chapters)} chapters")
+    
+    engines = args.engines or [e for e in MERGE_ENGINES if e != 'pikepdf' or merge.pikepdf is not None]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        print(f"\n{'engine':<10} {'count (s)':>10} {'merge (s)':>10} {'pages':>7} {'size (MB)':>10}")
+        for engine in engines:
+            runs = [
+                run_engine(engine, chapters, os.path.join(temp_dir, f"{engine}.pdf"))
+                for _ in range(max(args.repeat, 1))
+            ]
+            best = min(runs, key=lambda run: run['count_seconds'] + run['merge_seconds'])
+            print(f"{engine:<10} {best['count_seconds']:>10.3f} {best['merge_seconds']:>10.3f} "
+                  f"{best['pages']:>7} {best['size'] / (1024 * 1024):>10.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
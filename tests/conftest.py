@@ -9,6 +9,7 @@ import json
 import tempfile
 import shutil
 import pytest
+from reportlab.pdfgen import canvas
 
 
 @pytest.fixture
@@ -21,6 +22,19 @@ def temp_dir():
         shutil.rmtree(temp_path)
 
 
+@pytest.fixture
+def make_pdf():
+    """Factory writing a PDF with the given number of pages ("<filename> page <n>" on each)."""
+    def make(path, pages):
+        c = canvas.Canvas(path)
+        for n in range(pages):
+            c.drawString(100, 400, f"{os.path.basename(path)} page {n + 1}")
+            c.showPage()
+        c.save()
+        return path
+    return make
+
+
 @pytest.fixture
 def sample_markdown_content():
     """Sample markdown content for testing."""
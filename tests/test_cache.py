@@ -0,0 +1,656 @@
+"""
+Unit tests for bookbuilder.cache module.
+
+Tests cover:
+- Content and settings hashing
+- JSON cache file persistence
+- Conversion manifest, with per-document file dependencies
+- Page count index
+- Directory snapshot
+- Resolved book plan cache
+- Markdown -> HTML stage cache
+- Merged chapter block cache
+- Fetched resource cache
+- Pruning of unused HTML, resource and image entries
+- Book page-range map
+- Build manifest of finished books
+"""
+
+import os
+import json
+import time
+import pytest
+
+from bookbuilder.cache import (
+    CACHE_DIR_NAME,
+    get_cache_dir,
+    hash_file,
+    hash_data,
+    load_json_file,
+    save_json_file,
+    snapshot_files,
+    is_file_unchanged,
+    BookPlanCache,
+    BuildManifest,
+    ConversionManifest,
+    DirectorySnapshot,
+    PageCountIndex,
+    HtmlStageCache,
+    ChapterBlockCache,
+    ResourceCache,
+    ImageStageCache,
+    BookMap,
+    UNUSED_ENTRY_MAX_AGE,
+    prune_stage_caches
+)
+
+
+def age_entries(directory, seconds=UNUSED_ENTRY_MAX_AGE + 60):
+    """Set the mtime of every file in a cache directory to the past."""
+    past = time.time() - seconds
+    for filename in os.listdir(directory):
+        os.utime(os.path.join(directory, filename), (past, past))
+
+
+class TestHashing:
+    """Tests for hash_file and hash_data functions."""
+    
+    def test_hash_file_depends_on_content(self, temp_dir):
+        """Files with different content hash differently."""
+        first = os.path.join(temp_dir, "a.md")
+        second = os.path.join(temp_dir, "b.md")
+        with open(first, 'w') as f:
+            f.write("# One")
+        with open(second, 'w') as f:
+            f.write("# Two")
+        
+        assert hash_file(first) != hash_file(second)
+    
+    def test_hash_data_ignores_key_order(self):
+        """Equal dictionaries hash the same regardless of key order."""
+        assert hash_data({"a": 1, "b": {"c": 2}}) == hash_data({"b": {"c": 2}, "a": 1})
+    
+    def test_hash_data_detects_changes(self):
+        """Changed values produce a different hash."""
+        assert hash_data({"margins": "1in"}) != hash_data({"margins": "0.5in"})
+
+
+class TestJsonFiles:
+    """Tests for load_json_file and save_json_file functions."""
+    
+    def test_round_trip(self, temp_dir):
+        """Saved data loads back unchanged."""
+        path = os.path.join(temp_dir, "nested", "data.json")
+        
+        save_json_file(path, {"key": [1, 2, 3]})
+        
+        assert load_json_file(path) == {"key": [1, 2, 3]}
+    
+    def test_missing_file_returns_default(self, temp_dir):
+        """Missing files return the default value."""
+        assert load_json_file(os.path.join(temp_dir, "none.json"), {}) == {}
+    
+    def test_corrupt_file_returns_default(self, temp_dir):
+        """Corrupt files return the default value."""
+        path = os.path.join(temp_dir, "bad.json")
+        with open(path, 'w') as f:
+            f.write("{ not json")
+        
+        assert load_json_file(path, {}) == {}
+
+
+class TestConversionManifest:
+    """Tests for ConversionManifest class."""
+    
+    def test_cache_dir_inside_output_dir(self, temp_dir):
+        """Cache files live in a hidden folder of the output directory."""
+        assert get_cache_dir(temp_dir) == os.path.join(temp_dir, CACHE_DIR_NAME)
+    
+    def test_record_and_check(self, temp_dir):
+        """Recorded keys are reported as current."""
+        manifest = ConversionManifest(temp_dir)
+        pdf_path = os.path.join(temp_dir, "doc.pdf")
+        
+        manifest.record(pdf_path, "key-1")
+        
+        assert manifest.is_current(pdf_path, "key-1") is True
+        assert manifest.is_current(pdf_path, "key-2") is False
+    
+    def test_unknown_pdf_not_current(self, temp_dir):
+        """PDFs that were never recorded are not current."""
+        manifest = ConversionManifest(temp_dir)
+        
+        assert manifest.is_current(os.path.join(temp_dir, "x.pdf"), "key") is False
+    
+    def test_persists_between_builds(self, temp_dir):
+        """Saved entries are visible to a freshly loaded manifest."""
+        pdf_path = os.path.join(temp_dir, "chapter", "doc.pdf")
+        manifest = ConversionManifest(temp_dir)
+        manifest.record(pdf_path, "key-1")
+        manifest.save()
+        
+        reloaded = ConversionManifest(temp_dir)
+        
+        assert reloaded.is_current(pdf_path, "key-1") is True
+    
+    def test_outdated_manifest_version_discarded(self, temp_dir):
+        """Manifests written by another layout version are ignored."""
+        path = os.path.join(get_cache_dir(temp_dir), "manifest.json")
+        save_json_file(path, {"version": -1, "entries": {"doc.pdf": {"key": "k"}}})
+        
+        manifest = ConversionManifest(temp_dir)
+        
+        assert manifest.entries == {}
+    
+    def test_changed_dependency_not_current(self, temp_dir):
+        """A PDF is stale once a file it was rendered from changes or disappears."""
+        image = os.path.join(temp_dir, "shot.png")
+        style = os.path.join(temp_dir, "extra.css")
+        for path in (image, style):
+            with open(path, 'w') as f:
+                f.write("v1")
+        manifest = ConversionManifest(temp_dir)
+        pdf_path = os.path.join(temp_dir, "doc.pdf")
+        manifest.record(pdf_path, "key-1", snapshot_files([image, style]))
+        
+        assert manifest.is_current(pdf_path, "key-1") is True
+        with open(image, 'w') as f:
+            f.write("v2 (new screenshot)")
+        os.remove(style)
+        
+        assert manifest.is_current(pdf_path, "key-1") is False
+        assert manifest.changed_dependencies(pdf_path) == [style, image]
+    
+    def test_touched_dependency_still_current(self, temp_dir):
+        """A dependency with a new mtime but the same content is not a change."""
+        image = os.path.join(temp_dir, "shot.png")
+        with open(image, 'w') as f:
+            f.write("v1")
+        manifest = ConversionManifest(temp_dir)
+        pdf_path = os.path.join(temp_dir, "doc.pdf")
+        manifest.record(pdf_path, "key-1", snapshot_files([image]))
+        manifest.save()
+        
+        stat = os.stat(image)
+        os.utime(image, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        reloaded = ConversionManifest(temp_dir)
+        
+        assert reloaded.is_current(pdf_path, "key-1") is True
+        assert reloaded.get(pdf_path)['dependencies'][image]['mtime'] == stat.st_mtime_ns + 10**9
+    
+    def test_snapshot_files(self, temp_dir):
+        """Snapshots record size, mtime and hash of the files that exist."""
+        path = os.path.join(temp_dir, "a.css")
+        with open(path, 'w') as f:
+            f.write("body {}")
+        
+        snapshot = snapshot_files([path, os.path.join(temp_dir, "missing.css")])
+        
+        assert list(snapshot) == [path]
+        assert snapshot[path]['size'] == 7
+        assert snapshot[path]['hash'] == hash_file(path)
+    
+    def test_missing_dependency_must_stay_missing(self, temp_dir):
+        """A dependency recorded as missing is unchanged until it is created."""
+        missing = os.path.join(temp_dir, "later.png")
+        manifest = ConversionManifest(temp_dir)
+        pdf_path = os.path.join(temp_dir, "doc.pdf")
+        manifest.record(pdf_path, "key-1", snapshot_files([missing], include_missing=True))
+        
+        assert manifest.get(pdf_path)['dependencies'] == {missing: None}
+        assert manifest.is_current(pdf_path, "key-1") is True
+        
+        with open(missing, 'wb') as f:
+            f.write(b"png")
+        
+        assert manifest.is_current(pdf_path, "key-1") is False
+
+
+class TestPageCountIndex:
+    """Tests for PageCountIndex class."""
+    
+    def make_pdf(self, temp_dir, content=b"%PDF-1.4"):
+        """Create a placeholder PDF file."""
+        path = os.path.join(temp_dir, "doc.pdf")
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+    
+    def test_record_and_get(self, temp_dir):
+        """Recorded counts are returned while the file is unchanged."""
+        pdf_path = self.make_pdf(temp_dir)
+        index = PageCountIndex(temp_dir)
+        index.record(pdf_path, 7)
+        
+        assert index.get(pdf_path) == 7
+    
+    def test_changed_file_invalidates(self, temp_dir):
+        """A different size or mtime makes the entry stale."""
+        pdf_path = self.make_pdf(temp_dir)
+        index = PageCountIndex(temp_dir)
+        index.record(pdf_path, 7)
+        self.make_pdf(temp_dir, b"%PDF-1.4 changed")
+        
+        assert index.get(pdf_path) is None
+    
+    def test_missing_file(self, temp_dir):
+        """Unknown or deleted files have no page count."""
+        pdf_path = self.make_pdf(temp_dir)
+        index = PageCountIndex(temp_dir)
+        index.record(pdf_path, 2)
+        os.remove(pdf_path)
+        
+        assert index.get(pdf_path) is None
+        assert index.get(os.path.join(temp_dir, "other.pdf")) is None
+    
+    def test_persists_between_builds(self, temp_dir):
+        """Saved counts are loaded by the next build."""
+        pdf_path = self.make_pdf(temp_dir)
+        index = PageCountIndex(temp_dir)
+        index.record(pdf_path, 3)
+        index.save()
+        
+        assert PageCountIndex(temp_dir).get(pdf_path) == 3
+
+
+class TestDirectorySnapshot:
+    """Tests for DirectorySnapshot class."""
+    
+    OLD_MTIME = 1_600_000_000 * 10**9
+    
+    def test_listing_valid_for_same_mtime(self, temp_dir):
+        """A listing is returned only while the directory mtime is unchanged."""
+        snapshot = DirectorySnapshot(temp_dir)
+        snapshot.record(os.path.join(temp_dir, "docs"), self.OLD_MTIME, ["img"], ["a.md"])
+        
+        assert snapshot.get(os.path.join(temp_dir, "docs"), self.OLD_MTIME) == (["img"], ["a.md"])
+        assert snapshot.get(os.path.join(temp_dir, "docs"), self.OLD_MTIME + 1) is None
+    
+    def test_recently_modified_not_recorded(self, temp_dir):
+        """Directories modified moments ago are read again next time."""
+        snapshot = DirectorySnapshot(temp_dir)
+        
+        snapshot.record(temp_dir, os.stat(temp_dir).st_mtime_ns, [], ["a.md"])
+        
+        assert snapshot.entries == {}
+    
+    def test_save_keeps_used_directories(self, temp_dir):
+        """Saved snapshots only keep the directories the build looked at."""
+        snapshot = DirectorySnapshot(temp_dir)
+        snapshot.record("/src/a", self.OLD_MTIME, [], ["a.md"])
+        snapshot.record("/src/b", self.OLD_MTIME, [], ["b.md"])
+        snapshot.save()
+        
+        reloaded = DirectorySnapshot(temp_dir)
+        reloaded.get("/src/a", self.OLD_MTIME)
+        reloaded.save()
+        
+        assert list(DirectorySnapshot(temp_dir).entries) == [os.path.abspath("/src/a")]
+    
+    def test_looked_up_mtimes(self, temp_dir):
+        """Every directory looked up is listed with its mtime, found or not."""
+        snapshot = DirectorySnapshot(temp_dir)
+        snapshot.record("/src/a", self.OLD_MTIME, [], [])
+        snapshot.get("/src/a", self.OLD_MTIME)
+        snapshot.get("/src/b", self.OLD_MTIME + 1)
+        
+        assert snapshot.mtimes == {
+            os.path.abspath("/src/a"): self.OLD_MTIME,
+            os.path.abspath("/src/b"): self.OLD_MTIME + 1,
+        }
+
+
+class TestBookPlanCache:
+    """Tests for BookPlanCache class."""
+    
+    OLD_MTIME = 1_600_000_000 * 10**9
+    
+    def make_source(self, temp_dir):
+        """Create a source directory that looks unchanged for a while."""
+        source = os.path.join(temp_dir, "src")
+        os.makedirs(source)
+        os.utime(source, ns=(self.OLD_MTIME, self.OLD_MTIME))
+        return source
+    
+    def test_plan_reused_while_unchanged(self, temp_dir):
+        """A recorded plan is returned for the same order key and unchanged paths."""
+        source = self.make_source(temp_dir)
+        missing = os.path.join(temp_dir, "missing")
+        cache = BookPlanCache(temp_dir)
+        cache.record("order.json", "key", {"sections": []}, {source: self.OLD_MTIME, missing: None})
+        cache.save()
+        
+        reloaded = BookPlanCache(temp_dir)
+        
+        assert reloaded.get("order.json", "key") == {"sections": []}
+        assert reloaded.get("order.json", "other-key") is None
+        assert reloaded.get("other.json", "key") is None
+    
+    def test_changed_paths_invalidate(self, temp_dir):
+        """A changed directory mtime, or a path that appeared, invalidates the plan."""
+        source = self.make_source(temp_dir)
+        missing = os.path.join(temp_dir, "missing")
+        cache = BookPlanCache(temp_dir)
+        cache.record("order.json", "key", {}, {source: self.OLD_MTIME, missing: None})
+        
+        os.makedirs(missing)
+        
+        assert cache.get("order.json", "key") is None
+    
+    def test_recently_modified_not_recorded(self, temp_dir):
+        """Plans resolved from paths modified moments ago are not kept."""
+        cache = BookPlanCache(temp_dir)
+        
+        cache.record("order.json", "key", {}, {temp_dir: os.stat(temp_dir).st_mtime_ns})
+        
+        assert cache.entries == {}
+
+
+class TestHtmlStageCache:
+    """Tests for HtmlStageCache class."""
+    
+    def test_miss_returns_none(self, temp_dir):
+        """Unknown keys are cache misses."""
+        assert HtmlStageCache(temp_dir).get("missing") is None
+    
+    def test_put_and_get(self, temp_dir):
+        """Stored HTML and title are returned for the same key."""
+        HtmlStageCache(temp_dir).put("abc", "<h1>Hi</h1>", "Hi")
+        
+        assert HtmlStageCache(temp_dir).get("abc") == ("<h1>Hi</h1>", "Hi")
+    
+    def test_stored_inside_cache_dir(self, temp_dir):
+        """Entries live in the html subdirectory of the cache directory."""
+        cache = HtmlStageCache(temp_dir)
+        cache.put("abc", "<p>x</p>", None)
+        
+        assert os.path.exists(os.path.join(get_cache_dir(temp_dir), "html", "abc.json"))
+        assert cache.get("abc") == ("<p>x</p>", None)
+    
+    def test_prune_keeps_recently_used(self, temp_dir):
+        """Entries read or written within the age limit survive pruning."""
+        cache = HtmlStageCache(temp_dir)
+        cache.put("old", "<p>old</p>", None)
+        cache.put("used", "<p>used</p>", None)
+        age_entries(cache.directory)
+        cache.get("used")
+        cache.put("new", "<p>new</p>", None)
+        
+        assert cache.prune() == 1
+        assert cache.get("old") is None
+        assert cache.get("used") == ("<p>used</p>", None)
+        assert cache.get("new") == ("<p>new</p>", None)
+    
+    def test_prune_missing_directory(self, temp_dir):
+        """Pruning a cache that was never written deletes nothing."""
+        assert HtmlStageCache(temp_dir).prune() == 0
+
+
+class TestResourceCache:
+    """Tests for ResourceCache class."""
+    
+    def test_put_and_get(self, temp_dir):
+        """Stored resources are returned with their MIME type."""
+        ResourceCache(temp_dir).put("https://example.com/a.png", b"png", "image/png")
+        
+        assert ResourceCache(temp_dir).get("https://example.com/a.png") == (b"png", "image/png")
+        assert ResourceCache(temp_dir).get("https://example.com/b.png") is None
+    
+    def test_max_age(self, temp_dir):
+        """Entries older than max_age are misses."""
+        cache = ResourceCache(temp_dir)
+        cache.put("https://example.com/a.css", b"css", "text/css")
+        meta_path = cache._entry_path("https://example.com/a.css") + ".json"
+        save_json_file(meta_path, {**load_json_file(meta_path), 'fetched': 0})
+        
+        assert cache.get("https://example.com/a.css", max_age=3600) is None
+        assert cache.get("https://example.com/a.css") == (b"css", "text/css")
+    
+    def test_prune_removes_body_and_sidecar(self, temp_dir):
+        """An unused resource is deleted together with its metadata."""
+        cache = ResourceCache(temp_dir)
+        cache.put("https://example.com/a.png", b"png", "image/png")
+        cache.put("https://example.com/b.png", b"png", "image/png")
+        age_entries(cache.directory)
+        cache.get("https://example.com/b.png")
+        
+        assert cache.prune() == 1
+        assert sorted(os.listdir(cache.directory)) == sorted([
+            os.path.basename(cache._entry_path("https://example.com/b.png")),
+            os.path.basename(cache._entry_path("https://example.com/b.png")) + ".json",
+        ])
+
+
+class TestImageStageCache:
+    """Tests for ImageStageCache class."""
+    
+    def test_put_and_get(self, temp_dir):
+        """Stored images are returned for the same key and extension."""
+        cache = ImageStageCache(temp_dir)
+        cache.put("abc", b"jpeg", ".jpg")
+        
+        assert cache.get("abc", ".jpg") == b"jpeg"
+        assert cache.get("abc", ".png") is None
+    
+    def test_prune_keeps_sidecar_of_used_entry(self, temp_dir):
+        """Files sharing a key are kept while any of them is used."""
+        cache = ImageStageCache(temp_dir)
+        cache.put("used", b"svg", ".svg")
+        save_json_file(cache.path("used", ".json"), {'seconds': 1})
+        cache.put("old", b"png", ".png")
+        age_entries(cache.directory)
+        cache.get("used", ".svg")
+        
+        assert cache.prune() == 1
+        assert sorted(os.listdir(cache.directory)) == ["used.json", "used.svg"]
+
+
+class TestPruneStageCaches:
+    """Tests for prune_stage_caches function."""
+    
+    def test_prunes_all_stage_caches(self, temp_dir):
+        """Unused HTML, resource and image entries are all deleted."""
+        caches = [HtmlStageCache(temp_dir), ResourceCache(temp_dir), ImageStageCache(temp_dir)]
+        caches[0].put("abc", "<p>x</p>", None)
+        caches[1].put("https://example.com/a.png", b"png", "image/png")
+        caches[2].put("abc", b"png", ".png")
+        for cache in caches:
+            age_entries(cache.directory)
+        
+        assert prune_stage_caches(temp_dir, max_age=3600) == 3
+        assert all(os.listdir(cache.directory) == [] for cache in caches)
+
+
+class TestChapterBlockCache:
+    """Tests for ChapterBlockCache class."""
+    
+    def write(self, path, content):
+        """Write a small file and return its path."""
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+    
+    def test_key_follows_content_and_order(self, temp_dir):
+        """The key changes when an input changes or the order changes."""
+        cache = ChapterBlockCache(temp_dir)
+        a = self.write(os.path.join(temp_dir, "a.pdf"), b"alpha")
+        b = self.write(os.path.join(temp_dir, "b.pdf"), b"beta")
+        key = cache.compute_key([a, b])
+        
+        assert cache.compute_key([a, b]) == key
+        assert cache.compute_key([b, a]) != key
+        self.write(b, b"beta v2")
+        assert cache.compute_key([a, b]) != key
+    
+    def test_key_follows_merge_settings(self, temp_dir):
+        """Blocks merged with other settings are not reused."""
+        cache = ChapterBlockCache(temp_dir)
+        a = self.write(os.path.join(temp_dir, "a.pdf"), b"alpha")
+        
+        assert cache.compute_key([a], {'engine': 'pypdf'}) != cache.compute_key([a], {'engine': 'streaming'})
+    
+    def test_miss_then_hit(self, temp_dir):
+        """A block is found once its file exists."""
+        cache = ChapterBlockCache(temp_dir)
+        
+        assert cache.get("abc") is None
+        os.makedirs(cache.directory)
+        self.write(cache.path("abc"), b"%PDF")
+        assert cache.get("abc") == os.path.join(get_cache_dir(temp_dir), "chapters", "abc.pdf")
+    
+    def test_prune_keeps_used_blocks(self, temp_dir):
+        """Blocks not used by the current build are deleted."""
+        os.makedirs(ChapterBlockCache(temp_dir).directory)
+        old = ChapterBlockCache(temp_dir)
+        self.write(old.path("old"), b"%PDF")
+        self.write(old.path("kept"), b"%PDF")
+        
+        cache = ChapterBlockCache(temp_dir)
+        cache.get("kept")
+        
+        assert cache.prune() == 1
+        assert os.listdir(cache.directory) == ["kept.pdf"]
+
+
+class TestBookMap:
+    """Tests for BookMap class."""
+    
+    def write_book(self, temp_dir, content=b"%PDF book"):
+        """Write a stand-in book file."""
+        path = os.path.join(temp_dir, "book.pdf")
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+    
+    def test_round_trip(self, temp_dir):
+        """Recorded sources are returned after a reload."""
+        book = self.write_book(temp_dir)
+        book_map = BookMap(temp_dir)
+        book_map.record(book, [{'path': 'a.pdf', 'pages': 2}], full_build=True)
+        book_map.save()
+        
+        reloaded = BookMap(temp_dir)
+        assert reloaded.get_sources(book) == [{'path': 'a.pdf', 'pages': 2}]
+        assert reloaded.full_size == os.path.getsize(book)
+    
+    def test_modified_book_invalidates(self, temp_dir):
+        """A book changed since it was recorded has no sources."""
+        book = self.write_book(temp_dir)
+        book_map = BookMap(temp_dir)
+        book_map.record(book, [{'path': 'a.pdf'}], full_build=True)
+        
+        self.write_book(temp_dir, b"%PDF rewritten elsewhere")
+        
+        assert book_map.get_sources(book) is None
+        assert book_map.get_sources(os.path.join(temp_dir, "other.pdf")) is None
+    
+    def test_incremental_record_keeps_full_size(self, temp_dir):
+        """Only full builds reset the size that growth is measured against."""
+        book = self.write_book(temp_dir)
+        book_map = BookMap(temp_dir)
+        book_map.record(book, [], full_build=True)
+        full_size = book_map.full_size
+        
+        with open(book, 'ab') as f:
+            f.write(b" update")
+        book_map.record(book, [], full_build=False)
+        
+        assert book_map.full_size == full_size
+        assert book_map.get_sources(book) == []
+
+
+class TestIsFileUnchanged:
+    """Tests for is_file_unchanged function."""
+    
+    def test_touched_file_unchanged(self, temp_dir):
+        """A file with the same content and a new mtime is unchanged; the new mtime is kept."""
+        path = os.path.join(temp_dir, "a.png")
+        with open(path, 'wb') as f:
+            f.write(b"png")
+        recorded = snapshot_files([path])[path]
+        os.utime(path, ns=(0, recorded['mtime'] + 10**9))
+        
+        assert is_file_unchanged(path, recorded) is True
+        assert recorded['mtime'] == os.stat(path).st_mtime_ns
+    
+    def test_changed_or_missing_file(self, temp_dir):
+        """Different content, or no file at all, is a change."""
+        path = os.path.join(temp_dir, "a.png")
+        with open(path, 'wb') as f:
+            f.write(b"png")
+        recorded = snapshot_files([path])[path]
+        with open(path, 'wb') as f:
+            f.write(b"jpg")
+        
+        assert is_file_unchanged(path, recorded) is False
+        assert is_file_unchanged(os.path.join(temp_dir, "missing"), recorded) is False
+
+
+class TestBuildManifest:
+    """Tests for BuildManifest class."""
+    
+    OLD_MTIME = 1_600_000_000 * 10**9
+    
+    def make_build(self, temp_dir):
+        """Write an input file that looks unchanged for a while, and a book."""
+        source = os.path.join(temp_dir, "intro.md")
+        with open(source, 'w') as f:
+            f.write("# Intro")
+        os.utime(source, ns=(self.OLD_MTIME, self.OLD_MTIME))
+        book = os.path.join(temp_dir, "book.pdf")
+        with open(book, 'wb') as f:
+            f.write(b"%PDF")
+        return source, book
+    
+    def test_current_after_record(self, temp_dir):
+        """A recorded book is current for the same key while nothing changed."""
+        source, book = self.make_build(temp_dir)
+        manifest = BuildManifest(temp_dir)
+        manifest.record(book, "key", [source], time.time_ns())
+        manifest.save()
+        
+        reloaded = BuildManifest(temp_dir)
+        
+        assert reloaded.is_current(book, "key") is True
+        assert reloaded.is_current(book, "other-key") is False
+        assert reloaded.entries[os.path.abspath(book)]['book']['hash'] == hash_file(book)
+    
+    def test_changed_input_or_book(self, temp_dir):
+        """Changing an input or the book makes the book stale."""
+        source, book = self.make_build(temp_dir)
+        manifest = BuildManifest(temp_dir)
+        manifest.record(book, "key", [source], time.time_ns())
+        
+        with open(book, 'ab') as f:
+            f.write(b"edited")
+        assert manifest.is_current(book, "key") is False
+        
+        manifest.record(book, "key", [source], time.time_ns())
+        with open(source, 'w') as f:
+            f.write("# Changed")
+        assert manifest.is_current(book, "key") is False
+    
+    def test_missing_input_appears(self, temp_dir):
+        """A missing input is recorded, and creating it makes the book stale."""
+        source, book = self.make_build(temp_dir)
+        missing = os.path.join(temp_dir, "later.md")
+        manifest = BuildManifest(temp_dir)
+        manifest.record(book, "key", [source, missing], time.time_ns())
+        assert manifest.is_current(book, "key") is True
+        
+        with open(missing, 'w') as f:
+            f.write("# Later")
+        
+        assert manifest.is_current(book, "key") is False
+    
+    def test_input_changed_during_build_not_recorded(self, temp_dir):
+        """An input modified after the build started leaves the book unrecorded."""
+        source, book = self.make_build(temp_dir)
+        manifest = BuildManifest(temp_dir)
+        manifest.record(book, "key", [source], time.time_ns())
+        
+        manifest.record(book, "key", [source], self.OLD_MTIME)
+        
+        assert manifest.entries == {}
+        assert manifest.is_current(book, "key") is False
+
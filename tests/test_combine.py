@@ -5,19 +5,41 @@ Tests cover:
 - File path resolution
 - Directory file discovery
 - Chapter file collection
+- Resolved book plans, reused while the project is unchanged
 - TOC generation
+- Page counting through the page count index
+- PDF merging
+- Chapter block cache
 - Book building integration
+- Skipping builds when the book is up to date
 """
 
 import os
 import json
 import pytest
 
+from pypdf import PdfReader, PdfWriter
+
+from bookbuilder import combine, ignore
+from bookbuilder.cache import ChapterBlockCache, PageCountIndex
 from bookbuilder.combine import (
     resolve_file_path,
     find_files_in_directory,
-    collect_files_for_chapter
+    collect_files_for_chapter,
+    load_book_plan,
+    get_page_count,
+    combine_pdfs_with_bookmarks
 )
+from bookbuilder import merge
+from bookbuilder.merge import append_pdf
+from bookbuilder.plan import ChapterEntry, PlanSection
+
+# Merge engines, skipping those whose optional library is not installed
+MERGE_ENGINES = [
+    pytest.param(engine, marks=pytest.mark.skipif(
+        engine == 'pikepdf' and merge.pikepdf is None, reason="pikepdf is not installed"))
+    for engine in merge.MERGE_ENGINES
+]
 
 
 class TestResolveFilePath:
@@ -135,6 +157,35 @@ class TestFindFilesInDirectory:
         
         assert files == []
     
+    def test_ignore_rules_parsed_once(self, temp_dir, monkeypatch):
+        """Folders of one project share the ignore rules of its .gitignore."""
+        with open(os.path.join(temp_dir, ".gitignore"), 'w') as f:
+            f.write("draft-*.md\n")
+        for folder in ("a", "b"):
+            os.makedirs(os.path.join(temp_dir, folder))
+            for name in ("doc.md", "draft-1.md"):
+                with open(os.path.join(temp_dir, folder, name), 'w') as f:
+                    f.write("# Doc")
+        monkeypatch.setattr(ignore, '_MATCHERS', {})
+        reads = []
+        read_ignore_file = ignore.read_ignore_file
+        monkeypatch.setattr(ignore, 'read_ignore_file', lambda path: reads.append(path) or read_ignore_file(path))
+        
+        files = [find_files_in_directory(os.path.join(temp_dir, folder), temp_dir) for folder in ("a", "b", "a")]
+        
+        assert [[os.path.basename(f) for f in found] for found in files] == [["doc.md"]] * 3
+        assert reads == [os.path.join(temp_dir, ".gitignore")]
+    
+    def test_folder_under_ignored_parent(self, temp_dir):
+        """A folder inside an ignored directory contributes no files."""
+        with open(os.path.join(temp_dir, ".gitignore"), 'w') as f:
+            f.write("archive/\n")
+        os.makedirs(os.path.join(temp_dir, "archive", "old"))
+        with open(os.path.join(temp_dir, "archive", "old", "doc.md"), 'w') as f:
+            f.write("# Doc")
+        
+        assert find_files_in_directory(os.path.join(temp_dir, "archive", "old"), temp_dir) == []
+    
     def test_nonexistent_directory(self, temp_dir):
         """Nonexistent directory returns empty list."""
         files = find_files_in_directory(os.path.join(temp_dir, "nonexistent"), temp_dir)
@@ -253,6 +304,94 @@ class TestChapterTypes:
         assert is_back is False
 
 
+class TestLoadBookPlan:
+    """Tests for load_book_plan function."""
+    
+    OLD_MTIME = 1_600_000_000 * 10**9
+    
+    CHAPTERS = [
+        {"section": "Front Cover", "files": ["cover"]},
+        {"section": "Intro", "files": ["intro"]},
+        {"section": "Docs", "folders": ["docs/"]},
+    ]
+    
+    @pytest.fixture
+    def project(self, temp_dir):
+        """Create a project whose files and directories look unchanged for a while."""
+        root = os.path.join(temp_dir, "project")
+        for name in ("cover.md", "intro.pdf", "docs/a.md", "docs/b.md", ".gitignore"):
+            path = os.path.join(root, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write("# Doc\n")
+        self.make_old(root)
+        return root
+    
+    def make_old(self, root):
+        """Set every directory and .gitignore mtime well in the past."""
+        for path in (root, os.path.join(root, "docs"), os.path.join(root, ".gitignore")):
+            os.utime(path, ns=(self.OLD_MTIME, self.OLD_MTIME))
+    
+    def load(self, temp_dir, root, chapters=CHAPTERS):
+        """Load the plan of an order file."""
+        return load_book_plan(os.path.join(root, "order.json"), chapters, root, os.path.join(temp_dir, "out"))
+    
+    def test_resolved_plan(self, temp_dir, project):
+        """Covers, sections and the anchor map are resolved from the order file."""
+        plan, reused = self.load(temp_dir, project)
+        
+        assert reused is False
+        assert plan.front_cover_files == (os.path.join(project, "cover.md"),)
+        assert plan.sections == [
+            PlanSection("Intro", [os.path.join(project, "intro.pdf")]),
+            PlanSection("Docs", [os.path.join(project, "docs", "a.md"), os.path.join(project, "docs", "b.md")]),
+        ]
+        assert plan.anchor_map["a.md"] == "a"
+    
+    def test_reused_while_unchanged(self, temp_dir, project, monkeypatch):
+        """An unchanged project is not resolved again."""
+        first, _ = self.load(temp_dir, project)
+        monkeypatch.setattr(combine, 'collect_files_for_chapter', lambda *args: pytest.fail("resolved again"))
+        
+        plan, reused = self.load(temp_dir, project)
+        
+        assert reused is True
+        assert plan.sections == first.sections
+        assert plan.anchor_map == first.anchor_map
+    
+    def test_new_file_in_folder(self, temp_dir, project):
+        """Adding a file to a listed folder resolves the plan again."""
+        self.load(temp_dir, project)
+        
+        with open(os.path.join(project, "docs", "c.md"), 'w') as f:
+            f.write("# C\n")
+        plan, reused = self.load(temp_dir, project)
+        
+        assert reused is False
+        assert os.path.join(project, "docs", "c.md") in plan.sections[1].files
+    
+    def test_changed_gitignore(self, temp_dir, project):
+        """Editing a .gitignore that was read resolves the plan again."""
+        self.load(temp_dir, project)
+        
+        with open(os.path.join(project, ".gitignore"), 'w') as f:
+            f.write("b.md\n")
+        os.utime(os.path.join(project, ".gitignore"), ns=(self.OLD_MTIME + 1, self.OLD_MTIME + 1))
+        plan, reused = self.load(temp_dir, project)
+        
+        assert reused is False
+        assert plan.sections[1].files == (os.path.join(project, "docs", "a.md"),)
+    
+    def test_changed_order(self, temp_dir, project):
+        """A different order file content gives a different plan."""
+        self.load(temp_dir, project)
+        
+        plan, reused = self.load(temp_dir, project, self.CHAPTERS[:2])
+        
+        assert reused is False
+        assert [section.name for section in plan.sections] == ["Intro"]
+
+
 class TestOrderJsonParsing:
     """Tests for order JSON structure handling."""
     
@@ -297,3 +436,250 @@ class TestOrderJsonParsing:
         assert title == "Untitled Book"
         assert filename == "book.pdf"
         assert settings == {}
+
+
+class TestGetPageCount:
+    """Tests for get_page_count function."""
+    
+    def test_counts_pages_without_index(self, temp_dir, make_pdf):
+        """Without an index the PDF is parsed."""
+        pdf_path = make_pdf(os.path.join(temp_dir, "doc.pdf"), 3)
+        
+        assert get_page_count(pdf_path) == 3
+    
+    def test_parsed_count_recorded(self, temp_dir, make_pdf):
+        """A parsed count is recorded in the index."""
+        pdf_path = make_pdf(os.path.join(temp_dir, "doc.pdf"), 2)
+        index = PageCountIndex(temp_dir)
+        
+        assert get_page_count(pdf_path, index) == 2
+        assert index.get(pdf_path) == 2
+    
+    def test_indexed_count_skips_parsing(self, temp_dir, monkeypatch, make_pdf):
+        """An up-to-date index entry is used without opening the PDF."""
+        pdf_path = make_pdf(os.path.join(temp_dir, "doc.pdf"), 2)
+        index = PageCountIndex(temp_dir)
+        index.record(pdf_path, 2)
+        
+        def fail(path):
+            raise AssertionError("PDF parsed despite index entry")
+        monkeypatch.setattr(combine, 'safe_get_page_count', fail)
+        
+        assert get_page_count(pdf_path, index) == 2
+    
+    def test_probe_avoids_full_parse(self, temp_dir, monkeypatch, make_pdf):
+        """Well-formed PDFs are counted by the probe, without a PDF library."""
+        pdf_path = make_pdf(os.path.join(temp_dir, "doc.pdf"), 4)
+        
+        def fail(path, engine=None):
+            raise AssertionError("PDF parsed despite the probe")
+        monkeypatch.setattr(combine, 'count_pages', fail)
+        
+        assert get_page_count(pdf_path) == 4
+    
+    def test_falls_back_to_full_parse(self, temp_dir, monkeypatch, make_pdf):
+        """Files the probe cannot read are counted with the PDF library."""
+        pdf_path = make_pdf(os.path.join(temp_dir, "doc.pdf"), 3)
+        monkeypatch.setattr(combine, 'probe_page_count', lambda path: None)
+        
+        assert get_page_count(pdf_path) == 3
+    
+    def test_unreadable_pdf_not_recorded(self, temp_dir):
+        """Files that cannot be read count as 0 pages and are not indexed."""
+        pdf_path = os.path.join(temp_dir, "broken.pdf")
+        with open(pdf_path, 'w') as f:
+            f.write("not a pdf")
+        index = PageCountIndex(temp_dir)
+        
+        assert get_page_count(pdf_path, index) == 0
+        assert index.get(pdf_path) is None
+
+
+class TestCombinePdfs:
+    """Tests for append_pdf and combine_pdfs_with_bookmarks functions."""
+    
+    def test_append_pdf_returns_page_count(self, temp_dir, make_pdf):
+        """Appending reports how many pages were added."""
+        pdf_path = make_pdf(os.path.join(temp_dir, "doc.pdf"), 3)
+        writer = PdfWriter()
+        
+        assert append_pdf(writer, pdf_path) == 3
+        assert len(writer.pages) == 3
+    
+    @pytest.mark.parametrize("engine", MERGE_ENGINES)
+    def test_each_input_parsed_once(self, temp_dir, monkeypatch, engine, make_pdf):
+        """Every input PDF is opened by exactly one reader."""
+        opened = []
+        
+        class CountingReader(PdfReader):
+            def __init__(self, stream, *args, **kwargs):
+                opened.append(stream)
+                super().__init__(stream, *args, **kwargs)
+        
+        monkeypatch.setattr(merge, 'PdfReader', CountingReader)
+        if merge.pikepdf is not None:
+            pikepdf_open = merge.pikepdf.open
+            
+            def counting_open(path, *args, **kwargs):
+                opened.append(path)
+                return pikepdf_open(path, *args, **kwargs)
+            
+            monkeypatch.setattr(merge.pikepdf, 'open', counting_open)
+        front = make_pdf(os.path.join(temp_dir, "front.pdf"), 1)
+        toc = make_pdf(os.path.join(temp_dir, "toc.pdf"), 1)
+        chapters = [make_pdf(os.path.join(temp_dir, f"ch{n}.pdf"), 2) for n in range(3)]
+        back = make_pdf(os.path.join(temp_dir, "back.pdf"), 1)
+        output = os.path.join(temp_dir, "book.pdf")
+        chapter_info = [ChapterEntry('One', 3, 2), ChapterEntry('Two', 7, 1)]
+        
+        combine_pdfs_with_bookmarks(chapters, chapter_info, output, toc, front, back, merge_engine=engine)
+        
+        assert sorted(opened) == sorted([front, toc, back] + chapters)
+        merged = PdfReader(output)
+        assert len(merged.pages) == 9
+        assert [merged.get_destination_page_number(item) for item in merged.outline] == [2, 6]
+
+
+class TestChapterBlocks:
+    """Tests for assembling the book from cached chapter blocks."""
+    
+    @pytest.fixture
+    def chapters(self, temp_dir, make_pdf):
+        """Write a one-page TOC and five two-page chapter files."""
+        make_pdf(os.path.join(temp_dir, "toc.pdf"), 1)
+        return [make_pdf(os.path.join(temp_dir, f"ch{n}.pdf"), 2) for n in range(5)]
+    
+    def build(self, temp_dir, chapters):
+        """Combine two multi-file chapters and a single-file chapter."""
+        toc = os.path.join(temp_dir, "toc.pdf")
+        chapter_info = [
+            ChapterEntry('One', 2, 2),
+            ChapterEntry('Two', 6, 2),
+            ChapterEntry('Three', 10, 1),
+        ]
+        output = os.path.join(temp_dir, "book.pdf")
+        cache = ChapterBlockCache(temp_dir)
+        combine_pdfs_with_bookmarks(chapters, chapter_info, output, toc, chapter_cache=cache)
+        cache.prune()
+        return PdfReader(output)
+    
+    def test_pages_and_bookmarks(self, temp_dir, chapters):
+        """The book has every page and a bookmark at each chapter start."""
+        reader = self.build(temp_dir, chapters)
+        
+        assert len(reader.pages) == 11
+        assert [reader.get_destination_page_number(item) for item in reader.outline] == [1, 5, 9]
+    
+    def test_unchanged_chapters_reused(self, temp_dir, chapters, make_pdf, capsys):
+        """A rebuild after editing one file re-merges only its chapter."""
+        self.build(temp_dir, chapters)
+        assert "Reused 0 of 2 cached chapter blocks" in capsys.readouterr().out
+        
+        make_pdf(chapters[3], 3)
+        reader = self.build(temp_dir, chapters)
+        
+        assert "Reused 1 of 2 cached chapter blocks" in capsys.readouterr().out
+        assert len(reader.pages) == 12
+        assert len(os.listdir(ChapterBlockCache(temp_dir).directory)) == 2
+    
+    def test_unreadable_file_falls_back(self, temp_dir, chapters, capsys):
+        """A chapter whose block cannot be merged is added file by file."""
+        with open(chapters[0], 'w') as f:
+            f.write("not a pdf")
+        
+        reader = self.build(temp_dir, chapters)
+        
+        assert len(reader.pages) == 9
+        assert "Could not add ch0.pdf" in capsys.readouterr().out
+        assert len(os.listdir(ChapterBlockCache(temp_dir).directory)) == 1
+
+
+
+class TestUpToDateBook:
+    """Tests for skipping builds that would not change the book."""
+    
+    OLD_MTIME = 1_600_000_000 * 10**9
+    
+    @pytest.fixture
+    def project(self, temp_dir, make_pdf):
+        """Create a project of PDF chapters that look unchanged for a while."""
+        root = os.path.join(temp_dir, "project")
+        os.makedirs(os.path.join(root, "chapters"))
+        for name in ("one", "two"):
+            make_pdf(os.path.join(root, "chapters", f"{name}.pdf"), 2)
+        with open(os.path.join(root, "order.json"), 'w') as f:
+            json.dump({"bookTitle": "Book", "outputFilename": "book.pdf",
+                       "chapters": [{"section": "All", "folders": ["chapters"]}]}, f)
+        for path in (root, os.path.join(root, "chapters"), *self.chapter_files(root)):
+            os.utime(path, ns=(self.OLD_MTIME, self.OLD_MTIME))
+        return root
+    
+    def chapter_files(self, root):
+        """Get the chapter PDFs of the project."""
+        return [os.path.join(root, "chapters", f"{name}.pdf") for name in ("one", "two")]
+    
+    def build(self, root, **kwargs):
+        """Build the book of the project."""
+        return combine.build_book("order.json", root_dir=root, verbose=False, **kwargs)
+    
+    def test_unchanged_book_not_rebuilt(self, project, monkeypatch):
+        """A second build with nothing changed leaves the book alone."""
+        book = self.build(project)
+        mtime = os.stat(book).st_mtime_ns
+        monkeypatch.setattr(combine, 'create_toc_page', lambda *args: pytest.fail("rebuilt"))
+        
+        assert self.build(project) == book
+        assert os.stat(book).st_mtime_ns == mtime
+    
+    def test_touched_input_not_rebuilt(self, project, monkeypatch):
+        """An input with a new mtime but the same content does not rebuild the book."""
+        book = self.build(project)
+        os.utime(self.chapter_files(project)[0], ns=(self.OLD_MTIME + 1, self.OLD_MTIME + 1))
+        monkeypatch.setattr(combine, 'create_toc_page', lambda *args: pytest.fail("rebuilt"))
+        
+        assert self.build(project) == book
+    
+    def test_changed_input_rebuilds(self, project, make_pdf):
+        """Changing a chapter PDF builds the book again."""
+        book = self.build(project)
+        path = make_pdf(self.chapter_files(project)[1], 3)
+        os.utime(path, ns=(self.OLD_MTIME + 1, self.OLD_MTIME + 1))
+        
+        self.build(project)
+        
+        assert len(PdfReader(book).pages) == 6
+    
+    def test_changed_book_or_force_rebuilds(self, project):
+        """A modified book, or --force, builds the book again."""
+        book = self.build(project)
+        with open(book, 'ab') as f:
+            f.write(b"\n% edited")
+        
+        self.build(project)
+        with open(book, 'rb') as f:
+            assert not f.read().endswith(b"% edited")
+        
+        mtime = os.stat(book).st_mtime_ns
+        self.build(project, force=True)
+        assert os.stat(book).st_mtime_ns != mtime
+
+
+class TestStampFallback:
+    """Tests for falling back to CSS furniture when stamps cannot use the font."""
+    
+    def test_unembeddable_font_renders_css_furniture(self, temp_dir, make_pdf, capsys):
+        """stampAtMerge is turned off when the first font family cannot be embedded."""
+        os.makedirs(os.path.join(temp_dir, "chapters"))
+        make_pdf(os.path.join(temp_dir, "chapters", "one.pdf"), 2)
+        with open(os.path.join(temp_dir, "order.json"), 'w') as f:
+            json.dump({"bookTitle": "Book", "outputFilename": "book.pdf",
+                       "chapters": [{"section": "All", "folders": ["chapters"]}]}, f)
+        config_path = os.path.join(temp_dir, "config.json")
+        with open(config_path, 'w') as f:
+            json.dump({"pageSettings": {"stampAtMerge": True},
+                       "styleSettings": {"fontFamily": "Georgia, serif"}}, f)
+        
+        book = combine.build_book("order.json", root_dir=temp_dir, config_path=config_path)
+        
+        assert "Georgia, serif cannot be embedded in stamps" in capsys.readouterr().out
+        assert len(PdfReader(book).pages) == 3
@@ -7,10 +7,14 @@ Tests cover:
 - CSS content building
 - File path utilities
 - Conversion caching logic
+- Multi-process batch conversion
+- Single-pass whole-book rendering
+- Resource fetching and missing resources
 """
 
 import os
 import time
+from pathlib import Path
 import pytest
 
 from bookbuilder.convert import (
@@ -19,8 +23,20 @@ from bookbuilder.convert import (
     build_css_content,
     find_markdown_files,
     get_output_pdf_path,
-    is_conversion_needed
+    is_conversion_needed,
+    compute_cache_key,
+    resolve_worker_count,
+    convert_files_parallel,
+    css_string,
+    build_running_content,
+    convert_book_to_pdf,
+    css_font_stack,
+    build_font_face_css,
+    compute_html_cache_key,
+    render_markdown_html
 )
+from bookbuilder import convert, fetch
+from bookbuilder.cache import ConversionManifest, HtmlStageCache, PageCountIndex
 
 
 class TestExtractTitleFromMarkdown:
@@ -259,6 +275,17 @@ class TestFindMarkdownFiles:
         
         assert not any("node_modules" in f for f in md_files)
     
+    def test_nested_gitignore(self, project_structure):
+        """A .gitignore in a subdirectory applies to the files below it."""
+        root = project_structure["root"]
+        with open(os.path.join(root, "chapter1", ".gitignore"), 'w') as f:
+            f.write("details.md\n")
+        
+        md_files = find_markdown_files(root)
+        
+        assert os.path.join(root, "chapter1", "overview.md") in md_files
+        assert os.path.join(root, "chapter1", "details.md") not in md_files
+    
     def test_empty_directory(self, temp_dir):
         """Empty directory returns empty list."""
         md_files = find_markdown_files(temp_dir)
@@ -352,3 +379,673 @@ class TestIsConversionNeeded:
         result = is_conversion_needed(temp_markdown_file, pdf_path)
         
         assert result is False
+    
+    def test_manifest_key_match_skips_conversion(self, temp_markdown_file, temp_dir):
+        """Matching cache key skips conversion even if the MD is newer."""
+        pdf_path = os.path.join(temp_dir, "test.pdf")
+        with open(pdf_path, 'w') as f:
+            f.write("PDF")
+        time.sleep(0.1)
+        with open(temp_markdown_file, 'a') as f:
+            f.write("\nTouched")
+        manifest = ConversionManifest(temp_dir)
+        key = compute_cache_key(temp_markdown_file)
+        manifest.record(pdf_path, key)
+        
+        result = is_conversion_needed(temp_markdown_file, pdf_path, cache_key=key, manifest=manifest)
+        
+        assert result is False
+    
+    def test_manifest_key_mismatch_needs_conversion(self, temp_markdown_file, temp_dir):
+        """A different cache key needs conversion even if the PDF is newer."""
+        pdf_path = os.path.join(temp_dir, "test.pdf")
+        time.sleep(0.1)
+        with open(pdf_path, 'w') as f:
+            f.write("PDF")
+        manifest = ConversionManifest(temp_dir)
+        manifest.record(pdf_path, compute_cache_key(temp_markdown_file))
+        new_key = compute_cache_key(temp_markdown_file, style_settings={"margins": "0.5in"})
+        
+        result = is_conversion_needed(temp_markdown_file, pdf_path, cache_key=new_key, manifest=manifest)
+        
+        assert result is True
+
+
+class TestComputeCacheKey:
+    """Tests for compute_cache_key function."""
+    
+    def test_stable_for_same_inputs(self, temp_markdown_file):
+        """Same source and settings produce the same key."""
+        settings = {"pageSize": "A4"}
+        
+        assert compute_cache_key(temp_markdown_file, style_settings=settings) == \
+            compute_cache_key(temp_markdown_file, style_settings=dict(settings))
+    
+    def test_source_change_changes_key(self, temp_markdown_file):
+        """Editing the markdown changes the key."""
+        before = compute_cache_key(temp_markdown_file)
+        with open(temp_markdown_file, 'a') as f:
+            f.write("\nMore")
+        
+        assert compute_cache_key(temp_markdown_file) != before
+    
+    @pytest.mark.parametrize("changed", [
+        {"page_settings": {"footerRight": "Other"}},
+        {"style_settings": {"bodyFontSize": "14pt"}},
+        {"anchor_map": {"other.md": "other"}},
+        {"content_settings": {"detailsTagHandling": {"enabled": False}}},
+        {"full_bleed": True},
+    ])
+    def test_rendering_inputs_change_key(self, temp_markdown_file, changed):
+        """Every rendering input participates in the key."""
+        assert compute_cache_key(temp_markdown_file, **changed) != compute_cache_key(temp_markdown_file)
+    
+    def test_font_file_change_changes_key(self, temp_markdown_file, temp_dir):
+        """Replacing a bundled font invalidates the key."""
+        font_dir = os.path.join(temp_dir, "fonts")
+        os.makedirs(font_dir)
+        font_path = os.path.join(font_dir, "Inter-Regular.ttf")
+        with open(font_path, 'wb') as f:
+            f.write(b"font")
+        settings = {"fontDirectory": font_dir}
+        before = compute_cache_key(temp_markdown_file, style_settings=settings)
+        with open(font_path, 'wb') as f:
+            f.write(b"other font")
+        
+        assert compute_cache_key(temp_markdown_file, style_settings=settings) != before
+    
+    def test_stamped_furniture_not_in_key(self, temp_markdown_file):
+        """With stampAtMerge, header, footer and book title changes keep the key."""
+        stamped = {"stampAtMerge": True, "bookTitle": "Book A", "footerRight": "A"}
+        other_book = {"stampAtMerge": True, "bookTitle": "Book B", "footerRight": "B"}
+        
+        assert compute_cache_key(temp_markdown_file, page_settings=stamped) == \
+            compute_cache_key(temp_markdown_file, page_settings=other_book)
+        assert compute_cache_key(temp_markdown_file, page_settings=stamped) != \
+            compute_cache_key(temp_markdown_file, page_settings={"bookTitle": "Book A"})
+
+
+class TestRenderMarkdownHtml:
+    """Tests for the cached markdown -> HTML stage."""
+    
+    def test_parser_reset_between_files(self, temp_dir):
+        """Footnotes from one file do not leak into the next."""
+        first = os.path.join(temp_dir, "first.md")
+        second = os.path.join(temp_dir, "second.md")
+        with open(first, 'w') as f:
+            f.write("# First\n\nText[^1]\n\n[^1]: A footnote")
+        with open(second, 'w') as f:
+            f.write("# Second\n\nPlain text")
+        
+        render_markdown_html(first)
+        html_content, title = render_markdown_html(second)
+        
+        assert title == "Second"
+        assert "footnote" not in html_content
+    
+    def test_cache_hit_skips_markdown(self, temp_markdown_file, temp_dir, monkeypatch):
+        """A cached file is not parsed again."""
+        cache = HtmlStageCache(temp_dir)
+        expected = render_markdown_html(temp_markdown_file, html_cache=cache)
+        
+        def fail():
+            raise AssertionError("markdown parsed on a cache hit")
+        monkeypatch.setattr(convert, 'get_markdown_parser', fail)
+        
+        assert render_markdown_html(temp_markdown_file, html_cache=cache) == expected
+    
+    def test_source_change_misses(self, temp_markdown_file, temp_dir):
+        """Editing the source invalidates the cached HTML."""
+        cache = HtmlStageCache(temp_dir)
+        render_markdown_html(temp_markdown_file, html_cache=cache)
+        with open(temp_markdown_file, 'w') as f:
+            f.write("# Changed")
+        
+        html_content, title = render_markdown_html(temp_markdown_file, html_cache=cache)
+        
+        assert title == "Changed"
+    
+    def test_key_covers_preprocessing_inputs(self, temp_markdown_file):
+        """Anchor map and content settings change the HTML stage key."""
+        base = compute_html_cache_key(temp_markdown_file)
+        
+        assert compute_html_cache_key(temp_markdown_file, anchor_map={"a.md": "a"}) != base
+        assert compute_html_cache_key(
+            temp_markdown_file, content_settings={"detailsTagHandling": {"enabled": True}}
+        ) != base
+    
+    def test_style_change_reuses_html(self, temp_dir, monkeypatch):
+        """Re-converting after a style change re-runs layout only."""
+        monkeypatch.setattr(convert, 'HTML', FakeHTML)
+        monkeypatch.setattr(convert, 'CSS', FakeCSS)
+        md_path = os.path.join(temp_dir, "doc.md")
+        with open(md_path, 'w') as f:
+            f.write("# Doc")
+        output_dir = os.path.join(temp_dir, "out")
+        pdf_path = os.path.join(output_dir, "doc.pdf")
+        manifest = ConversionManifest(output_dir)
+        convert.convert_markdown_to_pdf(md_path, pdf_path, manifest=manifest)
+        with open(pdf_path, 'wb') as f:
+            f.write(b"%PDF")
+        
+        parses = []
+        real_parser = convert.get_markdown_parser
+        monkeypatch.setattr(convert, 'get_markdown_parser', lambda: parses.append(1) or real_parser())
+        _, converted = convert.convert_markdown_to_pdf(
+            md_path, pdf_path, style_settings={"bodyFontSize": "14pt"}, manifest=manifest
+        )
+        
+        assert converted
+        assert parses == []
+    
+    def test_batch_conversion_reuses_html(self, temp_dir, monkeypatch):
+        """convert_files_parallel reads and writes the HTML stage cache too."""
+        monkeypatch.setattr(convert, 'HTML', FakeHTML)
+        monkeypatch.setattr(convert, 'CSS', FakeCSS)
+        md_path = os.path.join(temp_dir, "doc.md")
+        with open(md_path, 'w') as f:
+            f.write("# Doc")
+        output_dir = os.path.join(temp_dir, "out")
+        convert_files_parallel([md_path], temp_dir, output_dir, verbose=False)
+        
+        parses = []
+        real_parser = convert.get_markdown_parser
+        monkeypatch.setattr(convert, 'get_markdown_parser', lambda: parses.append(1) or real_parser())
+        _, converted, failed = convert_files_parallel(
+            [md_path], temp_dir, output_dir, verbose=False, style_settings={"bodyFontSize": "14pt"}
+        )
+        
+        assert (converted, failed) == (1, 0)
+        assert parses == []
+
+
+class TestResolveWorkerCount:
+    """Tests for resolve_worker_count function."""
+    
+    def test_capped_by_task_count(self):
+        """Never start more workers than there are files."""
+        assert resolve_worker_count(8, 3) == 3
+    
+    def test_zero_uses_cpu_count(self):
+        """Zero means one worker per CPU core."""
+        expected = max(1, min(os.cpu_count() or 1, 100))
+        
+        assert resolve_worker_count(0, 100) == expected
+    
+    def test_at_least_one_worker(self):
+        """An empty batch still resolves to a single worker."""
+        assert resolve_worker_count(4, 0) == 1
+    
+    def test_negative_rejected(self):
+        """Negative counts are errors, not one worker per CPU core."""
+        with pytest.raises(ValueError):
+            resolve_worker_count(-3, 10)
+
+
+class TestConvertFilesParallel:
+    """Tests for convert_files_parallel function."""
+    
+    def test_results_keep_input_order(self, temp_dir, monkeypatch):
+        """PDF and MD inputs come back in their original order."""
+        first_pdf = os.path.join(temp_dir, "a.pdf")
+        last_pdf = os.path.join(temp_dir, "c.pdf")
+        for path in (first_pdf, last_pdf):
+            with open(path, 'w') as f:
+                f.write("PDF")
+        md_file = os.path.join(temp_dir, "b.md")
+        
+        def fake_convert_file(file_path, **kwargs):
+            return file_path[:-3] + '.pdf', True, None
+        
+        monkeypatch.setattr(convert, 'convert_file', fake_convert_file)
+        
+        pdf_paths, converted, failed = convert_files_parallel(
+            [first_pdf, md_file, last_pdf], temp_dir, temp_dir, verbose=False
+        )
+        
+        assert pdf_paths == [first_pdf, os.path.join(temp_dir, "b.pdf"), last_pdf]
+        assert converted == 1
+        assert failed == 0
+    
+    def test_worker_pool_reports_failures(self, temp_dir):
+        """Errors from worker processes are counted, not raised."""
+        missing = [os.path.join(temp_dir, f"missing{i}.md") for i in range(2)]
+        
+        pdf_paths, converted, failed = convert_files_parallel(
+            missing, temp_dir, temp_dir, verbose=False, max_workers=2
+        )
+        
+        assert pdf_paths == []
+        assert converted == 0
+        assert failed == 2
+    
+    def test_rendered_page_counts_recorded(self, temp_dir, monkeypatch):
+        """Page counts reported by the renderer go into the page index."""
+        md_file = os.path.join(temp_dir, "b.md")
+        with open(md_file, 'w') as f:
+            f.write("# B")
+        
+        def fake_convert_file(file_path, render_info=None, **kwargs):
+            pdf_path = file_path[:-3] + '.pdf'
+            with open(pdf_path, 'w') as f:
+                f.write("PDF")
+            render_info['pages'] = 4
+            return pdf_path, True, None
+        
+        monkeypatch.setattr(convert, 'convert_file', fake_convert_file)
+        index = PageCountIndex(temp_dir)
+        
+        convert_files_parallel([md_file], temp_dir, temp_dir, verbose=False, page_index=index)
+        
+        assert index.get(os.path.join(temp_dir, "b.pdf")) == 4
+    
+    def test_rasterized_svgs_reported(self, temp_dir, monkeypatch, capsys):
+        """Files with rasterized SVGs report the render time saved."""
+        md_file = os.path.join(temp_dir, "b.md")
+        with open(md_file, 'w') as f:
+            f.write("# B")
+        
+        def fake_convert_file(file_path, render_info=None, **kwargs):
+            render_info.update({'pages': 1, 'rasterized_svgs': 2, 'svg_seconds_saved': 4.24})
+            return file_path[:-3] + '.pdf', True, None
+        
+        monkeypatch.setattr(convert, 'convert_file', fake_convert_file)
+        
+        convert_files_parallel([md_file], temp_dir, temp_dir, verbose=True)
+        
+        assert "Converted: b.md (2 SVGs rasterized, ~4.2s render time saved)" in capsys.readouterr().out
+    
+    def test_convert_all_defaults_to_one_worker(self, temp_dir, monkeypatch):
+        """Library callers get a sequential run unless they ask for more workers."""
+        seen = {}
+        
+        def fake_parallel(md_files, root_dir, output_dir, force, verbose, **kwargs):
+            seen.update(kwargs)
+            return [], 0, 0
+        
+        monkeypatch.setattr(convert, 'convert_files_parallel', fake_parallel)
+        
+        convert.convert_all(temp_dir, os.path.join(temp_dir, "out"), verbose=False)
+        
+        assert seen['max_workers'] == 1
+
+
+class TestCssString:
+    """Tests for css_string function."""
+    
+    def test_quotes_text(self):
+        """Plain text is wrapped in single quotes."""
+        assert css_string("Header") == "'Header'"
+    
+    def test_escapes_quotes(self):
+        """Single quotes inside the text are escaped."""
+        assert css_string("It's") == "'It\\'s'"
+
+
+class TestCssFontStack:
+    """Tests for css_font_stack function."""
+    
+    def test_quotes_each_family(self):
+        """Each family is quoted on its own, generic families stay bare."""
+        assert css_font_stack("Helvetica Neue, Arial, sans-serif") == '"Helvetica Neue", "Arial", sans-serif'
+    
+    def test_strips_existing_quotes(self):
+        """Families already quoted in the settings are not double quoted."""
+        assert css_font_stack('"SF Mono", \'Menlo\', monospace') == '"SF Mono", "Menlo", monospace'
+    
+    def test_skips_empty_entries(self):
+        """Stray commas do not produce empty families."""
+        assert css_font_stack("Inter,, serif,") == '"Inter", serif'
+
+
+class TestBuildFontFaceCss:
+    """Tests for build_font_face_css function."""
+    
+    def make_fonts(self, temp_dir, names):
+        """Create empty font files in a fonts directory."""
+        font_dir = os.path.join(temp_dir, "fonts")
+        os.makedirs(font_dir)
+        for name in names:
+            with open(os.path.join(font_dir, name), 'wb') as f:
+                f.write(b"")
+        return font_dir
+    
+    def test_rule_per_font_file(self, temp_dir):
+        """Every font file gets one @font-face rule; other files are ignored."""
+        font_dir = self.make_fonts(temp_dir, ["Inter-Regular.ttf", "Inter-Bold.woff2", "LICENSE.txt"])
+        
+        css = build_font_face_css(font_dir)
+        
+        assert css.count("@font-face") == 2
+        assert "font-family: 'Inter';" in css
+        assert 'format("woff2")' in css
+        assert "LICENSE" not in css
+    
+    def test_weight_and_style_from_filename(self, temp_dir):
+        """The filename suffix selects weight and style."""
+        font_dir = self.make_fonts(temp_dir, ["Inter-SemiBoldItalic.otf"])
+        
+        css = build_font_face_css(font_dir)
+        
+        assert "font-weight: 600;" in css
+        assert "font-style: italic;" in css
+    
+    def test_uses_file_urls(self, temp_dir):
+        """Fonts are referenced by absolute file:// URLs."""
+        font_dir = self.make_fonts(temp_dir, ["Mono.ttf"])
+        
+        css = build_font_face_css(font_dir)
+        
+        assert 'url("file://' in css
+        assert "font-family: 'Mono';" in css
+        assert "font-weight: 400;" in css
+    
+    def test_missing_directory(self, temp_dir):
+        """No directory (or a missing one) produces no rules."""
+        assert build_font_face_css(None) == ""
+        assert build_font_face_css(os.path.join(temp_dir, "missing")) == ""
+
+
+class TestBuildRunningContent:
+    """Tests for build_running_content function."""
+    
+    def test_static_text_with_counters(self):
+        """Book-level text is resolved once and counters stay counters."""
+        content, named = build_running_content("footerCenter", "Page {page} of {pages}", {})
+        
+        assert content == "'Page ' counter(page) ' of ' counter(pages)"
+        assert named == []
+    
+    def test_document_placeholder_uses_named_string(self):
+        """Per-document placeholders become named strings."""
+        content, named = build_running_content("header", "{title}", {})
+        
+        assert content == "string(bb-header-0)"
+        assert named == [("bb-header-0", "{title}")]
+    
+    def test_book_placeholders_resolved(self):
+        """Book-level placeholders are substituted directly."""
+        content, _ = build_running_content("footerLeft", "{date}", {"date": "May 1"})
+        
+        assert content == "'May 1'"
+
+
+class FakeDocument:
+    """Stand-in for a rendered WeasyPrint document."""
+    
+    def __init__(self, page_count):
+        self.pages = [None] * page_count
+        self.written_to = None
+    
+    def write_pdf(self, target):
+        self.written_to = target
+
+
+class FakeHTML:
+    """Stand-in for weasyprint.HTML that records the rendered markup."""
+    
+    instances = []
+    
+    def __init__(self, string=None, base_url=None, **kwargs):
+        self.string = string
+        self.stylesheets = None
+        FakeHTML.instances.append(self)
+    
+    def render(self, stylesheets=None, font_config=None, **kwargs):
+        self.stylesheets = stylesheets
+        self.font_config = font_config
+        return FakeDocument(3)
+
+
+class FakeCSS:
+    """Stand-in for weasyprint.CSS that keeps the stylesheet source."""
+    
+    def __init__(self, string=None, **kwargs):
+        self.string = string
+
+
+class TestConvertBookToPdf:
+    """Tests for convert_book_to_pdf function."""
+    
+    @pytest.fixture
+    def rendered(self, project_structure, monkeypatch):
+        """Render the sample project in single-pass mode and return the HTML."""
+        root = project_structure["root"]
+        FakeHTML.instances = []
+        monkeypatch.setattr(convert, 'HTML', FakeHTML)
+        monkeypatch.setattr(convert, 'CSS', FakeCSS)
+        sections = [
+            ("Introduction", [os.path.join(root, "intro.md")]),
+            ("Chapter 1", [os.path.join(root, "chapter1", "overview.md"),
+                           os.path.join(root, "chapter1", "details.md")]),
+        ]
+        
+        pages = convert_book_to_pdf(
+            sections, os.path.join(root, "out", "book.pdf"), "Test Book",
+            page_settings={"header": "{title}"},
+            front_placeholder_pages=2
+        )
+        
+        fake = FakeHTML.instances[-1]
+        return pages, fake.string + ''.join(sheet.string for sheet in fake.stylesheets)
+    
+    def test_returns_page_count(self, rendered):
+        """Page count comes from the rendered document."""
+        pages, _ = rendered
+        
+        assert pages == 3
+    
+    def test_all_documents_in_one_html(self, rendered):
+        """Every chapter file is part of the same document."""
+        _, html = rendered
+        
+        assert html.count('class="bb-document"') == 3
+        assert html.count('class="bb-section"') == 2
+    
+    def test_toc_links_to_sections(self, rendered):
+        """TOC entries link to sections and use target-counter page numbers."""
+        _, html = rendered
+        
+        assert 'href="#bb-section-1"' in html
+        assert 'href="#bb-section-2"' in html
+        assert 'target-counter(attr(href), page)' in html
+    
+    def test_headers_use_named_strings(self, rendered):
+        """Each document sets its own title for the running header."""
+        _, html = rendered
+        
+        assert 'string(bb-header-0)' in html
+        assert "bb-header-0 &#x27;Chapter 1 Overview&#x27;" in html
+    
+    def test_cover_placeholders_reserved(self, rendered):
+        """Blank pages are reserved for a PDF front cover."""
+        _, html = rendered
+        
+        assert html.count('class="bb-cover bb-front-cover"') == 2
+
+
+class TestSharedStylesheet:
+    """Tests for the shared stylesheet used by per-file conversion."""
+    
+    @pytest.fixture(autouse=True)
+    def fake_weasyprint(self, monkeypatch):
+        """Replace WeasyPrint classes and clear the stylesheet cache."""
+        FakeHTML.instances = []
+        monkeypatch.setattr(convert, 'HTML', FakeHTML)
+        monkeypatch.setattr(convert, 'CSS', FakeCSS)
+        monkeypatch.setattr(convert, '_STYLESHEET_CACHE', {})
+    
+    def test_compiled_once_for_same_settings(self):
+        """Equal style settings reuse the same compiled stylesheet."""
+        first = convert.get_shared_stylesheet({"bodyFontSize": "12pt"})
+        second = convert.get_shared_stylesheet({"bodyFontSize": "12pt"})
+        
+        assert first is second
+    
+    def test_new_settings_compile_new_stylesheet(self):
+        """Different style settings get their own stylesheet."""
+        first = convert.get_shared_stylesheet({"bodyFontSize": "12pt"})
+        second = convert.get_shared_stylesheet({"bodyFontSize": "14pt"})
+        
+        assert first is not second
+        assert "14pt" in second.string
+    
+    def test_font_directory_loaded_in_shared_stylesheet(self, temp_dir):
+        """Bundled fonts are declared once, in the shared stylesheet."""
+        font_dir = os.path.join(temp_dir, "fonts")
+        os.makedirs(font_dir)
+        with open(os.path.join(font_dir, "Inter-Regular.ttf"), 'wb') as f:
+            f.write(b"")
+        
+        stylesheet = convert.get_shared_stylesheet({"fontDirectory": font_dir, "fontFamily": "Inter, sans-serif"})
+        
+        assert "@font-face" in stylesheet.string
+        assert 'font-family: "Inter", sans-serif;' in stylesheet.string
+    
+    def test_render_info_reports_pages(self, temp_dir):
+        """The rendered page count is reported through render_info."""
+        md_path = os.path.join(temp_dir, "doc.md")
+        with open(md_path, 'w') as f:
+            f.write("# Doc")
+        render_info = {}
+        
+        convert.convert_markdown_to_pdf(md_path, os.path.join(temp_dir, "doc.pdf"), render_info=render_info)
+        
+        assert render_info == {'pages': 3}
+    
+    def test_font_config_reused(self, monkeypatch):
+        """One font configuration is created per process."""
+        monkeypatch.setattr(convert, '_FONT_CONFIG', None)
+        
+        assert convert.get_font_config() is convert.get_font_config()
+    
+    def test_documents_share_body_stylesheet(self, temp_dir):
+        """Each conversion passes the shared sheet plus a small page sheet."""
+        for name in ("a", "b"):
+            md_path = os.path.join(temp_dir, f"{name}.md")
+            with open(md_path, 'w') as f:
+                f.write(f"# Title {name}")
+            convert.convert_markdown_to_pdf(md_path, os.path.join(temp_dir, f"{name}.pdf"))
+        
+        first, second = FakeHTML.instances
+        assert first.stylesheets[0] is second.stylesheets[0]
+        assert first.font_config is second.font_config
+        assert "Title a" in first.stylesheets[1].string
+        assert "@page" in first.stylesheets[1].string
+        assert "<style>" not in first.string
+
+
+class FetchingHTML(FakeHTML):
+    """FakeHTML that fetches its images through the url_fetcher, like WeasyPrint."""
+    
+    def __init__(self, string=None, base_url=None, url_fetcher=None, **kwargs):
+        super().__init__(string, base_url)
+        self.base_url = base_url
+        self.url_fetcher = url_fetcher
+    
+    def render(self, stylesheets=None, font_config=None, cache=None, **kwargs):
+        self.cache = cache
+        for name in ("logo.png", "missing.png"):
+            try:
+                self.url_fetcher(Path(self.base_url, name).as_uri())
+            except OSError:
+                pass  # WeasyPrint logs the failure and renders without the image
+        return super().render(stylesheets, font_config)
+
+
+class TestResourceFetching:
+    """Tests for fetching images and stylesheets through the process fetcher."""
+    
+    @pytest.fixture(autouse=True)
+    def fake_weasyprint(self, monkeypatch):
+        """Replace WeasyPrint classes with ones that fetch resources."""
+        FakeHTML.instances = []
+        monkeypatch.setattr(convert, 'HTML', FetchingHTML)
+        monkeypatch.setattr(convert, 'CSS', FakeCSS)
+        monkeypatch.setattr(fetch, '_FETCHER', None)
+    
+    def test_unreadable_resource_not_cached(self, temp_dir):
+        """A file rendered without a resource that may load next time is converted again."""
+        md_path = os.path.join(temp_dir, "doc.md")
+        with open(md_path, 'w') as f:
+            f.write("# Doc")
+        with open(os.path.join(temp_dir, "logo.png"), 'wb') as f:
+            f.write(b"png")
+        os.makedirs(os.path.join(temp_dir, "missing.png"))
+        manifest = ConversionManifest(os.path.join(temp_dir, "out"))
+        pdf_path = os.path.join(temp_dir, "out", "doc.pdf")
+        manifest.record(pdf_path, "key-of-an-earlier-build")
+        render_info = {}
+        
+        convert.convert_markdown_to_pdf(md_path, pdf_path, manifest=manifest, render_info=render_info)
+        
+        assert render_info['missing_resources'] == [Path(temp_dir, "missing.png").as_uri()]
+        assert manifest.get(pdf_path) is None
+    
+    def test_missing_local_file_cached_until_it_appears(self, temp_dir):
+        """A local image that does not exist is recorded as a dependency that must stay missing."""
+        md_path = os.path.join(temp_dir, "doc.md")
+        with open(md_path, 'w') as f:
+            f.write("# Doc")
+        with open(os.path.join(temp_dir, "logo.png"), 'wb') as f:
+            f.write(b"png")
+        missing = os.path.join(temp_dir, "missing.png")
+        manifest = ConversionManifest(os.path.join(temp_dir, "out"))
+        
+        _, converted, failed = convert_files_parallel(
+            [md_path], temp_dir, os.path.join(temp_dir, "out"), verbose=False, manifest=manifest
+        )
+        
+        assert (converted, failed) == (1, 0)
+        pdf_path = os.path.join(temp_dir, "out", "doc.pdf")
+        assert manifest.get(pdf_path)['dependencies'][missing] is None
+        assert manifest.changed_dependencies(pdf_path) == []
+        
+        with open(missing, 'wb') as f:
+            f.write(b"png")
+        
+        assert manifest.changed_dependencies(pdf_path) == [missing]
+    
+    def test_documents_share_caches(self, temp_dir):
+        """Documents share the resource fetcher and the decoded image cache."""
+        for name in ("a", "b"):
+            md_path = os.path.join(temp_dir, f"{name}.md")
+            with open(md_path, 'w') as f:
+                f.write(f"# Title {name}")
+        with open(os.path.join(temp_dir, "logo.png"), 'wb') as f:
+            f.write(b"png")
+        
+        for name in ("a", "b"):
+            convert.convert_markdown_to_pdf(
+                os.path.join(temp_dir, f"{name}.md"), os.path.join(temp_dir, f"{name}.pdf")
+            )
+        
+        first, second = FakeHTML.instances
+        assert first.cache is second.cache
+        assert fetch.get_fetcher().stats['reads'] == 1
+        assert fetch.get_fetcher().stats['memory_hits'] == 1
+    
+    def test_changed_image_rebuilds_its_document(self, temp_dir):
+        """Replacing an image makes only the documents using it stale."""
+        manifest = ConversionManifest(os.path.join(temp_dir, "out"))
+        documents = {}
+        for name in ("a", "b"):
+            os.makedirs(os.path.join(temp_dir, name))
+            for image in ("logo.png", "missing.png"):
+                with open(os.path.join(temp_dir, name, image), 'wb') as f:
+                    f.write(b"png")
+            md_path = os.path.join(temp_dir, name, "doc.md")
+            with open(md_path, 'w') as f:
+                f.write(f"# {name}")
+            pdf_path = os.path.join(temp_dir, "out", f"{name}.pdf")
+            convert.convert_markdown_to_pdf(md_path, pdf_path, manifest=manifest)
+            documents[name] = (md_path, pdf_path)
+        
+        with open(os.path.join(temp_dir, "a", "logo.png"), 'wb') as f:
+            f.write(b"new screenshot")
+        
+        current = {
+            name: manifest.is_current(pdf_path, compute_cache_key(md_path))
+            for name, (md_path, pdf_path) in documents.items()
+        }
+        assert current == {"a": False, "b": True}
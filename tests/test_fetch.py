@@ -0,0 +1,216 @@
+"""
+Unit tests for bookbuilder.fetch module.
+
+Tests cover:
+- Size-bounded LRU and image caches
+- Local files read once and re-read after they change
+- Remote resources cached in memory and on disk, with a maximum age
+- Offline mode and fetch timeouts
+- Telling missing local files from failures worth retrying
+- Recording the local files a document uses
+- Process fetcher configuration
+"""
+
+import os
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import pytest
+
+from bookbuilder import fetch
+from bookbuilder.cache import ResourceCache, load_json_file, save_json_file
+from bookbuilder.fetch import ImageCache, LRUCache, OfflineError, ResourceFetcher, is_retryable_failure
+
+
+class ResourceHandler(BaseHTTPRequestHandler):
+    """Serves a small stylesheet, counting requests; /slow answers late."""
+    
+    requests = []
+    
+    def do_GET(self):
+        self.requests.append(self.path)
+        if self.path == '/slow.css':
+            time.sleep(1)
+        body = b"body { color: red; }"
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/css')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    """Run a local HTTP server standing in for a remote host."""
+    ResourceHandler.requests = []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), ResourceHandler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestLRUCache:
+    """Tests for LRUCache and ImageCache classes."""
+    
+    def test_evicts_least_recently_used(self):
+        """Old entries are evicted once the values exceed max_bytes."""
+        cache = LRUCache(10)
+        cache.put('a', 'A', 4)
+        cache.put('b', 'B', 4)
+        cache.get('a')
+        cache.put('c', 'C', 4)
+        
+        assert cache.get('b') is None
+        assert cache.get('a') == 'A' and cache.get('c') == 'C'
+        assert cache.size == 8
+    
+    def test_oversized_value_not_stored(self):
+        """A value larger than the whole cache is not stored."""
+        cache = LRUCache(10)
+        cache.put('big', 'X', 11)
+        
+        assert cache.get('big') is None
+        assert len(cache) == 0
+    
+    def test_image_cache_bounded(self):
+        """The image cache keeps the most recently used images."""
+        cache = ImageCache(max_entries=2)
+        cache['a'] = 1
+        cache['b'] = 2
+        cache['a']
+        cache['c'] = 3
+        
+        assert 'b' not in cache
+        assert list(cache) == ['a', 'c']
+
+
+class TestResourceFetcher:
+    """Tests for ResourceFetcher class."""
+    
+    def test_local_file_read_once(self, temp_dir):
+        """A local file is read once, and again after it changes."""
+        path = Path(temp_dir) / "logo.svg"
+        path.write_bytes(b"<svg/>")
+        fetcher = ResourceFetcher()
+        
+        body, mime_type, _ = fetcher.fetch(path.as_uri())
+        fetcher.fetch(path.as_uri())
+        
+        assert body == b"<svg/>"
+        assert mime_type == 'image/svg+xml'
+        assert fetcher.stats['reads'] == 1
+        
+        path.write_bytes(b"<svg></svg>")
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+        assert fetcher.fetch(path.as_uri())[0] == b"<svg></svg>"
+        assert fetcher.stats['reads'] == 2
+    
+    def test_remote_cached_on_disk(self, temp_dir, server):
+        """Remote resources are downloaded once and reused by later builds."""
+        url = f"{server}/style.css"
+        
+        body, mime_type, _ = ResourceFetcher(temp_dir).fetch(url)
+        fetcher = ResourceFetcher(temp_dir)
+        cached = fetcher.fetch(url)
+        
+        assert body == b"body { color: red; }"
+        assert mime_type.startswith('text/css')
+        assert cached[0] == body
+        assert fetcher.stats['disk_hits'] == 1
+        assert ResourceHandler.requests == ['/style.css']
+    
+    def test_expired_entry_downloaded_again(self, temp_dir, server):
+        """Entries older than maxAgeHours are downloaded again."""
+        url = f"{server}/style.css"
+        cache = ResourceCache(temp_dir)
+        cache.put(url, b"old", 'text/css')
+        meta_path = cache._entry_path(url) + '.json'
+        save_json_file(meta_path, {**load_json_file(meta_path), 'fetched': time.time() - 7200})
+        
+        fetcher = ResourceFetcher(temp_dir, {'maxAgeHours': 1})
+        
+        assert fetcher.fetch(url)[0] == b"body { color: red; }"
+        assert ResourceHandler.requests == ['/style.css']
+        assert cache.get(url, 3600)[0] == b"body { color: red; }"
+    
+    def test_offline_uses_cache_only(self, temp_dir, server):
+        """Offline mode uses stale cached copies and never downloads."""
+        cached_url = f"{server}/cached.css"
+        cache = ResourceCache(temp_dir)
+        cache.put(cached_url, b"cached", 'text/css')
+        meta_path = cache._entry_path(cached_url) + '.json'
+        save_json_file(meta_path, {**load_json_file(meta_path), 'fetched': 0})
+        fetcher = ResourceFetcher(temp_dir, {'offline': True, 'maxAgeHours': 1})
+        
+        assert fetcher.fetch(cached_url)[0] == b"cached"
+        with pytest.raises(OfflineError):
+            fetcher.fetch(f"{server}/missing.css")
+        assert ResourceHandler.requests == []
+        assert fetcher.failures == [f"{server}/missing.css"]
+    
+    def test_timeout(self, temp_dir, server):
+        """Slow remote resources fail after the configured timeout."""
+        fetcher = ResourceFetcher(temp_dir, {'timeout': 0.2})
+        
+        with pytest.raises(Exception):
+            fetcher.fetch(f"{server}/slow.css")
+        assert fetcher.failures == [f"{server}/slow.css"]
+        assert ResourceCache(temp_dir).get(f"{server}/slow.css") is None
+    
+    def test_retryable_failures(self, temp_dir):
+        """Only local files that do not exist are failures not worth retrying."""
+        fetcher = ResourceFetcher()
+        missing = Path(temp_dir, "missing.png").as_uri()
+        unreadable = Path(temp_dir, "folder.png")
+        unreadable.mkdir()
+        
+        for url in (missing, unreadable.as_uri()):
+            with pytest.raises(OSError):
+                fetcher.fetch(url)
+        
+        assert [is_retryable_failure(url) for url in fetcher.failures] == [False, True]
+        assert is_retryable_failure("https://example.org/a.png") is True
+
+
+class TestRecordingDependencies:
+    """Tests for recording_dependencies function."""
+    
+    def test_collects_local_files(self, temp_dir, monkeypatch):
+        """Fetched files and image cache lookups are collected, remote URLs are not."""
+        monkeypatch.setattr(fetch, '_FETCHER', None)
+        monkeypatch.setattr(fetch, '_IMAGE_CACHE', None)
+        style = Path(temp_dir) / "style.css"
+        style.write_text("body {}")
+        logo = Path(temp_dir) / "logo.png"
+        
+        with fetch.recording_dependencies() as dependencies:
+            fetch.get_fetcher().fetch(style.as_uri())
+            logo.as_uri() in fetch.get_image_cache()
+            "https://example.org/a.png" in fetch.get_image_cache()
+        fetch.get_fetcher().fetch(style.as_uri())
+        
+        assert dependencies == {str(style), str(logo)}
+        assert fetch.get_fetcher().dependencies is None
+        assert fetch.get_image_cache().dependencies is None
+
+
+class TestConfigureFetcher:
+    """Tests for configure_fetcher and get_fetcher functions."""
+    
+    def test_same_configuration_keeps_fetcher(self, temp_dir, monkeypatch):
+        """The process fetcher and its caches survive repeated configuration."""
+        monkeypatch.setattr(fetch, '_FETCHER', None)
+        monkeypatch.setattr(fetch, '_FETCHER_CONFIG', None)
+        
+        fetcher = fetch.configure_fetcher(temp_dir, {'timeout': 5})
+        
+        assert fetch.configure_fetcher(temp_dir, {'timeout': 5}) is fetcher
+        assert fetch.get_fetcher() is fetcher
+        assert fetch.configure_fetcher(temp_dir, {'timeout': 6}) is not fetcher
@@ -0,0 +1,249 @@
+"""
+Unit tests for bookbuilder.ignore module.
+
+Tests cover:
+- Translating gitignore patterns (wildcards, **, character sets)
+- Last-match-wins rules with negation and directory-only patterns
+- Nested .gitignore files and pruning of ignored directories
+- Sharing one matcher per root until a .gitignore changes
+- Walking with a directory snapshot
+"""
+
+import os
+import re
+import pytest
+
+from bookbuilder import ignore
+from bookbuilder.cache import DirectorySnapshot
+from bookbuilder.ignore import IgnoreMatcher, IgnoreRules, get_ignore_matcher, read_ignore_file, translate_pattern
+
+
+def write_file(path, content=""):
+    """Write a file, creating its directory."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+class TestTranslatePattern:
+    """Tests for translate_pattern function."""
+    
+    @pytest.mark.parametrize("pattern,path,expected", [
+        ("*.log", "a/b/debug.log", True),
+        ("*.log", "a/debug.log/x", False),
+        ("/build", "build", True),
+        ("/build", "src/build", False),
+        ("docs/*.md", "docs/a.md", True),
+        ("docs/*.md", "docs/sub/a.md", False),
+        ("**/tmp", "a/b/tmp", True),
+        ("logs/**", "logs/a/b.txt", True),
+        ("logs/**", "logs", False),
+        ("a/**/b", "a/b", True),
+        ("a/**/b", "a/x/y/b", True),
+        ("f[a-c]?.txt", "fb1.txt", True),
+        ("f[!a-c].txt", "fd.txt", True),
+        ("f[!a-c].txt", "fa.txt", False),
+        ("\\!important", "!important", True),
+    ])
+    def test_matches(self, pattern, path, expected):
+        """Patterns match like git: wildcards stop at /, slashes anchor."""
+        regex, _, _ = translate_pattern(pattern)
+        
+        assert IgnoreRules([pattern]).match(path, False) is (True if expected else None)
+        assert bool(re.fullmatch(regex, path)) is expected
+    
+    def test_flags(self):
+        """Negation and directory-only markers are split off."""
+        assert translate_pattern("!keep/")[1:] == (True, True)
+        assert translate_pattern("/") is None
+
+
+class TestIgnoreRules:
+    """Tests for IgnoreRules class."""
+    
+    def test_last_match_wins(self):
+        """A later negation re-includes, a later pattern excludes again."""
+        rules = IgnoreRules(["*.md", "!keep*.md", "keep-not.md"])
+        
+        assert rules.match("a.md", False) is True
+        assert rules.match("keep.md", False) is False
+        assert rules.match("keep-not.md", False) is True
+        assert rules.match("a.txt", False) is None
+    
+    def test_directory_only(self):
+        """Patterns ending in / only match directories."""
+        rules = IgnoreRules(["build/"])
+        
+        assert rules.match("build", True) is True
+        assert rules.match("build", False) is None
+
+
+class TestIgnoreMatcher:
+    """Tests for IgnoreMatcher class."""
+    
+    def test_nested_gitignore(self, temp_dir):
+        """A .gitignore in a subdirectory applies below it and overrides its parents."""
+        write_file(os.path.join(temp_dir, ".gitignore"), "*.md\n")
+        write_file(os.path.join(temp_dir, "docs", ".gitignore"), "!*.md\ndraft.md\n")
+        matcher = IgnoreMatcher(temp_dir)
+        
+        assert matcher.is_ignored(os.path.join(temp_dir, "notes.md"), False) is True
+        assert matcher.is_ignored(os.path.join(temp_dir, "docs", "guide.md"), False) is False
+        assert matcher.is_ignored(os.path.join(temp_dir, "docs", "draft.md"), False) is True
+        assert matcher.is_ignored(os.path.join(temp_dir, "docs", "sub", "x.md"), False) is False
+    
+    def test_anchored_to_gitignore_directory(self, temp_dir):
+        """Anchored patterns in a nested .gitignore are relative to its directory."""
+        write_file(os.path.join(temp_dir, "docs", ".gitignore"), "/out\n")
+        matcher = IgnoreMatcher(temp_dir)
+        
+        assert matcher.is_ignored(os.path.join(temp_dir, "docs", "out"), True) is True
+        assert matcher.is_ignored(os.path.join(temp_dir, "out"), True) is False
+        assert matcher.is_ignored(os.path.join(temp_dir, "docs", "a", "out"), True) is False
+    
+    def test_parent_directory_ignored(self, temp_dir):
+        """Files in an ignored directory cannot be re-included."""
+        matcher = IgnoreMatcher(temp_dir, ["build/", "!build/keep.md"])
+        
+        assert matcher.is_ignored(os.path.join(temp_dir, "build", "keep.md"), False) is True
+        assert matcher.is_ignored(os.path.join(temp_dir, "..", "elsewhere.md"), False) is False
+    
+    def test_walk_prunes_ignored_directories(self, temp_dir, monkeypatch):
+        """Ignored directories are neither listed nor entered."""
+        write_file(os.path.join(temp_dir, ".gitignore"), "node_modules/\n*.log\n")
+        write_file(os.path.join(temp_dir, "a.md"))
+        write_file(os.path.join(temp_dir, "debug.log"))
+        write_file(os.path.join(temp_dir, "node_modules", "pkg", ".gitignore"), "x\n")
+        write_file(os.path.join(temp_dir, "node_modules", "pkg", "readme.md"))
+        write_file(os.path.join(temp_dir, "src", "b.md"))
+        write_file(os.path.join(temp_dir, "src", ".gitignore"))
+        read = []
+        monkeypatch.setattr('bookbuilder.ignore.read_ignore_file', lambda path: read.append(path) or [])
+        matcher = IgnoreMatcher(temp_dir, ["node_modules/", "*.log"])
+        
+        walked = {os.path.relpath(d, temp_dir): (sorted(dirs), sorted(files)) for d, dirs, files in matcher.walk(temp_dir)}
+        
+        assert walked == {".": (["src"], [".gitignore", "a.md"]), "src": ([], [".gitignore", "b.md"])}
+        assert read == [os.path.join(temp_dir, "src", ".gitignore")]
+    
+    def test_walk_order_matches_os_walk(self, temp_dir):
+        """Walks are top-down, like os.walk."""
+        for path in ("a/x/1.md", "a/2.md", "b/3.md"):
+            write_file(os.path.join(temp_dir, path))
+        matcher = IgnoreMatcher(temp_dir, [])
+        
+        walked = [(d, sorted(dirs), sorted(files)) for d, dirs, files in matcher.walk(temp_dir)]
+        expected = [(d, sorted(dirs), sorted(files)) for d, dirs, files in os.walk(temp_dir)]
+        
+        assert sorted(walked) == sorted(expected)
+        assert walked[0][0] == temp_dir
+    
+    def test_walk_inside_ignored_directory(self, temp_dir):
+        """Walking a directory below an ignored one yields nothing."""
+        write_file(os.path.join(temp_dir, "build", "docs", "a.md"))
+        write_file(os.path.join(temp_dir, "docs", "b.md"))
+        matcher = IgnoreMatcher(temp_dir, ["build/"])
+        
+        assert list(matcher.walk(os.path.join(temp_dir, "build", "docs"))) == []
+        assert list(matcher.walk(os.path.join(temp_dir, "build"))) == []
+        assert [f for _, _, files in matcher.walk(os.path.join(temp_dir, "docs")) for f in files] == ["b.md"]
+    
+    def test_read_ignore_file(self, temp_dir):
+        """Comments and blank lines are skipped."""
+        path = os.path.join(temp_dir, ".gitignore")
+        write_file(path, "# comment\n\n*.pyc\n!keep.pyc\n")
+        
+        assert read_ignore_file(path) == ["*.pyc", "!keep.pyc"]
+        assert read_ignore_file(os.path.join(temp_dir, "missing")) == []
+
+
+class TestGetIgnoreMatcher:
+    """Tests for get_ignore_matcher function."""
+    
+    @pytest.fixture(autouse=True)
+    def no_shared_matchers(self, monkeypatch):
+        """Start without shared matchers."""
+        monkeypatch.setattr(ignore, '_MATCHERS', {})
+    
+    def test_shared_per_root(self, temp_dir):
+        """The same root gets the same matcher while its .gitignore files are unchanged."""
+        write_file(os.path.join(temp_dir, ".gitignore"), "*.log\n")
+        write_file(os.path.join(temp_dir, "docs", ".gitignore"), "draft.md\n")
+        matcher = get_ignore_matcher(temp_dir)
+        matcher.is_ignored(os.path.join(temp_dir, "docs", "draft.md"), False)
+        
+        assert get_ignore_matcher(os.path.join(temp_dir, "docs", "..")) is matcher
+        assert matcher.is_current() is True
+    
+    def test_rebuilt_when_gitignore_changes(self, temp_dir):
+        """Changing a .gitignore that was read gives a new matcher."""
+        path = os.path.join(temp_dir, "docs", ".gitignore")
+        write_file(path, "draft.md\n")
+        matcher = get_ignore_matcher(temp_dir)
+        draft = os.path.join(temp_dir, "docs", "draft.md")
+        assert matcher.is_ignored(draft, False) is True
+        
+        write_file(path, "other.md\n")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        
+        assert matcher.is_current() is False
+        assert get_ignore_matcher(temp_dir).is_ignored(draft, False) is False
+    
+    def test_rebuilt_when_root_gitignore_added(self, temp_dir):
+        """A .gitignore created at the root is picked up."""
+        matcher = get_ignore_matcher(temp_dir)
+        write_file(os.path.join(temp_dir, ".gitignore"), "*.md\n")
+        
+        assert get_ignore_matcher(temp_dir) is not matcher
+        assert get_ignore_matcher(temp_dir).is_ignored(os.path.join(temp_dir, "a.md"), False) is True
+
+
+class TestSnapshotWalk:
+    """Tests for walking with a directory snapshot."""
+    
+    OLD_MTIME = 1_600_000_000 * 10**9
+    
+    def make_tree(self, temp_dir):
+        """Create a small source tree whose directories look unchanged for a while."""
+        root = os.path.join(temp_dir, "src")
+        for path in ("a.md", "docs/b.md", "docs/img/c.png"):
+            write_file(os.path.join(root, path))
+        for directory in (root, os.path.join(root, "docs"), os.path.join(root, "docs", "img")):
+            os.utime(directory, ns=(self.OLD_MTIME, self.OLD_MTIME))
+        return root
+    
+    def walk_files(self, root, snapshot):
+        """Walk a tree, returning the relative paths of its files."""
+        return sorted(
+            os.path.relpath(os.path.join(d, f), root)
+            for d, _, files in IgnoreMatcher(root, []).walk(root, snapshot) for f in files
+        )
+    
+    def test_unchanged_directories_not_read(self, temp_dir, monkeypatch):
+        """A later walk lists unchanged directories from the snapshot."""
+        root = self.make_tree(temp_dir)
+        output_dir = os.path.join(temp_dir, "out")
+        snapshot = DirectorySnapshot(output_dir)
+        first = self.walk_files(root, snapshot)
+        snapshot.save()
+        scanned = []
+        scandir = os.scandir
+        monkeypatch.setattr(os, 'scandir', lambda path: scanned.append(path) or scandir(path))
+        
+        files = self.walk_files(root, DirectorySnapshot(output_dir))
+        
+        assert files == first == ["a.md", os.path.join("docs", "b.md"), os.path.join("docs", "img", "c.png")]
+        assert scanned == []
+    
+    def test_changed_directory_read_again(self, temp_dir):
+        """Adding a file changes its directory's mtime, so the directory is read again."""
+        root = self.make_tree(temp_dir)
+        output_dir = os.path.join(temp_dir, "out")
+        snapshot = DirectorySnapshot(output_dir)
+        self.walk_files(root, snapshot)
+        snapshot.save()
+        
+        write_file(os.path.join(root, "docs", "new.md"))
+        
+        assert os.path.join("docs", "new.md") in self.walk_files(root, DirectorySnapshot(output_dir))
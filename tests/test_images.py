@@ -0,0 +1,279 @@
+"""
+Unit tests for bookbuilder.images module.
+
+Tests cover:
+- Pixel limits from the page size and margins
+- Downsampling and recompressing JPEG and PNG images
+- Caching processed images by content hash
+- Rasterizing heavy SVG diagrams (icons stay vector)
+- Render time saved by rasterized diagrams, for every document using them
+- Processing images fetched for WeasyPrint
+- Markdown copies pointing at processed images (EPUB)
+"""
+
+import io
+import os
+import re
+import base64
+from pathlib import Path
+import pytest
+from PIL import Image
+
+from bookbuilder import fetch, images
+from bookbuilder.fetch import ResourceFetcher
+from bookbuilder.images import (
+    EPUB_SOURCES_DIR_NAME,
+    ImageProcessor,
+    image_pixel_limits,
+    prepare_markdown_images,
+    svg_viewport
+)
+
+# Letter page with 1in margins: a 6.5in x 9in content box
+STYLES = {'pageSize': 'letter', 'margins': '1in'}
+
+
+def make_image(width, height, image_format='PNG'):
+    """Encode a gradient image (so it does not compress to nothing)."""
+    image = Image.new('RGB', (width, height))
+    image.putdata([(x % 256, y % 256, (x + y) % 256) for y in range(height) for x in range(width)])
+    output = io.BytesIO()
+    image.save(output, image_format)
+    return output.getvalue()
+
+
+def make_svg(elements, size='width="4in" height="2in"'):
+    """Make an SVG diagram with the given number of elements."""
+    shapes = ''.join(f'<rect x="{n % 100}" y="{n % 50}" width="1" height="1"/>' for n in range(elements))
+    return f'<svg xmlns="http://www.w3.org/2000/svg" {size} viewBox="0 0 100 50">{shapes}</svg>'.encode()
+
+
+class FakeCairoSVG:
+    """Stands in for CairoSVG, drawing a blank PNG of the requested size."""
+    
+    calls = []
+    
+    @classmethod
+    def svg2png(cls, bytestring, output_width, output_height):
+        cls.calls.append((output_width, output_height))
+        return make_image(output_width, output_height)
+
+
+@pytest.fixture
+def fake_cairosvg(monkeypatch):
+    """Make SVG rasterization available without CairoSVG."""
+    FakeCairoSVG.calls = []
+    monkeypatch.setattr(images, 'cairosvg', FakeCairoSVG)
+    return FakeCairoSVG
+
+
+def image_size(data):
+    """Get the pixel size of encoded image data."""
+    with Image.open(io.BytesIO(data)) as image:
+        return image.size
+
+
+class TestImagePixelLimits:
+    """Tests for image_pixel_limits function."""
+    
+    def test_content_box_at_dpi(self):
+        """Limits are the content box (page size minus margins) at the DPI."""
+        assert image_pixel_limits(STYLES, 100) == (650, 900)
+    
+    def test_defaults(self):
+        """Without settings, A4 with the default margins is used."""
+        width, height = image_pixel_limits(None, 72)
+        
+        assert width == round(595.28 - 2 * 0.8 * 72)
+        assert height == round(841.89 - 2 * 72)
+
+
+class TestImageProcessor:
+    """Tests for ImageProcessor class."""
+    
+    @pytest.mark.parametrize("image_format,mime_type", [("PNG", "image/png"), ("JPEG", "image/jpeg")])
+    def test_large_image_downsampled(self, image_format, mime_type):
+        """Images larger than the content box are resized to fit it."""
+        processor = ImageProcessor(image_settings={'dpi': 10}, style_settings=STYLES)
+        body = make_image(200, 90, image_format)
+        
+        data = processor.process(body, mime_type)
+        
+        assert image_size(data) == (65, 29)
+        assert len(data) < len(body)
+        assert processor.stats['processed'] == 1
+    
+    def test_small_image_kept(self):
+        """An image that fits and does not shrink is used as it is."""
+        processor = ImageProcessor(style_settings=STYLES)
+        body = make_image(4, 4)
+        
+        assert processor.process(body, 'image/png') is body
+    
+    def test_other_types_untouched(self):
+        """Only JPEG and PNG images are processed."""
+        processor = ImageProcessor(image_settings={'dpi': 1}, style_settings=STYLES)
+        
+        assert processor.process(b"<svg/>", 'image/svg+xml') == b"<svg/>"
+        assert processor.process(b"not a png", 'image/png') == b"not a png"
+    
+    def test_cached_by_content(self, temp_dir):
+        """Processed images are reused from the cache by later processors."""
+        body = make_image(200, 90)
+        first = ImageProcessor(temp_dir, {'dpi': 10}, STYLES).process(body, 'image/png')
+        
+        processor = ImageProcessor(temp_dir, {'dpi': 10}, STYLES)
+        
+        assert processor.process(body, 'image/png') == first
+        assert processor.stats == {'processed': 0, 'cached': 1, 'saved': 0}
+        assert ImageProcessor(temp_dir, {'dpi': 20}, STYLES).process(body, 'image/png') != first
+    
+    def test_fetched_images_processed(self, temp_dir):
+        """The resource fetcher hands WeasyPrint the processed image."""
+        path = Path(temp_dir) / "shot.png"
+        path.write_bytes(make_image(200, 90))
+        fetcher = ResourceFetcher(image_processor=ImageProcessor(temp_dir, {'dpi': 10}, STYLES))
+        
+        body, mime_type, _ = fetcher.fetch(path.as_uri())
+        
+        assert mime_type == 'image/png'
+        assert image_size(body) == (65, 29)
+
+
+class TestSvgViewport:
+    """Tests for svg_viewport function."""
+    
+    def test_size_from_attributes(self):
+        """Width and height are converted to CSS pixels."""
+        assert svg_viewport(b'<svg width="2in" height="72pt">') == (192.0, 96.0, ' width="2in" height="72pt"')
+    
+    def test_size_completed_from_view_box(self):
+        """A missing width or height follows the viewBox aspect ratio."""
+        assert svg_viewport(b'<svg width="2in" viewBox="0 0 100 50">') == (192.0, 96.0, ' width="2in"')
+        assert svg_viewport(b'<svg viewBox="0 0 300 100">') == (300.0, 100.0, '')
+    
+    def test_unknown_size(self):
+        """Percentages without a viewBox give no size."""
+        assert svg_viewport(b'<svg width="100%">') is None
+        assert svg_viewport(b'not svg') is None
+
+
+class TestSvgRasterization:
+    """Tests for rasterizing SVG images in ImageProcessor."""
+    
+    SETTINGS = {'downsample': False, 'rasterizeSvg': True, 'dpi': 96, 'svgMinElements': 50}
+    
+    def test_heavy_svg_rasterized(self, temp_dir, fake_cairosvg):
+        """Diagrams above the threshold become a PNG keeping the original size."""
+        processor = ImageProcessor(temp_dir, self.SETTINGS, STYLES)
+        
+        data = processor.process(make_svg(60), 'image/svg+xml')
+        
+        assert fake_cairosvg.calls == [(384, 192)]
+        assert b'width="4in" height="2in"' in data
+        assert b'viewBox="0 0 384 192"' in data
+        png = base64.b64decode(re.search(rb'base64,([^"]+)', data).group(1))
+        assert image_size(png) == (384, 192)
+        assert processor.svg_stats['rasterized'] == 1
+    
+    def test_content_box_limits_pixels(self, fake_cairosvg):
+        """Diagrams are not rasterized larger than the page's content box."""
+        processor = ImageProcessor(None, self.SETTINGS, STYLES)
+        
+        processor.process(make_svg(60, 'width="20in" height="10in"'), 'image/svg+xml')
+        
+        assert fake_cairosvg.calls == [(624, 312)]
+    
+    def test_icons_stay_vector(self, fake_cairosvg):
+        """Small SVGs are used as they are."""
+        processor = ImageProcessor(None, self.SETTINGS, STYLES)
+        body = make_svg(5)
+        
+        assert processor.process(body, 'image/svg+xml') is body
+        assert processor.process(body, 'image/svg+xml') is body
+        assert fake_cairosvg.calls == []
+    
+    def test_size_threshold(self, fake_cairosvg):
+        """Large SVG files are rasterized even with few elements."""
+        processor = ImageProcessor(None, {**self.SETTINGS, 'svgMinKB': 1}, STYLES)
+        body = make_svg(1).replace(b'<rect', b'<!--' + b'x' * 1024 + b'--><rect')
+        
+        assert processor.process(body, 'image/svg+xml') != body
+    
+    def test_cached_with_time_saved(self, temp_dir, fake_cairosvg):
+        """Later processors reuse the rasterized diagram and report the time saved."""
+        body = make_svg(60)
+        first = ImageProcessor(temp_dir, self.SETTINGS, STYLES).process(body, 'image/svg+xml')
+        
+        processor = ImageProcessor(temp_dir, self.SETTINGS, STYLES)
+        
+        assert processor.process(body, 'image/svg+xml') == first
+        assert len(fake_cairosvg.calls) == 1
+        assert processor.svg_stats['rasterized'] == 1
+        assert processor.svg_stats['seconds_saved'] > 0
+    
+    def test_time_saved_credited_per_document(self, temp_dir, fake_cairosvg, monkeypatch):
+        """Every document using a diagram reports its time saved, wherever the diagram comes from."""
+        path = Path(temp_dir) / "diagram.svg"
+        path.write_bytes(make_svg(60))
+        url = path.as_uri()
+        monkeypatch.setattr(fetch, '_IMAGE_CACHE', None)
+        
+        def render(fetcher, fetched=True):
+            monkeypatch.setattr(fetch, '_FETCHER', fetcher)
+            with fetch.recording_rasterized_svgs() as rasterized:
+                if fetched:
+                    fetcher.fetch(url)
+                else:
+                    url in fetch.get_image_cache()
+            return rasterized
+        
+        fetcher = ResourceFetcher(image_processor=ImageProcessor(temp_dir, self.SETTINGS, STYLES))
+        first = render(fetcher)
+        assert list(first) == [url] and first[url] > 0
+        assert render(fetcher) == first  # fetcher memory cache
+        assert render(fetcher, fetched=False) == first  # decoded image cache
+        
+        later_build = ResourceFetcher(image_processor=ImageProcessor(temp_dir, self.SETTINGS, STYLES))
+        assert render(later_build) == first  # image stage disk cache
+        assert len(fake_cairosvg.calls) == 1
+    
+    def test_disabled(self, fake_cairosvg):
+        """SVGs and raster images are only touched by the stages that are on."""
+        body = make_svg(60)
+        png = make_image(200, 90)
+        
+        assert ImageProcessor(None, {'dpi': 10}, STYLES).process(body, 'image/svg+xml') is body
+        assert ImageProcessor(None, {**self.SETTINGS, 'dpi': 10}, STYLES).process(png, 'image/png') is png
+
+
+class TestPrepareMarkdownImages:
+    """Tests for prepare_markdown_images function."""
+    
+    def test_references_rewritten(self, temp_dir):
+        """Files with large images are copied with references to the processed images."""
+        os.makedirs(os.path.join(temp_dir, "img"))
+        with open(os.path.join(temp_dir, "img", "big.png"), 'wb') as f:
+            f.write(make_image(200, 90))
+        with open(os.path.join(temp_dir, "img", "small.png"), 'wb') as f:
+            f.write(make_image(4, 4))
+        chapter = os.path.join(temp_dir, "chapter.md")
+        with open(chapter, 'w') as f:
+            f.write('![Big](img/big.png "Title")\n\n<img src="img/small.png">\n\n![Remote](https://x.org/a.png)\n')
+        plain = os.path.join(temp_dir, "plain.md")
+        with open(plain, 'w') as f:
+            f.write("# No images\n")
+        output_dir = os.path.join(temp_dir, "out")
+        processor = ImageProcessor(output_dir, {'dpi': 10}, STYLES)
+        
+        files = prepare_markdown_images([chapter, plain], processor, output_dir)
+        
+        assert files[1] == plain
+        assert files[0] == os.path.join(output_dir, EPUB_SOURCES_DIR_NAME, "000-chapter.md")
+        with open(files[0]) as f:
+            content = f.read()
+        processed = content.split("](<")[1].split(">")[0]
+        assert image_size(Path(processed).read_bytes()) == (65, 29)
+        assert '"Title")' in content
+        assert '<img src="img/small.png">' in content
+        assert "(https://x.org/a.png)" in content
@@ -0,0 +1,258 @@
+"""
+Unit tests for bookbuilder.incremental module.
+
+Tests cover:
+- Reading the outline and named destinations of a source PDF
+- Rebuilding the book outline from source entries
+- Replacing changed pages with an appended incremental-update section
+- Falling back to a full build when the layout changed
+- Stamping replaced pages again
+- Keeping links within a replaced source
+"""
+
+import os
+import datetime
+import pytest
+from pypdf import PdfReader, PdfWriter
+from pypdf.annotations import Link
+from pypdf.generic import ArrayObject, NameObject
+from reportlab.pdfgen import canvas
+
+from bookbuilder import incremental, stamp
+from bookbuilder.cache import BookMap
+from bookbuilder.combine import combine_pdfs_with_bookmarks
+from bookbuilder.incremental import (
+    build_outline,
+    describe_sources,
+    read_structure,
+    record_book,
+    update_book
+)
+from bookbuilder.merge import IncrementalUpdateError
+from bookbuilder.plan import ChapterEntry
+from bookbuilder.stamp import PageStamper
+
+
+def make_pdf(path, pages, label="v1", heading_page=0):
+    """Write a PDF with one outline entry and named destination on heading_page."""
+    c = canvas.Canvas(path)
+    for n in range(pages):
+        c.drawString(100, 100, f"{os.path.basename(path)} {label} page {n + 1}")
+        if n == heading_page:
+            c.bookmarkPage("heading")
+            c.addOutlineEntry(f"Heading {label}", "heading", level=0)
+        c.showPage()
+    c.save()
+    writer = PdfWriter(clone_from=path)
+    writer.add_named_destination(os.path.basename(path), heading_page)
+    writer.write(path)
+    return path
+
+
+class TestStructure:
+    """Tests for read_structure and build_outline."""
+    
+    def test_read_structure(self, temp_dir):
+        """Outline entries and named destinations point at source pages."""
+        pdf = make_pdf(os.path.join(temp_dir, "a.pdf"), 3, heading_page=1)
+        
+        outline, named_dests = read_structure(pdf)
+        
+        assert [(node[0], node[1]) for node in outline] == [("Heading v1", 1)]
+        assert named_dests["a.pdf"][0] == 1
+    
+    def test_build_outline_nesting(self):
+        """Chapter bookmarks nest the outline of the file that starts the chapter."""
+        def source(role, pages, outline=(), chapter=None, nested=False):
+            return {'role': role, 'pages': pages, 'chapter': chapter, 'section': f"Chapter {chapter}",
+                    'nested': nested, 'outline': [list(node) for node in outline], 'dests': {}}
+        sources = [
+            source('toc', 1),
+            source('chapter', 2, [("A", 1, None, [])], chapter=0),
+            source('chapter', 2, [("B", 0, None, [])], chapter=0),
+            source('chapter', 2, [("C", 0, None, [])], chapter=1, nested=True),
+            source('chapter', 2, [("D", 1, None, [])], chapter=1, nested=True),
+        ]
+        
+        nodes, _ = build_outline(sources)
+        
+        assert nodes == [
+            ["Chapter 0", 1, None, [["A", 2, None, []]]],
+            ["B", 3, None, []],
+            ["Chapter 1", 5, None, [["C", 5, None, []], ["D", 8, None, []]]],
+        ]
+
+
+class TestUpdateBook:
+    """Tests for update_book function."""
+    
+    def build(self, temp_dir, chapters):
+        """Build a book from scratch and record its map."""
+        toc = make_pdf(os.path.join(temp_dir, "toc.pdf"), 1, label="toc")
+        chapter_info = [ChapterEntry('One', 2, 1), ChapterEntry('Two', 4, 1)]
+        book = os.path.join(temp_dir, "book.pdf")
+        combine_pdfs_with_bookmarks(chapters, chapter_info, book, toc)
+        sources = self.sources(temp_dir, chapters)
+        record_book(book, sources, BookMap(temp_dir), full_build=True)
+        return book
+    
+    def sources(self, temp_dir, chapters):
+        """Describe the sources of the book."""
+        toc = os.path.join(temp_dir, "toc.pdf")
+        chapter_info = [ChapterEntry('One', 2, 1), ChapterEntry('Two', 4, 1)]
+        page_counts = {pdf: len(PdfReader(pdf).pages) for pdf in [toc] + chapters}
+        return describe_sources(None, toc, chapter_info, chapters, None, page_counts)
+    
+    def chapters(self, temp_dir):
+        """Write two two-page chapter files."""
+        return [make_pdf(os.path.join(temp_dir, f"ch{n}.pdf"), 2) for n in range(2)]
+    
+    def test_changed_pages_appended(self, temp_dir, capsys):
+        """Only an update section is appended, and the book shows the new pages."""
+        chapters = self.chapters(temp_dir)
+        book = self.build(temp_dir, chapters)
+        with open(book, 'rb') as f:
+            original = f.read()
+        
+        make_pdf(chapters[1], 2, label="v2")
+        
+        assert update_book(book, self.sources(temp_dir, chapters), BookMap(temp_dir))
+        with open(book, 'rb') as f:
+            updated = f.read()
+        assert updated.startswith(original)
+        assert updated.count(b"startxref") == original.count(b"startxref") + 1
+        texts = [page.extract_text() for page in PdfReader(book).pages]
+        assert "ch0.pdf v1 page 1" in texts[1]
+        assert "ch1.pdf v2 page 2" in texts[4]
+        assert "Updated 1 sources (2 pages)" in capsys.readouterr().out
+    
+    def test_moved_heading_rewrites_outline(self, temp_dir):
+        """Outline entries and named destinations follow a heading that moved."""
+        chapters = self.chapters(temp_dir)
+        book = self.build(temp_dir, chapters)
+        
+        make_pdf(chapters[0], 2, label="v2", heading_page=1)
+        
+        assert update_book(book, self.sources(temp_dir, chapters), BookMap(temp_dir))
+        reader = PdfReader(book)
+        heading = reader.outline[2][0]
+        assert [item.title for item in reader.outline if not isinstance(item, list)] == ["Heading toc", "One", "Two"]
+        assert heading.title == "Heading v2"
+        assert reader.get_destination_page_number(heading) == 2
+        assert reader.get_destination_page_number(reader.named_destinations["ch0.pdf"]) == 2
+        assert reader.get_destination_page_number(reader.named_destinations["ch1.pdf"]) == 3
+    
+    def test_unchanged_sources_left_alone(self, temp_dir):
+        """A book whose sources did not change is not written."""
+        chapters = self.chapters(temp_dir)
+        book = self.build(temp_dir, chapters)
+        size = os.path.getsize(book)
+        
+        assert update_book(book, self.sources(temp_dir, chapters), BookMap(temp_dir))
+        assert os.path.getsize(book) == size
+    
+    @pytest.mark.parametrize("change", ["page_count", "modified_book", "no_map"])
+    def test_full_build_needed(self, temp_dir, change):
+        """Layout changes, an edited book or a missing map need a full build."""
+        chapters = self.chapters(temp_dir)
+        book = self.build(temp_dir, chapters)
+        if change == "page_count":
+            make_pdf(chapters[1], 3, label="v2")
+        elif change == "modified_book":
+            with open(book, 'ab') as f:
+                f.write(b"\n% edited\n")
+        else:
+            os.remove(BookMap(temp_dir).path)
+        
+        assert not update_book(book, self.sources(temp_dir, chapters), BookMap(temp_dir))
+    
+    def test_links_within_source_kept(self, temp_dir):
+        """A link between pages of a replaced source targets the book page, not a copy."""
+        chapters = self.chapters(temp_dir)
+        book = self.build(temp_dir, chapters)
+        
+        make_pdf(chapters[1], 2, label="v2")
+        writer = PdfWriter(clone_from=chapters[1])
+        link = writer.add_annotation(0, Link(rect=(50, 50, 200, 80), target_page_index=1))
+        link[NameObject("/Dest")] = ArrayObject([writer.pages[1].indirect_reference, NameObject("/Fit")])
+        writer.write(chapters[1])
+        
+        assert update_book(book, self.sources(temp_dir, chapters), BookMap(temp_dir))
+        reader = PdfReader(book)
+        link = reader.pages[3]["/Annots"][0].get_object()
+        assert len(reader.pages) == 5
+        assert link["/Dest"][0].idnum == reader.pages[4].indirect_reference.idnum
+    
+    def test_full_build_without_incremental_writer(self, temp_dir, monkeypatch):
+        """A pypdf that cannot write incremental updates falls back to a full build."""
+        chapters = self.chapters(temp_dir)
+        book = self.build(temp_dir, chapters)
+        make_pdf(chapters[1], 2, label="v2")
+        
+        def unsupported(pdf_path):
+            raise IncrementalUpdateError("pypdf object table not found")
+        monkeypatch.setattr(incremental, 'open_incremental_writer', unsupported)
+        
+        assert not update_book(book, self.sources(temp_dir, chapters), BookMap(temp_dir))
+    
+    def test_full_build_when_stamps_cannot_be_added(self, temp_dir, monkeypatch):
+        """A pypdf that cannot add the stamp objects falls back to a full build."""
+        chapters = self.chapters(temp_dir)
+        toc = make_pdf(os.path.join(temp_dir, "toc.pdf"), 1, label="toc")
+        chapter_info = [ChapterEntry('One', 2, 1), ChapterEntry('Two', 4, 1)]
+        book = os.path.join(temp_dir, "book.pdf")
+        stamper = PageStamper({'footerCenter': 'Page {page}'})
+        for pdf in chapters:
+            stamper.add_document(pdf, os.path.basename(pdf))
+        combine_pdfs_with_bookmarks(chapters, chapter_info, book, toc, stamper=stamper)
+        record_book(book, self.sources(temp_dir, chapters), BookMap(temp_dir), full_build=True, stamper=stamper)
+        make_pdf(chapters[1], 2, label="v2")
+        
+        def unsupported(writer, obj):
+            raise IncrementalUpdateError("pypdf cannot add indirect objects")
+        monkeypatch.setattr(stamp, 'add_indirect_object', unsupported)
+        with open(book, 'rb') as f:
+            original = f.read()
+        
+        assert not update_book(book, self.sources(temp_dir, chapters), BookMap(temp_dir), stamper=stamper)
+        with open(book, 'rb') as f:
+            assert f.read() == original
+    
+    def test_growth_limit(self, temp_dir):
+        """Updates stop once they have grown the book past MAX_GROWTH."""
+        chapters = self.chapters(temp_dir)
+        book = self.build(temp_dir, chapters)
+        book_map = BookMap(temp_dir)
+        book_map.data['full_size'] = os.path.getsize(book) // 4
+        book_map.save()
+        
+        make_pdf(chapters[1], 2, label="v2")
+        
+        assert not update_book(book, self.sources(temp_dir, chapters), BookMap(temp_dir))
+    
+    def test_stamped_pages_restamped(self, temp_dir):
+        """Replaced pages are stamped again, and a new date restamps every page."""
+        chapters = self.chapters(temp_dir)
+        toc = make_pdf(os.path.join(temp_dir, "toc.pdf"), 1, label="toc")
+        chapter_info = [ChapterEntry('One', 2, 1), ChapterEntry('Two', 4, 1)]
+        book = os.path.join(temp_dir, "book.pdf")
+        
+        def stamper(day):
+            stamper = PageStamper({'footerLeft': '{date}', 'dateFormat': '%d/%m'}, date=datetime.date(2024, 5, day))
+            for pdf in chapters:
+                stamper.add_document(pdf, os.path.basename(pdf))
+            return stamper
+        
+        combine_pdfs_with_bookmarks(chapters, chapter_info, book, toc, stamper=stamper(1))
+        record_book(book, self.sources(temp_dir, chapters), BookMap(temp_dir), full_build=True, stamper=stamper(1))
+        
+        make_pdf(chapters[1], 2, label="v2")
+        assert update_book(book, self.sources(temp_dir, chapters), BookMap(temp_dir), stamper=stamper(1))
+        texts = [page.extract_text() for page in PdfReader(book).pages]
+        assert "ch1.pdf v2 page 1" in texts[3] and "Page 4 of 5" in texts[3] and "01/05" in texts[3]
+        
+        sources = self.sources(temp_dir, chapters)
+        record_book(book, sources, BookMap(temp_dir), full_build=False, stamper=stamper(1))
+        assert update_book(book, self.sources(temp_dir, chapters), BookMap(temp_dir), stamper=stamper(2))
+        texts = [page.extract_text() for page in PdfReader(book).pages]
+        assert all("02/05" in text and "01/05" not in text for text in texts[1:])
@@ -9,10 +9,12 @@ Tests cover end-to-end workflows:
 
 import os
 import json
+import argparse
 import subprocess
 import pytest
 
 from bookbuilder import build_book
+from bookbuilder.cli import non_negative_int
 from bookbuilder.utils import load_config, deep_merge
 
 
@@ -168,6 +170,14 @@ class TestCLIIntegration:
         
         assert result.returncode == 0
         assert "--confirm" in result.stdout
+    
+    def test_negative_jobs_rejected(self):
+        """--jobs takes 0 (one per CPU core) or a positive count."""
+        assert non_negative_int("0") == 0
+        assert non_negative_int("4") == 4
+        for value in ("-3", "many"):
+            with pytest.raises(argparse.ArgumentTypeError):
+                non_negative_int(value)
 
 
 class TestErrorHandling:
@@ -0,0 +1,335 @@
+"""
+Unit tests for bookbuilder.merge module.
+
+Tests cover:
+- Merge engine selection
+- Page, outline and named destination preservation in both engines
+- Incremental output of the streaming engine
+- Deduplication of identical objects across inputs
+- Deduplication statistics of the pypdf engine
+- Adding indirect objects, with an error when pypdf cannot
+"""
+
+import os
+import pytest
+from pypdf import PdfReader, PdfWriter
+from pypdf.annotations import Link
+from pypdf.generic import ArrayObject, NameObject, NumberObject, RectangleObject
+from PIL import Image
+from reportlab.pdfgen import canvas
+
+from bookbuilder import merge
+from bookbuilder.merge import (
+    IncrementalUpdateError,
+    PikepdfMerger,
+    PypdfMerger,
+    StreamingMerger,
+    add_indirect_object,
+    count_pages,
+    create_merger
+)
+
+# Merge engines, skipping those whose optional library is not installed
+MERGE_ENGINES = [
+    pytest.param(engine, marks=pytest.mark.skipif(
+        engine == 'pikepdf' and merge.pikepdf is None, reason="pikepdf is not installed"))
+    for engine in merge.MERGE_ENGINES
+]
+
+
+def make_document(path, title, pages=2):
+    """Write a PDF with text, an outline, a named destination and an internal link."""
+    source = path + ".src.pdf"
+    c = canvas.Canvas(source)
+    for n in range(pages):
+        c.drawString(100, 700, f"{title} page {n + 1}")
+        c.showPage()
+    c.save()
+    
+    writer = PdfWriter(clone_from=source)
+    parent = writer.add_outline_item(f"{title} heading", 0)
+    writer.add_outline_item(f"{title} section", pages - 1, parent=parent)
+    writer.add_named_destination(f"{title}-end", pages - 1)
+    link = writer.add_annotation(0, Link(rect=(50, 50, 200, 80), target_page_index=pages - 1))
+    # Older pypdf releases write the page index instead of a page reference
+    link[NameObject("/Dest")] = ArrayObject([writer.pages[pages - 1].indirect_reference, NameObject("/Fit")])
+    writer.write(path)
+    os.remove(source)
+    return path
+
+
+def make_logo_document(path, logo_path, title):
+    """Write a one-page PDF that embeds the given image."""
+    c = canvas.Canvas(path)
+    c.drawString(100, 700, title)
+    c.drawImage(logo_path, 100, 400, width=200, height=200)
+    c.showPage()
+    c.save()
+    return path
+
+
+def make_logo(path):
+    """Write a noisy PNG so the embedded image stream is large."""
+    image = Image.effect_noise((200, 200), 80).convert("RGB")
+    image.save(path)
+    return path
+
+
+def image_ids(reader):
+    """Get the object numbers of the images drawn on every page."""
+    ids = []
+    for page in reader.pages:
+        xobjects = page["/Resources"]["/XObject"]
+        ids.extend(xobjects.raw_get(name).idnum for name in xobjects)
+    return ids
+
+
+def page_texts(reader):
+    """Extract the text of every page."""
+    return [page.extract_text().strip() for page in reader.pages]
+
+
+def outline_tree(reader, items=None):
+    """Flatten an outline to (title, page_number, children) tuples."""
+    items = reader.outline if items is None else items
+    tree = []
+    for item in items:
+        if isinstance(item, list):
+            title, page, _ = tree[-1]
+            tree[-1] = (title, page, outline_tree(reader, item))
+        else:
+            tree.append((item.title, reader.get_destination_page_number(item), []))
+    return tree
+
+
+class TestCreateMerger:
+    """Tests for create_merger function."""
+    
+    def test_default_engine(self, temp_dir):
+        """pypdf is the default engine."""
+        merger = create_merger(os.path.join(temp_dir, "out.pdf"))
+        
+        assert isinstance(merger, PypdfMerger)
+    
+    def test_streaming_engine(self, temp_dir):
+        """The streaming engine can be selected by name."""
+        merger = create_merger(os.path.join(temp_dir, "out.pdf"), "streaming")
+        merger.close()
+        
+        assert isinstance(merger, StreamingMerger)
+    
+    @pytest.mark.skipif(merge.pikepdf is None, reason="pikepdf is not installed")
+    def test_pikepdf_engine(self, temp_dir):
+        """The pikepdf engine can be selected by name."""
+        merger = create_merger(os.path.join(temp_dir, "out.pdf"), "pikepdf")
+        merger.close()
+        
+        assert isinstance(merger, PikepdfMerger)
+    
+    def test_stats_start_empty(self, temp_dir):
+        """Every engine reports deduplication statistics."""
+        merger = create_merger(os.path.join(temp_dir, "out.pdf"), "pypdf")
+        
+        assert merger.stats == {'deduplicated_objects': 0, 'bytes_saved': 0}
+    
+    def test_unknown_engine(self, temp_dir):
+        """Unknown engine names are rejected."""
+        with pytest.raises(ValueError, match="Unsupported merge engine"):
+            create_merger(os.path.join(temp_dir, "out.pdf"), "fast")
+    
+    def test_pikepdf_engine_without_pikepdf(self, temp_dir, monkeypatch):
+        """Selecting pikepdf without the library installed is a clear error."""
+        monkeypatch.setattr(merge, 'pikepdf', None)
+        
+        with pytest.raises(ImportError, match="pikepdf"):
+            create_merger(os.path.join(temp_dir, "out.pdf"), "pikepdf")
+
+
+@pytest.mark.parametrize("engine", MERGE_ENGINES)
+class TestMergeEngines:
+    """Behavior shared by every merge engine."""
+    
+    def merge(self, temp_dir, engine):
+        """Merge two documents into a chapter and return the reader."""
+        first = make_document(os.path.join(temp_dir, "a.pdf"), "Alpha")
+        second = make_document(os.path.join(temp_dir, "b.pdf"), "Beta", pages=3)
+        output = os.path.join(temp_dir, f"{engine}.pdf")
+        
+        merger = create_merger(output, engine)
+        assert merger.append(first, "Chapter") == 2
+        assert merger.append(second) == 3
+        merger.close()
+        return PdfReader(output)
+    
+    def test_pages_in_order(self, temp_dir, engine):
+        """All pages are copied in input order."""
+        reader = self.merge(temp_dir, engine)
+        
+        assert page_texts(reader) == [
+            "Alpha page 1", "Alpha page 2",
+            "Beta page 1", "Beta page 2", "Beta page 3",
+        ]
+    
+    def test_outline_preserved(self, temp_dir, engine):
+        """The chapter item nests the first file's outline; later outlines follow it."""
+        reader = self.merge(temp_dir, engine)
+        
+        assert outline_tree(reader) == [
+            ("Chapter", 0, [("Alpha heading", 0, [("Alpha section", 1, [])])]),
+            ("Beta heading", 2, [("Beta section", 4, [])]),
+        ]
+    
+    def test_named_destinations_preserved(self, temp_dir, engine):
+        """Named destinations point at the merged pages."""
+        reader = self.merge(temp_dir, engine)
+        dests = reader.named_destinations
+        
+        assert reader.get_destination_page_number(dests["Alpha-end"]) == 1
+        assert reader.get_destination_page_number(dests["Beta-end"]) == 4
+    
+    def test_count_pages(self, temp_dir, engine):
+        """Every engine counts pages with its own PDF library."""
+        source = make_document(os.path.join(temp_dir, "a.pdf"), "Alpha", pages=3)
+        
+        assert count_pages(source, engine) == 3
+    
+    def test_internal_links_preserved(self, temp_dir, engine):
+        """Link annotations still target the right page."""
+        reader = self.merge(temp_dir, engine)
+        page_ids = [page.indirect_reference.idnum for page in reader.pages]
+        
+        targets = []
+        for n in (0, 2):
+            link = reader.pages[n]["/Annots"][0].get_object()
+            targets.append(page_ids.index(link["/Dest"][0].idnum))
+        
+        assert targets == [1, 4]
+
+
+class TestStreamingMerger:
+    """Tests specific to the streaming engine."""
+    
+    def test_pages_written_before_close(self, temp_dir):
+        """Page content is on disk as soon as an input is appended."""
+        source = make_document(os.path.join(temp_dir, "a.pdf"), "Alpha")
+        output = os.path.join(temp_dir, "out.pdf")
+        merger = StreamingMerger(output)
+        
+        merger.append(source)
+        merger._stream.flush()
+        written = os.path.getsize(output)
+        merger.close()
+        
+        assert written > os.path.getsize(output) / 2
+    
+    def test_inherited_resources_copied(self, temp_dir):
+        """Attributes inherited from the input page tree are kept on each page."""
+        source = os.path.join(temp_dir, "inherit.pdf")
+        writer = PdfWriter()
+        writer.add_blank_page(200, 300)
+        del writer.pages[0][NameObject("/MediaBox")]
+        writer.root_object["/Pages"][NameObject("/MediaBox")] = RectangleObject([0, 0, 200, 300])
+        writer.write(source)
+        output = os.path.join(temp_dir, "out.pdf")
+        
+        merger = StreamingMerger(output)
+        merger.append(source)
+        merger.close()
+        
+        box = PdfReader(output).pages[0].mediabox
+        assert (box.width, box.height) == (200, 300)
+    
+    def test_empty_book(self, temp_dir):
+        """A merge without inputs still produces a valid (empty) PDF."""
+        output = os.path.join(temp_dir, "out.pdf")
+        
+        merger = StreamingMerger(output)
+        merger.close()
+        
+        assert len(PdfReader(output).pages) == 0
+
+
+@pytest.mark.parametrize("engine", MERGE_ENGINES)
+class TestDeduplication:
+    """Identical objects from different inputs are written once."""
+    
+    def merge(self, temp_dir, engine, deduplicate):
+        """Merge three chapters that share one logo image."""
+        logo = make_logo(os.path.join(temp_dir, "logo.png"))
+        inputs = [
+            make_logo_document(os.path.join(temp_dir, f"ch{n}.pdf"), logo, f"Chapter {n}")
+            for n in range(3)
+        ]
+        output = os.path.join(temp_dir, f"{engine}-{deduplicate}.pdf")
+        merger = create_merger(output, engine, deduplicate)
+        for pdf in inputs:
+            merger.append(pdf)
+        merger.close()
+        return output, merger.stats
+    
+    def test_shared_image_written_once(self, temp_dir, engine):
+        """All chapters reference the same image object."""
+        output, _ = self.merge(temp_dir, engine, True)
+        
+        assert len(set(image_ids(PdfReader(output)))) == 1
+    
+    def test_reports_bytes_saved(self, temp_dir, engine):
+        """The saved bytes roughly match the size difference of the output."""
+        deduplicated, stats = self.merge(temp_dir, engine, True)
+        plain, plain_stats = self.merge(temp_dir, engine, False)
+        saved = os.path.getsize(plain) - os.path.getsize(deduplicated)
+        
+        assert plain_stats['bytes_saved'] == 0
+        assert stats['deduplicated_objects'] >= 2
+        assert saved > 0
+        assert abs(stats['bytes_saved'] - saved) < saved * 0.1
+    
+    def test_content_unchanged(self, temp_dir, engine):
+        """Deduplication keeps every page and its text."""
+        output, _ = self.merge(temp_dir, engine, True)
+        
+        assert page_texts(PdfReader(output)) == ["Chapter 0", "Chapter 1", "Chapter 2"]
+    
+    def test_disabled(self, temp_dir, engine):
+        """With deduplication off, every chapter keeps its own copy."""
+        output, _ = self.merge(temp_dir, engine, False)
+        
+        assert len(set(image_ids(PdfReader(output)))) == 3
+
+
+class TestPypdfMerger:
+    """Tests specific to the pypdf engine."""
+    
+    def test_unreferenced_objects_not_counted(self, temp_dir):
+        """Objects dropped only because nothing references them are not reported as duplicates."""
+        logo = make_logo(os.path.join(temp_dir, "logo.png"))
+        dropped = make_logo_document(os.path.join(temp_dir, "dropped.pdf"), logo, "Dropped")
+        kept = make_document(os.path.join(temp_dir, "kept.pdf"), "Kept")
+        merger = PypdfMerger(os.path.join(temp_dir, "out.pdf"))
+        merger.append(dropped)
+        del merger.writer.pages[0]
+        merger.append(kept)
+        merger.close()
+        
+        assert merger.stats == {'deduplicated_objects': 0, 'bytes_saved': 0}
+
+
+class TestAddIndirectObject:
+    """Tests for add_indirect_object function."""
+    
+    def test_adds_object(self):
+        """The object is added to the writer and referenced."""
+        writer = PdfWriter()
+        
+        ref = add_indirect_object(writer, NumberObject(7))
+        
+        assert ref.pdf is writer
+        assert writer.get_object(ref.idnum) == 7
+    
+    def test_missing_method_raises(self, monkeypatch):
+        """A pypdf without the method raises IncrementalUpdateError instead of AttributeError."""
+        writer = PdfWriter()
+        monkeypatch.delattr(PdfWriter, '_add_object')
+        
+        with pytest.raises(IncrementalUpdateError):
+            add_indirect_object(writer, NumberObject(7))
@@ -0,0 +1,134 @@
+"""
+Unit tests for bookbuilder.optimize module.
+
+Tests cover:
+- Step selection from output settings
+- Per-step reports (time, size before and after)
+- Stream recompression with and without pikepdf
+- Object streams and linearization (pikepdf)
+"""
+
+import os
+import pytest
+from pypdf import PdfReader
+from reportlab.pdfgen import canvas
+
+from bookbuilder import optimize
+from bookbuilder.optimize import optimize_pdf
+
+
+def make_book(path, pages=20):
+    """Write a multi-page PDF whose content streams are stored uncompressed."""
+    source = path + ".src.pdf"
+    c = canvas.Canvas(source, pageCompression=0)
+    for n in range(pages):
+        for line in range(40):
+            c.drawString(72, 750 - line * 16, f"Page {n + 1} line {line + 1} of the book")
+        c.showPage()
+    c.save()
+    os.replace(source, path)
+    return path
+
+
+def page_texts(path):
+    """Extract the text of every page."""
+    return [page.extract_text() for page in PdfReader(path).pages]
+
+
+class TestOptimizePdf:
+    """Tests for optimize_pdf function."""
+    
+    def test_disabled_steps_skipped(self, temp_dir):
+        """Only enabled optimizations run."""
+        book = make_book(os.path.join(temp_dir, "book.pdf"))
+        settings = {'compressStreams': False, 'objectStreams': False, 'linearize': False}
+        
+        assert optimize_pdf(book, settings, verbose=False) == []
+    
+    def test_compress_streams_report(self, temp_dir):
+        """Recompression shrinks uncompressed content and reports the change."""
+        book = make_book(os.path.join(temp_dir, "book.pdf"))
+        texts = page_texts(book)
+        settings = {'compressStreams': True, 'objectStreams': False}
+        
+        reports = optimize_pdf(book, settings, verbose=False)
+        
+        assert [r['name'] for r in reports] == ['compressStreams']
+        assert reports[0]['size_after'] == os.path.getsize(book)
+        assert reports[0]['size_after'] < reports[0]['size_before']
+        assert reports[0]['seconds'] >= 0
+        assert page_texts(book) == texts
+    
+    def test_compress_streams_without_pikepdf(self, temp_dir, monkeypatch):
+        """Without pikepdf, page content streams are recompressed with pypdf."""
+        monkeypatch.setattr(optimize, 'pikepdf', None)
+        book = make_book(os.path.join(temp_dir, "book.pdf"))
+        texts = page_texts(book)
+        
+        reports = optimize_pdf(book, {'objectStreams': False}, verbose=False)
+        
+        assert reports[0]['size_after'] < reports[0]['size_before']
+        assert page_texts(book) == texts
+    
+    def test_pikepdf_steps_skipped_without_pikepdf(self, temp_dir, monkeypatch):
+        """Steps that need pikepdf are reported as skipped and leave the file alone."""
+        monkeypatch.setattr(optimize, 'pikepdf', None)
+        book = make_book(os.path.join(temp_dir, "book.pdf"))
+        size = os.path.getsize(book)
+        settings = {'compressStreams': False, 'objectStreams': True, 'linearize': True}
+        
+        reports = optimize_pdf(book, settings, verbose=False)
+        
+        assert [r['name'] for r in reports] == ['objectStreams', 'linearize']
+        assert all('skipped' in r for r in reports)
+        assert os.path.getsize(book) == size
+    
+    def test_failed_step_keeps_previous_file(self, temp_dir):
+        """A step that fails leaves the file and no temporary output behind."""
+        book = os.path.join(temp_dir, "book.pdf")
+        with open(book, 'wb') as f:
+            f.write(b"not a pdf")
+        
+        reports = optimize_pdf(book, {'objectStreams': False}, verbose=False)
+        
+        assert 'skipped' in reports[0]
+        assert os.listdir(temp_dir) == ["book.pdf"]
+    
+    def test_prints_report(self, temp_dir, capsys):
+        """Each step prints its time and size saved."""
+        book = make_book(os.path.join(temp_dir, "book.pdf"))
+        
+        optimize_pdf(book, {'objectStreams': False})
+        
+        assert "compressStreams:" in capsys.readouterr().out
+
+
+class TestPikepdfOptimizations:
+    """Tests for the optimizations that need pikepdf."""
+    
+    @pytest.fixture(autouse=True)
+    def require_pikepdf(self):
+        """Skip when pikepdf is not installed."""
+        pytest.importorskip("pikepdf")
+    
+    def test_object_streams(self, temp_dir):
+        """Objects are packed into object streams."""
+        book = make_book(os.path.join(temp_dir, "book.pdf"))
+        
+        optimize_pdf(book, {'compressStreams': False, 'objectStreams': True}, verbose=False)
+        
+        with open(book, 'rb') as f:
+            assert b"/ObjStm" in f.read()
+        assert len(page_texts(book)) == 20
+    
+    def test_linearize(self, temp_dir):
+        """The output is linearized and keeps every page."""
+        import pikepdf
+        book = make_book(os.path.join(temp_dir, "book.pdf"))
+        texts = page_texts(book)
+        
+        optimize_pdf(book, {'linearize': True}, verbose=False)
+        
+        with pikepdf.open(book) as pdf:
+            assert pdf.is_linearized
+        assert page_texts(book) == texts
@@ -0,0 +1,71 @@
+"""
+Unit tests for bookbuilder.plan module.
+
+Tests cover:
+- Book plan files, markdown files and serialization
+- Compact __slots__ models
+- Directories checked when resolving order file references
+"""
+
+import os
+import pytest
+
+from bookbuilder.plan import BookPlan, ChapterEntry, PlanSection, order_reference_stamps
+
+
+def make_plan():
+    """Make a plan with two chapters and a front cover."""
+    return BookPlan(
+        [PlanSection("One", ["/p/a.md", "/p/b.pdf"]), PlanSection("Two", ["/p/c.MD"])],
+        front_cover_files=["/p/cover.md"],
+        anchor_map={"a.md": "a"}
+    )
+
+
+class TestBookPlan:
+    """Tests for BookPlan class."""
+    
+    def test_files(self):
+        """Chapter files come first, in order, then the covers."""
+        plan = make_plan()
+        
+        assert plan.book_files == ["/p/a.md", "/p/b.pdf", "/p/c.MD", "/p/cover.md"]
+        assert plan.markdown_files == ["/p/a.md", "/p/c.MD"]
+    
+    def test_round_trip(self):
+        """A plan survives to_dict and from_dict unchanged."""
+        plan = make_plan()
+        
+        restored = BookPlan.from_dict(plan.to_dict())
+        
+        assert restored.sections == plan.sections
+        assert restored.front_cover_files == ("/p/cover.md",)
+        assert restored.back_cover_files == ()
+        assert restored.anchor_map == {"a.md": "a"}
+    
+    @pytest.mark.parametrize("model", [make_plan(), PlanSection("One", []), ChapterEntry("One", 1, 1)])
+    def test_slots(self, model):
+        """Models have no per-instance dictionary."""
+        assert not hasattr(model, '__dict__')
+        with pytest.raises(AttributeError):
+            model.extra = 1
+
+
+class TestOrderReferenceStamps:
+    """Tests for order_reference_stamps function."""
+    
+    def test_directories_of_references(self, temp_dir):
+        """The directory of every relative file and folder reference is stamped."""
+        os.makedirs(os.path.join(temp_dir, "docs"))
+        chapters = [
+            {"section": "One", "files": ["intro", "docs/a.md", "/abs/x.md"]},
+            {"section": "Two", "folders": ["docs/", "missing/sub"]},
+        ]
+        
+        stamps = order_reference_stamps(chapters, temp_dir)
+        
+        assert stamps == {
+            temp_dir: os.stat(temp_dir).st_mtime_ns,
+            os.path.join(temp_dir, "docs"): os.stat(os.path.join(temp_dir, "docs")).st_mtime_ns,
+            os.path.join(temp_dir, "missing"): None,
+        }
@@ -0,0 +1,152 @@
+"""
+Unit tests for bookbuilder.probe module.
+
+Tests cover:
+- Page counts from classic cross-reference tables
+- Incremental updates (newest cross-reference section wins)
+- Cross-reference streams and object streams
+- Stream decoding (FlateDecode, PNG predictors)
+- Skipping hex string values in the catalog and page tree
+- Returning None for files the probe cannot read
+"""
+
+import os
+import zlib
+import pytest
+from pypdf import PdfReader, PdfWriter
+
+from bookbuilder.probe import ProbeError, decode_stream, probe_page_count
+
+
+def write_raw_pdf(path, objects):
+    """Write a PDF from raw object bodies (object numbers start at 1)."""
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+class TestProbePageCount:
+    """Tests for probe_page_count function."""
+    
+    @pytest.mark.parametrize("pages", [1, 7, 120])
+    def test_classic_xref_table(self, temp_dir, pages, make_pdf):
+        """Page counts are read from files with a classic xref table."""
+        pdf_path = make_pdf(os.path.join(temp_dir, "doc.pdf"), pages)
+        
+        assert probe_page_count(pdf_path) == pages
+    
+    def test_nested_page_tree(self, temp_dir):
+        """The count of the root node covers nested page tree nodes."""
+        pdf_path = os.path.join(temp_dir, "doc.pdf")
+        writer = PdfWriter()
+        for _ in range(25):
+            writer.add_blank_page(200, 200)
+        writer.write(pdf_path)
+        
+        assert probe_page_count(pdf_path) == len(PdfReader(pdf_path).pages) == 25
+    
+    def test_incremental_update(self, temp_dir, make_pdf):
+        """Pages added in an incremental update are counted."""
+        pdf_path = make_pdf(os.path.join(temp_dir, "doc.pdf"), 2)
+        writer = PdfWriter(pdf_path, incremental=True)
+        writer.add_blank_page(200, 200)
+        writer.write(pdf_path)
+        
+        with open(pdf_path, 'rb') as f:
+            assert f.read().count(b'startxref') == 2
+        assert probe_page_count(pdf_path) == 3
+    
+    def test_xref_and_object_streams(self, temp_dir, make_pdf):
+        """Catalog and page tree stored in object streams are found."""
+        pikepdf = pytest.importorskip("pikepdf")
+        source = make_pdf(os.path.join(temp_dir, "doc.pdf"), 5)
+        pdf_path = os.path.join(temp_dir, "compressed.pdf")
+        with pikepdf.open(source) as pdf:
+            pdf.save(pdf_path, object_stream_mode=pikepdf.ObjectStreamMode.generate)
+        
+        with open(pdf_path, 'rb') as f:
+            assert b'/ObjStm' in f.read()
+        assert probe_page_count(pdf_path) == 5
+    
+    @pytest.mark.parametrize("catalog, pages", [
+        (b"<< /Type /Catalog /Lang <656e> /Pages 2 0 R /Foo <00ff> >>", b"<< /Type /Pages /Kids [4 0 R] /Count 1 >>"),
+        (b"<< /Type /Catalog /Pages 2 0 R >>", b"<< /Type /Pages /Kids [4 0 R] /Count 1 /Foo <00ff> >>"),
+        (b"<< /Type /Catalog /Pages 2 0 R /Foo <00ff> >>", b"<< /Type /Pages /Foo <00ff> /Kids [4 0 R] /Count 1 >>"),
+    ])
+    def test_hex_strings_in_catalog_and_page_tree(self, temp_dir, catalog, pages):
+        """Hex string values are skipped without leaving their dictionary."""
+        pdf_path = write_raw_pdf(os.path.join(temp_dir, "doc.pdf"), [
+            catalog,
+            pages,
+            b"<< /Count 99 >>",
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 200 200] >>",
+        ])
+        
+        assert probe_page_count(pdf_path) == len(PdfReader(pdf_path).pages) == 1
+    
+    def test_encrypted_file(self, temp_dir, make_pdf):
+        """Encrypted files are left to pypdf."""
+        source = make_pdf(os.path.join(temp_dir, "doc.pdf"), 2)
+        writer = PdfWriter(clone_from=source)
+        writer.encrypt("secret")
+        pdf_path = os.path.join(temp_dir, "encrypted.pdf")
+        writer.write(pdf_path)
+        
+        assert probe_page_count(pdf_path) is None
+    
+    @pytest.mark.parametrize("content", [b"", b"not a pdf", b"%PDF-1.4\nstartxref\n99999\n%%EOF\n"])
+    def test_unreadable_files(self, temp_dir, content):
+        """Empty, non-PDF and damaged files return None."""
+        pdf_path = os.path.join(temp_dir, "broken.pdf")
+        with open(pdf_path, 'wb') as f:
+            f.write(content)
+        
+        assert probe_page_count(pdf_path) is None
+    
+    def test_truncated_file(self, temp_dir, make_pdf):
+        """A file cut off before its cross-reference table returns None."""
+        source = make_pdf(os.path.join(temp_dir, "doc.pdf"), 3)
+        with open(source, 'rb') as f:
+            data = f.read()
+        pdf_path = os.path.join(temp_dir, "truncated.pdf")
+        with open(pdf_path, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        
+        assert probe_page_count(pdf_path) is None
+    
+    def test_missing_file(self, temp_dir):
+        """A missing file returns None."""
+        assert probe_page_count(os.path.join(temp_dir, "missing.pdf")) is None
+
+
+class TestDecodeStream:
+    """Tests for decode_stream function."""
+    
+    def test_flate(self):
+        """FlateDecode content is inflated."""
+        data = zlib.compress(b"hello world")
+        
+        assert decode_stream({'/Filter': '/FlateDecode'}, data) == b"hello world"
+    
+    def test_png_up_predictor(self):
+        """PNG Up rows are added to the previous row byte by byte."""
+        rows = b"\x02\x01\x02\x03" + b"\x02\x01\xff\x01"
+        params = {'/Predictor': 12, '/Columns': 3}
+        
+        decoded = decode_stream({'/Filter': '/FlateDecode', '/DecodeParms': params}, zlib.compress(rows))
+        
+        assert decoded == b"\x01\x02\x03\x02\x01\x04"
+    
+    def test_unsupported_filter(self):
+        """Filters other than FlateDecode are rejected."""
+        with pytest.raises(ProbeError):
+            decode_stream({'/Filter': '/LZWDecode'}, b"")
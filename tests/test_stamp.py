@@ -0,0 +1,218 @@
+"""
+Unit tests for bookbuilder.stamp module.
+
+Tests cover:
+- Placeholders and book-wide page numbers in the stamped text
+- Stamping a book with an appended incremental update
+- Merging the stamps with the public pypdf API when objects cannot be added
+- Stamping during the merge (including chapter blocks)
+- Mapping styleSettings.fontFamily to the stamp fonts
+"""
+
+import os
+import shutil
+import datetime
+import pytest
+import reportlab
+from pypdf import PdfReader, PdfWriter
+
+from bookbuilder import combine, stamp
+from bookbuilder.cache import ChapterBlockCache, PageCountIndex
+from bookbuilder.combine import combine_pdfs_with_bookmarks
+from bookbuilder.merge import IncrementalUpdateError
+from bookbuilder.plan import ChapterEntry
+from bookbuilder.stamp import PageStamper, resolve_stamp_fonts
+
+
+def make_stamper(**page_settings):
+    """Create a stamper with a fixed date."""
+    settings = {
+        'header': '{title}',
+        'footerLeft': '{date}',
+        'footerCenter': 'Page {page} of {pages}',
+        'footerRight': '{bookTitle}',
+        'dateFormat': '%Y-%m-%d',
+        'bookTitle': 'The Book',
+        **page_settings,
+    }
+    return PageStamper(settings, date=datetime.date(2024, 5, 1))
+
+
+class TestPageStamper:
+    """Tests for PageStamper class."""
+    
+    def test_page_labels(self, temp_dir):
+        """Only pages of registered documents are labelled."""
+        stamper = make_stamper()
+        stamper.add_document(os.path.join(temp_dir, "a.pdf"), "Alpha", "a.md")
+        
+        labels = stamper.page_labels([
+            (os.path.join(temp_dir, "cover.pdf"), 0, 1),
+            (os.path.join(temp_dir, "a.pdf"), 1, 2),
+        ])
+        
+        assert sorted(labels) == [1, 2]
+        assert labels[1] == {'title': 'Alpha', 'filename': 'a.md'}
+    
+    def test_stamp_file(self, temp_dir, make_pdf):
+        """Stamps carry book-wide page numbers and are appended as an update."""
+        book = make_pdf(os.path.join(temp_dir, "book.pdf"), 4)
+        with open(book, 'rb') as f:
+            original = f.read()
+        stamper = make_stamper()
+        stamper.add_document("chapter.pdf", "Chapter One", "one.md")
+        
+        count = stamper.stamp_file(book, stamper.page_labels([("chapter.pdf", 1, 3)]))
+        
+        with open(book, 'rb') as f:
+            assert f.read().startswith(original)
+        texts = [page.extract_text() for page in PdfReader(book).pages]
+        assert count == 3
+        assert "Page" not in texts[0]
+        assert "book.pdf page 3" in texts[2]
+        assert "Chapter One" in texts[2]
+        assert "Page 3 of 4" in texts[2]
+        assert "2024-05-01" in texts[2]
+        assert "The Book" in texts[2]
+    
+    def test_restamp_replaces_stamp(self, temp_dir, make_pdf):
+        """Stamping a page again replaces its stamp instead of adding another."""
+        book = make_pdf(os.path.join(temp_dir, "book.pdf"), 2)
+        labels = {0: {'title': 'Chapter', 'filename': 'c.md'}}
+        make_stamper().stamp_file(book, labels)
+        
+        PageStamper({'footerCenter': 'Folio {page}', 'header': ''}).stamp_file(book, labels)
+        
+        text = PdfReader(book).pages[0].extract_text()
+        assert "Folio 1" in text
+        assert "Page 1 of 2" not in text
+    
+    def test_page_without_contents(self, temp_dir):
+        """A page with no content stream gets just the stamp."""
+        writer = PdfWriter()
+        writer.add_blank_page(612, 792)
+        
+        assert make_stamper().stamp_writer(writer, {0: {'title': 'Blank', 'filename': 'b.md'}}) == 1
+        
+        path = os.path.join(temp_dir, "blank.pdf")
+        writer.write(path)
+        assert "Page 1 of 1" in PdfReader(path).pages[0].extract_text()
+    
+    def test_merged_stamps_without_indirect_objects(self, temp_dir, make_pdf, monkeypatch):
+        """Without a way to add objects, stamps are merged and the file rewritten."""
+        book = make_pdf(os.path.join(temp_dir, "book.pdf"), 2)
+        labels = {0: {'title': 'Chapter', 'filename': 'c.md'}}
+        make_stamper().stamp_file(book, {1: labels[0]})
+        
+        def unsupported(writer, obj):
+            raise IncrementalUpdateError("pypdf cannot add indirect objects")
+        monkeypatch.setattr(stamp, 'add_indirect_object', unsupported)
+        stamper = PageStamper({'footerCenter': 'Folio {page}', 'header': ''})
+        
+        assert stamper.stamp_file(book, {0: labels[0], 1: labels[0]}) == 2
+        
+        texts = [page.extract_text() for page in PdfReader(book).pages]
+        assert "book.pdf page 1" in texts[0] and "Folio 1" in texts[0]
+        assert "book.pdf page 2" in texts[1] and "Folio 2" in texts[1]
+        assert "Page 2 of 2" not in texts[1]
+    
+    def test_signature_follows_date_and_settings(self):
+        """The signature changes with the date and the furniture settings."""
+        stamper = make_stamper()
+        
+        assert make_stamper().signature == stamper.signature
+        assert make_stamper(footerRight='Other').signature != stamper.signature
+        assert PageStamper(stamper.settings, date=datetime.date(2024, 5, 2)).signature != stamper.signature
+
+
+class TestResolveStampFonts:
+    """Tests for resolve_stamp_fonts function."""
+    
+    @pytest.fixture
+    def font_dir(self, temp_dir):
+        """Bundle ReportLab's Vera TrueType fonts as the "Vera" family."""
+        font_dir = os.path.join(temp_dir, "fonts")
+        os.makedirs(font_dir)
+        source = os.path.join(os.path.dirname(reportlab.__file__), "fonts")
+        shutil.copy(os.path.join(source, "Vera.ttf"), os.path.join(font_dir, "Vera-Regular.ttf"))
+        shutil.copy(os.path.join(source, "VeraBd.ttf"), os.path.join(font_dir, "Vera-Bold.ttf"))
+        return font_dir
+    
+    @pytest.mark.parametrize("font_family, fonts", [
+        (None, ('Helvetica', 'Helvetica-Bold')),
+        ("'Times New Roman', serif", ('Times-Roman', 'Times-Bold')),
+        ("monospace", ('Courier', 'Courier-Bold')),
+        ("Georgia, serif", None),
+    ])
+    def test_standard_families(self, font_family, fonts):
+        """The first family maps to a standard PDF font, or to None if it cannot be embedded."""
+        styles = {'fontFamily': font_family} if font_family else {}
+        
+        assert resolve_stamp_fonts(styles) == fonts
+    
+    def test_bundled_family_embedded(self, temp_dir, font_dir, make_pdf):
+        """A bundled TrueType family is embedded in the stamps."""
+        styles = {'fontFamily': 'Vera, sans-serif', 'fontDirectory': font_dir}
+        book = make_pdf(os.path.join(temp_dir, "book.pdf"), 1)
+        stamper = PageStamper({'header': 'Head', 'footerLeft': 'Foot'}, styles)
+        
+        stamper.stamp_file(book, {0: {'title': 'T', 'filename': 't.md'}})
+        
+        assert stamper.fonts == ('BB-Vera-Regular', 'BB-Vera-Bold')
+        form = PdfReader(book).pages[0]['/Resources']['/XObject']['/BBStamp']
+        fonts = [font.get_object() for font in form['/Resources']['/Font'].values()]
+        vera = [font for font in fonts if 'Vera' in font['/BaseFont']]
+        assert len(vera) == 2
+        assert all('/FontFile2' in font['/FontDescriptor'] for font in vera)
+    
+    def test_bundled_family_without_truetype(self, font_dir):
+        """A bundled family with only web fonts cannot be embedded."""
+        for name in os.listdir(font_dir):
+            os.rename(os.path.join(font_dir, name), os.path.join(font_dir, name[:-4] + ".woff2"))
+        
+        assert resolve_stamp_fonts({'fontFamily': 'Vera', 'fontDirectory': font_dir}) is None
+        with pytest.raises(ValueError):
+            PageStamper(style_settings={'fontFamily': 'Vera', 'fontDirectory': font_dir})
+
+
+class TestStampDuringMerge:
+    """Tests for stamping in combine_pdfs_with_bookmarks."""
+    
+    def test_book_wide_page_numbers(self, temp_dir, make_pdf):
+        """Rendered chapters are stamped with their page number in the book."""
+        toc = make_pdf(os.path.join(temp_dir, "toc.pdf"), 1)
+        chapters = [make_pdf(os.path.join(temp_dir, f"ch{n}.pdf"), 2) for n in range(3)]
+        chapter_info = [ChapterEntry('One', 2, 2), ChapterEntry('Two', 6, 1)]
+        stamper = make_stamper()
+        for n, pdf in enumerate(chapters[:2]):
+            stamper.add_document(pdf, f"Doc {n}", f"ch{n}.md")
+        output = os.path.join(temp_dir, "book.pdf")
+        
+        combine_pdfs_with_bookmarks(chapters, chapter_info, output, toc,
+                                    chapter_cache=ChapterBlockCache(temp_dir), stamper=stamper)
+        
+        texts = [page.extract_text() for page in PdfReader(output).pages]
+        assert len(texts) == 7
+        assert "Page" not in texts[0]
+        assert "Doc 0" in texts[1] and "Page 2 of 7" in texts[1]
+        assert "Doc 1" in texts[4] and "Page 5 of 7" in texts[4]
+        # Chapters included as existing PDFs are not stamped
+        assert "Page" not in texts[5]
+    
+    def test_block_page_counts_from_index(self, temp_dir, make_pdf, monkeypatch):
+        """Page ranges of chapter block files come from the page index, not by parsing them again."""
+        toc = make_pdf(os.path.join(temp_dir, "toc.pdf"), 1)
+        chapters = [make_pdf(os.path.join(temp_dir, f"ch{n}.pdf"), 2) for n in range(2)]
+        index = PageCountIndex(temp_dir)
+        stamper = make_stamper()
+        for pdf in chapters:
+            index.record(pdf, 2)
+            stamper.add_document(pdf, os.path.basename(pdf), "ch.md")
+        monkeypatch.setattr(combine, 'safe_get_page_count', lambda *args: pytest.fail("PDF parsed"))
+        output = os.path.join(temp_dir, "book.pdf")
+        
+        combine_pdfs_with_bookmarks(chapters, [ChapterEntry('One', 2, 2)], output, toc,
+                                    chapter_cache=ChapterBlockCache(temp_dir), stamper=stamper,
+                                    page_index=index)
+        
+        assert "Page 4 of 5" in PdfReader(output).pages[3].extract_text()
@@ -5,6 +5,7 @@ Tests cover:
 - Configuration loading and merging
 - Gitignore pattern handling
 - Directory utilities
+- CSS length, margin and page size conversion
 """
 
 import os
@@ -22,7 +23,11 @@ from bookbuilder.utils import (
     filename_to_anchor,
     build_anchor_map,
     rewrite_markdown_links,
-    inject_document_anchor
+    inject_document_anchor,
+    absolutize_resource_urls,
+    css_length_to_points,
+    css_margins_to_points,
+    css_page_size_to_points
 )
 
 
@@ -261,6 +266,21 @@ class TestIsIgnored:
         patterns = ["*.pyc"]
         
         assert is_ignored("deep/nested/path/file.pyc", patterns) is True
+    
+    def test_inside_ignored_folder(self):
+        """Paths inside an ignored folder are ignored."""
+        patterns = ["build/", "!build/keep.md"]
+        
+        assert is_ignored("build/out/chapter.md", patterns) is True
+        assert is_ignored("build/keep.md", patterns) is True
+        assert is_ignored("src/build.md", patterns) is False
+    
+    def test_negation(self):
+        """A later negated pattern re-includes a path."""
+        patterns = ["*.md", "!README.md"]
+        
+        assert is_ignored("docs/notes.md", patterns) is True
+        assert is_ignored("docs/README.md", patterns) is False
 
 
 class TestGetDefaultOutputDir:
@@ -555,3 +575,64 @@ class TestInjectDocumentAnchor:
         result = inject_document_anchor(html, "section")
         
         assert html in result
+
+
+class TestAbsolutizeResourceUrls:
+    """Tests for absolutize_resource_urls function."""
+    
+    def test_relative_src_made_absolute(self, temp_dir):
+        """Relative image paths become file URIs under the base directory."""
+        html = '<img alt="x" src="images/logo.png">'
+        
+        result = absolutize_resource_urls(html, temp_dir)
+        
+        assert 'src="file://' in result
+        assert os.path.join(temp_dir, "images", "logo.png").replace(os.sep, "/") in result
+    
+    def test_remote_and_data_urls_preserved(self, temp_dir):
+        """URLs with a scheme are left unchanged."""
+        html = '<img src="https://example.com/a.png"><img src="data:image/png;base64,AA">'
+        
+        assert absolutize_resource_urls(html, temp_dir) == html
+    
+    def test_encoded_spaces_decoded_once(self, temp_dir):
+        """Percent-encoded paths are not double encoded."""
+        result = absolutize_resource_urls('<img src="my%20image.png">', temp_dir)
+        
+        assert "my%20image.png" in result
+        assert "%2520" not in result
+
+
+class TestCssLengths:
+    """Tests for css_length_to_points, css_margins_to_points and css_page_size_to_points."""
+    
+    @pytest.mark.parametrize("value,points", [("1in", 72), ("10pt", 10), ("16px", 12), ("2.54cm", 72), ("12", 9)])
+    def test_units(self, value, points):
+        """CSS units are converted to points (unitless values are pixels)."""
+        assert css_length_to_points(value) == pytest.approx(points)
+    
+    def test_unknown_unit(self):
+        """Unsupported lengths use the default."""
+        assert css_length_to_points("2em", 5) == 5
+    
+    @pytest.mark.parametrize("margins,expected", [
+        ("1in", (72, 72, 72, 72)),
+        ("1in 0.5in", (72, 36, 72, 36)),
+        ("1in 0.5in 2in", (72, 36, 144, 36)),
+        ("1in 0.8in 1in 0.5in", (72, 57.6, 72, 36)),
+    ])
+    def test_margin_shorthand(self, margins, expected):
+        """One to four margin values expand like CSS."""
+        assert css_margins_to_points(margins) == pytest.approx(expected)
+    
+    @pytest.mark.parametrize("page_size,expected", [
+        ("A4", (595.28, 841.89)),
+        ("letter", (612, 792)),
+        ("letter landscape", (792, 612)),
+        ("6in 9in", (432, 648)),
+        ("5in", (360, 360)),
+        ("unknown", (595.28, 841.89)),
+    ])
+    def test_page_size(self, page_size, expected):
+        """Page size keywords, orientations and lengths are converted to points."""
+        assert css_page_size_to_points(page_size) == pytest.approx(expected)
@@ -4,10 +4,11 @@ from bookbuilder.convert import convert_markdown_to_pdf
 import os
 
 class TestFullBleed(unittest.TestCase):
+    @patch('bookbuilder.convert.CSS')
     @patch('bookbuilder.convert.HTML')
     @patch('bookbuilder.convert.markdown.markdown')
     @patch('builtins.open', new_callable=unittest.mock.mock_open, read_data='# Cover\nContent')
-    def test_full_bleed_css(self, mock_open, mock_markdown, mock_html):
+    def test_full_bleed_css(self, mock_open, mock_markdown, mock_html, mock_css):
         mock_markdown.return_value = '<h1>Cover</h1><p>Content</p>'
         mock_html_instance = MagicMock()
         mock_html.return_value = mock_html_instance
@@ -18,8 +19,8 @@ class TestFullBleed(unittest.TestCase):
         # Test with full_bleed=True
         convert_markdown_to_pdf(md_path, pdf_path, full_bleed=True)
         
-        # Verify HTML was called with margin: 0 and content: none
-        call_args = mock_html.call_args
+        # Verify the per-document stylesheet has margin: 0 and content: none
+        call_args = mock_css.call_args
         html_string = call_args[1]['string']
         
         self.assertIn('margin: 0;', html_string)
@@ -28,7 +29,7 @@ class TestFullBleed(unittest.TestCase):
         # Test with full_bleed=False (default)
         convert_markdown_to_pdf(md_path, pdf_path, full_bleed=False)
         
-        call_args = mock_html.call_args
+        call_args = mock_css.call_args
         html_string = call_args[1]['string']
         
         self.assertNotIn('margin: 0;', html_string)